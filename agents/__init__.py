@@ -1,12 +1,29 @@
-from .chat_agent import ChatAgent
-from .react_agent import ReActAgent
-from .reflection_agent import ReflectionAgent
-from .plan_and_exe import PlanAndSolveAgent
+from typing import TYPE_CHECKING
+from core.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .chat_agent import ChatAgent
+    from .react_agent import ReActAgent
+    from .scratchpad import Scratchpad
+    from .reflection_agent import ReflectionAgent
+    from .plan_and_exe import PlanAndSolveAgent
+
+# 公开名称 -> 所在子模块，首次访问时才导入
+_EXPORTS = {
+    "ChatAgent": ".chat_agent",
+    "ReActAgent": ".react_agent",
+    "Scratchpad": ".scratchpad",
+    "ReflectionAgent": ".reflection_agent",
+    "PlanAndSolveAgent": ".plan_and_exe",
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 # 定义模块的公开接口
 __all__ = [
     "ChatAgent",
     "ReActAgent",
+    "Scratchpad",
     "ReflectionAgent",
     "PlanAndSolveAgent",
 ]
@@ -1,6 +1,12 @@
 # my_simple_agent.py
-from typing import Optional, Iterator
+from typing import Dict, List, Optional, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from core import Agent, Message, GoAgentLLM, Config
+from core.events import EventType, EventLevel
+from tools.base import ToolTimeoutError, ToolCancelledError
+import threading
+import asyncio
+import time
 import re
 
 class ChatAgent(Agent):
@@ -16,51 +22,99 @@ class ChatAgent(Agent):
         system_prompt: Optional[str] = None,
         config: Optional[Config] = None,
         tool_registry: Optional['ToolRegistry'] = None,
-        enable_tool_calling: bool = True
+        enable_tool_calling: bool = True,
+        max_parallel_tools: int = 4,
+        tool_timeout: Optional[float] = None,
+        tool_timeouts: Optional[Dict[str, float]] = None
     ):
+        """
+        Args:
+            max_parallel_tools: 同一轮回复中的多个工具调用最多同时执行的数量
+            tool_timeout: 单个工具调用的超时时间(秒)，从本轮工具调用开始时计算，传给工具执行器处理，
+                超时的调用会收到取消信号；None 表示沿用工具执行器自身的超时配置
+            tool_timeouts: 按工具名称覆盖的超时时间
+        """
         super().__init__(name, llm, system_prompt, config)
         self.tool_registry = tool_registry
         self.enable_tool_calling = enable_tool_calling and tool_registry is not None
-        print(f"✅ {name} 初始化完成，工具调用: {'启用' if self.enable_tool_calling else '禁用'}")
+        self.max_parallel_tools = max(max_parallel_tools, 1)
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = dict(tool_timeouts or {})
+        self._tool_pool: Optional[ThreadPoolExecutor] = None
+        self._emit(EventType.MESSAGE, f"✅ {name} 初始化完成，工具调用: {'启用' if self.enable_tool_calling else '禁用'}", EventLevel.DEBUG)
 
 
     def run(self, input_text: str, max_tool_iterations: int = 3, **kwargs) -> str:
         """
         重写的运行方法 - 实现简单对话逻辑，支持可选工具调用
         """
-        print(f"🤖 {self.name} 正在处理: {input_text}")
+        with self.track_step("run"):
+            self._emit(EventType.STEP, f"🤖 {self.name} 正在处理: {input_text}", input=input_text)
 
-        # 构建消息列表
-        messages = []
+            messages = self._build_messages(input_text)
 
-        # 添加系统消息（可能包含工具信息）
-        enhanced_system_prompt = self._get_enhanced_system_prompt()
-        messages.append({"role": "system", "content": enhanced_system_prompt})
+            # 如果没有启用工具调用，使用简单对话逻辑
+            if not self.enable_tool_calling:
+                response = self.llm.invoke(messages, **kwargs)
+                self.add_message(Message(input_text, "user"))
+                self.add_message(Message(response, "assistant"))
+                self._emit(EventType.ANSWER, f"✅ {self.name} 响应完成", answer=response)
+                return response
 
-        # 添加历史消息
-        for msg in self._history:
-            messages.append({"role": msg.role, "content": msg.content})
+            # 支持多轮工具调用的逻辑
+            if self._use_function_calling():
+                return self._run_with_function_calls(messages, input_text, max_tool_iterations, **kwargs)
+            return self._run_with_tools(messages, input_text, max_tool_iterations, **kwargs)
 
-        # 添加当前用户消息
-        messages.append({"role": "user", "content": input_text})
+    async def arun(self, input_text: str, max_tool_iterations: int = 3, **kwargs) -> str:
+        """
+        异步运行方法 - 与 run 逻辑一致，LLM 调用走 llm.ainvoke，工具调用在线程池中执行
+        """
+        with self.track_step("run"):
+            self._emit(EventType.STEP, f"🤖 {self.name} 正在异步处理: {input_text}", input=input_text)
 
-        # 如果没有启用工具调用，使用简单对话逻辑
-        if not self.enable_tool_calling:
-            response = self.llm.invoke(messages, **kwargs)
-            self.add_message(Message(input_text, "user"))
-            self.add_message(Message(response, "assistant"))
-            print(f"✅ {self.name} 响应完成")
-            return response
+            messages = self._build_messages(input_text)
 
-        # 支持多轮工具调用的逻辑
-        return self._run_with_tools(messages, input_text, max_tool_iterations, **kwargs)
+            if not self.enable_tool_calling:
+                response = await self.llm.ainvoke(messages, **kwargs)
+                self.add_message(Message(input_text, "user"))
+                self.add_message(Message(response, "assistant"))
+                self._emit(EventType.ANSWER, f"✅ {self.name} 响应完成", answer=response)
+                return response
+
+            if self._use_function_calling():
+                return await self._arun_with_function_calls(messages, input_text, max_tool_iterations, **kwargs)
+            return await self._arun_with_tools(messages, input_text, max_tool_iterations, **kwargs)
+
+    def _build_messages(self, input_text: str, system_prompt: Optional[str] = None) -> list:
+        """
+        构建发送给LLM的消息列表：系统消息（可能包含工具信息）+ 预算内的历史消息 + 当前用户消息
+        """
+        if system_prompt is None:
+            system_prompt = self._get_enhanced_system_prompt()
+        messages = self.context.build(input_text, system_prompt)
+        self.metrics.histogram(
+            "goagent_agent_prompt_tokens", "每轮对话的提示词 token 数(估算)",
+            buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+        ).observe(self.prompt_tokens, agent=self.name)
+        return messages
+
+    def _get_enhanced_system_prompt(self, native: Optional[bool] = None) -> str:
+        """
+        构建增强的系统提示词，包含工具信息
 
-    def _get_enhanced_system_prompt(self) -> str:
-        """构建增强的系统提示词，包含工具信息"""
+        Args:
+            native: 是否使用原生函数调用，None 表示按配置判断；为 False 时按文本格式描述工具调用
+        """
         base_prompt = self.system_prompt or "你是一个有用的AI助手。"
 
         if not self.enable_tool_calling or not self.tool_registry:
             return base_prompt
+        if native is None:
+            native = self._use_function_calling()
+        if native:
+            # 工具定义通过请求参数 tools 传入，无需在提示词中描述调用格式
+            return base_prompt
 
         # 获取工具描述
         tools_description = self.tool_registry.get_tools_description()
@@ -79,6 +133,97 @@ class ChatAgent(Agent):
 
         return base_prompt + tools_section
 
+    def _use_function_calling(self) -> bool:
+        """模型客户端与工具注册表都支持原生函数调用且配置启用时使用"""
+        return (
+            self.enable_tool_calling
+            and self.config.function_calling
+            and hasattr(self.tool_registry, "get_openai_tools")
+            and hasattr(self.llm, "invoke_with_tools")
+        )
+
+    def _run_with_function_calls(self, messages: list, input_text: str, max_tool_iterations: int, **kwargs) -> str:
+        """使用原生函数调用的运行逻辑，工具调用及其结果以 tool_calls / tool 消息追加到对话中"""
+        tools = self.tool_registry.get_openai_tools()
+        final_response = None
+
+        for _ in range(max_tool_iterations):
+            turn = self.llm.invoke_with_tools(messages, tools, **kwargs)
+            if turn is None:
+                return self._run_with_tools(self._text_fallback_messages(input_text), input_text, max_tool_iterations, **kwargs)
+            if not turn.tool_calls:
+                final_response = turn.content
+                break
+            calls = self._function_calls(turn)
+            with self.track_step("tool_calls"):
+                tool_results = self._execute_tool_calls(calls)
+            self._append_function_results(messages, turn, tool_results)
+
+        # 超过最大迭代次数时，禁止继续调用工具并获取最终回答
+        if final_response is None:
+            turn = self.llm.invoke_with_tools(messages, tools, tool_choice="none", **kwargs)
+            if turn is None:
+                return self._run_with_tools(self._text_fallback_messages(input_text), input_text, max_tool_iterations, **kwargs)
+            final_response = turn.content
+
+        self.add_message(Message(input_text, "user"))
+        self.add_message(Message(final_response, "assistant"))
+        self._emit(EventType.ANSWER, f"✅ {self.name} 响应完成", answer=final_response)
+        return final_response
+
+    async def _arun_with_function_calls(self, messages: list, input_text: str, max_tool_iterations: int, **kwargs) -> str:
+        """_run_with_function_calls 的异步版本"""
+        tools = self.tool_registry.get_openai_tools()
+        final_response = None
+
+        for _ in range(max_tool_iterations):
+            turn = await self.llm.ainvoke_with_tools(messages, tools, **kwargs)
+            if turn is None:
+                return await self._arun_with_tools(self._text_fallback_messages(input_text), input_text, max_tool_iterations, **kwargs)
+            if not turn.tool_calls:
+                final_response = turn.content
+                break
+            calls = self._function_calls(turn)
+            with self.track_step("tool_calls"):
+                tool_results = await self._aexecute_tool_calls(calls)
+            self._append_function_results(messages, turn, tool_results)
+
+        if final_response is None:
+            turn = await self.llm.ainvoke_with_tools(messages, tools, tool_choice="none", **kwargs)
+            if turn is None:
+                return await self._arun_with_tools(self._text_fallback_messages(input_text), input_text, max_tool_iterations, **kwargs)
+            final_response = turn.content
+
+        self.add_message(Message(input_text, "user"))
+        self.add_message(Message(final_response, "assistant"))
+        self._emit(EventType.ANSWER, f"✅ {self.name} 响应完成", answer=final_response)
+        return final_response
+
+    def _text_fallback_messages(self, input_text: str) -> list:
+        """
+        原生函数调用的请求失败(例如服务端不支持 tools 参数返回 400)时，
+        改用文本格式描述工具，重新构建本轮的消息
+        """
+        self._emit(
+            EventType.MESSAGE, f"⚠️ {self.name} 原生函数调用失败，改用文本格式的工具调用", EventLevel.WARNING
+        )
+        return self._build_messages(input_text, self._get_enhanced_system_prompt(native=False))
+
+    def _function_calls(self, turn) -> list:
+        """把模型返回的原生工具调用转换为 _execute_tool_calls 使用的格式"""
+        calls = [
+            {'tool_name': call.name, 'parameters': call.arguments, 'native': True}
+            for call in turn.tool_calls
+        ]
+        self._emit(EventType.TOOL_CALL, f"🔧 模型发起 {len(calls)} 个工具调用", calls=calls)
+        return calls
+
+    def _append_function_results(self, messages: list, turn, tool_results: list) -> None:
+        """追加带 tool_calls 的 assistant 消息，以及与每个调用 id 对应的 tool 消息"""
+        messages.append(turn.to_message())
+        for call, result in zip(turn.tool_calls, tool_results):
+            messages.append({"role": "tool", "tool_call_id": call.id, "content": result})
+
     def _run_with_tools(self, messages: list, input_text: str, max_tool_iterations: int, **kwargs) -> str:
         """支持工具调用的运行逻辑"""
         current_iteration = 0
@@ -92,23 +237,11 @@ class ChatAgent(Agent):
             tool_calls = self._parse_tool_calls(response)
 
             if tool_calls:
-                print(f"🔧 检测到 {len(tool_calls)} 个工具调用")
-                # 执行所有工具调用并收集结果
-                tool_results = []
-                clean_response = response
-
-                for call in tool_calls:
-                    result = self._execute_tool_call(call['tool_name'], call['parameters'])
-                    tool_results.append(result)
-                    # 从响应中移除工具调用标记
-                    clean_response = clean_response.replace(call['original'], "")
-
-                # 构建包含工具结果的消息
-                messages.append({"role": "assistant", "content": clean_response})
-
-                # 添加工具结果
-                tool_results_text = "\n\n".join(tool_results)
-                messages.append({"role": "user", "content": f"工具执行结果:\n{tool_results_text}\n\n请基于这些结果给出完整的回答。"})
+                self._emit(EventType.TOOL_CALL, f"🔧 检测到 {len(tool_calls)} 个工具调用", calls=tool_calls)
+                # 并发执行所有工具调用，结果按调用顺序排列
+                with self.track_step("tool_calls"):
+                    tool_results = self._execute_tool_calls(tool_calls)
+                self._append_tool_results(messages, response, tool_calls, tool_results)
 
                 current_iteration += 1
                 continue
@@ -124,10 +257,56 @@ class ChatAgent(Agent):
         # 保存到历史记录
         self.add_message(Message(input_text, "user"))
         self.add_message(Message(final_response, "assistant"))
-        print(f"✅ {self.name} 响应完成")
+        self._emit(EventType.ANSWER, f"✅ {self.name} 响应完成", answer=final_response)
 
         return final_response
 
+    async def _arun_with_tools(self, messages: list, input_text: str, max_tool_iterations: int, **kwargs) -> str:
+        """支持工具调用的异步运行逻辑"""
+        current_iteration = 0
+        final_response = ""
+
+        while current_iteration < max_tool_iterations:
+            response = await self.llm.ainvoke(messages, **kwargs)
+
+            tool_calls = self._parse_tool_calls(response)
+
+            if tool_calls:
+                self._emit(EventType.TOOL_CALL, f"🔧 检测到 {len(tool_calls)} 个工具调用", calls=tool_calls)
+                # 工具为同步实现，放到线程池中并发执行以免阻塞事件循环
+                with self.track_step("tool_calls"):
+                    tool_results = await self._aexecute_tool_calls(tool_calls)
+                self._append_tool_results(messages, response, tool_calls, tool_results)
+
+                current_iteration += 1
+                continue
+
+            final_response = response
+            break
+
+        if current_iteration >= max_tool_iterations and not final_response:
+            final_response = await self.llm.ainvoke(messages, **kwargs)
+
+        self.add_message(Message(input_text, "user"))
+        self.add_message(Message(final_response, "assistant"))
+        self._emit(EventType.ANSWER, f"✅ {self.name} 响应完成", answer=final_response)
+
+        return final_response
+
+    def _append_tool_results(self, messages: list, response: str, tool_calls: list, tool_results: list) -> None:
+        """将去除工具调用标记后的回复及工具结果追加到消息列表"""
+        clean_response = response
+        for call in tool_calls:
+            # 从响应中移除工具调用标记
+            clean_response = clean_response.replace(call['original'], "")
+
+        # 构建包含工具结果的消息
+        messages.append({"role": "assistant", "content": clean_response})
+
+        # 添加工具结果
+        tool_results_text = "\n\n".join(tool_results)
+        messages.append({"role": "user", "content": f"工具执行结果:\n{tool_results_text}\n\n请基于这些结果给出完整的回答。"})
+
     def _parse_tool_calls(self, text: str) -> list:
         """解析文本中的工具调用"""
         pattern = r'\[TOOL_CALL:([^:]+):([^\]]+)\]'
@@ -143,29 +322,112 @@ class ChatAgent(Agent):
 
         return tool_calls
 
-    def _execute_tool_call(self, tool_name: str, parameters: str) -> str:
-        """执行工具调用"""
+    def _timeout_for(self, tool_name: str) -> Optional[float]:
+        return self.tool_timeouts.get(tool_name, self.tool_timeout)
+
+    def _timeout_result(self, error: ToolTimeoutError) -> str:
+        self._emit(
+            EventType.OBSERVATION, f"⏱️ {error}", EventLevel.WARNING,
+            tool=error.tool, timeout=error.timeout
+        )
+        return f"❌ 工具调用失败:{error}"
+
+    def _run_call(self, call: dict, start: float, cancel: Optional[threading.Event] = None) -> str:
+        """执行一个解析出的工具调用，超时从本轮工具调用开始时计算；未配置超时时由工具执行器决定"""
+        timeout = self._timeout_for(call['tool_name'])
+        remaining = None if timeout is None else max(timeout - (time.monotonic() - start), 0)
+        return self._execute_tool_call(call['tool_name'], call['parameters'], call.get('native', False), remaining, cancel)
+
+    def _execute_tool_calls(self, tool_calls: list) -> List[str]:
+        """
+        在有界线程池中并发执行同一轮回复中的工具调用，结果按调用顺序返回。
+        超时交给工具执行器处理，超时的调用返回错误信息，不影响其他调用的结果。
+        """
+        start = time.monotonic()
+        if len(tool_calls) == 1:
+            return [self._run_call(tool_calls[0], start)]
+
+        if self._tool_pool is None:
+            self._tool_pool = ThreadPoolExecutor(
+                max_workers=self.max_parallel_tools, thread_name_prefix=f"{self.name}-tools"
+            )
+        futures = [self._tool_pool.submit(self._run_call, call, start) for call in tool_calls]
+        return [future.result() for future in futures]
+
+    async def _aexecute_tool_calls(self, tool_calls: list) -> List[str]:
+        """_execute_tool_calls 的异步版本，并发数由信号量限制；协程被取消时通知所有进行中的工具调用结束"""
+        semaphore = asyncio.Semaphore(self.max_parallel_tools)
+        start = time.monotonic()
+        cancels = []
+
+        async def run(call: dict) -> str:
+            cancel = threading.Event()
+            cancels.append(cancel)
+            async with semaphore:
+                return await asyncio.to_thread(self._run_call, call, start, cancel)
+
+        try:
+            return list(await asyncio.gather(*(run(call) for call in tool_calls)))
+        except asyncio.CancelledError:
+            for cancel in cancels:
+                cancel.set()
+            raise
+
+    def _execute_tool_call(
+        self,
+        tool_name: str,
+        parameters: str,
+        native: bool = False,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> str:
+        """
+        执行工具调用
+
+        Args:
+            native: 是否为原生函数调用，此时 parameters 为模型生成的 JSON 参数，结果原样返回
+            timeout: 本次调用的超时时间(秒)，None 表示按工具执行器的配置
+            cancel: 取消信号，超时后由工具执行器设置，工具协作地结束执行
+        """
         if not self.tool_registry:
             return f"❌ 错误:未配置工具注册表"
 
+        # 工具执行器支持超时与取消参数，其他注册表按原接口调用
+        limits = {"timeout": timeout, "cancel": cancel} if hasattr(self.tool_registry, "execute_tool_call") else {}
         try:
+            if native:
+                return self.tool_registry.execute_tool_call(tool_name, parameters, **limits)
             # 智能参数解析
             if tool_name == 'calculator':
                 # 计算器工具直接传入表达式
-                result = self.tool_registry.execute_tool(tool_name, parameters)
+                result = self.tool_registry.execute_tool(tool_name, parameters, **limits)
             else:
                 # 其他工具使用智能参数解析
                 param_dict = self._parse_tool_parameters(tool_name, parameters)
                 tool = self.tool_registry.get_tool(tool_name)
                 if not tool:
                     return f"❌ 错误:未找到工具 '{tool_name}'"
-                result = tool.run(param_dict)
+                if limits:
+                    # 经由工具执行器调用，结果受 token 预算、超时与并发上限约束
+                    result = self.tool_registry.execute_tool_call(tool_name, param_dict, **limits)
+                else:
+                    result = tool.run(param_dict)
 
             return f"🔧 工具 {tool_name} 执行结果:\n{result}"
 
+        except ToolTimeoutError as e:
+            return self._timeout_result(e)
+        except ToolCancelledError as e:
+            return f"❌ 工具调用已取消:{str(e)}"
         except Exception as e:
             return f"❌ 工具调用失败:{str(e)}"
 
+    def close(self) -> None:
+        """关闭执行工具调用的线程池，不等待仍在执行的工具"""
+        if self._tool_pool is not None:
+            self._tool_pool.shutdown(wait=False)
+            self._tool_pool = None
+
     def _parse_tool_parameters(self, tool_name: str, parameters: str) -> dict:
         """智能解析工具参数"""
         param_dict = {}
@@ -198,32 +460,24 @@ class ChatAgent(Agent):
         """
         自定义的流式运行方法
         """
-        print(f"🌊 {self.name} 开始流式处理: {input_text}")
-
-        messages = []
-
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-
-        for msg in self._history:
-            messages.append({"role": msg.role, "content": msg.content})
+        self._emit(EventType.STEP, f"🌊 {self.name} 开始流式处理: {input_text}", input=input_text)
 
-        messages.append({"role": "user", "content": input_text})
+        messages = self._build_messages(input_text, self.system_prompt or "")
 
         # 流式调用LLM
         full_response = ""
-        print("📝 实时响应: ", end="")
+        self._emit(EventType.CHUNK, "📝 实时响应: ")
         for chunk in self.llm.stream_invoke(messages, **kwargs):
             full_response += chunk
-            print(chunk, end="", flush=True)
+            self._emit(EventType.CHUNK, chunk)
             yield chunk
 
-        print()  # 换行
+        self._emit(EventType.LLM_END)  # 换行
 
         # 保存完整对话到历史记录
         self.add_message(Message(input_text, "user"))
         self.add_message(Message(full_response, "assistant"))
-        print(f"✅ {self.name} 流式响应完成")
+        self._emit(EventType.ANSWER, f"✅ {self.name} 流式响应完成", answer=full_response)
 
     def add_tool(self, tool) -> None:
         """添加工具到Agent（便利方法）"""
@@ -233,7 +487,7 @@ class ChatAgent(Agent):
             self.enable_tool_calling = True
 
         self.tool_registry.register_tool(tool)
-        print(f"🔧 工具 '{tool.name}' 已添加")
+        self._emit(EventType.MESSAGE, f"🔧 工具 '{tool.name}' 已添加", EventLevel.DEBUG)
 
     def has_tools(self) -> bool:
         """检查是否有可用工具"""
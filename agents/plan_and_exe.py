@@ -1,5 +1,6 @@
 import ast
 from core import Agent
+from core.events import EventType, EventLevel, emit
 
 
 # 默认规划器提示词模板
@@ -55,13 +56,30 @@ class Planner:
         # 为了生成计划，我们构建一个简单的消息列表
         messages = [{"role": "user", "content": prompt}]
         
-        print("--- 正在生成计划 ---")
+        emit(EventType.STEP, "--- 正在生成计划 ---", source="Planner")
         # 使用流式输出来获取完整的计划
         response_text = self.llm_client.invoke(messages=messages) or ""
         
-        print(f"✅ 计划已生成:\n{response_text}")
-        
-        # 解析LLM输出的列表字符串
+        emit(EventType.MESSAGE, f"✅ 计划已生成:\n{response_text}", source="Planner")
+        return self._parse_plan(response_text)
+
+    async def aplan(self, question: str) -> list[str]:
+        """
+        plan 的异步版本。
+        """
+        prompt = self.custom_plan_prompt.format(question=question)
+        messages = [{"role": "user", "content": prompt}]
+
+        emit(EventType.STEP, "--- 正在生成计划 ---", source="Planner")
+        response_text = await self.llm_client.ainvoke(messages=messages) or ""
+
+        emit(EventType.MESSAGE, f"✅ 计划已生成:\n{response_text}", source="Planner")
+        return self._parse_plan(response_text)
+
+    def _parse_plan(self, response_text: str) -> list[str]:
+        """
+        解析LLM输出的列表字符串。
+        """
         try:
             # 找到```python和```之间的内容
             plan_str = response_text.split("```python")[1].split("```")[0].strip()
@@ -69,11 +87,10 @@ class Planner:
             plan = ast.literal_eval(plan_str)
             return plan if isinstance(plan, list) else []
         except (ValueError, SyntaxError, IndexError) as e:
-            print(f"❌ 解析计划时出错: {e}")
-            print(f"原始响应: {response_text}")
+            emit(EventType.MESSAGE, f"❌ 解析计划时出错: {e}\n原始响应: {response_text}", EventLevel.ERROR, source="Planner")
             return []
         except Exception as e:
-            print(f"❌ 解析计划时发生未知错误: {e}")
+            emit(EventType.MESSAGE, f"❌ 解析计划时发生未知错误: {e}", EventLevel.ERROR, source="Planner")
             return []
 
 class Executor:
@@ -87,31 +104,57 @@ class Executor:
         """
         history = "" # 用于存储历史步骤和结果的字符串
         
-        print("\n--- 正在执行计划 ---")
+        emit(EventType.STEP, "\n--- 正在执行计划 ---", source="Executor")
         
         for i, step in enumerate(plan):
-            print(f"\n-> 正在执行步骤 {i+1}/{len(plan)}: {step}")
+            emit(EventType.STEP, f"\n-> 正在执行步骤 {i+1}/{len(plan)}: {step}", source="Executor", step=i + 1)
             
-            prompt = self.custom_exec_prompt.format(
-                question=question,
-                plan=plan,
-                history=history if history else "无", # 如果是第一步，则历史为空
-                current_step=step
-            )
-            
-            messages = [{"role": "user", "content": prompt}]
+            messages = self._build_messages(question, plan, history, step)
             
             response_text = self.llm_client.invoke(messages=messages) or ""
             
             # 更新历史记录，为下一步做准备
             history += f"步骤 {i+1}: {step}\n结果: {response_text}\n\n"
             
-            print(f"✅ 步骤 {i+1} 已完成，结果: {response_text}")
+            emit(EventType.OBSERVATION, f"✅ 步骤 {i+1} 已完成，结果: {response_text}", source="Executor", step=i + 1)
 
         # 循环结束后，最后一步的响应就是最终答案
         final_answer = response_text
         return final_answer
 
+    async def aexecute(self, question: str, plan: list[str]) -> str:
+        """
+        execute 的异步版本。步骤之间存在依赖，仍按顺序执行。
+        """
+        history = ""
+        response_text = ""
+
+        emit(EventType.STEP, "\n--- 正在执行计划 ---", source="Executor")
+
+        for i, step in enumerate(plan):
+            emit(EventType.STEP, f"\n-> 正在执行步骤 {i+1}/{len(plan)}: {step}", source="Executor", step=i + 1)
+
+            messages = self._build_messages(question, plan, history, step)
+            response_text = await self.llm_client.ainvoke(messages=messages) or ""
+
+            history += f"步骤 {i+1}: {step}\n结果: {response_text}\n\n"
+
+            emit(EventType.OBSERVATION, f"✅ 步骤 {i+1} 已完成，结果: {response_text}", source="Executor", step=i + 1)
+
+        return response_text
+
+    def _build_messages(self, question: str, plan: list[str], history: str, step: str) -> list:
+        """
+        构建当前步骤的提示词消息。
+        """
+        prompt = self.custom_exec_prompt.format(
+            question=question,
+            plan=plan,
+            history=history if history else "无", # 如果是第一步，则历史为空
+            current_step=step
+        )
+        return [{"role": "user", "content": prompt}]
+
 
 class PlanAndSolveAgent(Agent):
     def __init__(self, llm_client, custom_prompt=None):
@@ -134,18 +177,39 @@ class PlanAndSolveAgent(Agent):
         """
         运行智能体的完整流程:先规划，后执行。
         """
-        print(f"\n--- 开始处理问题 ---\n问题: {question}")
+        with self.track_step("run"):
+            self._emit(EventType.STEP, f"\n--- 开始处理问题 ---\n问题: {question}", question=question)
         
-        # 1. 调用规划器生成计划
-        plan = self.planner.plan(question)
+            # 1. 调用规划器生成计划
+            with self.track_step("plan"):
+                plan = self.planner.plan(question)
         
-        # 检查计划是否成功生成
-        if not plan:
-            print("\n--- 任务终止 --- \n无法生成有效的行动计划。")
-            return
-
-        # 2. 调用执行器执行计划
-        final_answer = self.executor.execute(question, plan)
+            # 检查计划是否成功生成
+            if not plan:
+                self._emit(EventType.MESSAGE, "\n--- 任务终止 --- \n无法生成有效的行动计划。", EventLevel.WARNING)
+                return
+
+            # 2. 调用执行器执行计划
+            with self.track_step("execute"):
+                final_answer = self.executor.execute(question, plan)
         
-        print(f"\n--- 任务完成 ---\n最终答案: {final_answer}")
+            self._emit(EventType.ANSWER, f"\n--- 任务完成 ---\n最终答案: {final_answer}", answer=final_answer)
+
+    async def arun(self, question: str):
+        """
+        异步运行智能体的完整流程:先规划，后执行。
+        """
+        with self.track_step("run"):
+            self._emit(EventType.STEP, f"\n--- 开始处理问题 ---\n问题: {question}", question=question)
+
+            with self.track_step("plan"):
+                plan = await self.planner.aplan(question)
+
+            if not plan:
+                self._emit(EventType.MESSAGE, "\n--- 任务终止 --- \n无法生成有效的行动计划。", EventLevel.WARNING)
+                return
+
+            with self.track_step("execute"):
+                final_answer = await self.executor.aexecute(question, plan)
 
+            self._emit(EventType.ANSWER, f"\n--- 任务完成 ---\n最终答案: {final_answer}", answer=final_answer)
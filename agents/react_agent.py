@@ -1,12 +1,16 @@
 import re
-from typing import List
-from core import Agent, Message, GoAgentLLM
+import json
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from core import Agent, Message, GoAgentLLM, Config
+from core.events import EventType
 from tools import ToolExecutor
+from tools.base import ToolTimeoutError, ToolCancelledError
+from .scratchpad import Scratchpad
 
-# ReAct 提示词模板 - 改进版，更明确的指令格式
-REACT_PROMPT_TEMPLATE = """
-
-你是一个具备推理和行动能力的AI助手。你可以通过思考分析问题，然后调用合适的工具来获取信息，最终给出准确的答案。
+# ReAct 提示词模板 - 只包含指令与工具描述，作为系统消息；在工具集合不变时逐字节保持不变，
+# 便于服务端的前缀缓存命中
+REACT_PROMPT_TEMPLATE = """你是一个具备推理和行动能力的AI助手。你可以通过思考分析问题，然后调用合适的工具来获取信息，最终给出准确的答案。
 
 ## 可用工具
 {tools}
@@ -24,80 +28,326 @@ Action: 选择一个行动，格式必须是以下之一:
 2. 工具调用的格式必须严格遵循:工具名[参数]
 3. 只有当你确信有足够信息回答问题时，才使用Finish
 4. 如果工具返回的信息不够，继续使用其他工具或相同工具的不同参数
+5. 用户消息会给出当前任务与执行历史，请在执行历史的基础上继续推理和行动
+"""
+
+# 原生函数调用下的系统提示词 - 工具定义通过请求参数 tools 传入，无需描述工具与调用格式
+REACT_FUNCTION_PROMPT_TEMPLATE = """你是一个具备推理和行动能力的AI助手。你可以通过思考分析问题，然后调用合适的工具来获取信息，最终给出准确的答案。
 
-## 当前任务
+## 工作流程
+每一步先用一两句话写出你的思考，然后调用一个工具:
+- 需要更多信息时，调用合适的工具
+- 有足够信息给出最终答案时，调用 Finish 工具
+
+## 重要提醒
+1. 只有当你确信有足够信息回答问题时，才调用 Finish
+2. 如果工具返回的信息不够，继续使用其他工具或相同工具的不同参数
+3. 用户消息会给出当前任务与执行历史，请在执行历史的基础上继续推理和行动
+"""
+
+# 原生函数调用下表示给出最终答案的工具
+FINISH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "Finish",
+        "description": "当你有足够信息回答问题时调用，给出最终答案。",
+        "parameters": {
+            "type": "object",
+            "properties": {"answer": {"type": "string", "description": "最终答案"}},
+            "required": ["answer"],
+        },
+    },
+}
+
+# 当前任务 - 执行历史紧接在末尾逐步追加，之前各步的提示词始终是之后提示词的前缀
+REACT_TASK_TEMPLATE = """## 当前任务
 **Question:** {question}
 
 ## 执行历史
-{history}
-
-现在开始你的推理和行动:
 """
 
 class ReActAgent(Agent):
-    def __init__(self, llm_client: GoAgentLLM, tool_executor: ToolExecutor, max_steps: int = 5):
-        super().__init__(name="ReAct Agent", llm=llm_client)
+    def __init__(
+        self,
+        llm_client: GoAgentLLM,
+        tool_executor: ToolExecutor,
+        max_steps: int = 5,
+        scratchpad: Optional[Scratchpad] = None,
+        config: Optional[Config] = None,
+        function_calling: Optional[bool] = None
+    ):
+        """
+        Args:
+            llm_client: LLM 客户端
+            tool_executor: 工具执行器
+            max_steps: 最大步数
+            scratchpad: 执行历史的截断与压缩策略，默认使用 Scratchpad 的默认参数
+            config: 配置
+            function_calling: 是否使用原生函数调用选择工具，默认在配置启用且 LLM 客户端支持时使用；
+                关闭时按文本中的 Thought / Action 格式解析；启用时如果某一步回复没有工具调用但写出了 Action，
+                该步也按文本格式解析执行
+        """
+        super().__init__(name="ReAct Agent", llm=llm_client, config=config)
         self.llm_client = llm_client
         self.tool_registry = tool_executor
         self.max_steps = max_steps
         self.history = []
         self.name = "ReAct Agent"
         self.current_history: List[str] = []
-        self.prompt_template = REACT_PROMPT_TEMPLATE
+        if function_calling is None:
+            function_calling = self.config.function_calling and hasattr(llm_client, "invoke_with_tools")
+        self.function_calling = function_calling
+        self.prompt_template = REACT_FUNCTION_PROMPT_TEMPLATE if function_calling else REACT_PROMPT_TEMPLATE
+        self.task_template = REACT_TASK_TEMPLATE
+        # 渲染好的系统提示词，以 (工具执行器, 工具集合版本, 模板) 为键缓存
+        self._prompt_cache: Optional[Tuple[Tuple, str]] = None
+        self._task_question: Optional[str] = None
+        self._task_prompt = ""
+        self.scratchpad = scratchpad if scratchpad is not None else Scratchpad()
+        # (工具执行器返回的定义列表, 追加了 Finish 的列表)
+        self._tools_cache: Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = None
 
     def run(self, input_text: str, **kwargs) -> str:
         """运行ReAct Agent"""
+        with self.track_step("run"):
+            self._start_task(input_text)
+            current_step = 0
+
+            self._emit(EventType.STEP, f"\n🤖 {self.name} 开始处理问题: {input_text}", input=input_text)
+
+            while current_step < self.max_steps:
+                current_step += 1
+                self._emit(EventType.STEP, f"\n--- 第 {current_step} 步 ---", step=current_step)
+
+                # 1. 构建提示词
+                messages = self._build_messages(input_text)
+
+                if self.function_calling:
+                    with self.track_step("llm"):
+                        turn = self.llm_client.invoke_with_tools(messages, self._function_tools(), **kwargs)
+                    response_text = self._text_action_reply(turn)
+                    if response_text is None:
+                        calls, final_answer = self._handle_turn(input_text, turn)
+                        if final_answer is not None:
+                            return final_answer
+                        for call in calls:
+                            with self.track_step("tool"):
+                                try:
+                                    observation = self.tool_registry.execute_tool_call(call.name, call.arguments)
+                                except (ToolTimeoutError, ToolCancelledError) as e:
+                                    observation = self._tool_error_observation(e)
+                            self._record_observation(self._format_call(call), observation)
+                        continue
+                else:
+                    # 2. 调用LLM
+                    with self.track_step("llm"):
+                        response_text = self.llm_client.invoke(messages, **kwargs)
+
+                # 3. 解析输出并检查完成条件
+                action, final_answer = self._handle_response(input_text, response_text)
+                if final_answer is not None:
+                    return final_answer
+
+                # 4. 执行工具调用
+                if action:
+                    tool_name, tool_input = self._parse_action(action)
+                    with self.track_step("tool"):
+                        try:
+                            observation = self.tool_registry.execute_tool(tool_name, tool_input)
+                        except (ToolTimeoutError, ToolCancelledError) as e:
+                            observation = self._tool_error_observation(e)
+                    self._record_observation(action, observation)
+
+            return self._finish_without_answer(input_text)
+
+    async def arun(self, input_text: str, **kwargs) -> str:
+        """异步运行ReAct Agent，LLM 调用走 ainvoke，工具调用在线程池中执行"""
+        with self.track_step("run"):
+            self._start_task(input_text)
+            current_step = 0
+
+            self._emit(EventType.STEP, f"\n🤖 {self.name} 开始异步处理问题: {input_text}", input=input_text)
+
+            while current_step < self.max_steps:
+                current_step += 1
+                self._emit(EventType.STEP, f"\n--- 第 {current_step} 步 ---", step=current_step)
+
+                messages = self._build_messages(input_text)
+                if self.function_calling:
+                    with self.track_step("llm"):
+                        turn = await self.llm_client.ainvoke_with_tools(messages, self._function_tools(), **kwargs)
+                    response_text = self._text_action_reply(turn)
+                    if response_text is None:
+                        calls, final_answer = self._handle_turn(input_text, turn)
+                        if final_answer is not None:
+                            return final_answer
+                        for call in calls:
+                            with self.track_step("tool"):
+                                try:
+                                    observation = await asyncio.to_thread(
+                                        self.tool_registry.execute_tool_call, call.name, call.arguments
+                                    )
+                                except (ToolTimeoutError, ToolCancelledError) as e:
+                                    observation = self._tool_error_observation(e)
+                            self._record_observation(self._format_call(call), observation)
+                        continue
+                else:
+                    with self.track_step("llm"):
+                        response_text = await self.llm_client.ainvoke(messages, **kwargs)
+
+                action, final_answer = self._handle_response(input_text, response_text)
+                if final_answer is not None:
+                    return final_answer
+
+                if action:
+                    tool_name, tool_input = self._parse_action(action)
+                    with self.track_step("tool"):
+                        try:
+                            observation = await self._aexecute_tool(tool_name, tool_input)
+                        except (ToolTimeoutError, ToolCancelledError) as e:
+                            observation = self._tool_error_observation(e)
+                    self._record_observation(action, observation)
+
+            return self._finish_without_answer(input_text)
+
+    def _start_task(self, input_text: str) -> None:
+        """开始一次新的任务，清空执行历史"""
         self.current_history = []
-        current_step = 0
-
-        print(f"\n🤖 {self.name} 开始处理问题: {input_text}")
-
-        while current_step < self.max_steps:
-            current_step += 1
-            print(f"\n--- 第 {current_step} 步 ---")
-
-            # 1. 构建提示词
-            tools_desc = self.tool_registry.get_tools_description()
-            history_str = "\n".join(self.current_history)
-            prompt = self.prompt_template.format(
-                tools=tools_desc,
-                question=input_text,
-                history=history_str
-            )
-
-            # 2. 调用LLM
-            messages = [{"role": "user", "content": prompt}]
-            response_text = self.llm_client.invoke(messages, **kwargs)
-
-            # 3. 解析输出
-            thought, action = self._parse_output(response_text)
-            
-            # 显示思考过程
-            if thought:
-                print(f"\n💭 思考: {thought}")
-            if action:
-                print(f"⚡ 动作: {action}")
-
-            # 4. 检查完成条件
-            if action and action.startswith("Finish"):
-                final_answer = self._parse_action_input(action)
-                print(f"\n✅ 最终答案:")
-                print(final_answer)
-                self.add_message(Message(input_text, "user"))
-                self.add_message(Message(final_answer, "assistant"))
-                return final_answer
-
-            # 5. 执行工具调用
-            if action:
-                tool_name, tool_input = self._parse_action(action)
-                observation = self.tool_registry.execute_tool(tool_name, tool_input)
-                print(f"\n📊 观察结果:")
-                print(observation)
-                print()
-                self.current_history.append(f"Action: {action}")
-                self.current_history.append(f"Observation: {observation}")
-
-        # 达到最大步数
+        self._task_question = input_text
+        self._task_prompt = self.task_template.format(question=input_text)
+        self.scratchpad.reset(input_text)
+
+    def _system_prompt(self) -> str:
+        """渲染系统提示词，工具集合与模板都没有变化时直接复用上次的结果"""
+        version = getattr(self.tool_registry, "version", None)
+        key = (id(self.tool_registry), version, self.prompt_template)
+        if version is not None and self._prompt_cache is not None and self._prompt_cache[0] == key:
+            return self._prompt_cache[1]
+        prompt = self.prompt_template.format(tools=self.tool_registry.get_tools_description())
+        self._prompt_cache = (key, prompt)
+        return prompt
+
+    def _build_messages(self, input_text: str) -> list:
+        """
+        构建提示词消息：系统消息为固定的指令与工具描述，用户消息为当前任务加上逐步追加的执行历史。
+        执行历史按 scratchpad 的策略截断与压缩，两次压缩之间前一步的提示词是后一步提示词的前缀。
+        """
+        if self._task_question != input_text:
+            self._start_task(input_text)
+        messages = [
+            {"role": "system", "content": self._system_prompt()},
+            {"role": "user", "content": self._task_prompt + self.scratchpad.text},
+        ]
+        self.metrics.histogram(
+            "goagent_agent_prompt_tokens", "每轮对话的提示词 token 数(估算)",
+            buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+        ).observe(sum(self.context.counter.count_message(m["role"], m["content"]) for m in messages), agent=self.name)
+        return messages
+
+    def _handle_response(self, input_text: str, response_text: str):
+        """
+        解析LLM输出，如果是Finish动作则记录历史并返回最终答案。
+
+        Returns:
+            (action, final_answer)，未完成时 final_answer 为 None
+        """
+        thought, action = self._parse_output(response_text or "")
+
+        # 显示思考过程
+        if thought:
+            self._emit(EventType.THOUGHT, f"\n💭 思考: {thought}", thought=thought)
+        if action:
+            self._emit(EventType.ACTION, f"⚡ 动作: {action}", action=action)
+
+        if action and action.startswith("Finish"):
+            final_answer = self._parse_action_input(action)
+            self._emit(EventType.ANSWER, f"\n✅ 最终答案:\n{final_answer}", answer=final_answer)
+            self.add_message(Message(input_text, "user"))
+            self.add_message(Message(final_answer, "assistant"))
+            return action, final_answer
+        return action, None
+
+    def _function_tools(self) -> List[Dict[str, Any]]:
+        """工具执行器的函数调用定义加上 Finish，工具集合不变时复用同一个列表"""
+        tools = self.tool_registry.get_openai_tools()
+        if self._tools_cache is None or self._tools_cache[0] is not tools:
+            self._tools_cache = (tools, tools + [FINISH_TOOL])
+        return self._tools_cache[1]
+
+    def _text_action_reply(self, turn) -> Optional[str]:
+        """
+        模型没有调用任何工具、却按文本格式写出了 Action 时(例如服务端忽略了 tools 参数)，
+        返回回复文本，由文本协议继续解析执行；否则返回 None
+        """
+        if turn is None or turn.tool_calls or not turn.content:
+            return None
+        _, action = self._parse_output(turn.content)
+        return turn.content if action else None
+
+    def _handle_turn(self, input_text: str, turn):
+        """
+        处理原生函数调用的结果: 文本内容作为思考，调用 Finish 或不调用任何工具时结束。
+
+        Returns:
+            (要执行的工具调用列表, final_answer)，未完成时 final_answer 为 None
+        """
+        if turn is None:
+            return [], None
+        if turn.content:
+            self._emit(EventType.THOUGHT, f"\n💭 思考: {turn.content}", thought=turn.content)
+
+        final_answer = None
+        for call in turn.tool_calls:
+            if call.name == FINISH_TOOL["function"]["name"]:
+                try:
+                    final_answer = str(call.parse_arguments().get("answer", ""))
+                except ValueError:
+                    final_answer = call.arguments
+                break
+        if not turn.tool_calls:
+            # 模型没有调用工具而是直接回答
+            final_answer = turn.content
+        if final_answer is None:
+            for call in turn.tool_calls:
+                self._emit(EventType.ACTION, f"⚡ 动作: {self._format_call(call)}", action=self._format_call(call))
+            return turn.tool_calls, None
+
+        self._emit(EventType.ANSWER, f"\n✅ 最终答案:\n{final_answer}", answer=final_answer)
+        self.add_message(Message(input_text, "user"))
+        self.add_message(Message(final_answer, "assistant"))
+        return [], final_answer
+
+    @staticmethod
+    def _format_call(call) -> str:
+        """把工具调用写成执行历史中的 工具名[参数] 形式，只有一个参数时只写参数值"""
+        try:
+            arguments = call.parse_arguments()
+        except ValueError:
+            return f"{call.name}[{call.arguments}]"
+        if len(arguments) == 1:
+            value = next(iter(arguments.values()))
+            return f"{call.name}[{value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)}]"
+        return f"{call.name}[{json.dumps(arguments, ensure_ascii=False)}]"
+
+    def _record_observation(self, action: str, observation: str) -> None:
+        """将动作与观察结果追加到执行历史"""
+        self._emit(EventType.OBSERVATION, f"\n📊 观察结果:\n{observation}\n", action=action, observation=observation)
+        self.current_history.append(f"Action: {action}")
+        self.current_history.append(f"Observation: {observation}")
+        self.scratchpad.add(action, observation)
+
+    async def _aexecute_tool(self, tool_name: str, tool_input: str) -> str:
+        aexecute_tool = getattr(self.tool_registry, "aexecute_tool", None)
+        if aexecute_tool is not None:
+            return await aexecute_tool(tool_name, tool_input)
+        return await asyncio.to_thread(self.tool_registry.execute_tool, tool_name, tool_input)
+
+    def _tool_error_observation(self, error: Exception) -> str:
+        """工具超时或被取消时，把错误作为观察结果交给模型，由模型决定重试或换用其他工具"""
+        return f"错误: {error}。请换用其他工具、调整输入后重试，或基于已有信息给出答案。"
+
+    def _finish_without_answer(self, input_text: str) -> str:
+        """达到最大步数时的收尾处理"""
         final_answer = "抱歉，我无法在限定步数内完成这个任务。"
         self.add_message(Message(input_text, "user"))
         self.add_message(Message(final_answer, "assistant"))
@@ -1,4 +1,5 @@
 from core import Agent
+from core.events import EventType, EventLevel, emit
 from typing import List, Dict, Any, Optional
 
 
@@ -74,7 +75,7 @@ class Memory:
         """
         record = {"type": record_type, "content": content}
         self.records.append(record)
-        print(f"📝 记忆已更新，新增一条 '{record_type}' 记录。")
+        emit(EventType.MESSAGE, f"📝 记忆已更新，新增一条 '{record_type}' 记录。", EventLevel.DEBUG, source="Memory")
 
     def get_trajectory(self) -> str:
         """
@@ -114,51 +115,96 @@ class ReflectionAgent(Agent):
             self.custom_prompts["refine"] = custom_prompts["refine"] or DEFAULT_PROMPTS["refine"]
 
     def run(self, task: str):
-        print(f"\n--- 开始处理任务 ---\n任务: {task}")
-
-        # --- 1. 初始执行 ---
-        print("\n--- 正在进行初始尝试 ---")
-        initial_prompt = self.custom_prompts["initial"].format(task=task)
-        initial_code = self._get_llm_response(initial_prompt)
-        self.memory.add_record("execution", initial_code)
-
-        # --- 2. 迭代循环:反思与优化 ---
-        for i in range(self.max_iterations):
-            print(f"\n--- 第 {i+1}/{self.max_iterations} 轮迭代 ---")
-
-            # a. 反思
-            print("\n-> 正在进行反思...")
-            last_answer = self.memory.get_last_execution()
-            reflect_prompt = self.custom_prompts["reflect"].format(task=task, content=last_answer)
-            feedback = self._get_llm_response(reflect_prompt)
-            self.memory.add_record("reflection", feedback)
-
-            # b. 检查是否需要停止
-            # 检查是否明确表示无需改进（句首或独立行）
-            feedback_lines = feedback.strip().split('\n')
-            should_stop = any(
-                line.strip() in ["无需改进", "无需修改", "完美实现"] or
-                line.strip().startswith("无需改进") or
-                line.strip().startswith("无需修改")
-                for line in feedback_lines
-            )
-            if should_stop:
-                print("\n✅ 反思认为回答已达到高质量标准，任务完成。")
-                break
-
-            # c. 优化
-            print("\n-> 正在进行优化...")
-            refine_prompt = self.custom_prompts["refine"].format(
-                task=task,
-                last_attempt=last_answer,
-                feedback=feedback
-            )
-            refined_code = self._get_llm_response(refine_prompt)
-            self.memory.add_record("execution", refined_code)
+        with self.track_step("run"):
+            self._emit(EventType.STEP, f"\n--- 开始处理任务 ---\n任务: {task}", task=task)
+
+            # --- 1. 初始执行 ---
+            self._emit(EventType.STEP, "\n--- 正在进行初始尝试 ---")
+            initial_prompt = self.custom_prompts["initial"].format(task=task)
+            with self.track_step("initial"):
+                initial_code = self._get_llm_response(initial_prompt)
+            self.memory.add_record("execution", initial_code)
+
+            # --- 2. 迭代循环:反思与优化 ---
+            for i in range(self.max_iterations):
+                self._emit(EventType.STEP, f"\n--- 第 {i+1}/{self.max_iterations} 轮迭代 ---", iteration=i + 1)
+
+                # a. 反思
+                self._emit(EventType.STEP, "\n-> 正在进行反思...")
+                last_answer = self.memory.get_last_execution()
+                reflect_prompt = self.custom_prompts["reflect"].format(task=task, content=last_answer)
+                with self.track_step("reflect"):
+                    feedback = self._get_llm_response(reflect_prompt)
+                self.memory.add_record("reflection", feedback)
+
+                # b. 检查是否需要停止
+                if self._should_stop(feedback):
+                    self._emit(EventType.MESSAGE, "\n✅ 反思认为回答已达到高质量标准，任务完成。")
+                    break
+
+                # c. 优化
+                self._emit(EventType.STEP, "\n-> 正在进行优化...")
+                refine_prompt = self.custom_prompts["refine"].format(
+                    task=task,
+                    last_attempt=last_answer,
+                    feedback=feedback
+                )
+                with self.track_step("refine"):
+                    refined_code = self._get_llm_response(refine_prompt)
+                self.memory.add_record("execution", refined_code)
         
-        final_answer = self.memory.get_last_execution()
-        print(f"\n--- 任务完成 ---\n最终生成的结果:\n\n{final_answer}")
-        return final_answer
+            final_answer = self.memory.get_last_execution()
+            self._emit(EventType.ANSWER, f"\n--- 任务完成 ---\n最终生成的结果:\n\n{final_answer}", answer=final_answer)
+            return final_answer
+
+    async def arun(self, task: str):
+        """异步运行反思流程，LLM 调用走 ainvoke"""
+        with self.track_step("run"):
+            self._emit(EventType.STEP, f"\n--- 开始处理任务 ---\n任务: {task}", task=task)
+
+            self._emit(EventType.STEP, "\n--- 正在进行初始尝试 ---")
+            initial_prompt = self.custom_prompts["initial"].format(task=task)
+            with self.track_step("initial"):
+                initial_code = await self._aget_llm_response(initial_prompt)
+            self.memory.add_record("execution", initial_code)
+
+            for i in range(self.max_iterations):
+                self._emit(EventType.STEP, f"\n--- 第 {i+1}/{self.max_iterations} 轮迭代 ---", iteration=i + 1)
+
+                self._emit(EventType.STEP, "\n-> 正在进行反思...")
+                last_answer = self.memory.get_last_execution()
+                reflect_prompt = self.custom_prompts["reflect"].format(task=task, content=last_answer)
+                with self.track_step("reflect"):
+                    feedback = await self._aget_llm_response(reflect_prompt)
+                self.memory.add_record("reflection", feedback)
+
+                if self._should_stop(feedback):
+                    self._emit(EventType.MESSAGE, "\n✅ 反思认为回答已达到高质量标准，任务完成。")
+                    break
+
+                self._emit(EventType.STEP, "\n-> 正在进行优化...")
+                refine_prompt = self.custom_prompts["refine"].format(
+                    task=task,
+                    last_attempt=last_answer,
+                    feedback=feedback
+                )
+                with self.track_step("refine"):
+                    refined_code = await self._aget_llm_response(refine_prompt)
+                self.memory.add_record("execution", refined_code)
+
+            final_answer = self.memory.get_last_execution()
+            self._emit(EventType.ANSWER, f"\n--- 任务完成 ---\n最终生成的结果:\n\n{final_answer}", answer=final_answer)
+            return final_answer
+
+    def _should_stop(self, feedback: str) -> bool:
+        """检查反馈是否明确表示无需改进（句首或独立行）"""
+        feedback_lines = feedback.strip().split('\n')
+        return any(
+            line.strip() in ["无需改进", "无需修改", "完美实现"] or
+            line.strip().startswith("无需改进") or
+            line.strip().startswith("无需修改")
+            for line in feedback_lines
+        )
 
     def _get_llm_response(self, prompt: str) -> str:
         """一个辅助方法，用于调用LLM并获取完整的流式响应。"""
@@ -166,3 +212,8 @@ class ReflectionAgent(Agent):
         response_text = self.llm_client.invoke(messages=messages) or ""
         return response_text
 
+    async def _aget_llm_response(self, prompt: str) -> str:
+        """_get_llm_response 的异步版本。"""
+        messages = [{"role": "user", "content": prompt}]
+        response_text = await self.llm_client.ainvoke(messages=messages) or ""
+        return response_text
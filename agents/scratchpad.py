@@ -0,0 +1,171 @@
+"""
+ReAct 执行历史(scratchpad)
+
+控制每一步提示词中执行历史的大小:
+- 每条观察结果在记录时按 token 上限截断
+- 最近 window 步保持原文
+- 更早的步骤只保留与问题和动作最相关的句子(抽取式压缩)
+- 压缩后的历史超过总预算时，最早的步骤只保留动作
+
+压缩按 stride 步为一批进行，两次压缩之间执行历史只在末尾追加，
+因此提示词在大多数步骤之间仍然保持前缀稳定。
+"""
+import re
+from typing import List, Optional, Set
+
+from core.context import TokenCounter
+
+# 句子边界: 换行与中英文句末标点
+_SENTENCE_RE = re.compile(r"[^\n。！？!?；;]+[。！？!?；;]?")
+_WORD_RE = re.compile(r"[A-Za-z0-9_]{2,}")
+_CJK_RUN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+")
+
+
+def _terms(text: str) -> Set[str]:
+    """提取用于相关性打分的词项: 英文单词与数字，以及中文的二元组"""
+    terms = {w.lower() for w in _WORD_RE.findall(text)}
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            terms.add(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class _Step:
+    __slots__ = ("action", "observation", "compressed", "dropped")
+
+    def __init__(self, action: str, observation: str):
+        self.action = action
+        self.observation = observation
+        self.compressed: Optional[str] = None
+        self.dropped = False
+
+
+class Scratchpad:
+    """ReAct 的执行历史，按策略截断、压缩并渲染为文本"""
+
+    def __init__(
+        self,
+        max_observation_tokens: Optional[int] = 600,
+        window: int = 3,
+        stride: int = 2,
+        compressed_tokens: int = 120,
+        max_tokens: Optional[int] = 3000,
+        counter: Optional[TokenCounter] = None
+    ):
+        """
+        Args:
+            max_observation_tokens: 单条观察结果的 token 上限，None 表示不截断
+            window: 保持原文的最近步数
+            stride: 每次压缩的步数，越大压缩越不频繁，提示词前缀稳定的步数越多
+            compressed_tokens: 压缩后单条观察结果的 token 上限
+            max_tokens: 执行历史的总 token 预算，超出时最早的步骤只保留动作；None 表示不限制
+            counter: token 计数器
+        """
+        self.max_observation_tokens = max_observation_tokens
+        self.window = max(window, 0)
+        self.stride = max(stride, 1)
+        self.compressed_tokens = compressed_tokens
+        self.max_tokens = max_tokens
+        self.counter = counter or TokenCounter()
+        self.compressions = 0
+        self.reset()
+
+    def reset(self, question: str = "") -> None:
+        """开始新的任务"""
+        self.question = question
+        self._steps: List[_Step] = []
+        self._verbatim_from = 0   # 从该下标开始的步骤保持原文
+        self._text = ""
+        self._tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    @property
+    def text(self) -> str:
+        """渲染后的执行历史"""
+        return self._text
+
+    @property
+    def tokens(self) -> int:
+        """执行历史的 token 数(估算)"""
+        return self._tokens
+
+    def add(self, action: str, observation: str) -> None:
+        """记录一步的动作与观察结果"""
+        step = _Step(action, self.truncate(observation, self.max_observation_tokens))
+        self._steps.append(step)
+        if len(self._steps) - self._verbatim_from >= self.window + self.stride:
+            self._compress_oldest()
+            self._render()
+        else:
+            rendered = self._render_step(step)
+            self._text += rendered
+            self._tokens += self.counter.count_text(rendered)
+
+    def truncate(self, text: str, max_tokens: Optional[int]) -> str:
+        """保留开头部分使文本不超过 max_tokens，并注明截断"""
+        if max_tokens is None:
+            return text
+        total = self.counter.count_text(text)
+        if total <= max_tokens:
+            return text
+        return f"{self.counter.truncate(text, max_tokens).rstrip()}…(已截断，原文约 {total} tokens)"
+
+    def compress(self, observation: str, action: str = "") -> str:
+        """
+        抽取式压缩: 按与问题和动作的词项重合度挑选句子，按原文顺序拼接到 compressed_tokens 以内。
+        """
+        if self.counter.count_text(observation) <= self.compressed_tokens:
+            return observation
+        sentences = [s.strip() for s in _SENTENCE_RE.findall(observation) if s.strip()]
+        terms = _terms(self.question) | _terms(action)
+        scored = []
+        for index, sentence in enumerate(sentences):
+            overlap = len(terms & _terms(sentence))
+            scored.append((-overlap, index, sentence))
+        scored.sort()
+
+        chosen, used = [], 0
+        for _, index, sentence in scored:
+            tokens = self.counter.count_text(sentence)
+            if used + tokens > self.compressed_tokens:
+                continue
+            chosen.append((index, sentence))
+            used += tokens
+        if not chosen:
+            return self.truncate(sentences[0] if sentences else observation, self.compressed_tokens)
+        chosen.sort()
+        return " … ".join(sentence for _, sentence in chosen)
+
+    def _compress_oldest(self) -> None:
+        end = min(self._verbatim_from + self.stride, len(self._steps))
+        for step in self._steps[self._verbatim_from:end]:
+            step.compressed = self.compress(step.observation, step.action)
+        self._verbatim_from = end
+        self.compressions += 1
+
+        if self.max_tokens is None:
+            return
+        total = sum(self.counter.count_text(self._render_step(s)) for s in self._steps)
+        for step in self._steps[:self._verbatim_from]:
+            if total <= self.max_tokens:
+                break
+            if not step.dropped:
+                before = self.counter.count_text(self._render_step(step))
+                step.dropped = True
+                total -= before - self.counter.count_text(self._render_step(step))
+
+    def _render_step(self, step: _Step) -> str:
+        if step.dropped:
+            observation = "(已省略)"
+        elif step.compressed is not None:
+            observation = f"(摘录) {step.compressed}"
+        else:
+            observation = step.observation
+        return f"Action: {step.action}\nObservation: {observation}\n"
+
+    def _render(self) -> None:
+        self._text = "".join(self._render_step(step) for step in self._steps)
+        self._tokens = self.counter.count_text(self._text)
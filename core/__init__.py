@@ -3,15 +3,86 @@ GoAgent Core 核心模块
 
 这个包包含了 GoAgent 框架的核心组件：
 - Agent: Agent 抽象基类
-- Message: 消息类
+- Message / MessageStore: 消息类与按列存储的大量消息
 - GoAgentLLM: 大语言模型客户端
 - Config: 配置管理类
+- ContextWindow / TokenCounter: 按 token 预算维护的对话历史窗口
+- HistoryCompactor: 在后台把较早的对话压缩为滚动摘要
+- SessionStore / Session: 按 id 持久化会话的追加日志与快照
+- LLMResponseCache / SearchResultCache: LLM 响应缓存与搜索结果缓存
+- BatchResult: 批量调用结果
+- ToolCall / AssistantTurn: 原生函数调用的工具调用与模型回复
+- RetryPolicy / CircuitBreaker / HedgePolicy / RateLimiter: 重试、熔断、对冲策略与限速
+- RouterLLM: 多节点路由客户端，按在途请求数或延迟选择节点
+- MetricsRegistry: 指标注册表，可导出为 Prometheus 文本或 JSON
+- EventSink / ConsoleSink: 事件接收器，默认不输出，需要控制台输出时显式启用 ConsoleSink
+
+各组件在首次访问时才导入对应的子模块，导入本包本身不会加载 openai、pydantic 等依赖。
 """
+from typing import TYPE_CHECKING
+from .lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .agent import Agent
+    from .message import Message, MessageRole, MessageStore
+    from .go_agent_llm import GoAgentLLM
+    from .router import RouterLLM, Endpoint
+    from .config import Config
+    from .context import ContextWindow, TokenCounter
+    from .compaction import HistoryCompactor
+    from .session import SessionStore, Session
+    from .cache import LLMResponseCache, SearchResultCache
+    from .batch import BatchResult, BatchItemResult
+    from .tool_calls import ToolCall, AssistantTurn, ToolCallAccumulator
+    from .resilience import RetryPolicy, CircuitBreaker, HedgePolicy, CircuitOpenError, RateLimiter
+    from .metrics import MetricsRegistry, get_registry
+    from .events import (
+        Event, EventLevel, EventType, EventSink, NullSink, ConsoleSink, CallbackSink, LoggingSink,
+        get_event_sink, set_event_sink,
+    )
+
+# 公开名称 -> 所在子模块
+_EXPORTS = {
+    "Agent": ".agent",
+    "Message": ".message",
+    "MessageRole": ".message",
+    "MessageStore": ".message",
+    "GoAgentLLM": ".go_agent_llm",
+    "RouterLLM": ".router",
+    "Endpoint": ".router",
+    "Config": ".config",
+    "ContextWindow": ".context",
+    "TokenCounter": ".context",
+    "HistoryCompactor": ".compaction",
+    "SessionStore": ".session",
+    "Session": ".session",
+    "LLMResponseCache": ".cache",
+    "SearchResultCache": ".cache",
+    "BatchResult": ".batch",
+    "BatchItemResult": ".batch",
+    "ToolCall": ".tool_calls",
+    "AssistantTurn": ".tool_calls",
+    "ToolCallAccumulator": ".tool_calls",
+    "RetryPolicy": ".resilience",
+    "CircuitBreaker": ".resilience",
+    "HedgePolicy": ".resilience",
+    "CircuitOpenError": ".resilience",
+    "RateLimiter": ".resilience",
+    "MetricsRegistry": ".metrics",
+    "get_registry": ".metrics",
+    "Event": ".events",
+    "EventLevel": ".events",
+    "EventType": ".events",
+    "EventSink": ".events",
+    "NullSink": ".events",
+    "ConsoleSink": ".events",
+    "CallbackSink": ".events",
+    "LoggingSink": ".events",
+    "get_event_sink": ".events",
+    "set_event_sink": ".events",
+}
 
-from .agent import Agent
-from .message import Message, MessageRole
-from .go_agent_llm import GoAgentLLM
-from .config import Config
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 # 定义模块的公开接口
 # 当使用 from core import * 时，只会导入这些
@@ -19,8 +90,40 @@ __all__ = [
     "Agent",
     "Message",
     "MessageRole",
+    "MessageStore",
     "GoAgentLLM",
+    "RouterLLM",
+    "Endpoint",
     "Config",
+    "ContextWindow",
+    "TokenCounter",
+    "HistoryCompactor",
+    "SessionStore",
+    "Session",
+    "LLMResponseCache",
+    "SearchResultCache",
+    "BatchResult",
+    "BatchItemResult",
+    "ToolCall",
+    "AssistantTurn",
+    "ToolCallAccumulator",
+    "RetryPolicy",
+    "CircuitBreaker",
+    "HedgePolicy",
+    "CircuitOpenError",
+    "RateLimiter",
+    "MetricsRegistry",
+    "get_registry",
+    "Event",
+    "EventLevel",
+    "EventType",
+    "EventSink",
+    "NullSink",
+    "ConsoleSink",
+    "CallbackSink",
+    "LoggingSink",
+    "get_event_sink",
+    "set_event_sink",
 ]
 
 # 版本信息
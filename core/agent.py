@@ -1,9 +1,18 @@
 """Agent基类"""
+import time
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional, Any
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Optional, Any, Iterator
 from .message import Message
 from .go_agent_llm import GoAgentLLM
 from .config import Config
+from .context import ContextWindow
+from .metrics import MetricsRegistry, get_registry, current_agent
+from .events import EventLevel, EventSink, emit
+
+if TYPE_CHECKING:
+    from .session import Session
 
 class Agent(ABC):
     """Agent基类"""
@@ -13,30 +22,108 @@ class Agent(ABC):
         name: str,
         llm: GoAgentLLM,
         system_prompt: Optional[str] = None,
-        config: Optional[Config] = None
+        config: Optional[Config] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        event_sink: Optional[EventSink] = None
     ):
         self.name = name
         self.llm = llm
         self.system_prompt = system_prompt
         self.config = config or Config()
-        self._history: list[Message] = []
+        self.metrics = metrics or get_registry()
+        self.event_sink = event_sink
+        # 对话历史按 token 预算与条数上限维护，最近的若干轮始终保留
+        self.context = ContextWindow(
+            max_tokens=self.config.max_context_tokens,
+            max_messages=self.config.max_history_length,
+            pinned_turns=self.config.context_pinned_turns,
+        )
+        self.session: Optional["Session"] = None
+        self.compactor = None
+        if self.config.context_compaction and self.config.max_context_tokens:
+            # 延迟导入，未启用压缩时不创建后台线程池
+            from .compaction import HistoryCompactor
+            self.compactor = HistoryCompactor(
+                self.context,
+                llm,
+                threshold=int(self.config.max_context_tokens * self.config.compaction_threshold),
+                keep_turns=self.config.compaction_keep_turns,
+                metrics=self.metrics,
+                source=self.name,
+            )
     
     @abstractmethod
     def run(self, input_text: str, **kwargs) -> str:
         """运行Agent"""
         pass
+
+    async def arun(self, input_text: str, **kwargs) -> str:
+        """
+        异步运行Agent。
+        默认在线程池中执行同步的 run，子类可以基于 llm.ainvoke 重写为原生异步实现。
+        """
+        return await asyncio.to_thread(self.run, input_text, **kwargs)
     
+    def _emit(self, event_type: str, message: str = "", level: EventLevel = EventLevel.INFO, **data) -> None:
+        """以当前 Agent 为来源发出事件"""
+        emit(event_type, message, level, source=self.name, sink=self.event_sink, **data)
+
+    @contextmanager
+    def track_step(self, step: str) -> Iterator[None]:
+        """
+        记录一个步骤的耗时。
+        step 为 "run" 时表示一次完整的运行，期间的 LLM token 用量会归属到当前 Agent。
+        """
+        token = current_agent.set(self.name) if step == "run" else None
+        start = time.perf_counter()
+        status = "error"
+        try:
+            yield
+            status = "ok"
+        finally:
+            elapsed = time.perf_counter() - start
+            if token is not None:
+                current_agent.reset(token)
+                self.metrics.counter("goagent_agent_runs_total", "Agent 运行次数").inc(agent=self.name, status=status)
+                self.metrics.histogram("goagent_agent_run_duration_seconds", "Agent 单次运行耗时").observe(
+                    elapsed, agent=self.name
+                )
+            else:
+                self.metrics.histogram("goagent_agent_step_duration_seconds", "Agent 步骤耗时").observe(
+                    elapsed, agent=self.name, step=step
+                )
+
     def add_message(self, message: Message):
-        """添加消息到历史记录"""
-        self._history.append(message)
+        """添加消息到历史记录，超出预算时淘汰最早的消息；绑定了会话时同时写入会话日志"""
+        self.context.append(message)
+        if self.session is not None:
+            self.session.append(message)
+            self.session.maybe_snapshot(self.context)
+
+    def attach_session(self, session: "Session", resume: bool = True) -> None:
+        """
+        绑定持久化会话，之后加入的消息都会追加到会话日志。
+
+        Args:
+            session: SessionStore.open 打开的会话
+            resume: 是否用会话中已有的历史恢复上下文窗口
+        """
+        if resume:
+            session.restore(self.context)
+        self.session = session
     
     def clear_history(self):
         """清空历史记录"""
-        self._history.clear()
+        self.context.clear()
     
     def get_history(self) -> list[Message]:
         """获取历史记录"""
-        return self._history.copy()
+        return self.context.messages()
+
+    @property
+    def prompt_tokens(self) -> int:
+        """最近一次构建的提示词 token 数(估算值)"""
+        return self.context.last_prompt_tokens
     
     def __str__(self) -> str:
         return f"Agent(name={self.name}, model={self.llm.model})"
@@ -0,0 +1,76 @@
+"""批量调用结果"""
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class BatchItemResult:
+    """单条请求的结果"""
+
+    index: int
+    content: Optional[str] = None
+    error: Optional[BaseException] = None
+    latency: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchResult:
+    """
+    批量调用结果，items 与输入顺序一致。
+    失败的条目保留异常对象，而不是返回None。
+    """
+
+    items: List[BatchItemResult] = field(default_factory=list)
+    wall_time: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index: int) -> BatchItemResult:
+        return self.items[index]
+
+    @property
+    def contents(self) -> List[Optional[str]]:
+        """按输入顺序返回生成文本，失败的条目为None"""
+        return [item.content for item in self.items]
+
+    @property
+    def errors(self) -> List[BatchItemResult]:
+        """所有失败的条目"""
+        return [item for item in self.items if not item.ok]
+
+    @property
+    def throughput(self) -> float:
+        """每秒完成的请求数"""
+        return len(self.items) / self.wall_time if self.wall_time > 0 else 0.0
+
+    def latency_percentile(self, q: float) -> float:
+        """单条请求延迟的分位数(最近秩法)，q 取值 0~100"""
+        latencies = sorted(item.latency for item in self.items)
+        if not latencies:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * len(latencies)))
+        return latencies[rank - 1]
+
+    def summary(self) -> Dict[str, Any]:
+        """汇总的延迟与吞吐统计"""
+        latencies = [item.latency for item in self.items]
+        return {
+            "total": len(self.items),
+            "succeeded": len(self.items) - len(self.errors),
+            "failed": len(self.errors),
+            "wall_time": self.wall_time,
+            "throughput": self.throughput,
+            "latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p50": self.latency_percentile(50),
+            "latency_p95": self.latency_percentile(95),
+            "latency_max": max(latencies) if latencies else 0.0,
+        }
@@ -0,0 +1,365 @@
+"""缓存组件"""
+import json
+import time
+import sqlite3
+import hashlib
+import unicodedata
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class LRUCache:
+    """
+    线程安全的内存 LRU 缓存，支持容量上限与 TTL 过期。
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            max_size: 最大条目数，超出后淘汰最久未使用的条目
+            ttl: 条目存活时间(秒)，None 表示不过期
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，未命中或已过期时返回None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            created, value = item
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, created: Optional[float] = None) -> None:
+        """写入缓存值"""
+        with self._lock:
+            self._data[key] = (created if created is not None else time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    基于 SQLite 的磁盘缓存，进程重启后依然有效。
+    值以 JSON 形式存储，因此只能缓存可 JSON 序列化的数据。
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, table: str = "cache"):
+        """
+        Args:
+            path: 数据库文件路径
+            ttl: 条目存活时间(秒)，None 表示不过期
+            table: 表名
+        """
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get_with_time(self, key: str) -> Optional[Tuple[float, Any]]:
+        """获取缓存值及其写入时间，未命中或已过期时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl is not None and time.time() - created > self.ttl:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return created, json.loads(value)
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self.get_with_time(key)
+        return item[1] if item is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created) VALUES (?, ?, ?)",
+                (key, data, time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    两级缓存:内存 LRU 在前，可选的 SQLite 磁盘缓存在后。
+    磁盘命中的条目会被提升到内存层，并统计命中/未命中次数。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = None,
+        db_path: Optional[str] = None,
+        table: str = "cache"
+    ):
+        """
+        Args:
+            max_size: 内存层最大条目数
+            ttl: 条目存活时间(秒)，两级共用，None 表示不过期
+            db_path: 磁盘层数据库路径，None 表示只使用内存层
+            table: 磁盘层表名
+        """
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.disk = SQLiteCache(db_path, ttl=ttl, table=table) if db_path else None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """依次查询内存层与磁盘层，未命中返回None"""
+        value, tier = self._fetch(key)
+        self._record(memory_hit=tier == "memory", disk_hit=tier == "disk")
+        return value
+
+    def _fetch(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        不计入统计地查询两级缓存，磁盘命中的条目同样提升到内存层。
+
+        Returns:
+            (值, 命中的层 "memory" / "disk")，未命中时为 (None, None)
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            return value, "memory"
+
+        if self.disk is not None:
+            item = self.disk.get_with_time(key)
+            if item is not None:
+                created, value = item
+                # 保留原始写入时间，避免提升后延长TTL
+                self.memory.set(key, value, created=created)
+                return value, "disk"
+
+        return None, None
+
+    def set(self, key: str, value: Any) -> None:
+        """同时写入内存层与磁盘层"""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def _record(self, memory_hit: bool = False, disk_hit: bool = False) -> None:
+        with self._stats_lock:
+            if memory_hit:
+                self.hits += 1
+                self.memory_hits += 1
+            elif disk_hit:
+                self.hits += 1
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "memory_size": len(self.memory),
+        }
+
+
+class LLMResponseCache(TieredCache):
+    """
+    LLM 响应缓存。
+    以模型、规范化后的消息与采样参数作为键，缓存值为流式响应的数据块列表，
+    因此既可以直接拼接为完整回复，也可以按原始分块重放给流式调用方。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = None,
+        db_path: Optional[str] = None,
+        deterministic_only: bool = True
+    ):
+        """
+        Args:
+            max_size: 内存层最大条目数
+            ttl: 条目存活时间(秒)，None 表示不过期
+            db_path: 磁盘层数据库路径，None 表示只使用内存层
+            deterministic_only: 是否只缓存 temperature 为0的确定性调用
+        """
+        super().__init__(max_size=max_size, ttl=ttl, db_path=db_path, table="llm_responses")
+        self.deterministic_only = deterministic_only
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """判断一次调用是否允许使用缓存"""
+        return not self.deterministic_only or temperature == 0
+
+    @staticmethod
+    def normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """规范化消息:统一换行符并去除首尾空白，只保留影响生成结果的字段"""
+        normalized = []
+        for msg in messages:
+            if hasattr(msg, "to_dict"):
+                msg = msg.to_dict()
+            item = {k: v for k, v in msg.items() if k in ("role", "content", "name", "tool_calls", "tool_call_id")}
+            if isinstance(item.get("content"), str):
+                item["content"] = item["content"].replace("\r\n", "\n").strip()
+            normalized.append(item)
+        return normalized
+
+    @classmethod
+    def make_key(cls, model: str, messages: List[Dict[str, Any]], **params) -> str:
+        """根据模型、消息和采样参数生成缓存键"""
+        payload = {
+            "model": model,
+            "messages": cls.normalize_messages(messages),
+            "params": {k: v for k, v in params.items() if v is not None},
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SearchResultCache(TieredCache):
+    """
+    搜索结果缓存。
+    以规范化后的查询与地区/语言等参数作为键，缓存搜索引擎返回的原始结果。
+    没有结果的查询也会被缓存(负缓存)，但使用更短的存活时间，以便之后重新搜索。
+    """
+
+    # 不影响搜索结果的参数
+    IGNORED_PARAMS = ("api_key",)
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = 3600,
+        db_path: Optional[str] = None,
+        negative_ttl: Optional[float] = 300
+    ):
+        """
+        Args:
+            max_size: 内存层最大条目数
+            ttl: 有结果的条目存活时间(秒)，None 表示不过期
+            db_path: 磁盘层数据库路径，None 表示只使用内存层
+            negative_ttl: 没有结果的条目存活时间(秒)，0 表示不做负缓存
+        """
+        super().__init__(max_size=max_size, ttl=ttl, db_path=db_path, table="search_results")
+        self.negative_ttl = negative_ttl
+        self.negative_hits = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """规范化查询:统一全角/半角字符、大小写，合并连续空白"""
+        return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+    @classmethod
+    def make_key(cls, params: Dict[str, Any]) -> str:
+        """根据规范化后的查询与其余参数生成缓存键"""
+        payload = {k: v for k, v in params.items() if k not in cls.IGNORED_PARAMS and v is not None}
+        if isinstance(payload.get("q"), str):
+            payload["q"] = cls.normalize_query(payload["q"])
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_empty(results: Dict[str, Any]) -> bool:
+        """判断一次搜索是否没有任何可用结果"""
+        return not any(results.get(k) for k in ("answer_box_list", "answer_box", "knowledge_graph", "organic_results"))
+
+    def lookup(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """查询缓存的搜索结果，未命中或负缓存已过期时返回None"""
+        key = self.make_key(params)
+        entry, tier = self._fetch(key)
+        if entry is not None and entry["negative"] and self.negative_ttl is not None \
+                and time.time() - entry["cached_at"] > self.negative_ttl:
+            # 负缓存已过期，按未命中统计
+            self.delete(key)
+            entry, tier = None, None
+        self._record(memory_hit=tier == "memory", disk_hit=tier == "disk")
+        if entry is None:
+            return None
+        if entry["negative"]:
+            with self._stats_lock:
+                self.negative_hits += 1
+        return entry["results"]
+
+    def store(self, params: Dict[str, Any], results: Dict[str, Any]) -> bool:
+        """
+        缓存搜索结果。
+        出错的结果不缓存，只有搜索引擎明确表示没有结果时才做负缓存。
+
+        Returns:
+            是否写入了缓存
+        """
+        negative = self.is_empty(results)
+        if negative:
+            error = str(results.get("error", ""))
+            if not self.negative_ttl or (error and "any results" not in error):
+                return False
+        self.set(self.make_key(params), {"results": results, "negative": negative, "cached_at": time.time()})
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["negative_hits"] = self.negative_hits
+        return stats
@@ -0,0 +1,201 @@
+"""
+录制 / 回放
+
+将真实的 LLM 流式响应与工具调用结果录制到 cassette 文件中，之后无需网络与密钥即可原样回放，
+用于离线基准测试与可重复的 Agent 运行。
+cassette 为 JSON Lines 文件，每行一次交互，新的录制只追加写入。
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from .cache import LLMResponseCache
+
+
+class CassetteMissError(LookupError):
+    """回放模式下 cassette 中没有对应的录制"""
+
+    def __init__(self, kind: str, key: str):
+        super().__init__(f"cassette 中没有找到对应的 {kind} 录制 (key={key[:12]})")
+        self.kind = kind
+        self.key = key
+
+
+class Cassette:
+    """
+    一个 cassette 文件。
+    相同请求被录制多次时按顺序回放；回放次数超过录制次数后，
+    auto 模式请求上游并追加录制，replay 模式重复最后一次录制。
+    """
+
+    RECORD = "record"   # 总是请求上游并重新录制(清空已有文件)
+    REPLAY = "replay"   # 只回放，没有录制时抛出 CassetteMissError
+    AUTO = "auto"       # 有录制时回放，否则请求上游并追加录制
+
+    def __init__(self, path: str, mode: str = AUTO):
+        """
+        Args:
+            path: cassette 文件路径
+            mode: "record" / "replay" / "auto"
+        """
+        if mode not in (self.RECORD, self.REPLAY, self.AUTO):
+            raise ValueError(f"未知的 cassette 模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if mode == self.RECORD:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            open(path, "w", encoding="utf-8").close()
+        elif os.path.exists(path):
+            self._load()
+        elif mode == self.REPLAY:
+            raise FileNotFoundError(f"cassette 文件不存在: {path}")
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def entries(self, kind: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """遍历录制的交互，可按类型过滤"""
+        with self._lock:
+            entries = [e for group in self._entries.values() for e in group]
+        return (e for e in entries if kind is None or e["kind"] == kind)
+
+    @staticmethod
+    def make_key(kind: str, request: Dict[str, Any]) -> str:
+        raw = json.dumps({"kind": kind, "request": request}, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def llm_request(model: str, messages: List[Dict[str, Any]], temperature: float) -> Dict[str, Any]:
+        """构建用于匹配 LLM 调用的请求描述，消息的规范化方式与响应缓存一致"""
+        return {
+            "model": model,
+            "messages": LLMResponseCache.normalize_messages(messages),
+            "temperature": temperature,
+        }
+
+    def lookup(self, kind: str, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        查找录制。
+
+        Returns:
+            录制的交互，录制模式或没有录制时返回None(回放模式下没有录制会抛出 CassetteMissError)
+        """
+        if self.mode == self.RECORD:
+            return None
+        key = self.make_key(kind, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                if self.mode == self.REPLAY:
+                    raise CassetteMissError(kind, key)
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            if index >= len(entries):
+                if self.mode == self.AUTO:
+                    return None
+                index = len(entries) - 1
+            return entries[index]
+
+    def record(self, kind: str, request: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """追加一条录制，回放模式下忽略"""
+        if self.mode == self.REPLAY:
+            return
+        key = self.make_key(kind, request)
+        entry = {"kind": kind, "key": key, "request": request, **response}
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self._entries.setdefault(key, []).append(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def stream(self, kind: str, request: Dict[str, Any], source: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """
+        回放录制的数据块；没有录制时迭代 source 并在完整结束后录制数据块及其相对时间。
+        中途失败或被关闭的流不会被录制。
+        """
+        entry = self.lookup(kind, request)
+        if entry is not None:
+            yield from entry["chunks"]
+            return
+        start = time.perf_counter()
+        chunks, offsets = [], []
+        for chunk in source():
+            chunks.append(chunk)
+            offsets.append(round(time.perf_counter() - start, 4))
+            yield chunk
+        self.record(kind, request, {"chunks": chunks, "offsets": offsets})
+
+    async def astream(
+        self,
+        kind: str,
+        request: Dict[str, Any],
+        source: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """stream 的异步版本"""
+        entry = self.lookup(kind, request)
+        if entry is not None:
+            for chunk in entry["chunks"]:
+                yield chunk
+            return
+        start = time.perf_counter()
+        chunks, offsets = [], []
+        async for chunk in source():
+            chunks.append(chunk)
+            offsets.append(round(time.perf_counter() - start, 4))
+            yield chunk
+        self.record(kind, request, {"chunks": chunks, "offsets": offsets})
+
+    def call(self, kind: str, request: Dict[str, Any], func: Callable[[], Any]) -> Any:
+        """回放录制的结果；没有录制时调用 func 并录制其返回值"""
+        entry = self.lookup(kind, request)
+        if entry is not None:
+            return entry["result"]
+        start = time.perf_counter()
+        result = func()
+        self.record(kind, request, {"result": result, "duration": round(time.perf_counter() - start, 4)})
+        return result
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def open_cassette(path: str, mode: str = Cassette.AUTO) -> Cassette:
+    """
+    打开 cassette。同一进程中对同一路径返回同一个实例，
+    使 GoAgentLLM 与各个工具共享录制文件而不会互相覆盖。
+    """
+    real_path = os.path.abspath(path)
+    with _cassettes_lock:
+        cassette = _cassettes.get(real_path)
+        if cassette is None or cassette.mode != mode:
+            cassette = _cassettes[real_path] = Cassette(real_path, mode)
+        return cassette
+
+
+def default_cassette() -> Optional[Cassette]:
+    """
+    根据环境变量 GOAGENT_CASSETTE(文件路径) 与 GOAGENT_CASSETTE_MODE(默认 auto) 打开 cassette，
+    未设置时返回None。
+    """
+    path = os.getenv("GOAGENT_CASSETTE")
+    if not path:
+        return None
+    return open_cassette(path, os.getenv("GOAGENT_CASSETTE_MODE", Cassette.AUTO))
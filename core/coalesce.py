@@ -0,0 +1,244 @@
+"""
+请求合并(single-flight)
+
+同一时刻键相同的多个请求只向上游发出一次，其余调用方订阅同一个数据块流。
+后加入的订阅者会先重放已经产出的数据块，再继续接收后续数据块。
+调用方在开始迭代时才加入或发起上游调用，创建后从未迭代的流不占用任何资源。
+"""
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class _Flight:
+    """一次进行中的上游调用"""
+
+    __slots__ = ("chunks", "done", "error", "subscribers", "cond")
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 1
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """
+    同步的请求合并。
+    首个调用方(leader)在自己的线程中驱动上游迭代器并广播数据块；
+    leader 提前停止读取而仍有其他订阅者时，剩余部分转到后台线程继续读取。
+    """
+
+    def __init__(self, on_coalesced: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            on_coalesced: 每当一个调用方加入已有的上游调用时回调，用于记录指标
+        """
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.on_coalesced = on_coalesced
+
+    def stream(self, key: str, factory: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """
+        获取键对应的数据块流，没有进行中的调用时通过 factory 发起一次。
+
+        Args:
+            key: 请求键，相同的键共享同一次上游调用
+            factory: 创建上游数据块迭代器的函数
+
+        Returns:
+            数据块生成器，第一次迭代时才加入或发起上游调用；上游的异常会原样抛给每个订阅者
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                flight.subscribers += 1
+                leader = False
+        if leader:
+            yield from self._lead(key, flight, factory)
+            return
+        if self.on_coalesced:
+            self.on_coalesced()
+        yield from self._follow(flight)
+
+    def in_flight(self) -> int:
+        """当前进行中的上游调用数"""
+        return len(self._flights)
+
+    def _publish(self, flight: _Flight, chunk: str) -> None:
+        with flight.cond:
+            flight.chunks.append(chunk)
+            flight.cond.notify_all()
+
+    def _finish(self, key: str, flight: _Flight, error: Optional[BaseException]) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.cond:
+            flight.done = True
+            flight.error = error
+            flight.cond.notify_all()
+
+    def _lead(self, key: str, flight: _Flight, factory: Callable[[], Iterator[str]]) -> Iterator[str]:
+        try:
+            source = factory()
+            for chunk in source:
+                self._publish(flight, chunk)
+                yield chunk
+        except GeneratorExit:
+            with self._lock:
+                flight.subscribers -= 1
+                handoff = flight.subscribers > 0
+                if not handoff and self._flights.get(key) is flight:
+                    # 在同一把锁内移除，避免新的订阅者加入一个不会再产出数据的调用
+                    del self._flights[key]
+            if handoff:
+                threading.Thread(target=self._drain, args=(key, flight, source), daemon=True).start()
+            else:
+                self._finish(key, flight, None)
+                close = getattr(source, "close", None)
+                if close:
+                    close()
+            raise
+        except BaseException as e:
+            self._finish(key, flight, e)
+            raise
+        self._finish(key, flight, None)
+
+    def _drain(self, key: str, flight: _Flight, source: Iterator[str]) -> None:
+        try:
+            for chunk in source:
+                self._publish(flight, chunk)
+        except BaseException as e:
+            self._finish(key, flight, e)
+            return
+        self._finish(key, flight, None)
+
+    def _follow(self, flight: _Flight) -> Iterator[str]:
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    while index >= len(flight.chunks) and not flight.done:
+                        flight.cond.wait()
+                    if index < len(flight.chunks):
+                        chunk = flight.chunks[index]
+                    elif flight.error is not None:
+                        raise flight.error
+                    else:
+                        return
+                index += 1
+                yield chunk
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+
+
+class _AsyncFlight:
+    """一次进行中的异步上游调用，由独立的任务驱动"""
+
+    __slots__ = ("chunks", "done", "error", "subscribers", "updated", "task")
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.updated = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+
+class AsyncSingleFlight:
+    """
+    异步的请求合并。
+    上游调用在独立的任务中进行，所有调用方都是订阅者；
+    某个订阅者被取消不会影响其他订阅者，所有订阅者都离开后才取消上游调用。
+    """
+
+    def __init__(self, on_coalesced: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            on_coalesced: 每当一个调用方加入已有的上游调用时回调，用于记录指标
+        """
+        # 键中包含事件循环，不同事件循环之间不共享调用
+        self._flights: Dict[Tuple[int, str], _AsyncFlight] = {}
+        self.on_coalesced = on_coalesced
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        获取键对应的异步数据块流，没有进行中的调用时通过 factory 发起一次。
+        需要在事件循环中迭代。
+
+        Args:
+            key: 请求键，相同的键共享同一次上游调用
+            factory: 创建上游异步数据块迭代器的函数
+
+        Returns:
+            异步数据块生成器，第一次迭代时才订阅或发起上游调用；上游的异常会原样抛给每个订阅者
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            flight = self._flights[flight_key] = _AsyncFlight()
+            flight.task = loop.create_task(self._produce(flight_key, flight, factory))
+        elif self.on_coalesced:
+            self.on_coalesced()
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(flight.chunks):
+                    chunk = flight.chunks[index]
+                    index += 1
+                    yield chunk
+                elif flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await flight.updated.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 没有订阅者了，停止上游调用
+                if self._flights.get(flight_key) is flight:
+                    del self._flights[flight_key]
+                flight.task.cancel()
+
+    def in_flight(self) -> int:
+        """当前进行中的上游调用数"""
+        return len(self._flights)
+
+    def _finish(self, flight_key: Tuple[int, str], flight: _AsyncFlight, error: Optional[BaseException]) -> None:
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        flight.done = True
+        flight.error = error
+        flight.notify()
+
+    async def _produce(
+        self,
+        flight_key: Tuple[int, str],
+        flight: _AsyncFlight,
+        factory: Callable[[], AsyncIterator[str]]
+    ) -> None:
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError as e:
+            self._finish(flight_key, flight, e)
+            raise
+        except Exception as e:
+            self._finish(flight_key, flight, e)
+            return
+        self._finish(flight_key, flight, None)
@@ -0,0 +1,199 @@
+"""
+对话历史压缩
+
+对话历史超过阈值时，把较早的若干轮对话交给 LLM 合并进一段滚动摘要，
+摘要以一条系统消息的形式放在系统提示词之后，替代被压缩的原始消息。
+摘要在后台线程中生成，不阻塞当前请求；结果在下一次加入消息或构建提示词时才应用到窗口，
+因此窗口本身只会在调用方的线程中被修改。
+"""
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from .context import ContextWindow
+from .events import EventLevel, EventType, emit
+from .metrics import MetricsRegistry, get_registry
+
+if TYPE_CHECKING:
+    from .go_agent_llm import GoAgentLLM
+    from .message import Message
+
+
+SUMMARY_PROMPT = """你负责维护一段对话的滚动摘要。请把"新增对话"中的关键信息合并进"已有摘要"：
+保留用户的身份与偏好、提出的需求、已经确认的事实与结论、做出的决定以及尚未解决的问题，
+删去寒暄和重复的内容。只输出更新后的摘要，不超过 {max_chars} 字。
+
+已有摘要:
+{summary}
+
+新增对话:
+{conversation}
+"""
+
+_ROLE_NAMES = {"user": "用户", "assistant": "助手", "system": "系统", "tool": "工具"}
+
+
+class HistoryCompactor:
+    """
+    滚动摘要压缩器，挂载到一个 ContextWindow 上。
+    历史(含摘要)的 token 数超过 threshold 时，把最近 keep_turns 轮之前的对话提交到后台总结；
+    同一时刻最多只有一个总结任务，新的摘要总是在上一次摘要的基础上增量更新。
+    总结完成之前被窗口按预算直接淘汰的消息也会并入下一次总结，不会丢失。
+    """
+
+    def __init__(
+        self,
+        window: ContextWindow,
+        llm: "GoAgentLLM",
+        threshold: Optional[int] = None,
+        keep_turns: int = 2,
+        max_summary_chars: int = 500,
+        executor: Optional[ThreadPoolExecutor] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        source: Optional[str] = None
+    ):
+        """
+        Args:
+            window: 要压缩的上下文窗口，压缩器会挂载到它上面
+            llm: 用于生成摘要的 LLM 客户端
+            threshold: 触发压缩的历史 token 数，默认为窗口预算的 60%
+            keep_turns: 压缩时保留的最近对话轮数
+            max_summary_chars: 摘要的最大字数(写入提示词，由 LLM 遵守)
+            executor: 执行总结的线程池，默认创建一个单线程的线程池
+            metrics: 指标注册表
+            source: 事件来源，通常为 Agent 名称
+        """
+        if threshold is None:
+            if window.max_tokens is None:
+                raise ValueError("窗口未设置 token 预算时必须指定压缩阈值 threshold")
+            threshold = int(window.max_tokens * 0.6)
+        self.window = window
+        self.llm = llm
+        self.threshold = threshold
+        self.keep_turns = keep_turns
+        self.max_summary_chars = max_summary_chars
+        self.metrics = metrics or get_registry()
+        self.source = source
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="goagent-compaction")
+        self._job: Optional[Tuple[Future, List["Message"], List["Message"], int]] = None
+        self._evicted: List["Message"] = []
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self._user_on_evict = window.on_evict
+        window.on_evict = self._on_evict
+        window.compactor = self
+
+    @property
+    def pending(self) -> bool:
+        """是否有进行中或尚未应用的总结任务"""
+        return self._job is not None
+
+    def on_append(self, window: ContextWindow) -> None:
+        """窗口加入消息后调用：应用已完成的摘要，超过阈值时提交新的总结任务"""
+        self._apply_finished()
+        if self._job is None and window.tokens > self.threshold:
+            covered = window.compactable(self.keep_turns)
+            if covered:
+                self._submit(covered)
+
+    def before_build(self, window: ContextWindow) -> None:
+        """构建提示词前调用：应用已完成的摘要"""
+        self._apply_finished()
+
+    def reset(self) -> None:
+        """窗口被清空时调用，丢弃进行中的总结任务的结果"""
+        with self._lock:
+            self._generation += 1
+            self._job = None
+            self._evicted = []
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待进行中的总结任务完成并应用到窗口，主要用于测试与关闭前的收尾。
+
+        Returns:
+            没有未完成的任务时返回True
+        """
+        job = self._job
+        if job is not None:
+            try:
+                job[0].result(timeout=timeout)
+            except Exception:
+                pass
+        self._apply_finished()
+        return self._job is None
+
+    def close(self) -> None:
+        """关闭压缩器自己创建的线程池"""
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    def _on_evict(self, messages: List["Message"]) -> None:
+        # 窗口按预算直接淘汰的消息先暂存，并入下一次总结
+        with self._lock:
+            self._evicted.extend(messages)
+        if self._user_on_evict is not None:
+            self._user_on_evict(messages)
+
+    def _submit(self, covered: List["Message"]) -> None:
+        with self._lock:
+            evicted, self._evicted = self._evicted, []
+            generation = self._generation
+        # 被淘汰的消息早于窗口中剩余的消息，按时间顺序排在前面
+        conversation = evicted + [m for m in covered if all(m is not e for e in evicted)]
+        future = self._executor.submit(self._summarize, self.window.summary, conversation)
+        self._job = (future, covered, evicted, generation)
+        emit(
+            EventType.MESSAGE, f"🗜️ 开始压缩 {len(conversation)} 条历史消息", EventLevel.DEBUG,
+            source=self.source, messages=len(conversation)
+        )
+
+    def _summarize(self, summary: Optional[str], conversation: List["Message"]) -> str:
+        lines = [f"{_ROLE_NAMES.get(m.role, m.role)}: {m.content}" for m in conversation]
+        prompt = SUMMARY_PROMPT.format(
+            max_chars=self.max_summary_chars,
+            summary=summary or "(无)",
+            conversation="\n".join(lines),
+        )
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = self.llm.invoke([{"role": "user", "content": prompt}], temperature=0)
+            if not result or not result.strip():
+                raise RuntimeError("LLM 返回了空的摘要")
+            status = "ok"
+            return result.strip()
+        finally:
+            self.metrics.counter("goagent_context_compactions_total", "对话历史压缩次数").inc(status=status)
+            self.metrics.histogram("goagent_context_compaction_seconds", "对话历史压缩耗时").observe(
+                time.perf_counter() - start
+            )
+
+    def _apply_finished(self) -> None:
+        job = self._job
+        if job is None or not job[0].done():
+            return
+        future, covered, evicted, generation = job
+        self._job = None
+        with self._lock:
+            if generation != self._generation:
+                return
+            error = future.exception()
+            if error is not None:
+                # 总结失败时原始消息仍在窗口中，只需把暂存的淘汰消息放回去等待下一次总结
+                self._evicted[:0] = evicted
+        if error is not None:
+            emit(
+                EventType.MESSAGE, f"⚠️ 历史压缩失败: {error}", EventLevel.WARNING,
+                source=self.source, error=str(error)
+            )
+            return
+        before = self.window.tokens
+        self.window.set_summary(future.result(), covered)
+        emit(
+            EventType.MESSAGE, f"🗜️ 历史压缩完成: {before} -> {self.window.tokens} tokens", EventLevel.DEBUG,
+            source=self.source, before=before, after=self.window.tokens
+        )
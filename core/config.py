@@ -2,6 +2,7 @@
 import os
 from typing import Optional, Dict, Any
 from pydantic import BaseModel
+from .env import ensure_env
 
 class Config(BaseModel):
     """HelloAgents配置类"""
@@ -16,17 +17,29 @@ class Config(BaseModel):
     debug: bool = False
     log_level: str = "INFO"
     
-    # 其他配置
-    max_history_length: int = 100
+    # 上下文窗口配置
+    max_history_length: int = 100       # 历史消息条数上限
+    max_context_tokens: Optional[int] = 8000  # 提示词 token 预算，None 表示不限制
+    context_pinned_turns: int = 2       # 始终保留的最近对话轮数
+    context_compaction: bool = False    # 超过阈值时在后台把较早的对话压缩为滚动摘要
+    compaction_threshold: float = 0.6   # 触发压缩的历史 token 数占预算的比例
+    compaction_keep_turns: int = 2      # 压缩时保留的最近对话轮数
+
+    # 工具调用配置
+    function_calling: bool = False      # 启用且模型客户端与工具执行器都支持时，使用原生函数调用而非文本格式的工具调用
     
     @classmethod
     def from_env(cls) -> "Config":
         """从环境变量创建配置"""
+        ensure_env()
         return cls(
             debug=os.getenv("DEBUG", "false").lower() == "true",
             log_level=os.getenv("LOG_LEVEL", "INFO"),
             temperature=float(os.getenv("TEMPERATURE", "0.7")),
             max_tokens=int(os.getenv("MAX_TOKENS")) if os.getenv("MAX_TOKENS") else None,
+            max_context_tokens=int(os.getenv("MAX_CONTEXT_TOKENS")) if os.getenv("MAX_CONTEXT_TOKENS") else 8000,
+            context_compaction=os.getenv("CONTEXT_COMPACTION", "false").lower() == "true",
+            function_calling=os.getenv("FUNCTION_CALLING", "false").lower() == "true",
         )
     
     def to_dict(self) -> Dict[str, Any]:
@@ -0,0 +1,241 @@
+"""
+对话上下文窗口
+
+按 token 预算与消息条数上限维护对话历史：每条消息只在加入时计数一次，
+超出预算时从最早的消息开始淘汰，系统提示词与最近若干轮对话始终保留。
+可以挂载压缩器(见 core.compaction)，把较早的对话合并为一条摘要消息而不是直接丢弃。
+"""
+import re
+import math
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .message import Message
+
+# 中日韩文字、全角标点等，大多数分词器中约为每字一个 token
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+class TokenCounter:
+    """
+    token 计数器。
+    默认使用启发式估算：中日韩字符每字计 1 个 token，其余字符每 4 个计 1 个 token；
+    需要精确计数时可以传入分词函数(例如基于 tiktoken 的实现)。
+    """
+
+    def __init__(self, tokenize: Optional[Callable[[str], int]] = None, message_overhead: int = 4):
+        """
+        Args:
+            tokenize: 返回文本 token 数的函数，默认使用启发式估算
+            message_overhead: 每条消息在聊天格式中额外占用的 token 数(角色、分隔符等)
+        """
+        self.tokenize = tokenize
+        self.message_overhead = message_overhead
+
+    def count_text(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        if self.tokenize is not None:
+            return self.tokenize(text)
+        cjk = len(_CJK_RE.findall(text))
+        return cjk + math.ceil((len(text) - cjk) / 4)
+
+    def count_message(self, role: str, content: Optional[str]) -> int:
+        return self.message_overhead + self.count_text(content)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """返回 text 中不超过 max_tokens 的开头部分"""
+        total = self.count_text(text)
+        if total <= max_tokens:
+            return text
+        # 按比例估计截断位置，再逐步回退直到满足上限
+        end = max(int(len(text) * max_tokens / total), 1)
+        while end > 1 and self.count_text(text[:end]) > max_tokens:
+            end = int(end * 0.9)
+        return text[:end]
+
+
+class ContextWindow:
+    """
+    对话历史窗口。
+    加入消息时计数并按预算淘汰最早的消息，淘汰总是以完整的轮次为单位，
+    保证窗口中的历史以用户消息开头；最近 pinned_turns 轮对话不会被淘汰，即使它们本身已超出预算。
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        pinned_turns: int = 2,
+        counter: Optional[TokenCounter] = None,
+        on_evict: Optional[Callable[[List["Message"]], None]] = None
+    ):
+        """
+        Args:
+            max_tokens: 整个提示词(系统提示词 + 历史 + 当前输入)的 token 预算，None 表示不限制
+            max_messages: 历史消息条数上限，None 表示不限制
+            pinned_turns: 始终保留的最近对话轮数(每轮为一问一答两条消息)
+            counter: token 计数器
+            on_evict: 消息被淘汰时的回调，参数为按时间顺序排列的被淘汰消息
+        """
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.pinned_turns = pinned_turns
+        self.counter = counter or TokenCounter()
+        self.on_evict = on_evict
+        self._items: Deque[Tuple["Message", int]] = deque()
+        # 与 _items 一一对应的 OpenAI 格式消息，构建提示词时直接整体复制
+        self._dicts: Deque[Dict[str, str]] = deque()
+        self._tokens = 0
+        self._system: Tuple[Optional[str], int] = (None, 0)
+        self.summary: Optional[str] = None
+        self._summary_tokens = 0
+        # 压缩器，需要提供 on_append(window) / before_build(window) / reset() 方法
+        self.compactor = None
+        self.last_prompt_tokens = 0
+
+    @property
+    def tokens(self) -> int:
+        """当前历史消息(含摘要)的 token 数"""
+        return self._tokens + self._summary_tokens
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator["Message"]:
+        return (message for message, _ in self._items)
+
+    def messages(self) -> List["Message"]:
+        """历史消息的副本"""
+        return [message for message, _ in self._items]
+
+    def append(self, message: "Message") -> List["Message"]:
+        """
+        加入一条消息并按预算淘汰。
+
+        Returns:
+            被淘汰的消息
+        """
+        tokens = self.counter.count_message(message.role, message.content)
+        self._items.append((message, tokens))
+        self._dicts.append(message.to_dict())
+        self._tokens += tokens
+        evicted = self._trim(reserve=self._system[1])
+        if self.compactor is not None:
+            self.compactor.on_append(self)
+        return evicted
+
+    def extend(self, messages: Iterable["Message"]) -> List["Message"]:
+        """
+        批量加入消息，全部加入后按预算淘汰一次。不通知压缩器，
+        用于从会话恢复已经按快照中的摘要压缩过的历史，不会因此提交新的总结任务。
+
+        Returns:
+            被淘汰的消息
+        """
+        for message in messages:
+            tokens = self.counter.count_message(message.role, message.content)
+            self._items.append((message, tokens))
+            self._dicts.append(message.to_dict())
+            self._tokens += tokens
+        return self._trim(reserve=self._system[1])
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._dicts.clear()
+        self._tokens = 0
+        self.summary = None
+        self._summary_tokens = 0
+        self.last_prompt_tokens = 0
+        if self.compactor is not None:
+            self.compactor.reset()
+
+    def set_summary(self, summary: str, covered: List["Message"]) -> None:
+        """
+        用摘要替换窗口开头已被摘要覆盖的消息。
+
+        Args:
+            summary: 新的摘要
+            covered: 摘要覆盖的消息，仍在窗口开头的部分会被移除
+        """
+        covered_ids = {id(message) for message in covered}
+        while self._items and id(self._items[0][0]) in covered_ids:
+            self._pop()
+        self.summary = summary
+        self._summary_tokens = self.counter.count_message("system", self._summary_content())
+
+    def _summary_content(self) -> str:
+        return f"以下是之前对话的摘要:\n{self.summary}"
+
+    def system_tokens(self, system_prompt: Optional[str]) -> int:
+        """系统提示词的 token 数，提示词不变时复用上次的计数"""
+        if not system_prompt:
+            return 0
+        cached_prompt, cached_tokens = self._system
+        if cached_prompt != system_prompt:
+            cached_tokens = self.counter.count_message("system", system_prompt)
+            self._system = (system_prompt, cached_tokens)
+        return cached_tokens
+
+    def build(self, input_text: Optional[str] = None, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        构建发送给LLM的消息列表：系统提示词 + 窗口中的历史 + 当前输入。
+        若总量超出预算，先淘汰最早的历史消息。
+
+        Args:
+            input_text: 当前用户输入
+            system_prompt: 系统提示词，始终保留
+
+        Returns:
+            OpenAI 格式的消息列表
+        """
+        if self.compactor is not None:
+            self.compactor.before_build(self)
+        system_tokens = self.system_tokens(system_prompt)
+        input_tokens = self.counter.count_message("user", input_text) if input_text else 0
+        self._trim(reserve=system_tokens + input_tokens)
+
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        if self.summary:
+            messages.append({"role": "system", "content": self._summary_content()})
+        messages.extend(self._dicts)
+        if input_text:
+            messages.append({"role": "user", "content": input_text})
+        self.last_prompt_tokens = system_tokens + self.tokens + input_tokens
+        return messages
+
+    def compactable(self, keep_turns: int) -> List["Message"]:
+        """
+        可以被压缩的较早消息：保留最近 keep_turns 轮(且不少于 pinned_turns 轮)，
+        并保证截断位置落在一轮对话的开头。
+        """
+        cut = len(self._items) - max(keep_turns, self.pinned_turns) * 2
+        while cut > 0 and self._items[cut][0].role != "user":
+            cut -= 1
+        return [self._items[i][0] for i in range(max(cut, 0))]
+
+    def _over_budget(self, reserve: int) -> bool:
+        if self.max_messages is not None and len(self._items) > self.max_messages:
+            return True
+        return self.max_tokens is not None and self.tokens + reserve > self.max_tokens
+
+    def _trim(self, reserve: int = 0) -> List["Message"]:
+        pinned = self.pinned_turns * 2
+        evicted = []
+        while len(self._items) > pinned and self._over_budget(reserve):
+            evicted.append(self._pop())
+            # 不留下没有对应提问的回复
+            while len(self._items) > pinned and self._items[0][0].role != "user":
+                evicted.append(self._pop())
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+        return evicted
+
+    def _pop(self) -> "Message":
+        message, tokens = self._items.popleft()
+        self._dicts.popleft()
+        self._tokens -= tokens
+        return message
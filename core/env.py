@@ -0,0 +1,21 @@
+"""环境变量加载"""
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def ensure_env() -> None:
+    """
+    从 .env 文件加载环境变量。
+    只在首次调用时真正读取文件，之后的调用直接返回；导入各模块时不会触发加载。
+    """
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+        _loaded = True
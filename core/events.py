@@ -0,0 +1,189 @@
+"""
+事件系统
+
+框架内部不直接 print，而是发出带级别的结构化事件，由事件接收器(EventSink)决定如何处理。
+默认使用 NullSink，不产生任何输出；需要控制台输出时显式启用 ConsoleSink:
+
+    from core.events import set_event_sink, ConsoleSink
+    set_event_sink(ConsoleSink())
+"""
+import sys
+import time
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, TextIO
+
+if TYPE_CHECKING:
+    import logging
+
+
+class EventLevel(IntEnum):
+    """事件级别"""
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+
+class EventType:
+    """事件类型"""
+    CHUNK = "chunk"              # LLM 流式输出的一个数据块
+    LLM_START = "llm_start"      # 开始调用 LLM
+    LLM_END = "llm_end"          # LLM 流式输出结束
+    STEP = "step"                # Agent 的一个步骤/阶段
+    THOUGHT = "thought"          # 推理过程
+    ACTION = "action"            # 选定的动作
+    TOOL_CALL = "tool_call"      # 工具调用
+    OBSERVATION = "observation"  # 工具返回的观察结果
+    ANSWER = "answer"            # 最终答案或阶段性结果
+    MESSAGE = "message"          # 其他提示信息
+
+
+@dataclass
+class Event:
+    """一条结构化事件"""
+
+    type: str
+    message: str = ""
+    level: EventLevel = EventLevel.INFO
+    source: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+
+class EventSink(ABC):
+    """
+    事件接收器基类，子类需要实现 emit。
+    发送方会先调用 enabled_for 判断是否需要构造事件，因此关闭的接收器几乎没有开销。
+    """
+
+    def __init__(self, level: EventLevel = EventLevel.INFO):
+        self.level = level
+
+    def enabled_for(self, level: EventLevel, event_type: str) -> bool:
+        return level >= self.level
+
+    @abstractmethod
+    def emit(self, event: Event) -> None:
+        """处理一条事件"""
+        pass
+
+
+class NullSink(EventSink):
+    """丢弃所有事件，生产环境的默认接收器"""
+
+    def enabled_for(self, level: EventLevel, event_type: str) -> bool:
+        return False
+
+    def emit(self, event: Event) -> None:
+        pass
+
+
+class ConsoleSink(EventSink):
+    """
+    控制台接收器，按原有的 print 格式渲染事件。
+    流式数据块不换行并立即刷新。
+    """
+
+    def __init__(self, level: EventLevel = EventLevel.DEBUG, stream: Optional[TextIO] = None):
+        super().__init__(level)
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event: Event) -> None:
+        stream = self.stream or sys.stdout
+        with self._lock:
+            if event.type == EventType.CHUNK:
+                stream.write(event.message)
+                stream.flush()
+            else:
+                stream.write(event.message + "\n")
+
+
+class CallbackSink(EventSink):
+    """将事件转交给回调函数，便于接入自定义的前端或日志系统"""
+
+    def __init__(self, callback: Callable[[Event], None], level: EventLevel = EventLevel.INFO, include_chunks: bool = True):
+        super().__init__(level)
+        self.callback = callback
+        self.include_chunks = include_chunks
+
+    def enabled_for(self, level: EventLevel, event_type: str) -> bool:
+        if event_type == EventType.CHUNK and not self.include_chunks:
+            return False
+        return level >= self.level
+
+    def emit(self, event: Event) -> None:
+        self.callback(event)
+
+
+class LoggingSink(EventSink):
+    """写入标准 logging，数据块默认不记录以免日志泛滥"""
+
+    def __init__(self, logger: Optional["logging.Logger"] = None, level: EventLevel = EventLevel.INFO, include_chunks: bool = False):
+        super().__init__(level)
+        if logger is None:
+            import logging
+            logger = logging.getLogger("goagent")
+        self.logger = logger
+        self.include_chunks = include_chunks
+
+    def enabled_for(self, level: EventLevel, event_type: str) -> bool:
+        if event_type == EventType.CHUNK and not self.include_chunks:
+            return False
+        return level >= self.level and self.logger.isEnabledFor(int(level))
+
+    def emit(self, event: Event) -> None:
+        self.logger.log(int(event.level), event.message, extra={
+            "event_type": event.type,
+            "event_source": event.source,
+            "event_data": event.data,
+        })
+
+
+_sink: EventSink = NullSink()
+
+
+def get_event_sink() -> EventSink:
+    """获取全局事件接收器"""
+    return _sink
+
+
+def set_event_sink(sink: Optional[EventSink]) -> EventSink:
+    """
+    设置全局事件接收器，传入None恢复为 NullSink。
+
+    Returns:
+        之前的接收器
+    """
+    global _sink
+    previous = _sink
+    _sink = sink or NullSink()
+    return previous
+
+
+def emit(
+    event_type: str,
+    message: str = "",
+    level: EventLevel = EventLevel.INFO,
+    source: Optional[str] = None,
+    sink: Optional[EventSink] = None,
+    **data
+) -> None:
+    """
+    发出一条事件。
+
+    Args:
+        event_type: 事件类型，见 EventType
+        message: 用于展示的文本
+        level: 事件级别
+        source: 事件来源（如 Agent 名称、工具名称）
+        sink: 指定接收器，默认使用全局接收器
+        **data: 附加的结构化数据
+    """
+    sink = sink or _sink
+    if not sink.enabled_for(level, event_type):
+        return
+    sink.emit(Event(event_type, message, level, source, data))
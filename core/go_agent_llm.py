@@ -1,97 +1,832 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
-from typing import List, Dict, Optional
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, AsyncIterator, Iterator, Tuple, Callable
+from .cache import LLMResponseCache
+from .batch import BatchItemResult, BatchResult
+from .resilience import RetryPolicy, CircuitBreaker, HedgePolicy
+from .metrics import MetricsRegistry, get_registry, record_llm_call
+from .events import Event, EventLevel, EventSink, EventType, emit, get_event_sink
+from .coalesce import SingleFlight, AsyncSingleFlight
+from .env import ensure_env
+from .cassette import Cassette, default_cassette
+from .tool_calls import AssistantTurn, ToolCallAccumulator
 
-# 加载 .env 文件中的环境变量
-load_dotenv()
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
 
 
 class GoAgentLLM:
     """
     大语言模型客户端。
     用于调用任何兼容OpenAI接口的服务，并默认使用流式响应。
+    同时提供基于异步客户端的 ainvoke / astream，所有异步调用共享同一个连接池，
+    并通过信号量限制同时在途的请求数。
+    invoke_with_tools / ainvoke_with_tools 使用原生函数调用，流式拼接模型返回的工具调用。
     """
-    def __init__(self, model: str = None, api_key: str = None, base_url: str = None, timeout: int = None):
+    def __init__(
+        self,
+        model: str = None,
+        api_key: str = None,
+        base_url: str = None,
+        timeout: int = None,
+        max_concurrency: int = None,
+        cache: Optional[LLMResponseCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        stream_usage: Optional[bool] = None,
+        event_sink: Optional[EventSink] = None,
+        coalesce: Optional[bool] = None,
+        cassette: Optional[Cassette] = None
+    ):
         """
         初始化客户端。优先使用传入参数，如果未提供，则从环境变量加载。
-        
+
         Args:
             model: 模型ID，默认从环境变量LLM_MODEL_ID获取
             api_key: API密钥，默认从环境变量LLM_API_KEY获取
             base_url: 服务地址，默认从环境变量LLM_BASE_URL获取
             timeout: 超时时间(秒)，默认从环境变量LLM_TIMEOUT获取，若未设置则为60秒
+            max_concurrency: 异步调用的最大在途请求数，默认从环境变量LLM_MAX_CONCURRENCY获取，若未设置则为64
+            cache: 响应缓存，命中时直接返回（流式调用按原始分块重放），默认不启用
+            retry_policy: 重试策略，默认按环境变量LLM_MAX_RETRIES(默认2次)进行带抖动的指数退避重试
+            circuit_breaker: 熔断器，默认不启用
+            hedge_policy: 对冲请求策略，仅作用于非流式的完整调用(invoke / invoke_many)，默认不启用
+            metrics: 指标注册表，默认使用全局注册表
+            stream_usage: 是否在流式响应中请求 token 用量(stream_options.include_usage)，
+                默认从环境变量LLM_STREAM_USAGE获取，若未设置则为True；不支持该参数的服务可关闭
+            event_sink: 事件接收器，默认使用全局接收器
+            coalesce: 是否合并同一时刻完全相同的确定性请求(temperature为0)，合并后只向上游发出一次，
+                流式调用方共享同一个数据块流；默认从环境变量LLM_COALESCE获取，若未设置则不启用。
+                批量压测或需要每个请求都真正发往上游(如多节点分流)时不应开启
+            cassette: 录制/回放用的 cassette，默认按环境变量GOAGENT_CASSETTE打开，未设置时不启用；
+                回放模式下可以不提供API密钥和服务地址
         """
+        ensure_env()
         self.model = model or os.getenv("LLM_MODEL_ID")
         api_key = api_key or os.getenv("LLM_API_KEY")
         base_url = base_url or os.getenv("LLM_BASE_URL")
         timeout = timeout or int(os.getenv("LLM_TIMEOUT", 60))
-        
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", 64))
+        self.cassette = cassette if cassette is not None else default_cassette()
+        if self.cassette is not None and self.cassette.mode == Cassette.REPLAY:
+            # 纯回放不会发出请求
+            api_key = api_key or "sk-cassette-replay"
+            base_url = base_url or "http://cassette.invalid/v1"
+
         if not all([self.model, api_key, base_url]):
             raise ValueError("模型ID、API密钥和服务地址必须被提供或在.env文件中定义。")
 
-        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=int(os.getenv("LLM_MAX_RETRIES", 2)))
+        self.circuit_breaker = circuit_breaker
+        self.hedge_policy = hedge_policy
+        self.metrics = metrics or get_registry()
+        if stream_usage is None:
+            stream_usage = os.getenv("LLM_STREAM_USAGE", "true").lower() == "true"
+        self.stream_usage = stream_usage
+        self.event_sink = event_sink
+        if coalesce is None:
+            coalesce = os.getenv("LLM_COALESCE", "false").lower() == "true"
+        self.coalesce = coalesce
+        self._flights = SingleFlight(on_coalesced=self._record_coalesced)
+        self._async_flights = AsyncSingleFlight(on_coalesced=self._record_coalesced)
+
+        # 客户端在首次请求时才创建；异步客户端及信号量绑定到创建时的事件循环，事件循环变化时重新创建
+        self._client: Optional["OpenAI"] = None
+        self._client_lock = threading.Lock()
+        self._async_client: Optional["AsyncOpenAI"] = None
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_pool_lock = threading.Lock()
+
+    @property
+    def client(self) -> "OpenAI":
+        """获取同步客户端，首次访问时创建"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    # 重试由 retry_policy 统一处理，关闭 SDK 内置重试以免叠加
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        """
+        获取共享的异步客户端。
+        同一事件循环内的 ainvoke / astream 调用复用同一个 httpx 连接池，连接数上限与 max_concurrency 一致。
+        """
+        self._bind_loop()
+        if self._async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            limits = httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            )
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=limits, timeout=self.timeout),
+            )
+        return self._async_client
+
+    def _get_async_semaphore(self) -> asyncio.Semaphore:
+        """获取限制在途请求数的信号量"""
+        self._bind_loop()
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._async_semaphore
+
+    def _bind_loop(self) -> None:
+        """
+        连接池与信号量只能在创建它们的事件循环中使用。
+        当前运行的事件循环与之不同时(如多次调用 asyncio.run)丢弃旧的客户端与信号量，之后按需重新创建；
+        旧事件循环通常已经关闭，其上的连接无法再正常关闭，交由垃圾回收释放。
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = None
+            self._async_semaphore = None
+            self._async_loop = loop
+
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        """获取对冲请求使用的线程池"""
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.max_concurrency * 2)
+            return self._hedge_pool
+
+    def _emit(self, event_type: str, message: str = "", level: EventLevel = EventLevel.INFO, **data) -> None:
+        emit(event_type, message, level, source=self.model, sink=self.event_sink, **data)
+
+    def _chunk_callback(self) -> Optional[Callable[[str], None]]:
+        """接收器需要数据块事件时返回回调，否则返回None，避免在热路径上构造事件"""
+        sink = self.event_sink or get_event_sink()
+        if not sink.enabled_for(EventLevel.INFO, EventType.CHUNK):
+            return None
+        return lambda content: sink.emit(Event(EventType.CHUNK, content, source=self.model))
 
     def invoke(self, messages: List[Dict[str, str]], temperature: float = 0, **kwargs) -> Optional[str]:
         """
         调用大语言模型生成回复，并返回其响应。
-        
+        可重试的错误会按 retry_policy 自动重试，熔断器打开时快速失败。
+
         Args:
             messages: 对话历史消息列表
             temperature: 温度参数，控制回复的随机性，默认为0(最确定性)
             **kwargs: 其他参数（为了兼容性，当前会被忽略）
-            
+
         Returns:
             模型生成的文本，如出错则返回None
         """
-        print(f"🧠 正在调用 {self.model} 模型...")
+        self._emit(EventType.LLM_START, f"🧠 正在调用 {self.model} 模型...")
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                stream=True,
-            )
-            
+            cache_key, cached = self._cache_lookup(messages, temperature)
+            if cached is not None:
+                content = "".join(cached)
+                self._emit(EventType.MESSAGE, "✅ 命中响应缓存:")
+                self._emit(EventType.LLM_END, content, cached=True)
+                return content
+
             # 处理流式响应
-            print("✅ 大语言模型响应成功:")
-            collected_content = []
-            for chunk in response:
-                content = chunk.choices[0].delta.content or ""
-                print(content, end="", flush=True)
-                collected_content.append(content)
-            print()  # 在流式输出结束后换行
-            return "".join(collected_content)
+            self._emit(EventType.MESSAGE, "✅ 大语言模型响应成功:")
+            content = self._complete(
+                messages, temperature, on_chunk=self._chunk_callback(), lookup=(cache_key, cached)
+            )
+            self._emit(EventType.LLM_END)  # 在流式输出结束后换行
+            return content
 
         except Exception as e:
-            print(f"❌ 调用LLM API时发生错误: {e}")
+            self._emit(EventType.MESSAGE, f"❌ 调用LLM API时发生错误: {e}", EventLevel.ERROR, error=repr(e))
             return None
-    
+
     def stream_invoke(self, messages: List[Dict[str, str]], temperature: float = 0, **kwargs):
         """
         流式调用大语言模型，逐块返回响应内容（生成器）。
-        
+        命中缓存时按缓存的原始分块重放；仅在尚未产出任何数据块时才会重试。
+
         Args:
             messages: 对话历史消息列表
             temperature: 温度参数，控制回复的随机性，默认为0(最确定性)
             **kwargs: 其他参数（为了兼容性，当前会被忽略）
-            
+
         Yields:
             每次生成的文本块
         """
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                stream=True,
-            )
-            
+            cache_key, cached = self._cache_lookup(messages, temperature)
+            if cached is not None:
+                yield from cached
+                return
+
+            collected_content = []
+            source = lambda: self._stream_resilient(messages, temperature)
+            for content in self._shared_stream(messages, temperature, source):
+                collected_content.append(content)
+                yield content
+            self._cache_store(cache_key, collected_content)
+
+        except Exception as e:
+            self._emit(EventType.MESSAGE, f"❌ 流式调用LLM API时发生错误: {e}", EventLevel.ERROR, error=repr(e))
+            yield ""
+
+    def invoke_many(
+        self,
+        messages_list: List[List[Dict[str, str]]],
+        temperature: float = 0,
+        max_workers: Optional[int] = None,
+        **kwargs
+    ) -> BatchResult:
+        """
+        在有界线程池中并发调用大语言模型，处理多组消息。
+
+        Args:
+            messages_list: 多组对话消息列表
+            temperature: 温度参数，控制回复的随机性，默认为0(最确定性)
+            max_workers: 最大并发数，默认与 max_concurrency 一致
+            **kwargs: 其他参数（为了兼容性，当前会被忽略）
+
+        Returns:
+            BatchResult，结果顺序与输入一致，失败的条目携带异常而非None
+        """
+        if not messages_list:
+            return BatchResult()
+
+        self._emit(EventType.LLM_START, f"🧠 正在批量调用 {self.model} 模型，共 {len(messages_list)} 条请求...")
+        workers = min(max_workers or self.max_concurrency, len(messages_list))
+
+        def run_one(index: int, messages: List[Dict[str, str]]) -> BatchItemResult:
+            start = time.perf_counter()
+            try:
+                content = self._complete(messages, temperature)
+                return BatchItemResult(index, content=content, latency=time.perf_counter() - start)
+            except Exception as e:
+                return BatchItemResult(index, error=e, latency=time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            items = list(pool.map(run_one, range(len(messages_list)), messages_list))
+        result = BatchResult(items=items, wall_time=time.perf_counter() - start)
+
+        self._emit(
+            EventType.MESSAGE,
+            f"✅ 批量调用完成: 成功 {len(result) - len(result.errors)} 条，失败 {len(result.errors)} 条，"
+            f"耗时 {result.wall_time:.2f}s，吞吐 {result.throughput:.2f} req/s",
+            **result.summary()
+        )
+        return result
+
+    def invoke_with_tools(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        temperature: float = 0,
+        tool_choice: Optional[Any] = None,
+        **kwargs
+    ) -> Optional[AssistantTurn]:
+        """
+        携带工具定义调用大语言模型(原生函数调用)，流式接收文本与工具调用增量并拼接为完整结果。
+        可重试的错误会按 retry_policy 自动重试，熔断器打开时快速失败；不使用响应缓存与请求合并。
+
+        Args:
+            messages: 对话历史消息列表，可以包含 assistant 的 tool_calls 消息与 tool 消息
+            tools: OpenAI 格式的工具定义列表，通常来自 ToolExecutor.get_openai_tools()
+            temperature: 温度参数，控制回复的随机性，默认为0(最确定性)
+            tool_choice: "auto" / "none" / "required" 或指定函数，默认由服务决定
+            **kwargs: 其他参数（为了兼容性，当前会被忽略）
+
+        Returns:
+            AssistantTurn，包含文本内容与工具调用，如出错则返回None
+        """
+        self._emit(EventType.LLM_START, f"🧠 正在调用 {self.model} 模型(函数调用)...")
+        try:
+            extra = self._tool_params(tools, tool_choice)
+            on_chunk = self._chunk_callback()
+
+            def complete() -> Dict[str, Any]:
+                accumulator = ToolCallAccumulator()
+                collected_content = []
+                for content in self._stream_resilient(messages, temperature, extra=extra, tool_calls=accumulator):
+                    if on_chunk:
+                        on_chunk(content)
+                    collected_content.append(content)
+                return AssistantTurn("".join(collected_content), accumulator.calls(), accumulator.finish_reason).to_dict()
+
+            if self.cassette is None:
+                turn = AssistantTurn.from_dict(complete())
+            else:
+                request = {**Cassette.llm_request(self.model, messages, temperature), **extra}
+                turn = AssistantTurn.from_dict(self.cassette.call("llm_tools", request, complete))
+            self._emit(EventType.LLM_END, tool_calls=[call.name for call in turn.tool_calls])
+            return turn
+
+        except Exception as e:
+            self._emit(EventType.MESSAGE, f"❌ 调用LLM API时发生错误: {e}", EventLevel.ERROR, error=repr(e))
+            return None
+
+    @staticmethod
+    def _tool_params(tools: List[Dict[str, Any]], tool_choice: Optional[Any]) -> Dict[str, Any]:
+        """构建函数调用的额外请求参数"""
+        extra: Dict[str, Any] = {"tools": tools}
+        if tool_choice is not None:
+            extra["tool_choice"] = tool_choice
+        return extra
+
+    def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        on_chunk: Optional[Callable[[str], None]] = None,
+        lookup: Optional[Tuple[Optional[str], Optional[List[str]]]] = None
+    ) -> str:
+        """
+        同步获取完整回复（使用缓存、重试、熔断与对冲），异常直接向上抛出。
+
+        Args:
+            on_chunk: 每收到一个数据块时的回调；发生对冲时在完成后以完整文本回调一次
+            lookup: 调用方已经完成的缓存查询结果(_cache_lookup 的返回值)，传入时不再重复查询，
+                以免未命中被计数两次
+        """
+        cache_key, cached = lookup if lookup is not None else self._cache_lookup(messages, temperature)
+        if cached is not None:
+            return "".join(cached)
+
+        hedge_delay = self.hedge_policy.get_delay() if self.hedge_policy is not None else None
+        if hedge_delay is None:
+            source = lambda: self._stream_resilient(messages, temperature)
+        else:
+            # 对冲的两个请求并行进行，数据块在胜出的请求完成后才会一并产出
+            source = lambda: iter(self._complete_hedged(messages, temperature, hedge_delay))
+
+        collected_content = []
+        for content in self._shared_stream(messages, temperature, source):
+            if on_chunk:
+                on_chunk(content)
+            collected_content.append(content)
+
+        self._cache_store(cache_key, collected_content)
+        return "".join(collected_content)
+
+    def _complete_hedged(self, messages: List[Dict[str, str]], temperature: float, delay: float) -> List[str]:
+        """
+        发出主请求，若 delay 秒后仍未完成则再发一个相同的对冲请求，返回先成功者的数据块。
+        """
+        pool = self._get_hedge_pool()
+
+        def attempt(cancel_event: threading.Event) -> List[str]:
+            return list(self._stream_resilient(messages, temperature, cancel_event=cancel_event))
+
+        primary_cancel = threading.Event()
+        primary = pool.submit(attempt, primary_cancel)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedge_policy.mark_sent()
+        backup_cancel = threading.Event()
+        backup = pool.submit(attempt, backup_cancel)
+        cancel_events = {primary: primary_cancel, backup: backup_cancel}
+
+        pending = set(cancel_events)
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 通知落后的请求尽快停止读取
+                    for other in pending:
+                        cancel_events[other].set()
+                    if future is backup:
+                        self.hedge_policy.mark_sent(won=True)
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def _coalesce_key(self, messages: List[Dict[str, str]], temperature: float) -> Optional[str]:
+        """计算请求合并使用的键，未启用合并或调用不确定(temperature不为0)时返回None"""
+        if not self.coalesce or temperature != 0:
+            return None
+        return LLMResponseCache.make_key(self.model, messages, temperature=temperature)
+
+    def _record_coalesced(self) -> None:
+        self.metrics.counter("goagent_llm_coalesced_total", "被合并到已有上游调用的请求数").inc(model=self.model)
+
+    def _shared_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        source: Callable[[], Iterator[str]]
+    ) -> Iterator[str]:
+        """同一时刻完全相同的请求共享 source 产出的数据块流；启用 cassette 时先经过录制/回放"""
+        if self.cassette is not None:
+            # 有录制时回放，否则请求上游并录制
+            request = Cassette.llm_request(self.model, messages, temperature)
+            source = lambda raw=source: self.cassette.stream("llm", request, raw)
+        key = self._coalesce_key(messages, temperature)
+        if key is None:
+            return source()
+        return self._flights.stream(key, source)
+
+    def _ashared_stream(self, messages: List[Dict[str, str]], temperature: float) -> AsyncIterator[str]:
+        """_astream_raw 的请求合并与录制/回放版本"""
+        source = lambda: self._astream_raw(messages, temperature)
+        if self.cassette is not None:
+            request = Cassette.llm_request(self.model, messages, temperature)
+            source = lambda raw=source: self.cassette.astream("llm", request, raw)
+        key = self._coalesce_key(messages, temperature)
+        if key is None:
+            return source()
+        return self._async_flights.stream(key, source)
+
+    def _stream_resilient(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        cancel_event: Optional[threading.Event] = None,
+        extra: Optional[Dict[str, Any]] = None,
+        tool_calls: Optional[ToolCallAccumulator] = None
+    ) -> Iterator[str]:
+        """
+        带熔断与重试的同步流式请求。
+        只有在尚未产出任何数据块时才会重试，避免向调用方重复输出内容。
+
+        Args:
+            extra: 额外的请求参数(如 tools)
+            tool_calls: 拼接工具调用增量的累加器，每次重试前清空
+        """
+        attempt = 0
+        while True:
+            probe = self.circuit_breaker is not None and self.circuit_breaker.before_call()
+            resolved = False
+            if tool_calls is not None:
+                tool_calls.reset()
+            started = False
+            start = time.perf_counter()
+            try:
+                try:
+                    for content in self._stream_raw(messages, temperature, cancel_event, extra, tool_calls):
+                        started = True
+                        yield content
+                except Exception as e:
+                    if self.circuit_breaker is not None:
+                        self.circuit_breaker.record_failure()
+                    resolved = True
+                    if started or not self.retry_policy.should_retry(attempt, e):
+                        raise
+                    delay = self.retry_policy.compute_delay(attempt, e)
+                    self._emit(
+                        EventType.MESSAGE, f"⚠️ 调用LLM API失败({e})，{delay:.2f} 秒后进行第 {attempt + 1} 次重试...",
+                        EventLevel.WARNING, error=repr(e), attempt=attempt + 1, delay=delay
+                    )
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+
+                # 被对冲请求取消的调用不计入统计
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                resolved = True
+                if self.hedge_policy is not None:
+                    self.hedge_policy.record(time.perf_counter() - start)
+                return
+            finally:
+                # 调用方提前关闭流或被对冲请求取消时没有结论，归还试探名额，避免熔断器停留在半开状态
+                if probe and not resolved:
+                    self.circuit_breaker.release()
+
+    def _stream_raw(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        cancel_event: Optional[threading.Event] = None,
+        extra: Optional[Dict[str, Any]] = None,
+        tool_calls: Optional[ToolCallAccumulator] = None
+    ) -> Iterator[str]:
+        """
+        发起同步流式请求并逐块返回非空内容，同时记录耗时与用量指标，异常直接向上抛出。
+        工具调用增量不产出，而是拼接到 tool_calls 中。
+        """
+        # 客户端在计时之前创建，首次请求的耗时指标不包含客户端的构造时间
+        client = self.client
+        stats = _CallStats(tool_calls)
+        try:
+            response = client.chat.completions.create(**self._request_params(messages, temperature, extra))
             for chunk in response:
-                content = chunk.choices[0].delta.content or ""
+                if cancel_event is not None and cancel_event.is_set():
+                    response.close()
+                    stats.status = "cancelled"
+                    return
+                content = stats.consume(chunk)
                 if content:
                     yield content
-                    
+            stats.status = "ok"
+        except GeneratorExit:
+            stats.status = "cancelled"
+            raise
+        finally:
+            self._record_call(stats)
+
+    def _request_params(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        extra: Optional[Dict[str, Any]] = None
+    ) -> Dict:
+        """构建流式请求参数"""
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        }
+        if self.stream_usage:
+            params["stream_options"] = {"include_usage": True}
+        if extra:
+            params.update(extra)
+        return params
+
+    def _record_call(self, stats: "_CallStats") -> None:
+        """将一次调用的统计写入指标注册表"""
+        usage = stats.usage
+        record_llm_call(
+            self.metrics,
+            model=self.model,
+            status=stats.status,
+            duration=time.perf_counter() - stats.start,
+            ttft=stats.ttft,
+            chunks=stats.chunks,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            cached_tokens=getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None),
+        )
+
+    def _cache_lookup(self, messages: List[Dict[str, str]], temperature: float) -> Tuple[Optional[str], Optional[List[str]]]:
+        """
+        查询响应缓存。
+
+        Returns:
+            (缓存键, 缓存的数据块列表)，不可缓存时缓存键为None，未命中时数据块列表为None
+        """
+        if self.cache is None or not self.cache.is_cacheable(temperature):
+            return None, None
+        key = self.cache.make_key(self.model, messages, temperature=temperature)
+        return key, self.cache.get(key)
+
+    def _cache_store(self, cache_key: Optional[str], chunks: List[str]) -> None:
+        """将完整响应的数据块写入缓存"""
+        if cache_key is not None and chunks:
+            self.cache.set(cache_key, chunks)
+
+    async def ainvoke(self, messages: List[Dict[str, str]], temperature: float = 0, **kwargs) -> Optional[str]:
+        """
+        异步调用大语言模型生成回复，并返回完整响应。
+        并发调用数超过 max_concurrency 时会在信号量上排队等待。
+
+        Args:
+            messages: 对话历史消息列表
+            temperature: 温度参数，控制回复的随机性，默认为0(最确定性)
+            **kwargs: 其他参数（为了兼容性，当前会被忽略）
+
+        Returns:
+            模型生成的文本，如出错则返回None
+        """
+        self._emit(EventType.LLM_START, f"🧠 正在调用 {self.model} 模型...")
+        try:
+            self._emit(EventType.MESSAGE, "✅ 大语言模型响应成功:")
+            on_chunk = self._chunk_callback()
+            collected_content = []
+            async for content in self._ashared_stream(messages, temperature):
+                if on_chunk:
+                    on_chunk(content)
+                collected_content.append(content)
+            self._emit(EventType.LLM_END)  # 在流式输出结束后换行
+            return "".join(collected_content)
+
         except Exception as e:
-            print(f"❌ 流式调用LLM API时发生错误: {e}")
+            self._emit(EventType.MESSAGE, f"❌ 异步调用LLM API时发生错误: {e}", EventLevel.ERROR, error=repr(e))
+            return None
+
+    async def astream(self, messages: List[Dict[str, str]], temperature: float = 0, **kwargs) -> AsyncIterator[str]:
+        """
+        异步流式调用大语言模型，逐块返回响应内容（异步生成器）。
+
+        Args:
+            messages: 对话历史消息列表
+            temperature: 温度参数，控制回复的随机性，默认为0(最确定性)
+            **kwargs: 其他参数（为了兼容性，当前会被忽略）
+
+        Yields:
+            每次生成的文本块
+        """
+        try:
+            async for content in self._ashared_stream(messages, temperature):
+                yield content
+
+        except Exception as e:
+            self._emit(EventType.MESSAGE, f"❌ 异步流式调用LLM API时发生错误: {e}", EventLevel.ERROR, error=repr(e))
             yield ""
+
+    async def ainvoke_with_tools(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        temperature: float = 0,
+        tool_choice: Optional[Any] = None,
+        **kwargs
+    ) -> Optional[AssistantTurn]:
+        """
+        invoke_with_tools 的异步版本，并发调用数超过 max_concurrency 时会在信号量上排队等待。
+
+        Returns:
+            AssistantTurn，包含文本内容与工具调用，如出错则返回None
+        """
+        self._emit(EventType.LLM_START, f"🧠 正在调用 {self.model} 模型(函数调用)...")
+        try:
+            extra = self._tool_params(tools, tool_choice)
+            request = None
+            turn = None
+            if self.cassette is not None:
+                request = {**Cassette.llm_request(self.model, messages, temperature), **extra}
+                entry = self.cassette.lookup("llm_tools", request)
+                if entry is not None:
+                    turn = AssistantTurn.from_dict(entry["result"])
+
+            if turn is None:
+                start = time.perf_counter()
+                on_chunk = self._chunk_callback()
+                accumulator = ToolCallAccumulator()
+                collected_content = []
+                async for content in self._astream_raw(messages, temperature, extra, accumulator):
+                    if on_chunk:
+                        on_chunk(content)
+                    collected_content.append(content)
+                turn = AssistantTurn("".join(collected_content), accumulator.calls(), accumulator.finish_reason)
+                if request is not None:
+                    self.cassette.record("llm_tools", request, {
+                        "result": turn.to_dict(), "duration": round(time.perf_counter() - start, 4)
+                    })
+            self._emit(EventType.LLM_END, tool_calls=[call.name for call in turn.tool_calls])
+            return turn
+
+        except Exception as e:
+            self._emit(EventType.MESSAGE, f"❌ 异步调用LLM API时发生错误: {e}", EventLevel.ERROR, error=repr(e))
+            return None
+
+    async def ainvoke_many(
+        self,
+        messages_list: List[List[Dict[str, str]]],
+        temperature: float = 0,
+        **kwargs
+    ) -> BatchResult:
+        """
+        invoke_many 的异步版本，并发数受 max_concurrency 限制。
+
+        Args:
+            messages_list: 多组对话消息列表
+            temperature: 温度参数，控制回复的随机性，默认为0(最确定性)
+            **kwargs: 其他参数（为了兼容性，当前会被忽略）
+
+        Returns:
+            BatchResult，结果顺序与输入一致，失败的条目携带异常而非None
+        """
+        async def run_one(index: int, messages: List[Dict[str, str]]) -> BatchItemResult:
+            start = time.perf_counter()
+            try:
+                collected_content = [content async for content in self._ashared_stream(messages, temperature)]
+                return BatchItemResult(index, content="".join(collected_content), latency=time.perf_counter() - start)
+            except Exception as e:
+                return BatchItemResult(index, error=e, latency=time.perf_counter() - start)
+
+        start = time.perf_counter()
+        items = await asyncio.gather(*(run_one(i, m) for i, m in enumerate(messages_list)))
+        return BatchResult(items=list(items), wall_time=time.perf_counter() - start)
+
+    async def _astream_raw(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        extra: Optional[Dict[str, Any]] = None,
+        tool_calls: Optional[ToolCallAccumulator] = None
+    ) -> AsyncIterator[str]:
+        """
+        在信号量保护下发起异步流式请求，带熔断与重试，异常直接向上抛出。
+        退避等待期间不占用信号量。携带 extra 参数(如 tools)的请求不使用响应缓存，
+        工具调用增量拼接到 tool_calls 中，每次重试前清空。
+        """
+        cache_key, cached = (None, None) if extra else self._cache_lookup(messages, temperature)
+        if cached is not None:
+            for content in cached:
+                yield content
+            return
+
+        collected_content = []
+        attempt = 0
+        while True:
+            probe = self.circuit_breaker is not None and self.circuit_breaker.before_call()
+            resolved = False
+            if tool_calls is not None:
+                tool_calls.reset()
+            try:
+                try:
+                    async with self._get_async_semaphore():
+                        client = self.async_client
+                        stats = _CallStats(tool_calls)
+                        try:
+                            response = await client.chat.completions.create(
+                                **self._request_params(messages, temperature, extra)
+                            )
+                            async for chunk in response:
+                                content = stats.consume(chunk)
+                                if content:
+                                    collected_content.append(content)
+                                    yield content
+                            stats.status = "ok"
+                        except GeneratorExit:
+                            stats.status = "cancelled"
+                            raise
+                        finally:
+                            self._record_call(stats)
+                except Exception as e:
+                    if self.circuit_breaker is not None:
+                        self.circuit_breaker.record_failure()
+                    resolved = True
+                    if collected_content or not self.retry_policy.should_retry(attempt, e):
+                        raise
+                    delay = self.retry_policy.compute_delay(attempt, e)
+                    self._emit(
+                        EventType.MESSAGE, f"⚠️ 异步调用LLM API失败({e})，{delay:.2f} 秒后进行第 {attempt + 1} 次重试...",
+                        EventLevel.WARNING, error=repr(e), attempt=attempt + 1, delay=delay
+                    )
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                resolved = True
+            finally:
+                # 调用方提前关闭流或任务被取消时归还试探名额
+                if probe and not resolved:
+                    self.circuit_breaker.release()
+            break
+
+        self._cache_store(cache_key, collected_content)
+
+    async def aclose(self) -> None:
+        """关闭异步客户端，释放连接池"""
+        if self._async_client is not None and self._async_loop is asyncio.get_running_loop():
+            await self._async_client.close()
+        self._async_client = None
+        self._async_semaphore = None
+        self._async_loop = None
+
+
+class _CallStats:
+    """单次流式调用的统计信息"""
+
+    __slots__ = ("start", "ttft", "chunks", "usage", "status", "tool_calls")
+
+    def __init__(self, tool_calls: Optional[ToolCallAccumulator] = None):
+        self.start = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.chunks = 0
+        self.usage = None
+        self.status = "error"
+        self.tool_calls = tool_calls
+
+    def consume(self, chunk) -> str:
+        """处理一个流式数据块，返回其中的文本内容；工具调用增量拼接到 tool_calls 中"""
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self.usage = usage
+        if not chunk.choices:
+            return ""
+        choice = chunk.choices[0]
+        if self.tool_calls is not None:
+            deltas = getattr(choice.delta, "tool_calls", None)
+            if deltas:
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - self.start
+                self.tool_calls.add(deltas)
+            if getattr(choice, "finish_reason", None):
+                self.tool_calls.finish_reason = choice.finish_reason
+        content = choice.delta.content or ""
+        if content:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self.start
+            self.chunks += 1
+        return content
@@ -0,0 +1,29 @@
+"""包级别的延迟导入"""
+import importlib
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    为包生成模块级 __getattr__ / __dir__，首次访问某个名称时才导入其所在的子模块。
+
+    Args:
+        package: 包名，通常传入 __name__
+        exports: 公开名称到相对子模块路径的映射，例如 {"GoAgentLLM": ".go_agent_llm"}
+
+    Returns:
+        (__getattr__, __dir__)
+    """
+    def __getattr__(name: str) -> Any:
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module_name, package), name)
+        # 写回包的命名空间，之后的访问不再经过 __getattr__
+        setattr(importlib.import_module(package), name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(importlib.import_module(package))) | set(exports))
+
+    return __getattr__, __dir__
@@ -1,33 +1,188 @@
 """消息系统"""
-from typing import Optional, Dict, Any, Literal
+import json
+import time
+from array import array
 from datetime import datetime
-from pydantic import BaseModel
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Literal, Union
 
 # 定义消息角色的类型，限制其取值
 MessageRole = Literal["user", "assistant", "system", "tool"]
 
-class Message(BaseModel):
-    """消息类"""
-    
-    content: str
-    role: MessageRole
-    timestamp: datetime = None
-    metadata: Optional[Dict[str, Any]] = None
-    
+_ROLES = ("user", "assistant", "system", "tool")
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+
+
+class Message:
+    """
+    消息类。
+    使用 __slots__ 存储，时间戳以浮点数记录，只在访问 timestamp 时才转换为 datetime；
+    metadata 在首次访问时才创建。OpenAI 格式的字典在首次转换后缓存复用。
+    """
+
+    __slots__ = ("content", "role", "_timestamp", "_metadata", "_dict")
+
     def __init__(self, content: str, role: MessageRole, **kwargs):
-        super().__init__(
-            content=content,
-            role=role,
-            timestamp=kwargs.get('timestamp', datetime.now()),
-            metadata=kwargs.get('metadata', {})
-        )
-    
+        if role not in _ROLE_CODES:
+            raise ValueError(f"未知的消息角色: {role}")
+        self.content = content
+        self.role = role
+        timestamp = kwargs.get("timestamp")
+        self._timestamp: Union[float, datetime] = time.time() if timestamp is None else timestamp
+        self._metadata: Optional[Dict[str, Any]] = kwargs.get("metadata")
+        self._dict: Optional[Dict[str, Any]] = None
+
+    @property
+    def timestamp(self) -> datetime:
+        if not isinstance(self._timestamp, datetime):
+            self._timestamp = datetime.fromtimestamp(self._timestamp)
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, value: datetime) -> None:
+        self._timestamp = value
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value: Optional[Dict[str, Any]]) -> None:
+        self._metadata = value
+
     def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式（OpenAI API格式）"""
-        return {
-            "role": self.role,
-            "content": self.content
-        }
-    
+        """
+        转换为字典格式（OpenAI API格式）。
+        返回的字典会被缓存复用，调用方不应修改它。
+        """
+        cached = self._dict
+        if cached is None or cached["content"] is not self.content or cached["role"] is not self.role:
+            cached = self._dict = {"role": self.role, "content": self.content}
+        return cached
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Message):
+            return NotImplemented
+        return (
+            self.content == other.content
+            and self.role == other.role
+            and self.timestamp == other.timestamp
+            and (self._metadata or {}) == (other._metadata or {})
+        )
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content!r})"
+
     def __str__(self) -> str:
         return f"[{self.role}] {self.content}"
+
+
+class MessageStore:
+    """
+    按列存储的大量消息。
+    角色与时间戳存放在紧凑的 array 中，内容为字符串列表，metadata 只为有元数据的消息稀疏保存；
+    按下标访问时才构造 Message 对象。OpenAI 格式的消息列表在需要时增量构建并缓存。
+    """
+
+    def __init__(self, messages: Optional[Iterable[Message]] = None):
+        """
+        Args:
+            messages: 初始消息
+        """
+        self._roles = array("B")
+        self._timestamps = array("d")
+        self._contents: List[str] = []
+        self._metadata: Dict[int, Dict[str, Any]] = {}
+        self._openai: List[Dict[str, Any]] = []
+        if messages is not None:
+            self.extend(messages)
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    def append(
+        self,
+        content: str,
+        role: MessageRole,
+        timestamp: Optional[float] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """
+        追加一条消息。
+
+        Args:
+            content: 消息内容
+            role: 消息角色
+            timestamp: Unix 时间戳，默认为当前时间
+            metadata: 元数据
+
+        Returns:
+            消息的下标
+        """
+        index = len(self._contents)
+        self._roles.append(_ROLE_CODES[role])
+        self._timestamps.append(time.time() if timestamp is None else timestamp)
+        self._contents.append(content)
+        if metadata:
+            self._metadata[index] = metadata
+        return index
+
+    def add(self, message: Message) -> int:
+        """追加一个 Message 对象"""
+        timestamp = message._timestamp
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        return self.append(message.content, message.role, timestamp, message._metadata)
+
+    def extend(self, messages: Iterable[Message]) -> None:
+        for message in messages:
+            self.add(message)
+
+    def __getitem__(self, index: int) -> Message:
+        if index < 0:
+            index += len(self._contents)
+        if not 0 <= index < len(self._contents):
+            raise IndexError("消息下标超出范围")
+        return Message(
+            self._contents[index],
+            _ROLES[self._roles[index]],
+            timestamp=self._timestamps[index],
+            metadata=self._metadata.get(index),
+        )
+
+    def __iter__(self) -> Iterator[Message]:
+        return (self[i] for i in range(len(self._contents)))
+
+    def to_openai(self) -> List[Dict[str, Any]]:
+        """
+        OpenAI 格式的消息列表。
+        列表被缓存并只为新追加的消息增量构建，返回的是内部列表本身，调用方不应修改它。
+        """
+        openai = self._openai
+        roles, contents = self._roles, self._contents
+        for i in range(len(openai), len(contents)):
+            openai.append({"role": _ROLES[roles[i]], "content": contents[i]})
+        return openai
+
+    def dumps(self) -> str:
+        """按列序列化为 JSON 字符串"""
+        return json.dumps({
+            "roles": self._roles.tobytes().decode("latin-1"),
+            "timestamps": self._timestamps.tolist(),
+            "contents": self._contents,
+            "metadata": {str(i): m for i, m in self._metadata.items()},
+        }, ensure_ascii=False, default=str)
+
+    @classmethod
+    def loads(cls, data: str) -> "MessageStore":
+        """从 dumps 的结果恢复"""
+        raw = json.loads(data)
+        store = cls()
+        store._roles.frombytes(raw["roles"].encode("latin-1"))
+        store._timestamps.fromlist(raw["timestamps"])
+        store._contents = raw["contents"]
+        store._metadata = {int(i): m for i, m in raw["metadata"].items()}
+        if not len(store._roles) == len(store._timestamps) == len(store._contents):
+            raise ValueError("消息数据的各列长度不一致")
+        return store
@@ -0,0 +1,325 @@
+"""
+指标采集
+
+提供进程内可查询的计数器、仪表盘与直方图，并支持导出为 Prometheus 文本格式或 JSON。
+LLM 调用、工具调用与 Agent 步骤的耗时和 token 用量都记录在默认注册表中。
+"""
+import json
+import math
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认的耗时分桶(秒)
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = []
+    for k, v in pairs:
+        v = v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """单调递增的计数器"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def total(self) -> float:
+        """所有标签组合的合计"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def _samples(self) -> List[Tuple[LabelKey, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def to_prometheus(self) -> List[str]:
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in self._samples()]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": self.type_name,
+            "help": self.help,
+            "series": [{"labels": dict(k), "value": v} for k, v in self._samples()],
+        }
+
+
+class Gauge(Counter):
+    """可增可减的仪表盘"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class _HistogramSeries:
+    __slots__ = ("bucket_counts", "count", "sum", "recent")
+
+    def __init__(self, n_buckets: int, reservoir_size: int):
+        self.bucket_counts = [0] * n_buckets
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=reservoir_size)
+
+
+class Histogram:
+    """
+    直方图。
+    除了用于导出的固定分桶外，每个标签组合还保留最近的样本，用于进程内计算 p50/p99 等分位数。
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str = "",
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        reservoir_size: int = 2048
+    ):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.reservoir_size = reservoir_size
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets), self.reservoir_size)
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series.bucket_counts[index] += 1
+            series.count += 1
+            series.sum += value
+            series.recent.append(value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """以上下文管理器的方式记录代码块耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """
+        基于最近样本计算分位数。
+
+        Args:
+            q: 分位数，取值 0~1，例如 0.99
+            **labels: 标签；不传时合并所有标签组合的样本
+
+        Returns:
+            分位数值，无样本时返回None
+        """
+        with self._lock:
+            if labels:
+                series = self._series.get(_label_key(labels))
+                samples = list(series.recent) if series else []
+            else:
+                samples = [v for s in self._series.values() for v in s.recent]
+        if not samples:
+            return None
+        samples.sort()
+        rank = max(1, math.ceil(q * len(samples)))
+        return samples[rank - 1]
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return series.count if series else 0
+
+    def sum(self, **labels) -> float:
+        series = self._series.get(_label_key(labels))
+        return series.sum if series else 0.0
+
+    def to_prometheus(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(k, list(s.bucket_counts), s.count, s.sum) for k, s in self._series.items()]
+        for key, bucket_counts, count, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, bucket_counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = list(self._series.keys())
+        series = []
+        for key in keys:
+            labels = dict(key)
+            series.append({
+                "labels": labels,
+                "count": self.count(**labels),
+                "sum": self.sum(**labels),
+                "p50": self.quantile(0.5, **labels),
+                "p90": self.quantile(0.9, **labels),
+                "p99": self.quantile(0.99, **labels),
+            })
+        return {"type": self.type_name, "help": self.help, "buckets": list(self.buckets), "series": series}
+
+
+class MetricsRegistry:
+    """指标注册表，按名称获取或创建指标"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"指标 '{name}' 已注册为 {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get_or_create(Counter, name, help=help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, help=help)
+
+    def histogram(self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help=help, buckets=buckets)
+
+    def get(self, name: str):
+        """按名称获取已注册的指标，不存在时返回None"""
+        return self._metrics.get(name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.to_prometheus())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.to_dict() for metric in metrics}
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        """导出为 JSON"""
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent)
+
+
+_default_registry = MetricsRegistry()
+
+# 当前正在运行的 Agent 名称，用于把 LLM token 用量归属到具体的 Agent
+current_agent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_agent", default=None)
+
+
+def get_registry() -> MetricsRegistry:
+    """获取默认的指标注册表"""
+    return _default_registry
+
+
+def record_llm_call(
+    registry: MetricsRegistry,
+    model: str,
+    status: str,
+    duration: float,
+    ttft: Optional[float] = None,
+    chunks: int = 0,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    cached_tokens: Optional[int] = None
+) -> None:
+    """
+    记录一次 LLM 调用的耗时、分块数与 token 用量。
+    cached_tokens 为服务端前缀缓存命中的提示词 token 数，与 prompt 类型的用量相除即为前缀缓存命中率。
+    """
+    registry.counter("goagent_llm_requests_total", "LLM 请求次数").inc(model=model, status=status)
+    registry.histogram("goagent_llm_duration_seconds", "LLM 请求总耗时").observe(duration, model=model)
+    if ttft is not None:
+        registry.histogram("goagent_llm_ttft_seconds", "LLM 首个数据块耗时").observe(ttft, model=model)
+    if status != "ok":
+        return
+
+    registry.histogram(
+        "goagent_llm_chunks", "每次 LLM 响应的数据块数",
+        buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+    ).observe(chunks, model=model)
+
+    tokens = registry.counter("goagent_llm_tokens_total", "LLM token 用量")
+    if prompt_tokens is not None:
+        tokens.inc(prompt_tokens, model=model, type="prompt")
+    if cached_tokens is not None:
+        tokens.inc(cached_tokens, model=model, type="cached_prompt")
+    if completion_tokens is not None:
+        tokens.inc(completion_tokens, model=model, type="completion")
+        if ttft is not None and duration > ttft:
+            registry.histogram(
+                "goagent_llm_tokens_per_second", "LLM 生成速度(首个数据块之后)",
+                buckets=(1, 5, 10, 20, 40, 80, 160, 320)
+            ).observe(completion_tokens / (duration - ttft), model=model)
+
+    agent = current_agent.get()
+    if agent is not None:
+        agent_tokens = registry.counter("goagent_agent_tokens_total", "各 Agent 消耗的 token")
+        if prompt_tokens is not None:
+            agent_tokens.inc(prompt_tokens, agent=agent, type="prompt")
+        if completion_tokens is not None:
+            agent_tokens.inc(completion_tokens, agent=agent, type="completion")
@@ -0,0 +1,288 @@
+"""重试、熔断、对冲请求与限速"""
+import asyncio
+import math
+import time
+import random
+import threading
+from collections import deque
+from typing import Deque, Optional, Tuple, Type
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态时快速失败抛出的异常"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"熔断器已打开，服务暂不可用，约 {retry_in:.1f} 秒后重试")
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """
+    带抖动的指数退避重试策略。
+    对于携带 Retry-After 响应头的错误，优先使用服务端给出的等待时间。
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        jitter: bool = True,
+        retry_on_status: Tuple[int, ...] = (408, 409, 429, 500, 502, 503, 504),
+        retry_on_exceptions: Optional[Tuple[Type[BaseException], ...]] = None
+    ):
+        """
+        Args:
+            max_retries: 最大重试次数（不含首次请求）
+            base_delay: 首次重试的基础等待时间(秒)
+            max_delay: 单次等待时间上限(秒)
+            jitter: 是否使用全抖动(在 0~退避时间 之间随机取值)
+            retry_on_status: 允许重试的HTTP状态码
+            retry_on_exceptions: 允许重试的异常类型，默认为连接错误与超时(含 openai.APIConnectionError)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_on_status = retry_on_status
+        self._retry_on_exceptions = retry_on_exceptions
+
+    @property
+    def retry_on_exceptions(self) -> Tuple[Type[BaseException], ...]:
+        # 首次判断时才导入 openai，避免导入本模块时加载 SDK
+        if self._retry_on_exceptions is None:
+            from openai import APIConnectionError
+            self._retry_on_exceptions = (APIConnectionError, ConnectionError, TimeoutError)
+        return self._retry_on_exceptions
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        """判断异常是否值得重试"""
+        if isinstance(exc, CircuitOpenError):
+            return False
+        status = getattr(exc, "status_code", None)
+        if status is not None:
+            return status in self.retry_on_status
+        return isinstance(exc, self.retry_on_exceptions)
+
+    def should_retry(self, attempt: int, exc: BaseException) -> bool:
+        """
+        Args:
+            attempt: 已经重试的次数，首次失败时为0
+            exc: 本次失败的异常
+        """
+        return attempt < self.max_retries and self.is_retryable(exc)
+
+    def compute_delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        """计算第 attempt 次重试前的等待时间"""
+        retry_after = self.get_retry_after(exc) if exc is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+    @staticmethod
+    def get_retry_after(exc: BaseException) -> Optional[float]:
+        """从异常携带的HTTP响应中解析 Retry-After（支持秒数、HTTP日期和 retry-after-ms）"""
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+
+        value = headers.get("retry-after-ms")
+        if value:
+            try:
+                return max(float(value) / 1000, 0.0)
+            except ValueError:
+                pass
+
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitBreaker:
+    """
+    熔断器。
+    连续失败达到阈值后打开，在恢复时间内所有请求快速失败；
+    恢复时间过后进入半开状态，放行少量试探请求，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        """
+        Args:
+            failure_threshold: 打开熔断器所需的连续失败次数
+            recovery_timeout: 打开后进入半开状态前的等待时间(秒)
+            half_open_max_calls: 半开状态下允许同时进行的试探请求数
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+    def before_call(self) -> bool:
+        """
+        请求发出前调用，熔断器打开时抛出 CircuitOpenError。
+
+        Returns:
+            是否占用了半开状态下的试探名额；占用名额的请求结束时必须调用 record_success / record_failure，
+            既未成功也未失败(如调用方提前关闭流、被对冲请求取消)时调用 release 归还名额
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == self.OPEN:
+                raise CircuitOpenError(self.recovery_timeout - (time.monotonic() - self._opened_at))
+            if self._state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(0.0)
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def release(self) -> None:
+        """归还试探名额而不改变状态，用于没有结论的试探请求"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+            self._half_open_calls = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+
+class HedgePolicy:
+    """
+    对冲请求策略。
+    记录近期成功请求的耗时，当一次请求超过该分布的分位数(默认p95)仍未完成时，
+    再发出一个相同的请求，取先完成者的结果。
+    """
+
+    def __init__(
+        self,
+        quantile: float = 95,
+        min_delay: float = 0.05,
+        max_delay: float = 30.0,
+        window: int = 200,
+        min_samples: int = 20,
+        initial_delay: Optional[float] = None
+    ):
+        """
+        Args:
+            quantile: 触发对冲的耗时分位数(0~100)
+            min_delay: 对冲等待时间下限(秒)
+            max_delay: 对冲等待时间上限(秒)
+            window: 用于估计分位数的近期样本数
+            min_samples: 样本不足时不发对冲请求（除非指定 initial_delay）
+            initial_delay: 样本不足时使用的固定对冲等待时间(秒)
+        """
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """记录一次成功请求的耗时"""
+        with self._lock:
+            self._samples.append(latency)
+
+    def mark_sent(self, won: bool = False) -> None:
+        """统计对冲请求的发送次数与胜出次数"""
+        with self._lock:
+            if won:
+                self.hedges_won += 1
+            else:
+                self.hedges_sent += 1
+
+    def get_delay(self) -> Optional[float]:
+        """当前的对冲等待时间，None 表示暂不对冲"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        rank = max(1, math.ceil(self.quantile / 100 * len(samples)))
+        return min(max(samples[rank - 1], self.min_delay), self.max_delay)
+
+
+class RateLimiter:
+    """
+    令牌桶限速器，同时支持同步与异步调用方。
+    令牌不足时预约下一个令牌并等待，因此并发的调用方按到达顺序依次放行。
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """
+        Args:
+            rate: 每秒放行的请求数
+            burst: 桶容量，即空闲之后允许的突发请求数，默认与 rate 相同(至少为1)
+        """
+        if rate <= 0:
+            raise ValueError("rate 必须大于0")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(int(rate), 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """取一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """同步等待直到放行"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        """异步等待直到放行"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
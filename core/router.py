@@ -0,0 +1,425 @@
+"""
+多节点路由
+
+RouterLLM 与 GoAgentLLM 接口一致，将请求分发到多个兼容 OpenAI 接口的服务节点上。
+支持按在途请求数最少或按延迟加权选择节点，连续失败的节点会被暂时摘除，
+每个节点可以单独限制并发数。
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from .go_agent_llm import GoAgentLLM, _CallStats
+from .tool_calls import ToolCallAccumulator
+from .resilience import RetryPolicy
+from .events import EventLevel, EventType
+from .env import ensure_env
+
+EndpointSpec = Union[str, Dict, GoAgentLLM, "Endpoint"]
+
+
+class Endpoint:
+    """路由器中的一个上游服务节点"""
+
+    def __init__(self, llm: GoAgentLLM, max_concurrency: Optional[int] = None, name: Optional[str] = None):
+        """
+        Args:
+            llm: 该节点的客户端
+            max_concurrency: 该节点的最大在途请求数，默认与客户端的 max_concurrency 一致
+            name: 节点名称，用于指标标签，默认为服务地址
+        """
+        self.llm = llm
+        self.name = name or llm.base_url
+        self.max_concurrency = max_concurrency or llm.max_concurrency
+        self.outstanding = 0
+        self.latency: Optional[float] = None  # 首个数据块耗时的指数加权平均
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def has_capacity(self) -> bool:
+        return self.outstanding < self.max_concurrency
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.name!r}, outstanding={self.outstanding}, latency={self.latency})"
+
+
+def _endpoint_url(spec: EndpointSpec) -> str:
+    if isinstance(spec, Endpoint):
+        return spec.llm.base_url
+    if isinstance(spec, GoAgentLLM):
+        return spec.base_url
+    if isinstance(spec, dict):
+        return spec["base_url"]
+    return spec
+
+
+class RouterLLM(GoAgentLLM):
+    """
+    多节点路由客户端。
+    invoke / stream_invoke / ainvoke / astream / invoke_many 等接口与 GoAgentLLM 相同，
+    缓存、熔断、对冲与指标的行为也保持一致，区别在于每次请求都会选择一个节点发出。
+    请求失败且可重试时优先立即换到其他尚未尝试过的节点，所有节点都试过后才按退避时间等待。
+    """
+
+    LEAST_OUTSTANDING = "least_outstanding"
+    LATENCY = "latency"
+
+    def __init__(
+        self,
+        endpoints: Optional[List[EndpointSpec]] = None,
+        model: str = None,
+        api_key: str = None,
+        strategy: str = LEAST_OUTSTANDING,
+        max_concurrency_per_endpoint: Optional[int] = None,
+        failure_threshold: int = 3,
+        ejection_time: float = 30.0,
+        max_ejection_time: float = 300.0,
+        latency_decay: float = 0.3,
+        **kwargs
+    ):
+        """
+        Args:
+            endpoints: 节点列表，每项可以是服务地址、参数字典(base_url / api_key / model / max_concurrency)、
+                GoAgentLLM 或 Endpoint；默认从环境变量LLM_BASE_URLS(逗号分隔)获取
+            model: 模型ID，默认从环境变量LLM_MODEL_ID获取
+            api_key: API密钥，默认从环境变量LLM_API_KEY获取
+            strategy: 负载均衡策略，"least_outstanding" 选择在途请求占比最低的节点，
+                "latency" 选择 (在途请求数+1) × 平均首块延迟 最小的节点
+            max_concurrency_per_endpoint: 每个节点的默认最大在途请求数，默认从环境变量LLM_MAX_CONCURRENCY获取
+            failure_threshold: 连续失败多少次后摘除节点
+            ejection_time: 首次摘除的时长(秒)，同一节点再次被摘除时加倍
+            max_ejection_time: 摘除时长上限(秒)
+            latency_decay: 延迟指数加权平均的衰减系数，越大越看重最近的样本
+            **kwargs: 其他参数(cache / retry_policy / circuit_breaker / hedge_policy / metrics / event_sink 等)，
+                含义与 GoAgentLLM 相同
+        """
+        if strategy not in (self.LEAST_OUTSTANDING, self.LATENCY):
+            raise ValueError(f"未知的负载均衡策略: {strategy}")
+        ensure_env()
+        if endpoints is None:
+            endpoints = [url.strip() for url in os.getenv("LLM_BASE_URLS", "").split(",") if url.strip()]
+        if not endpoints:
+            raise ValueError("至少需要一个服务节点，请传入 endpoints 或在.env文件中定义LLM_BASE_URLS。")
+
+        model = model or os.getenv("LLM_MODEL_ID")
+        api_key = api_key or os.getenv("LLM_API_KEY")
+        self.max_concurrency_per_endpoint = max_concurrency_per_endpoint or int(os.getenv("LLM_MAX_CONCURRENCY", 64))
+        # 路由器自身不直接发出请求，base_url 仅用于满足父类的校验
+        super().__init__(model=model, api_key=api_key, base_url=_endpoint_url(endpoints[0]), **kwargs)
+
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.latency_decay = latency_decay
+        self.endpoints: List[Endpoint] = [self._make_endpoint(spec) for spec in endpoints]
+        # 整体的并发上限为各节点上限之和
+        self.max_concurrency = sum(e.max_concurrency for e in self.endpoints)
+
+        self._cond = threading.Condition()
+        self._async_released: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = None
+
+    def _make_endpoint(self, spec: EndpointSpec) -> Endpoint:
+        """根据节点描述创建 Endpoint，节点客户端关闭自身的重试与缓存，由路由器统一处理"""
+        if isinstance(spec, Endpoint):
+            return spec
+        if isinstance(spec, GoAgentLLM):
+            return Endpoint(spec, min(spec.max_concurrency, self.max_concurrency_per_endpoint))
+        if isinstance(spec, str):
+            spec = {"base_url": spec}
+        max_concurrency = spec.get("max_concurrency") or self.max_concurrency_per_endpoint
+        llm = GoAgentLLM(
+            model=spec.get("model") or self.model,
+            api_key=spec.get("api_key") or self.api_key,
+            base_url=spec["base_url"],
+            timeout=spec.get("timeout") or self.timeout,
+            max_concurrency=max_concurrency,
+            retry_policy=RetryPolicy(max_retries=0),
+            metrics=self.metrics,
+            stream_usage=spec.get("stream_usage", self.stream_usage),
+            event_sink=self.event_sink,
+            # 请求合并只在路由器一层进行(按 coalesce 参数)，节点客户端不再合并
+            coalesce=False,
+        )
+        return Endpoint(llm, max_concurrency, name=spec.get("name"))
+
+    def _score(self, endpoint: Endpoint) -> float:
+        if self.strategy == self.LATENCY:
+            known = [e.latency for e in self.endpoints if e.latency is not None]
+            # 尚无样本的节点按当前最快节点估算，保证新节点能分到流量(得分相同时 _pick 优先选择它)
+            latency = endpoint.latency if endpoint.latency is not None else (min(known) if known else 1.0)
+            return (endpoint.outstanding + 1) * latency
+        return endpoint.outstanding / endpoint.max_concurrency
+
+    def _pick(self, exclude: Set[Endpoint]) -> Optional[Endpoint]:
+        """
+        选择一个节点，调用方需持有 self._cond。
+        优先不重复已尝试过的节点；所有节点都被摘除时退化为在全部节点中选择，避免整体不可用。
+        """
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+        healthy = [e for e in candidates if not e.is_ejected(now)] or candidates
+        available = [e for e in healthy if e.has_capacity()]
+        if not available:
+            return None
+        return min(available, key=lambda e: (self._score(e), e.latency is not None, random.random()))
+
+    def _take(self, endpoint: Endpoint) -> Endpoint:
+        endpoint.outstanding += 1
+        self.metrics.gauge("goagent_router_outstanding", "各节点的在途请求数").set(
+            endpoint.outstanding, endpoint=endpoint.name
+        )
+        return endpoint
+
+    def _acquire(self, exclude: Set[Endpoint]) -> Endpoint:
+        """同步获取一个有空闲容量的节点，全部满载时阻塞等待"""
+        with self._cond:
+            while True:
+                endpoint = self._pick(exclude)
+                if endpoint is not None:
+                    return self._take(endpoint)
+                self._cond.wait()
+
+    async def _aacquire(self, exclude: Set[Endpoint]) -> Endpoint:
+        """异步获取一个有空闲容量的节点，全部满载时等待其他请求释放"""
+        self._bind_loop()
+        while True:
+            with self._cond:
+                endpoint = self._pick(exclude)
+                if endpoint is not None:
+                    return self._take(endpoint)
+                if self._async_released is None:
+                    self._async_released = (asyncio.get_running_loop(), asyncio.Event())
+                released = self._async_released[1]
+                released.clear()
+            await released.wait()
+
+    def _bind_loop(self) -> None:
+        """等待节点释放的事件同样绑定到事件循环，事件循环变化时一并重建"""
+        if self._async_loop is not asyncio.get_running_loop():
+            with self._cond:
+                self._async_released = None
+        super()._bind_loop()
+
+    def _release(self, endpoint: Endpoint) -> None:
+        """释放节点容量，并唤醒同步与异步的等待者；同步调用也可能在其他线程中释放，因此通过 call_soon_threadsafe 唤醒事件循环"""
+        with self._cond:
+            endpoint.outstanding -= 1
+            self.metrics.gauge("goagent_router_outstanding", "各节点的在途请求数").set(
+                endpoint.outstanding, endpoint=endpoint.name
+            )
+            self._cond.notify()
+            waiter = self._async_released
+        if waiter is not None:
+            loop, released = waiter
+            try:
+                loop.call_soon_threadsafe(released.set)
+            except RuntimeError:
+                # 事件循环已经关闭，不再有等待者
+                pass
+
+    def _record_success(self, endpoint: Endpoint, ttft: Optional[float]) -> None:
+        with self._cond:
+            endpoint.consecutive_failures = 0
+            endpoint.ejections = 0
+            if ttft is not None:
+                if endpoint.latency is None:
+                    endpoint.latency = ttft
+                else:
+                    endpoint.latency += self.latency_decay * (ttft - endpoint.latency)
+        self.metrics.counter("goagent_router_requests_total", "路由到各节点的请求数").inc(
+            endpoint=endpoint.name, status="ok"
+        )
+
+    def _record_failure(self, endpoint: Endpoint, exc: BaseException) -> None:
+        """记录一次失败；只有可重试的错误(连接错误、超时、5xx、429)才计入节点健康状况"""
+        self.metrics.counter("goagent_router_requests_total", "路由到各节点的请求数").inc(
+            endpoint=endpoint.name, status="error"
+        )
+        if not self.retry_policy.is_retryable(exc):
+            return
+        with self._cond:
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures < self.failure_threshold:
+                return
+            duration = min(self.ejection_time * (2 ** endpoint.ejections), self.max_ejection_time)
+            endpoint.ejections += 1
+            endpoint.consecutive_failures = 0
+            endpoint.ejected_until = time.monotonic() + duration
+        self.metrics.counter("goagent_router_ejections_total", "节点被摘除的次数").inc(endpoint=endpoint.name)
+        self._emit(
+            EventType.MESSAGE, f"⚠️ 节点 {endpoint.name} 连续失败，摘除 {duration:.0f} 秒",
+            EventLevel.WARNING, endpoint=endpoint.name, duration=duration
+        )
+
+    def _next_delay(self, attempt: int, exc: BaseException, tried: Set[Endpoint]) -> float:
+        """还有未尝试过的健康节点时立即切换，否则按重试策略退避"""
+        now = time.monotonic()
+        with self._cond:
+            untried = any(e not in tried and not e.is_ejected(now) for e in self.endpoints)
+        return 0.0 if untried else self.retry_policy.compute_delay(attempt, exc)
+
+    def _stream_resilient(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        cancel_event: Optional[threading.Event] = None,
+        extra: Optional[Dict[str, Any]] = None,
+        tool_calls: Optional[ToolCallAccumulator] = None
+    ) -> Iterator[str]:
+        """选择节点发起同步流式请求，失败时切换节点重试，只有在尚未产出任何数据块时才会重试"""
+        attempt = 0
+        tried: Set[Endpoint] = set()
+        while True:
+            probe = self.circuit_breaker is not None and self.circuit_breaker.before_call()
+            resolved = False
+            if tool_calls is not None:
+                tool_calls.reset()
+            try:
+                endpoint = self._acquire(tried)
+                tried.add(endpoint)
+                # 先创建客户端，首块延迟只包含请求本身的耗时
+                endpoint.llm.client
+                started = False
+                start = time.perf_counter()
+                ttft = None
+                try:
+                    for content in endpoint.llm._stream_raw(messages, temperature, cancel_event, extra, tool_calls):
+                        if not started:
+                            started = True
+                            ttft = time.perf_counter() - start
+                        yield content
+                except Exception as e:
+                    self._record_failure(endpoint, e)
+                    if self.circuit_breaker is not None:
+                        self.circuit_breaker.record_failure()
+                    resolved = True
+                    if started or not self.retry_policy.should_retry(attempt, e):
+                        raise
+                    delay = self._next_delay(attempt, e, tried)
+                    self._emit(
+                        EventType.MESSAGE, f"⚠️ 节点 {endpoint.name} 调用失败({e})，{delay:.2f} 秒后进行第 {attempt + 1} 次重试...",
+                        EventLevel.WARNING, error=repr(e), attempt=attempt + 1, delay=delay, endpoint=endpoint.name
+                    )
+                    if delay:
+                        time.sleep(delay)
+                    attempt += 1
+                    continue
+                finally:
+                    self._release(endpoint)
+
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                self._record_success(endpoint, ttft)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                resolved = True
+                if self.hedge_policy is not None:
+                    self.hedge_policy.record(time.perf_counter() - start)
+                return
+            finally:
+                # 调用方提前关闭流或被对冲请求取消时没有结论，归还试探名额，避免熔断器停留在半开状态
+                if probe and not resolved:
+                    self.circuit_breaker.release()
+
+    async def _astream_raw(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        extra: Optional[Dict[str, Any]] = None,
+        tool_calls: Optional[ToolCallAccumulator] = None
+    ) -> AsyncIterator[str]:
+        """
+        选择节点发起异步流式请求，失败时切换节点重试，异常直接向上抛出。
+        并发上限由各节点的容量控制，退避等待期间不占用节点容量。
+        """
+        cache_key, cached = (None, None) if extra else self._cache_lookup(messages, temperature)
+        if cached is not None:
+            for content in cached:
+                yield content
+            return
+
+        collected_content = []
+        attempt = 0
+        tried: Set[Endpoint] = set()
+        while True:
+            probe = self.circuit_breaker is not None and self.circuit_breaker.before_call()
+            resolved = False
+            if tool_calls is not None:
+                tool_calls.reset()
+            try:
+                endpoint = await self._aacquire(tried)
+                tried.add(endpoint)
+                llm = endpoint.llm
+                client = llm.async_client
+                stats = _CallStats(tool_calls)
+                try:
+                    try:
+                        response = await client.chat.completions.create(
+                            **llm._request_params(messages, temperature, extra)
+                        )
+                        async for chunk in response:
+                            content = stats.consume(chunk)
+                            if content:
+                                collected_content.append(content)
+                                yield content
+                        stats.status = "ok"
+                    except GeneratorExit:
+                        stats.status = "cancelled"
+                        raise
+                    finally:
+                        llm._record_call(stats)
+                        self._release(endpoint)
+                except Exception as e:
+                    self._record_failure(endpoint, e)
+                    if self.circuit_breaker is not None:
+                        self.circuit_breaker.record_failure()
+                    resolved = True
+                    if collected_content or not self.retry_policy.should_retry(attempt, e):
+                        raise
+                    delay = self._next_delay(attempt, e, tried)
+                    self._emit(
+                        EventType.MESSAGE, f"⚠️ 节点 {endpoint.name} 异步调用失败({e})，{delay:.2f} 秒后进行第 {attempt + 1} 次重试...",
+                        EventLevel.WARNING, error=repr(e), attempt=attempt + 1, delay=delay, endpoint=endpoint.name
+                    )
+                    if delay:
+                        await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self._record_success(endpoint, stats.ttft)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                resolved = True
+            finally:
+                # 调用方提前关闭流或任务被取消时归还试探名额
+                if probe and not resolved:
+                    self.circuit_breaker.release()
+            break
+
+        self._cache_store(cache_key, collected_content)
+
+    def stats(self) -> List[Dict]:
+        """各节点的当前状态"""
+        now = time.monotonic()
+        with self._cond:
+            return [{
+                "endpoint": e.name,
+                "outstanding": e.outstanding,
+                "max_concurrency": e.max_concurrency,
+                "latency": e.latency,
+                "ejected": e.is_ejected(now),
+                "ejections": e.ejections,
+            } for e in self.endpoints]
+
+    async def aclose(self) -> None:
+        """关闭所有节点的异步客户端"""
+        for endpoint in self.endpoints:
+            await endpoint.llm.aclose()
+        await super().aclose()
@@ -0,0 +1,228 @@
+"""
+会话持久化
+
+每个会话对应存储目录下以会话 id 命名的子目录：
+- journal.jsonl: 只追加写入的消息日志，每行一条消息
+- snapshot.json: 定期写入的快照，记录当时上下文窗口中保留的消息、摘要以及对应的日志位置
+
+恢复会话时读取快照，再通过内存映射只解析快照之后追加的日志，
+因此重新打开一个很长的会话只与最近的对话量有关。任何进程都可以按 id 打开会话继续对话，
+但同一时刻一个会话只应由一个进程写入。
+"""
+import os
+import re
+import json
+import mmap
+import time
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+from .message import Message
+
+if TYPE_CHECKING:
+    from .context import ContextWindow
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+def _encode(message: Message) -> bytes:
+    timestamp = message._timestamp
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.timestamp()
+    record: Dict[str, Any] = {"r": message.role, "c": message.content, "t": timestamp}
+    if message._metadata:
+        record["m"] = message._metadata
+    return (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def _decode(line: bytes) -> Message:
+    record = json.loads(line)
+    return Message(record["c"], record["r"], timestamp=record["t"], metadata=record.get("m"))
+
+
+class Session:
+    """一个会话的日志与快照"""
+
+    JOURNAL = "journal.jsonl"
+    SNAPSHOT = "snapshot.json"
+
+    def __init__(self, path: str, session_id: str, snapshot_every: int = 200, fsync: bool = False):
+        """
+        Args:
+            path: 会话目录
+            session_id: 会话 id
+            snapshot_every: 每追加多少条消息写入一次快照
+            fsync: 每次追加后是否调用 fsync，开启后更安全但更慢
+        """
+        self.id = session_id
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(path, exist_ok=True)
+        self._journal_path = os.path.join(path, self.JOURNAL)
+        self._snapshot_path = os.path.join(path, self.SNAPSHOT)
+        self._snapshot = self._read_snapshot()
+        self._repair()
+        self._fd = os.open(self._journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._since_snapshot = 0
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        try:
+            with open(self._snapshot_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"offset": 0, "count": 0, "summary": None, "messages": []}
+
+    def _repair(self) -> None:
+        """截掉进程崩溃时写了一半的最后一行"""
+        if not os.path.exists(self._journal_path):
+            return
+        with open(self._journal_path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[size - 1:size] == b"\n":
+                    return
+                end = mm.rfind(b"\n") + 1
+            f.truncate(end)
+
+    def append(self, message: Message) -> None:
+        """把一条消息追加到日志，整行通过一次 write 写入"""
+        os.write(self._fd, _encode(message))
+        if self.fsync:
+            os.fsync(self._fd)
+        self._since_snapshot += 1
+
+    def maybe_snapshot(self, window: "ContextWindow") -> bool:
+        """距上次快照追加的消息数达到 snapshot_every 时写入快照"""
+        if self._since_snapshot < self.snapshot_every:
+            return False
+        self.snapshot(window)
+        return True
+
+    def snapshot(self, window: "ContextWindow") -> None:
+        """
+        写入快照：记录上下文窗口中当前保留的消息与摘要，以及日志的当前位置。
+        先写临时文件再原子替换，崩溃时旧快照仍然完整。
+        """
+        offset = os.fstat(self._fd).st_size
+        snapshot = {
+            "offset": offset,
+            "count": len(self),
+            "summary": window.summary,
+            "messages": [json.loads(_encode(m)) for m in window],
+            "created": time.time(),
+        }
+        tmp = self._snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, default=str)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self._snapshot_path)
+        self._snapshot = snapshot
+        self._since_snapshot = 0
+
+    def _scan(self, start: int) -> Iterator[bytes]:
+        """通过内存映射从 start 开始逐行读取日志"""
+        with open(self._journal_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= start:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = start
+                while pos < size:
+                    end = mm.find(b"\n", pos)
+                    if end < 0:
+                        break
+                    yield mm[pos:end]
+                    pos = end + 1
+
+    def recent(self) -> List[Message]:
+        """快照中保留的消息加上快照之后追加的消息，用于恢复上下文窗口"""
+        messages = [Message(r["c"], r["r"], timestamp=r["t"], metadata=r.get("m")) for r in self._snapshot["messages"]]
+        messages.extend(_decode(line) for line in self._scan(self._snapshot["offset"]))
+        return messages
+
+    @property
+    def summary(self) -> Optional[str]:
+        """快照中记录的历史摘要"""
+        return self._snapshot.get("summary")
+
+    def __iter__(self) -> Iterator[Message]:
+        """按顺序惰性遍历完整的历史消息"""
+        return (_decode(line) for line in self._scan(0))
+
+    def __len__(self) -> int:
+        return self._snapshot["count"] + sum(1 for _ in self._scan(self._snapshot["offset"]))
+
+    def restore(self, window: "ContextWindow") -> None:
+        """用快照与之后的日志恢复上下文窗口，恢复过程不触发历史压缩"""
+        window.clear()
+        if self.summary:
+            window.set_summary(self.summary, [])
+        window.extend(self.recent())
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self) -> "Session":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SessionStore:
+    """按 id 管理会话，多个进程可以共享同一个存储目录"""
+
+    def __init__(self, root: str, snapshot_every: int = 200, fsync: bool = False):
+        """
+        Args:
+            root: 存储目录
+            snapshot_every: 每追加多少条消息写入一次快照
+            fsync: 每次追加后是否调用 fsync
+        """
+        self.root = root
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        if not _SESSION_ID_RE.match(session_id) or session_id in (".", ".."):
+            raise ValueError(f"非法的会话 id: {session_id}")
+        return os.path.join(self.root, session_id)
+
+    def open(self, session_id: Optional[str] = None) -> Session:
+        """
+        打开会话，不存在时创建。
+
+        Args:
+            session_id: 会话 id，为空时生成一个新的 id
+        """
+        session_id = session_id or uuid.uuid4().hex
+        return Session(self._path(session_id), session_id, self.snapshot_every, self.fsync)
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.exists(os.path.join(self._path(session_id), Session.JOURNAL))
+
+    def list(self) -> List[str]:
+        """所有会话的 id"""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, Session.JOURNAL))
+        )
+
+    def delete(self, session_id: str) -> bool:
+        """删除会话，会话不存在时返回False"""
+        path = self._path(session_id)
+        if not os.path.isdir(path):
+            return False
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
+        return True
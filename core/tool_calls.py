@@ -0,0 +1,121 @@
+"""原生函数调用(function calling)的数据结构，以及流式响应中工具调用增量的拼接"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def _field(obj: Any, name: str) -> Any:
+    """同时支持 SDK 对象与字典形式的增量"""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+@dataclass
+class ToolCall:
+    """模型发起的一次工具调用，arguments 为模型生成的 JSON 字符串"""
+
+    id: str
+    name: str
+    arguments: str = ""
+
+    def parse_arguments(self) -> Dict[str, Any]:
+        """
+        解析调用参数。
+
+        Raises:
+            ValueError: 参数不是合法的 JSON 对象
+        """
+        if not self.arguments.strip():
+            return {}
+        parsed = json.loads(self.arguments)
+        if not isinstance(parsed, dict):
+            raise ValueError(f"工具参数必须是 JSON 对象: {self.arguments}")
+        return parsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为 OpenAI 消息中 tool_calls 的条目格式"""
+        return {"id": self.id, "type": "function", "function": {"name": self.name, "arguments": self.arguments}}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ToolCall":
+        function = data.get("function") or {}
+        return cls(id=data.get("id", ""), name=function.get("name", ""), arguments=function.get("arguments") or "")
+
+
+@dataclass
+class AssistantTurn:
+    """一次带工具定义的模型调用结果: 文本内容与工具调用"""
+
+    content: str = ""
+    tool_calls: List[ToolCall] = field(default_factory=list)
+    finish_reason: Optional[str] = None
+
+    def to_message(self) -> Dict[str, Any]:
+        """转换为追加到对话中的 assistant 消息"""
+        message: Dict[str, Any] = {"role": "assistant", "content": self.content or None}
+        if self.tool_calls:
+            message["tool_calls"] = [call.to_dict() for call in self.tool_calls]
+        return message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "content": self.content,
+            "tool_calls": [call.to_dict() for call in self.tool_calls],
+            "finish_reason": self.finish_reason,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AssistantTurn":
+        return cls(
+            content=data.get("content") or "",
+            tool_calls=[ToolCall.from_dict(c) for c in data.get("tool_calls") or []],
+            finish_reason=data.get("finish_reason"),
+        )
+
+
+class ToolCallAccumulator:
+    """
+    按 index 拼接流式响应中的工具调用增量。
+    首个增量携带 id 与函数名，之后的增量只携带参数片段。
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, Dict[str, Any]] = {}
+        self.finish_reason: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def reset(self) -> None:
+        """丢弃已拼接的内容，重试前调用"""
+        self._calls.clear()
+        self.finish_reason = None
+
+    def add(self, deltas: Iterable[Any]) -> None:
+        """处理一个数据块中的工具调用增量列表"""
+        for delta in deltas:
+            index = _field(delta, "index")
+            if index is None:
+                index = len(self._calls)
+            entry = self._calls.setdefault(index, {"id": "", "name": "", "arguments": []})
+            call_id = _field(delta, "id")
+            if call_id:
+                entry["id"] = call_id
+            function = _field(delta, "function")
+            if function is None:
+                continue
+            name = _field(function, "name")
+            # 部分服务在每个增量中重复函数名，只取第一次出现的
+            if name and not entry["name"]:
+                entry["name"] = name
+            arguments = _field(function, "arguments")
+            if arguments:
+                entry["arguments"].append(arguments)
+
+    def calls(self) -> List[ToolCall]:
+        """按 index 顺序返回拼接完成的工具调用"""
+        return [
+            ToolCall(id=entry["id"] or f"call_{index}", name=entry["name"], arguments="".join(entry["arguments"]))
+            for index, entry in sorted(self._calls.items())
+        ]
@@ -0,0 +1,113 @@
+"""
+Agent 离线基准测试
+
+先用真实的 LLM 与 SerpApi 录制一次 cassette，之后即可在无网络、无密钥的环境下
+确定性地重放 ReActAgent / ReflectionAgent / PlanAndSolveAgent 的完整运行并测量框架开销。
+
+用法:
+    # 录制(需要 .env 中的 LLM 与 SerpApi 配置)
+    python test/bench_agents.py --record --cassette test/cassettes/agents.jsonl
+
+    # 进程内回放，只测量框架自身的开销
+    python test/bench_agents.py --cassette test/cassettes/agents.jsonl --rounds 20
+
+    # 通过本地伪 OpenAI 服务按录制时的节奏回放，包含网络与流式解析的开销
+    python test/bench_agents.py --cassette test/cassettes/agents.jsonl --server --pacing recorded --speed 10
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+from core import GoAgentLLM, get_registry
+from core.cassette import Cassette
+from fake_openai_server import FakeOpenAIServer
+
+
+QUESTIONS = {
+    "react": "英伟达最新发布的显卡型号是什么？",
+    "reflection": "编写一个Python函数，找出1到n之间所有的素数。",
+    "plan_and_solve": "一个水果店周一卖出了15个苹果。周二卖出的苹果是周一的两倍。周三卖出的数量比周二少了5个。三天总共卖出了多少个苹果？",
+}
+
+
+def build_agents(llm: GoAgentLLM, cassette: Cassette):
+    from tools import ToolExecutor, SearchTool
+    from agents import ReActAgent, ReflectionAgent, PlanAndSolveAgent
+
+    tool_executor = ToolExecutor()
+    tool_executor.register_tool(SearchTool(cassette=cassette))
+    return {
+        "react": lambda: ReActAgent(llm_client=llm, tool_executor=tool_executor, max_steps=5),
+        "reflection": lambda: ReflectionAgent(llm_client=llm, max_iterations=2),
+        "plan_and_solve": lambda: PlanAndSolveAgent(llm_client=llm),
+    }
+
+
+def run_round(factories) -> dict:
+    timings = {}
+    for name, factory in factories.items():
+        agent = factory()
+        start = time.perf_counter()
+        agent.run(QUESTIONS[name])
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent 离线基准测试")
+    parser.add_argument("--cassette", default=os.path.join(os.path.dirname(__file__), "cassettes", "agents.jsonl"))
+    parser.add_argument("--record", action="store_true", help="使用真实服务重新录制")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--server", action="store_true", help="通过本地伪 OpenAI 服务回放")
+    parser.add_argument("--pacing", choices=["fixed", "recorded"], default="fixed")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.record:
+        cassette = Cassette(args.cassette, Cassette.RECORD)
+        llm = GoAgentLLM(cassette=cassette, coalesce=False)
+        run_round(build_agents(llm, cassette))
+        print(f"已录制 {len(cassette)} 次交互到 {args.cassette}")
+        return
+
+    if not os.path.exists(args.cassette):
+        print(f"cassette 文件不存在: {args.cassette}，请先使用 --record 录制")
+        sys.exit(1)
+
+    cassette = Cassette(args.cassette, Cassette.REPLAY)
+    server = None
+    model = next(e["request"]["model"] for e in cassette.entries("llm"))
+    if args.server:
+        server = FakeOpenAIServer(
+            cassette=cassette, pacing=args.pacing, speed=args.speed, latency=args.latency
+        ).start()
+        llm = GoAgentLLM(model=model, api_key="sk-fake", base_url=server.base_url, coalesce=False, stream_usage=False)
+    else:
+        llm = GoAgentLLM(model=model, cassette=cassette, coalesce=False)
+
+    try:
+        factories = build_agents(llm, cassette)
+        rounds = [run_round(factories) for _ in range(args.rounds)]
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"{'Agent':<16}{'最小(ms)':>12}{'平均(ms)':>12}{'最大(ms)':>12}")
+    for name in QUESTIONS:
+        samples = sorted(r[name] * 1000 for r in rounds)
+        print(f"{name:<16}{samples[0]:>12.1f}{sum(samples) / len(samples):>12.1f}{samples[-1]:>12.1f}")
+
+    requests = get_registry().get("goagent_llm_requests_total")
+    if requests is not None:
+        print(f"LLM 请求次数: {int(requests.total())}")
+    if server is not None and server.cassette_misses:
+        print(f"⚠️ 有 {server.cassette_misses} 个请求未在 cassette 中找到")
+
+
+if __name__ == "__main__":
+    main()
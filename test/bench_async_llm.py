@@ -0,0 +1,81 @@
+"""
+GoAgentLLM 同步 / 异步吞吐量基准测试
+
+在本地伪 OpenAI 服务上比较:
+- 同步 stream_invoke + 线程池
+- 异步 ainvoke + 共享连接池与并发上限
+- 批量 invoke_many
+
+用法:
+    python test/bench_async_llm.py --requests 500 --latency 0.2 --concurrency 200
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import GoAgentLLM
+from fake_openai_server import FakeOpenAIServer
+
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+def bench_threads(llm: GoAgentLLM, requests: int, workers: int) -> float:
+    def call(_):
+        return "".join(llm.stream_invoke(MESSAGES))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(call, range(requests)))
+    return time.perf_counter() - start
+
+
+async def bench_async(llm: GoAgentLLM, requests: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(llm.ainvoke(MESSAGES) for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await llm.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GoAgentLLM 吞吐量基准测试")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(latency=args.latency, chunk_delay=args.chunk_delay) as server:
+        llm = GoAgentLLM(
+            model="fake-model",
+            api_key="sk-fake",
+            base_url=server.base_url,
+            max_concurrency=args.concurrency,
+        )
+
+        print("=" * 60)
+        print(f"请求数: {args.requests}, 服务端延迟: {args.latency}s")
+        print("=" * 60)
+
+        elapsed = bench_threads(llm, args.requests, args.threads)
+        print(f"同步 + {args.threads} 线程: {elapsed:.2f}s, {args.requests / elapsed:.1f} req/s")
+
+        elapsed = asyncio.run(bench_async(llm, args.requests))
+        print(f"异步 (并发上限 {args.concurrency}): {elapsed:.2f}s, {args.requests / elapsed:.1f} req/s")
+
+        batch = llm.invoke_many([MESSAGES] * args.requests, max_workers=args.threads * 4)
+        summary = batch.summary()
+        print(f"invoke_many ({args.threads * 4} 线程): {summary['wall_time']:.2f}s, "
+              f"{summary['throughput']:.1f} req/s, p95 {summary['latency_p95'] * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+本地 BM25 检索基准测试
+
+生成指定篇数的中文合成语料，增量地写入磁盘索引，然后重新打开索引(倒排表通过 mmap 按需读取)，
+输出建索引耗时、索引大小以及查询延迟的 P50 / P95。
+
+用法:
+    python test/bench_local_search.py --docs 1000000 --queries 200
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import random
+import argparse
+import tempfile
+
+from tools.local_search import BM25Index
+
+# 按常见程度排列的汉字，靠前的字出现得更频繁
+CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所"
+    "民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日"
+    "那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想"
+)
+TOPICS = ["显卡", "报销", "年假", "驱动", "服务器", "数据库", "合同", "发票", "招聘", "预算"]
+
+
+def make_document(rng: random.Random, i: int) -> dict:
+    length = rng.randint(40, 160)
+    # 近似 Zipf 分布地抽取汉字
+    text = "".join(CHARS[min(int(rng.paretovariate(1.1)) - 1, len(CHARS) - 1)] for _ in range(length))
+    if rng.random() < 0.05:
+        position = rng.randint(0, length)
+        text = text[:position] + rng.choice(TOPICS) + text[position:]
+    return {"title": f"文档 {i}", "text": text, "link": f"corpus/{i}.md"}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100000, help="语料篇数")
+    parser.add_argument("--queries", type=int, default=100, help="查询次数")
+    parser.add_argument("--flush-every", type=int, default=50000, help="内存段写入磁盘的篇数")
+    parser.add_argument("--path", default=None, help="索引目录，默认使用临时目录")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path or tmp
+        start = time.perf_counter()
+        index = BM25Index(path, flush_every=args.flush_every)
+        index.add_many(make_document(rng, i) for i in range(args.docs))
+        index.close()
+        build = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        print(f"建索引: {args.docs} 篇, {build:.1f}s, 索引大小 {size / 1024 ** 2:.1f} MB")
+
+        start = time.perf_counter()
+        index = BM25Index(path)
+        print(f"打开索引: {(time.perf_counter() - start) * 1000:.1f} ms, {len(index._segments)} 个段")
+
+        queries = [
+            rng.choice(TOPICS) + rng.choice(["怎么办", "的流程", "相关规定", "问题", ""]) + rng.choice(CHARS[:40])
+            for _ in range(args.queries)
+        ]
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, k=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"查询: P50 {percentile(latencies, 0.5):.2f} ms, P95 {percentile(latencies, 0.95):.2f} ms")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+向量记忆检索基准测试
+
+向磁盘上的 VectorIndex 分批加入合成的聚类向量(按 IVF 阈值自动训练)，重新打开索引后
+输出单条查询延迟的 P50 / P95、批量查询的平均每条耗时，以及相对精确检索的 recall@10。
+
+用法:
+    python test/bench_memory.py --vectors 1000000 --dim 256 --nprobe 16
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from tools.memory import VectorIndex
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200000, help="向量条数")
+    parser.add_argument("--dim", type=int, default=256, help="向量维度")
+    parser.add_argument("--clusters", type=int, default=2000, help="合成数据的聚类数")
+    parser.add_argument("--nprobe", type=int, default=16, help="查询扫描的聚类数")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(args.clusters, args.dim)).astype(np.float32)
+
+    def sample(n):
+        return centers[rng.integers(args.clusters, size=n)] + 0.5 * rng.normal(size=(n, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        index = VectorIndex(args.dim, path=path, nprobe=args.nprobe)
+        for begin in range(0, args.vectors, 50000):
+            index.add(sample(min(50000, args.vectors - begin)))
+        index.flush()
+        print(f"写入: {args.vectors} 条, {time.perf_counter() - start:.1f}s, "
+              f"{len(index.centroids) if index.centroids is not None else 0} 个聚类")
+
+        index = VectorIndex(args.dim, path=path, nprobe=args.nprobe)
+        queries = sample(args.queries)
+        index.search(queries[:1], k=10)  # 建立倒排表
+
+        latencies = []
+        found = []
+        for query in queries:
+            start = time.perf_counter()
+            found.append(index.search(query, k=10)[0])
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"单条查询: P50 {percentile(latencies, 0.5):.2f} ms, P95 {percentile(latencies, 0.95):.2f} ms")
+
+        start = time.perf_counter()
+        index.search(queries, k=10)
+        print(f"批量查询: 平均每条 {(time.perf_counter() - start) * 1000 / len(queries):.2f} ms")
+
+        # 与精确检索比较召回率
+        centroids, index.centroids = index.centroids, None
+        truth = index.search(queries[:50], k=10)
+        index.centroids = centroids
+        recall = np.mean([len({i for i, _ in t} & {i for i, _ in f}) / 10 for t, f in zip(truth, found[:50])])
+        print(f"recall@10: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
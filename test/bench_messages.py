@@ -0,0 +1,129 @@
+"""
+消息存储基准测试
+
+分别在独立的子进程中构造大量消息，比较构造耗时、常驻内存(RSS)增量与转换为 OpenAI 格式的耗时:
+- pydantic: 原先基于 pydantic 的 Message 实现(需要安装 pydantic，否则跳过)
+- slots: 基于 __slots__ 的 Message
+- store: 按列存储的 MessageStore
+
+用法:
+    python test/bench_messages.py --count 1000000
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import gc
+import json
+import subprocess
+import time
+
+
+def rss_bytes() -> int:
+    """当前进程的常驻内存，Linux 下读取 /proc，其他平台退化为峰值内存"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def legacy_message_class():
+    from datetime import datetime
+    from typing import Optional, Dict, Any
+    from pydantic import BaseModel
+    from core.message import MessageRole
+
+    class LegacyMessage(BaseModel):
+        content: str
+        role: MessageRole
+        timestamp: datetime = None
+        metadata: Optional[Dict[str, Any]] = None
+
+        def __init__(self, content: str, role: MessageRole, **kwargs):
+            super().__init__(
+                content=content,
+                role=role,
+                timestamp=kwargs.get('timestamp', datetime.now()),
+                metadata=kwargs.get('metadata', {})
+            )
+
+        def to_dict(self):
+            return {"role": self.role, "content": self.content}
+
+    return LegacyMessage
+
+
+def run_variant(variant: str, count: int) -> dict:
+    from core.message import Message, MessageStore
+
+    # 内容字符串提前创建，只测量消息本身的开销
+    contents = [f"message {i}" for i in range(count)]
+    roles = ("user", "assistant")
+    gc.collect()
+    before = rss_bytes()
+    start = time.perf_counter()
+    if variant == "store":
+        messages = MessageStore()
+        for i, content in enumerate(contents):
+            messages.append(content, roles[i & 1])
+    else:
+        cls = legacy_message_class() if variant == "pydantic" else Message
+        messages = [cls(content, roles[i & 1]) for i, content in enumerate(contents)]
+    build = time.perf_counter() - start
+    gc.collect()
+    rss = rss_bytes() - before
+
+    start = time.perf_counter()
+    if variant == "store":
+        messages.to_openai()
+    else:
+        [m.to_dict() for m in messages]
+    first = time.perf_counter() - start
+
+    # 追加一条消息后再次获取完整列表，对应每轮对话都要重新构建消息列表的场景
+    start = time.perf_counter()
+    if variant == "store":
+        messages.append("new", "user")
+        openai = messages.to_openai()
+    else:
+        messages.append(messages[0])
+        openai = [m.to_dict() for m in messages]
+    again = time.perf_counter() - start
+    assert len(openai) == count + 1
+    return {"build": build, "rss": rss, "to_openai": first, "to_openai_again": again}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="消息存储基准测试")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--variant", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.count)))
+        return
+
+    print(f"{'实现':<10}{'构造(s)':>10}{'RSS(MB)':>10}{'转换(s)':>10}{'再次转换(s)':>14}")
+    for variant in ("pydantic", "slots", "store"):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--variant", variant, "--count", str(args.count)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            reason = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "未知错误"
+            print(f"{variant:<10}跳过: {reason}")
+            continue
+        r = json.loads(proc.stdout)
+        print(
+            f"{variant:<10}{r['build']:>10.2f}{r['rss'] / 1024 / 1024:>10.1f}"
+            f"{r['to_openai']:>10.2f}{r['to_openai_again']:>14.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
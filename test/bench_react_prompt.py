@@ -0,0 +1,129 @@
+"""
+ReAct 提示词布局基准测试
+
+在开启前缀缓存模拟的本地伪 OpenAI 服务上运行多步 ReActAgent，比较:
+- legacy: 原先的布局，整个模板渲染为一条用户消息，执行历史位于中间，之后还有固定的结尾
+- stable: 当前的布局，系统消息固定不变，执行历史只在用户消息末尾追加
+
+输出前缀缓存命中率与平均首 token 延迟(TTFT)。伪服务按未命中缓存的提示词 token 数增加预填充耗时。
+
+用法:
+    python test/bench_react_prompt.py --runs 20 --steps 6 --prefill-latency 0.00005
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+from core import GoAgentLLM, MetricsRegistry
+from tools import ToolExecutor
+from tools.base import BaseTool
+from agents.react_agent import ReActAgent
+from fake_openai_server import FakeOpenAIServer
+
+
+# 原先的单消息模板，执行历史位于当前任务之后、结尾提示之前
+LEGACY_PROMPT_TEMPLATE = """
+
+你是一个具备推理和行动能力的AI助手。你可以通过思考分析问题，然后调用合适的工具来获取信息，最终给出准确的答案。
+
+## 可用工具
+{tools}
+
+## 工作流程
+请严格按照以下格式进行回应，每次只能执行一个步骤:
+
+Thought: 分析当前问题，思考需要什么信息或采取什么行动。
+Action: 选择一个行动，格式必须是以下之一:
+- `{{tool_name}}[{{tool_input}}]` - 调用指定工具
+- `Finish[最终答案]` - 当你有足够信息给出最终答案时
+
+## 重要提醒
+1. 每次回应必须包含Thought和Action两部分
+2. 工具调用的格式必须严格遵循:工具名[参数]
+3. 只有当你确信有足够信息回答问题时，才使用Finish
+4. 如果工具返回的信息不够，继续使用其他工具或相同工具的不同参数
+
+## 当前任务
+**Question:** {question}
+
+## 执行历史
+{history}
+
+现在开始你的推理和行动:
+"""
+
+
+class LegacyReActAgent(ReActAgent):
+    """每一步都重新渲染整个模板的旧布局"""
+
+    def _build_messages(self, input_text: str) -> list:
+        prompt = LEGACY_PROMPT_TEMPLATE.format(
+            tools=self.tool_registry.get_tools_description(),
+            question=input_text,
+            history="\n".join(self.current_history),
+        )
+        return [{"role": "user", "content": prompt}]
+
+
+class LookupTool(BaseTool):
+    """返回固定长度资料的查询工具"""
+
+    def __init__(self):
+        super().__init__("lookup", "在资料库中查询条目，输入为条目名称。")
+
+    def execute(self, input_data: str) -> str:
+        return f"{input_data} 的资料: " + "相关内容。" * 40
+
+
+def scripted_reply(steps: int):
+    """根据已有的观察结果数量决定继续调用工具还是给出答案"""
+    def reply(body: dict) -> str:
+        done = sum(str(m.get("content") or "").count("Observation:") for m in body.get("messages", []))
+        if done + 1 < steps:
+            return f"Thought: 还需要更多资料。\nAction: lookup[第{done + 1}项]"
+        return "Thought: 资料已经足够。\nAction: Finish[汇总完成]"
+    return reply
+
+
+def bench(agent_cls, runs: int, steps: int, prefill_latency: float) -> dict:
+    metrics = MetricsRegistry()
+    with FakeOpenAIServer(reply=scripted_reply(steps), prefix_cache=True, prefill_latency=prefill_latency) as server:
+        llm = GoAgentLLM(model="fake", api_key="sk-fake", base_url=server.base_url, metrics=metrics, coalesce=False)
+        tool_executor = ToolExecutor(metrics=metrics)
+        tool_executor.register_tool(LookupTool())
+        for i in range(runs):
+            # 比较的是文本格式工具调用下的提示词布局
+            agent = agent_cls(llm_client=llm, tool_executor=tool_executor, max_steps=steps + 1, function_calling=False)
+            agent.run(f"请汇总第{i}组资料")
+        ttft = metrics.get("goagent_llm_ttft_seconds")
+        tokens = metrics.get("goagent_llm_tokens_total")
+        return {
+            "hit_rate": tokens.get(model="fake", type="cached_prompt") / tokens.get(model="fake", type="prompt"),
+            "ttft": ttft.sum(model="fake") / ttft.count(model="fake"),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReAct 提示词布局基准测试")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--prefill-latency", type=float, default=0.00005, help="每个未命中缓存的提示词 token 的预填充耗时(秒)")
+    args = parser.parse_args()
+
+    results = {
+        "legacy": bench(LegacyReActAgent, args.runs, args.steps, args.prefill_latency),
+        "stable": bench(ReActAgent, args.runs, args.steps, args.prefill_latency),
+    }
+    print(f"{'布局':<10}{'前缀缓存命中率':>16}{'平均TTFT(ms)':>16}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['hit_rate']:>16.1%}{r['ttft'] * 1000:>16.2f}")
+    legacy, stable = results["legacy"]["ttft"], results["stable"]["ttft"]
+    if legacy > 0:
+        print(f"TTFT 降低: {(legacy - stable) / legacy:.1%}")
+
+
+if __name__ == "__main__":
+    main()
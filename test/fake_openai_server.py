@@ -0,0 +1,414 @@
+"""
+本地伪 OpenAI 兼容服务
+
+只实现 /v1/chat/completions（流式与非流式），用于在无网络、无密钥的环境下
+对 GoAgentLLM 及各个 Agent 进行基准测试。
+提供 cassette 时按请求回放录制的真实响应，数据块节奏可以固定，也可以按录制时的时间重放。
+开启 prefix_cache 时模拟服务端的提示词前缀缓存：与近期请求相同的前缀不计入预填充耗时，
+并在 usage.prompt_tokens_details.cached_tokens 中返回命中的 token 数。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import random
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeOpenAIServer:
+    """
+    一个在后台线程运行的伪 OpenAI 服务。
+
+    用法:
+        with FakeOpenAIServer(latency=0.2) as server:
+            llm = GoAgentLLM(model="fake", api_key="sk-fake", base_url=server.base_url)
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        chunk_delay: float = 0.0,
+        reply: str = "Thought: 这是一个测试回复。\nAction: Finish[测试完成]",
+        fault_plan: Optional[List[Optional[Dict]]] = None,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        slow_rate: float = 0.0,
+        slow_latency: float = 1.0,
+        cassette=None,
+        pacing: str = "fixed",
+        speed: float = 1.0,
+        prefix_cache: bool = False,
+        prefill_latency: float = 0.0,
+        reject_tools: bool = False
+    ):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示由系统分配
+            latency: 首个数据块之前的等待时间(秒)，模拟首 token 延迟
+            chunk_delay: 相邻数据块之间的等待时间(秒)
+            reply: 固定的回复内容
+            fault_plan: 按请求顺序依次注入的故障，每项为None(正常)或字典:
+                {"status": 503, "retry_after": 1} 返回错误状态码及可选的Retry-After头;
+                {"delay": 2.0} 在响应前额外等待
+            error_rate: fault_plan 用完后随机返回错误的概率
+            error_status: 随机错误使用的状态码
+            slow_rate: fault_plan 用完后随机变慢的概率
+            slow_latency: 随机变慢时额外等待的时间(秒)
+            cassette: 回放用的 cassette 文件路径或 Cassette 对象；未命中的请求返回404
+            pacing: 回放节奏，"fixed" 使用 latency / chunk_delay，"recorded" 按录制时各数据块的时间重放
+            speed: "recorded" 节奏下的回放倍速，2.0 表示两倍速
+            reply 也可以是函数，接收请求体并返回回复内容，用于模拟多步交互；
+                返回字典 {"content": ..., "tool_calls": [{"name": ..., "arguments": {...}}]} 时以原生函数调用的
+                增量格式流式返回工具调用
+            prefix_cache: 是否模拟提示词前缀缓存(以 64 个 token 为一块，每个字符计为一个 token)
+            prefill_latency: 每个未命中缓存的提示词 token 在首个数据块之前增加的等待时间(秒)
+            reject_tools: 对携带 tools 参数的请求返回 400，模拟不支持原生函数调用的服务
+        """
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.reply = reply
+        self.fault_plan = deque(fault_plan or [])
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        if pacing not in ("fixed", "recorded"):
+            raise ValueError(f"未知的回放节奏: {pacing}")
+        if isinstance(cassette, str):
+            from core.cassette import Cassette
+            cassette = Cassette(cassette, Cassette.REPLAY)
+        self.cassette = cassette
+        self.pacing = pacing
+        self.speed = speed
+        self.cassette_misses = 0
+        self.prefix_cache = prefix_cache
+        self.prefill_latency = prefill_latency
+        self.reject_tools = reject_tools
+        self._recent_prompts = deque(maxlen=64)
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.request_count = 0
+        self.error_count = 0
+        self.requests = deque(maxlen=64)   # 最近的请求体
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def next_fault(self) -> Optional[Dict]:
+        """决定当前请求要注入的故障"""
+        with self._lock:
+            if self.fault_plan:
+                return self.fault_plan.popleft()
+        if self.error_rate and random.random() < self.error_rate:
+            return {"status": self.error_status}
+        if self.slow_rate and random.random() < self.slow_rate:
+            return {"delay": self.slow_latency}
+        return None
+
+    def lookup_reply(self, body: Dict) -> Optional[Tuple[List[str], Optional[List[float]], List[Dict]]]:
+        """
+        决定当前请求的回复数据块、其相对时间以及工具调用。
+
+        Returns:
+            (数据块列表, 各数据块的相对时间或None, 工具调用列表)；cassette 未命中时返回None
+        """
+        if self.cassette is None:
+            reply = self.reply(body) if callable(self.reply) else self.reply
+            if isinstance(reply, dict):
+                tool_calls = [
+                    {
+                        "name": call["name"],
+                        "arguments": call["arguments"] if isinstance(call.get("arguments"), str)
+                        else json.dumps(call.get("arguments") or {}, ensure_ascii=False),
+                    }
+                    for call in reply.get("tool_calls") or []
+                ]
+                content = reply.get("content") or ""
+                return (self.split_reply(content) if content else []), None, tool_calls
+            return self.split_reply(reply), None, []
+
+        from core.cassette import Cassette, CassetteMissError
+        request = Cassette.llm_request(body.get("model", "fake"), body.get("messages", []), body.get("temperature", 0))
+        kind = "llm"
+        if body.get("tools"):
+            # 原生函数调用的录制以完整结果保存，按 tools / tool_choice 一并匹配
+            kind = "llm_tools"
+            request["tools"] = body["tools"]
+            if body.get("tool_choice") is not None:
+                request["tool_choice"] = body["tool_choice"]
+        try:
+            entry = self.cassette.lookup(kind, request)
+        except CassetteMissError:
+            entry = None
+        if entry is None:
+            with self._lock:
+                self.cassette_misses += 1
+            return None
+        if kind == "llm_tools":
+            result = entry["result"]
+            tool_calls = [c["function"] for c in result.get("tool_calls") or []]
+            content = result.get("content") or ""
+            return (self.split_reply(content) if content else []), None, tool_calls
+        offsets = entry.get("offsets") if self.pacing == "recorded" else None
+        return entry["chunks"] or [""], offsets, []
+
+    def prefill(self, messages: List[Dict]) -> Tuple[int, int]:
+        """
+        计算提示词 token 数及其中命中前缀缓存的部分，并记录本次提示词供之后的请求匹配。
+
+        Returns:
+            (提示词 token 数, 命中缓存的 token 数)
+        """
+        prompt = "".join(f"<{m.get('role')}>{m.get('content') or ''}" for m in messages)
+        cached = 0
+        with self._lock:
+            if self.prefix_cache:
+                for previous in self._recent_prompts:
+                    cached = max(cached, len(os.path.commonprefix([prompt, previous])))
+                cached -= cached % 64
+                self._recent_prompts.append(prompt)
+            self.prompt_tokens += len(prompt)
+            self.cached_tokens += cached
+        return len(prompt), cached
+
+    @property
+    def prefix_hit_rate(self) -> float:
+        """前缀缓存命中的提示词 token 占比"""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def split_reply(self, text: str) -> List[str]:
+        """将回复切分为若干数据块"""
+        size = 4
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.request_count += 1
+                    server.requests.append(body)
+
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                if server.reject_tools and body.get("tools"):
+                    self._send_json(400, {"error": {"message": "tools is not supported", "type": "invalid_request_error"}})
+                    return
+
+                fault = server.next_fault() or {}
+                if fault.get("delay"):
+                    time.sleep(fault["delay"])
+                if fault.get("status"):
+                    with server._lock:
+                        server.error_count += 1
+                    headers = {}
+                    if fault.get("retry_after") is not None:
+                        headers["Retry-After"] = str(fault["retry_after"])
+                    self._send_json(fault["status"], {"error": {"message": "injected fault", "type": "server_error"}}, headers)
+                    return
+
+                model = body.get("model", "fake")
+                reply = server.lookup_reply(body)
+                if reply is None:
+                    self._send_json(404, {"error": {"message": "cassette 中没有对应的录制", "type": "invalid_request_error"}})
+                    return
+                pieces, offsets, tool_calls = reply
+                prompt_tokens, cached_tokens = server.prefill(body.get("messages", []))
+                if server.prefill_latency:
+                    time.sleep((prompt_tokens - cached_tokens) * server.prefill_latency)
+                if server.latency and offsets is None:
+                    time.sleep(server.latency)
+
+                if body.get("stream"):
+                    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+                    self._send_stream(model, pieces, prompt_tokens, cached_tokens, include_usage, offsets, tool_calls)
+                else:
+                    if offsets:
+                        time.sleep(offsets[-1] / server.speed)
+                    message = {"role": "assistant", "content": "".join(pieces)}
+                    if tool_calls:
+                        message["tool_calls"] = [
+                            {"id": f"call_{i}", "type": "function", "function": call}
+                            for i, call in enumerate(tool_calls)
+                        ]
+                    self._send_json(200, {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": message,
+                            "finish_reason": "tool_calls" if tool_calls else "stop",
+                        }],
+                    })
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_stream(
+                self,
+                model: str,
+                pieces: List[str],
+                prompt_tokens: int,
+                cached_tokens: int,
+                include_usage: bool,
+                offsets: Optional[List[float]] = None,
+                tool_calls: Optional[List[Dict]] = None
+            ) -> None:
+                start = time.perf_counter()
+                if offsets:
+                    # 按录制时的首个数据块时间等待后再返回响应头
+                    time.sleep(offsets[0] / server.speed)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                for i, piece in enumerate(pieces):
+                    if offsets:
+                        wait = offsets[i] / server.speed - (time.perf_counter() - start)
+                        if wait > 0:
+                            time.sleep(wait)
+                    elif i and server.chunk_delay:
+                        time.sleep(server.chunk_delay)
+                    self._write_chunk(self._sse(model, {"content": piece}, None))
+                for i, call in enumerate(tool_calls or []):
+                    # 首个增量携带 id 与函数名，参数按 8 个字符一段依次返回
+                    self._write_chunk(self._sse(model, {"tool_calls": [{
+                        "index": i, "id": f"call_{i}", "type": "function",
+                        "function": {"name": call["name"], "arguments": ""},
+                    }]}, None))
+                    arguments = call["arguments"]
+                    for start_at in range(0, len(arguments), 8):
+                        if server.chunk_delay:
+                            time.sleep(server.chunk_delay)
+                        self._write_chunk(self._sse(model, {"tool_calls": [{
+                            "index": i, "function": {"arguments": arguments[start_at:start_at + 8]},
+                        }]}, None))
+                self._write_chunk(self._sse(model, {}, "tool_calls" if tool_calls else "stop"))
+                if include_usage:
+                    # 粗略估算: 每个字符计为一个 token
+                    completion_tokens = sum(len(p) for p in pieces) + sum(len(c["arguments"]) for c in tool_calls or [])
+                    self._write_chunk(self._sse(model, None, None, usage={
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                    }))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _sse(self, model: str, delta: Optional[dict], finish_reason, usage: Optional[dict] = None) -> bytes:
+                payload = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                if usage is not None:
+                    payload["usage"] = usage
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        return Handler
+
+
+def make_llm(server: FakeOpenAIServer, **kwargs):
+    """
+    创建连接到伪服务的 GoAgentLLM，供各个测试共用。
+
+    Args:
+        server: 伪 OpenAI 服务
+        **kwargs: 传给 GoAgentLLM 的其他参数，model 默认为 "fake-model"
+    """
+    from core import GoAgentLLM
+    kwargs.setdefault("model", "fake-model")
+    return GoAgentLLM(api_key="sk-fake", base_url=server.base_url, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地伪 OpenAI 兼容服务")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--cassette", help="回放用的 cassette 文件")
+    parser.add_argument("--pacing", choices=["fixed", "recorded"], default="fixed")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--prefix-cache", action="store_true")
+    parser.add_argument("--prefill-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        port=args.port,
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        cassette=args.cassette,
+        pacing=args.pacing,
+        speed=args.speed,
+        prefix_cache=args.prefix_cache,
+        prefill_latency=args.prefill_latency,
+    )
+    print(f"伪 OpenAI 服务已启动: {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,166 @@
+"""
+本地伪 SerpApi 服务
+
+只实现 GET /search.json，用于在无网络、无密钥的环境下测试 SearchTool 的连接复用、
+异步与批量查询。提供 cassette 时回放录制的真实 SerpApi 结果，否则返回按查询生成的固定结果。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlparse
+
+
+class FakeSerpApiServer:
+    """
+    一个在后台线程运行的伪 SerpApi 服务。
+
+    用法:
+        with FakeSerpApiServer(latency=0.1) as server:
+            tool = SearchTool(base_url=server.base_url)
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        results: Optional[Dict[str, Dict[str, Any]]] = None,
+        cassette=None
+    ):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示由系统分配
+            latency: 每个请求返回前的等待时间(秒)
+            results: 查询 -> SerpApi 原始结果，优先于 cassette 与默认结果
+            cassette: 回放用的 cassette 文件路径或 Cassette 对象，按 "serpapi" 类型的录制匹配请求
+        """
+        self.latency = latency
+        self.results = dict(results or {})
+        if isinstance(cassette, str):
+            from core.cassette import Cassette
+            cassette = Cassette(cassette, Cassette.REPLAY)
+        self.cassette = cassette
+        self.request_count = 0
+        self.connection_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.request_times = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeSerpApiServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeSerpApiServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def lookup(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """决定一次查询返回的原始结果"""
+        query = params.get("q", "")
+        if query in self.results:
+            return self.results[query]
+        if self.cassette is not None:
+            from core.cassette import CassetteMissError
+            request = {k: v for k, v in params.items() if k != "api_key"}
+            try:
+                entry = self.cassette.lookup("serpapi", request)
+            except CassetteMissError:
+                entry = None
+            if entry is not None:
+                return entry["result"]
+            return {"error": "Google hasn't returned any results for this query."}
+        return {
+            "search_metadata": {"status": "Success"},
+            "organic_results": [
+                {"title": f"{query} - 结果{i}", "snippet": f"关于 {query} 的第{i}条摘要。", "link": f"https://example.com/{i}"}
+                for i in range(1, 4)
+            ],
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # 每个新的 TCP 连接调用一次，用于验证连接是否被复用
+                with server._lock:
+                    server.connection_count += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                with server._lock:
+                    server.request_count += 1
+                    server.request_times.append(time.monotonic())
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    if url.path.rstrip("/") != "/search.json":
+                        self._send_json(404, {"error": "not found"})
+                        return
+                    params = dict(parse_qsl(url.query))
+                    if not params.get("api_key"):
+                        self._send_json(401, {"error": "Invalid API key."})
+                        return
+                    if server.latency:
+                        time.sleep(server.latency)
+                    self._send_json(200, server.lookup(params))
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _send_json(self, status: int, payload: dict) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地伪 SerpApi 服务")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--cassette", help="回放用的 cassette 文件")
+    args = parser.parse_args()
+
+    server = FakeSerpApiServer(port=args.port, latency=args.latency, cassette=args.cassette)
+    print(f"伪 SerpApi 服务已启动: {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,74 @@
+"""
+测试 GoAgentLLM 的异步接口: ainvoke / astream、并发上限以及跨事件循环复用
+
+使用本地伪 OpenAI 服务，无需网络与密钥。
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+
+from core.resilience import RetryPolicy
+from fake_openai_server import FakeOpenAIServer, make_llm
+
+
+def messages(i: int = 0):
+    return [{"role": "user", "content": f"你好 {i}"}]
+
+
+def test_ainvoke_and_astream_return_full_reply():
+    async def run(llm):
+        content = await llm.ainvoke(messages())
+        chunks = [chunk async for chunk in llm.astream(messages(1))]
+        await llm.aclose()
+        return content, chunks
+
+    with FakeOpenAIServer(chunk_delay=0.01) as server:
+        content, chunks = asyncio.run(run(make_llm(server)))
+        assert content == server.reply
+        assert len(chunks) > 1 and "".join(chunks) == server.reply
+
+
+def test_async_concurrency_cap():
+    async def run(llm):
+        start = time.perf_counter()
+        results = await asyncio.gather(*(llm.ainvoke(messages(i)) for i in range(4)))
+        return results, time.perf_counter() - start
+
+    with FakeOpenAIServer(latency=0.2) as server:
+        results, elapsed = asyncio.run(run(make_llm(server, max_concurrency=2)))
+        assert results == [server.reply] * 4
+        # 同时只允许两个在途请求，4 个请求至少需要两轮
+        assert elapsed >= 0.4
+
+
+def test_reused_across_event_loops():
+    with FakeOpenAIServer() as server:
+        llm = make_llm(server)
+        # 每次 asyncio.run 都会创建新的事件循环，客户端与信号量需要随之重建
+        assert asyncio.run(llm.ainvoke(messages(0))) == server.reply
+        assert asyncio.run(llm.ainvoke(messages(1))) == server.reply
+        assert "".join(asyncio.run(_collect(llm.astream(messages(2))))) == server.reply
+        assert server.request_count == 3
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_async_errors_return_none_or_empty_chunk():
+    with FakeOpenAIServer(fault_plan=[{"status": 400}, {"status": 400}]) as server:
+        llm = make_llm(server, retry_policy=RetryPolicy(max_retries=0))
+        assert asyncio.run(llm.ainvoke(messages())) is None
+        assert asyncio.run(_collect(llm.astream(messages(1)))) == [""]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,79 @@
+"""
+测试批量调用 invoke_many / ainvoke_many: 结果顺序、失败条目以及统计信息
+
+使用本地伪 OpenAI 服务，无需网络与密钥。
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+
+from core.resilience import RetryPolicy
+from fake_openai_server import FakeOpenAIServer, make_llm
+
+COUNT = 6
+
+
+def echo_reply(body):
+    """原样返回问题，序号越小的问题越慢，使完成顺序与输入顺序相反"""
+    question = body["messages"][-1]["content"]
+    time.sleep(0.02 * (COUNT - int(question.split()[-1])))
+    return f"回答: {question}"
+
+
+def batch():
+    return [[{"role": "user", "content": f"问题 {i}"}] for i in range(COUNT)]
+
+
+def test_invoke_many_keeps_input_order():
+    with FakeOpenAIServer(reply=echo_reply) as server:
+        result = make_llm(server).invoke_many(batch(), max_workers=COUNT)
+        assert result.contents == [f"回答: 问题 {i}" for i in range(COUNT)]
+        assert [item.index for item in result] == list(range(COUNT))
+        assert not result.errors and result.throughput > 0
+        assert result.summary()["succeeded"] == COUNT
+
+
+def test_ainvoke_many_keeps_input_order():
+    with FakeOpenAIServer(reply=echo_reply) as server:
+        result = asyncio.run(make_llm(server).ainvoke_many(batch()))
+        assert result.contents == [f"回答: 问题 {i}" for i in range(COUNT)]
+
+
+def test_failed_items_carry_exceptions():
+    fault_plan = [None, {"status": 400}, None]
+    with FakeOpenAIServer(fault_plan=fault_plan) as server:
+        llm = make_llm(server, retry_policy=RetryPolicy(max_retries=0))
+        # 单线程依次发出，故障落在第二条请求上
+        result = llm.invoke_many(batch()[:3], max_workers=1)
+        assert result.contents == [server.reply, None, server.reply]
+        assert [item.index for item in result.errors] == [1]
+        assert result[1].error is not None and not result[1].ok
+        assert result.summary()["failed"] == 1
+
+
+def test_async_failed_items_carry_exceptions():
+    fault_plan = [None, {"status": 400}, None]
+    with FakeOpenAIServer(fault_plan=fault_plan) as server:
+        llm = make_llm(server, retry_policy=RetryPolicy(max_retries=0), max_concurrency=1)
+        result = asyncio.run(llm.ainvoke_many(batch()[:3]))
+        assert result.contents == [server.reply, None, server.reply]
+        assert [item.index for item in result.errors] == [1]
+
+
+def test_empty_batch():
+    with FakeOpenAIServer() as server:
+        result = make_llm(server).invoke_many([])
+        assert len(result) == 0 and result.throughput == 0.0
+        assert server.request_count == 0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,168 @@
+"""
+测试 cassette 录制/回放及伪 OpenAI 服务的回放
+
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import tempfile
+import http.client
+from urllib.parse import urlparse
+
+from core.cassette import Cassette, CassetteMissError
+from fake_openai_server import FakeOpenAIServer
+
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+def temp_path() -> str:
+    return os.path.join(tempfile.mkdtemp(), "cassette.jsonl")
+
+
+def record_llm(path: str, chunks, offsets=None, model: str = "fake-model") -> None:
+    cassette = Cassette(path, Cassette.RECORD)
+    request = Cassette.llm_request(model, MESSAGES, 0)
+    cassette.record("llm", request, {"chunks": chunks, "offsets": offsets or [0.0] * len(chunks)})
+
+
+def test_stream_records_then_replays():
+    path = temp_path()
+    calls = []
+
+    def source():
+        calls.append(1)
+        yield from ["你", "好"]
+
+    request = Cassette.llm_request("fake-model", MESSAGES, 0)
+    assert list(Cassette(path, Cassette.RECORD).stream("llm", request, source)) == ["你", "好"]
+
+    replay = Cassette(path, Cassette.REPLAY)
+    assert list(replay.stream("llm", request, source)) == ["你", "好"]
+    assert len(calls) == 1
+    # 消息经过与响应缓存相同的规范化
+    request = Cassette.llm_request("fake-model", [{"role": "user", "content": " 你好\r\n"}], 0)
+    assert list(replay.stream("llm", request, source)) == ["你", "好"]
+
+
+def test_replay_miss_raises():
+    path = temp_path()
+    record_llm(path, ["a"])
+    cassette = Cassette(path, Cassette.REPLAY)
+    try:
+        cassette.lookup("llm", Cassette.llm_request("other-model", MESSAGES, 0))
+        assert False, "应当抛出 CassetteMissError"
+    except CassetteMissError:
+        pass
+
+
+def test_repeated_requests_replay_in_order():
+    path = temp_path()
+    cassette = Cassette(path, Cassette.AUTO)
+    results = iter(["第一次", "第二次"])
+    request = {"q": "x"}
+    assert cassette.call("serpapi", request, lambda: next(results)) == "第一次"
+
+    replay = Cassette(path, Cassette.AUTO)
+    assert replay.call("serpapi", request, lambda: next(results)) == "第一次"
+    # 录制用完后请求上游并追加录制
+    assert replay.call("serpapi", request, lambda: next(results)) == "第二次"
+    assert len(Cassette(path, Cassette.REPLAY)) == 2
+
+
+def test_record_mode_truncates_existing_file():
+    path = temp_path()
+    record_llm(path, ["a"])
+    record_llm(path, ["b"])
+    assert len(Cassette(path, Cassette.REPLAY)) == 1
+
+
+def post(server: FakeOpenAIServer, body: dict):
+    url = urlparse(server.base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port)
+    conn.request("POST", url.path + "/chat/completions", json.dumps(body), {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    data = response.read().decode("utf-8")
+    conn.close()
+    return response.status, data
+
+
+def test_fake_server_replays_cassette_with_recorded_pacing():
+    path = temp_path()
+    record_llm(path, ["录制", "的", "回复"], offsets=[0.2, 0.25, 0.3])
+    with FakeOpenAIServer(cassette=path, pacing="recorded", speed=2.0) as server:
+        start = time.perf_counter()
+        status, data = post(server, {"model": "fake-model", "messages": MESSAGES, "temperature": 0, "stream": True})
+        elapsed = time.perf_counter() - start
+        assert status == 200
+        contents = [
+            json.loads(line[6:])["choices"][0]["delta"].get("content", "")
+            for line in data.splitlines()
+            if line.startswith("data: {") and json.loads(line[6:])["choices"]
+        ]
+        assert "".join(contents) == "录制的回复"
+        # 两倍速: 约 0.15 秒
+        assert 0.14 <= elapsed < 1.0
+
+        status, _ = post(server, {"model": "fake-model", "messages": [{"role": "user", "content": "没录过"}], "stream": True})
+        assert status == 404
+        assert server.cassette_misses == 1
+
+
+def test_llm_replays_without_network():
+    from core import GoAgentLLM
+
+    path = temp_path()
+    with FakeOpenAIServer(reply="来自上游的回复") as server:
+        llm = GoAgentLLM(model="fake-model", api_key="sk-fake", base_url=server.base_url,
+                         cassette=Cassette(path, Cassette.RECORD))
+        assert llm.invoke(MESSAGES) == "来自上游的回复"
+
+    # 服务已关闭，回放模式下也不需要密钥和服务地址
+    llm = GoAgentLLM(model="fake-model", cassette=Cassette(path, Cassette.REPLAY))
+    assert llm.invoke(MESSAGES) == "来自上游的回复"
+    assert "".join(llm.stream_invoke(MESSAGES)) == "来自上游的回复"
+
+
+def test_search_tool_replays_without_api_key():
+    from tools import SearchTool
+
+    path = temp_path()
+    cassette = Cassette(path, Cassette.RECORD)
+    request = {"engine": "google", "q": "地球周长", "gl": "cn", "hl": "zh-cn"}
+    cassette.record("serpapi", request, {"result": {"answer_box": {"answer": "约40075公里"}}})
+
+    tool = SearchTool(cassette=Cassette(path, Cassette.REPLAY))
+    tool.api_key = None
+    assert tool.execute("地球周长") == "【直接答案】\n约40075公里"
+
+
+def test_search_tool_records_into_new_cassette():
+    from tools import SearchTool
+
+    class FixedSearchTool(SearchTool):
+        def _fetch(self, params):
+            return {"answer_box": {"answer": "约40075公里"}}
+
+    path = temp_path()
+    # 新建的录制 cassette 没有任何条目，也必须被使用而不是被默认值替换
+    tool = FixedSearchTool(cassette=Cassette(path, Cassette.RECORD))
+    tool.api_key = "test-key"
+    assert tool.execute("地球周长") == "【直接答案】\n约40075公里"
+    assert len(tool.cassette) == 1
+
+    replay = SearchTool(cassette=Cassette(path, Cassette.REPLAY))
+    replay.api_key = None
+    assert replay.execute("地球周长") == "【直接答案】\n约40075公里"
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -7,10 +7,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 from core import GoAgentLLM
 from agents.chat_agent import ChatAgent
+from core.events import set_event_sink, ConsoleSink
 
 # 加载环境变量
 load_dotenv()
 
+# 在控制台输出运行过程
+set_event_sink(ConsoleSink())
+
 # 创建LLM实例
 llm = GoAgentLLM()
 
@@ -0,0 +1,162 @@
+"""
+测试 ChatAgent 并发执行同一轮回复中的多个工具调用
+
+使用按脚本回复的假 LLM 与本地工具，无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+import threading
+
+from tools import ToolExecutor
+from tools.base import BaseTool
+from agents.chat_agent import ChatAgent
+
+
+class SleepTool(BaseTool):
+    """等待指定秒数后返回输入"""
+
+    def __init__(self, name: str = "sleep"):
+        super().__init__(name, "等待一段时间后返回输入。")
+
+    def execute(self, input_data: str) -> str:
+        seconds, _, text = input_data.partition(" ")
+        time.sleep(float(seconds))
+        return text
+
+
+class WaitTool(BaseTool):
+    """协作式取消的等待工具，记录被取消的次数"""
+
+    def __init__(self):
+        super().__init__("wait", "等待一段时间，可被取消。")
+        self.saw_cancel = threading.Event()
+
+    def execute(self, input_data: str) -> str:
+        if self.wait_cancelled(float(input_data)):
+            self.saw_cancel.set()
+            self.check_cancelled()
+        return f"等了 {input_data} 秒"
+
+
+class ScriptedLLM:
+    model = "scripted"
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def invoke(self, messages, **kwargs):
+        self.calls.append([dict(m) for m in messages])
+        return self.replies.pop(0)
+
+    async def ainvoke(self, messages, **kwargs):
+        return self.invoke(messages, **kwargs)
+
+
+def make_agent(replies, executor=None, **kwargs):
+    executor = executor or ToolExecutor()
+    executor.register_tool(SleepTool())
+    llm = ScriptedLLM(replies)
+    return ChatAgent("tester", llm, tool_registry=executor, **kwargs), llm
+
+
+THREE_CALLS = "[TOOL_CALL:sleep:0.3 一]\n[TOOL_CALL:sleep:0.1 二]\n[TOOL_CALL:sleep:0.2 三]"
+
+
+def tool_results(llm) -> str:
+    return llm.calls[1][-1]["content"]
+
+
+def test_tool_calls_run_concurrently_in_order():
+    agent, llm = make_agent([THREE_CALLS, "完成"])
+    start = time.perf_counter()
+    assert agent.run("问题") == "完成"
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.5
+    results = tool_results(llm)
+    assert results.index("一") < results.index("二") < results.index("三")
+
+
+def test_tool_timeout_does_not_block_other_results():
+    agent, llm = make_agent(
+        ["[TOOL_CALL:sleep:1 慢]\n[TOOL_CALL:sleep:0 快]", "完成"],
+        tool_timeout=0.2,
+    )
+    start = time.perf_counter()
+    agent.run("问题")
+    assert time.perf_counter() - start < 0.8
+    results = tool_results(llm)
+    assert "超时" in results and "快" in results
+    assert "慢" not in results
+
+
+def test_per_tool_timeout_override():
+    agent, llm = make_agent(["[TOOL_CALL:sleep:0.3 好了]", "完成"], tool_timeout=0.1, tool_timeouts={"sleep": 2})
+    agent.run("问题")
+    assert "好了" in tool_results(llm)
+
+
+def test_timed_out_call_is_cancelled_through_executor():
+    executor = ToolExecutor()
+    tool = WaitTool()
+    executor.register_tool(tool)
+    agent, llm = make_agent(["[TOOL_CALL:wait:5]", "完成"], executor=executor, tool_timeout=0.1)
+    start = time.perf_counter()
+    agent.run("问题")
+    assert time.perf_counter() - start < 1.0
+    assert "超时" in tool_results(llm)
+    # 超时后工具收到取消信号，不会继续占用执行线程
+    assert tool.saw_cancel.wait(1.0)
+    agent.close()
+    assert agent._tool_pool is None
+
+
+def test_executor_timeouts_apply_without_agent_timeout():
+    executor = ToolExecutor(timeouts={"sleep": 0.1})
+    agent, llm = make_agent(["[TOOL_CALL:sleep:1 慢]\n[TOOL_CALL:sleep:0 快]", "完成"], executor=executor)
+    start = time.perf_counter()
+    agent.run("问题")
+    assert time.perf_counter() - start < 0.8
+    results = tool_results(llm)
+    assert "超时" in results and "快" in results
+    agent.close()
+
+
+def test_async_timed_out_call_is_cancelled():
+    executor = ToolExecutor()
+    tool = WaitTool()
+    executor.register_tool(tool)
+    agent, llm = make_agent(["[TOOL_CALL:wait:5]\n[TOOL_CALL:sleep:0 快]", "完成"], executor=executor, tool_timeout=0.1)
+    asyncio.run(agent.arun("问题"))
+    results = tool_results(llm)
+    assert "超时" in results and "快" in results
+    assert tool.saw_cancel.wait(1.0)
+
+
+def test_async_tool_calls_run_concurrently_in_order():
+    agent, llm = make_agent([THREE_CALLS, "完成"], max_parallel_tools=3)
+    start = time.perf_counter()
+    assert asyncio.run(agent.arun("问题")) == "完成"
+    assert time.perf_counter() - start < 0.5
+    results = tool_results(llm)
+    assert results.index("一") < results.index("二") < results.index("三")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_tool_calls_run_concurrently_in_order,
+        test_tool_timeout_does_not_block_other_results,
+        test_per_tool_timeout_override,
+        test_timed_out_call_is_cancelled_through_executor,
+        test_executor_timeouts_apply_without_agent_timeout,
+        test_async_timed_out_call_is_cancelled,
+        test_async_tool_calls_run_concurrently_in_order,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,222 @@
+"""
+测试相同请求的合并(single-flight)
+
+可以直接运行，也可以通过 pytest 收集；最后两个用例使用本地伪 OpenAI 服务。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.coalesce import SingleFlight, AsyncSingleFlight
+
+
+def slow_source(calls, pieces=("a", "b", "c"), delay=0.05):
+    def factory():
+        calls.append(1)
+        for piece in pieces:
+            time.sleep(delay)
+            yield piece
+    return factory
+
+
+def test_concurrent_callers_share_one_upstream_call():
+    calls, joined = [], []
+    flights = SingleFlight(on_coalesced=lambda: joined.append(1))
+    factory = slow_source(calls)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: "".join(flights.stream("k", factory)), range(8)))
+    assert results == ["abc"] * 8
+    assert len(calls) == 1
+    assert len(joined) == 7
+    assert flights.in_flight() == 0
+
+
+def test_late_subscriber_replays_earlier_chunks():
+    calls = []
+    flights = SingleFlight()
+    leader = flights.stream("k", slow_source(calls))
+    assert next(leader) == "a"
+    follower = flights.stream("k", slow_source(calls))
+    assert next(follower) == "a"
+    assert "".join(leader) == "bc"
+    assert "".join(follower) == "bc"
+    assert len(calls) == 1
+
+
+def test_leader_closing_early_hands_off_to_followers():
+    calls = []
+    flights = SingleFlight()
+    leader = flights.stream("k", slow_source(calls))
+    assert next(leader) == "a"
+    follower = flights.stream("k", slow_source(calls))
+    assert next(follower) == "a"
+    leader.close()
+    assert "".join(follower) == "bc"
+    assert len(calls) == 1
+
+
+def test_unstarted_streams_do_not_hold_the_key():
+    calls = []
+    flights = SingleFlight()
+    # 创建后从未迭代的流既不发起上游调用，也不占用键
+    dropped = flights.stream("k", slow_source(calls))
+    assert flights.in_flight() == 0 and not calls
+    del dropped
+    leader = flights.stream("k", slow_source(calls))
+    unstarted_follower = flights.stream("k", slow_source(calls))
+    assert "".join(leader) == "abc"
+    assert flights.in_flight() == 0 and len(calls) == 1
+    unstarted_follower.close()
+
+    # 在途调用的键被释放后，新的调用方不会阻塞
+    result = []
+    thread = threading.Thread(target=lambda: result.append("".join(flights.stream("k", slow_source(calls)))))
+    thread.start()
+    thread.join(timeout=2)
+    assert result == ["abc"]
+
+
+def test_errors_propagate_to_every_subscriber():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+        yield  # pragma: no cover
+
+    errors = []
+
+    def consume():
+        try:
+            list(flights.stream("k", failing))
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=consume)
+    leader.start()
+    started.wait()
+    consume()
+    leader.join()
+    assert len(errors) == 2
+    assert flights.in_flight() == 0
+
+
+def test_async_subscribers_share_one_upstream_call():
+    calls, joined = [], []
+
+    async def source():
+        calls.append(1)
+        for piece in ("a", "b", "c"):
+            await asyncio.sleep(0.02)
+            yield piece
+
+    async def main():
+        flights = AsyncSingleFlight(on_coalesced=lambda: joined.append(1))
+
+        async def consume():
+            return "".join([c async for c in flights.stream("k", source)])
+
+        results = await asyncio.gather(*(consume() for _ in range(10)))
+        assert flights.in_flight() == 0
+        return results
+
+    assert asyncio.run(main()) == ["abc"] * 10
+    assert len(calls) == 1
+    assert len(joined) == 9
+
+
+def test_async_cancelled_subscriber_does_not_affect_others():
+    async def source():
+        for piece in ("a", "b", "c"):
+            await asyncio.sleep(0.02)
+            yield piece
+
+    async def main():
+        flights = AsyncSingleFlight()
+
+        async def consume():
+            return "".join([c async for c in flights.stream("k", source)])
+
+        first = asyncio.create_task(consume())
+        second = asyncio.create_task(consume())
+        await asyncio.sleep(0.03)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "abc"
+
+
+def test_async_unstarted_subscriber_does_not_start_upstream():
+    calls = []
+
+    async def source():
+        calls.append(1)
+        yield "a"
+
+    async def main():
+        flights = AsyncSingleFlight()
+        dropped = flights.stream("k", source)
+        await asyncio.sleep(0.01)
+        assert flights.in_flight() == 0 and not calls
+        del dropped
+        assert "".join([c async for c in flights.stream("k", source)]) == "a"
+        assert flights.in_flight() == 0
+
+    asyncio.run(main())
+    assert len(calls) == 1
+
+
+def test_llm_coalesces_identical_requests():
+    from core import get_registry
+    from fake_openai_server import FakeOpenAIServer, make_llm
+
+    messages = [{"role": "user", "content": "热门问题"}]
+    with FakeOpenAIServer(latency=0.2) as server:
+        llm = make_llm(server, model="fake-coalesce", coalesce=True)
+        result = llm.invoke_many([messages] * 10)
+        assert result.contents == [server.reply] * 10
+        assert server.request_count == 1
+        coalesced = get_registry().counter("goagent_llm_coalesced_total")
+        assert coalesced.get(model="fake-coalesce") == 9
+
+        # temperature 不为0的调用期望得到不同的采样，不做合并
+        llm.invoke_many([messages] * 3, temperature=0.7)
+        assert server.request_count == 4
+
+
+def test_llm_streams_fan_out_from_one_call():
+    from fake_openai_server import FakeOpenAIServer, make_llm
+
+    messages = [{"role": "user", "content": "流式热门问题"}]
+    with FakeOpenAIServer(latency=0.1, chunk_delay=0.01) as server:
+        llm = make_llm(server, coalesce=True)
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            outputs = list(pool.map(lambda _: list(llm.stream_invoke(messages)), range(5)))
+        assert all("".join(chunks) == server.reply for chunks in outputs)
+        assert server.request_count == 1
+
+
+def test_llm_does_not_coalesce_by_default():
+    from fake_openai_server import FakeOpenAIServer, make_llm
+
+    messages = [{"role": "user", "content": "热门问题"}]
+    with FakeOpenAIServer(latency=0.1) as server:
+        llm = make_llm(server)
+        assert not llm.coalesce
+        llm.invoke_many([messages] * 4)
+        assert server.request_count == 4
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,140 @@
+"""
+测试对话历史的滚动摘要压缩
+
+使用一个记录调用的假 LLM，无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+
+from core.message import Message
+from core.context import ContextWindow
+from core.compaction import HistoryCompactor
+
+
+class FakeSummarizer:
+    """把每次调用的提示词记录下来，返回带序号的摘要；可以阻塞以模拟慢速的 LLM"""
+
+    def __init__(self, fail: bool = False):
+        self.prompts = []
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = fail
+
+    def invoke(self, messages, temperature=0, **kwargs):
+        self.release.wait(5)
+        self.prompts.append(messages[0]["content"])
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return f"摘要{len(self.prompts)}"
+
+
+def add_turn(window: ContextWindow, i: int, size: int = 20) -> None:
+    window.append(Message(f"第{i}个问题" + "啊" * size, "user"))
+    window.append(Message(f"answer {i} " + "x" * size * 4, "assistant"))
+
+
+def test_old_turns_are_replaced_by_summary():
+    window = ContextWindow(max_tokens=1000, pinned_turns=1)
+    llm = FakeSummarizer()
+    compactor = HistoryCompactor(window, llm, threshold=200, keep_turns=2)
+    for i in range(6):
+        add_turn(window, i)
+    assert compactor.wait(5)
+
+    messages = window.build("新的问题", "你是一个有用的AI助手。")
+    assert messages[1]["role"] == "system"
+    assert window.summary.startswith("摘要")
+    assert window.summary in messages[1]["content"]
+    # 摘要之后紧跟最近的完整对话轮次
+    assert messages[2]["role"] == "user"
+    assert window.tokens <= 200 + 100
+    assert "第0个问题" in llm.prompts[0]
+
+
+def test_summary_is_updated_incrementally():
+    window = ContextWindow(max_tokens=1000, pinned_turns=1)
+    llm = FakeSummarizer()
+    compactor = HistoryCompactor(window, llm, threshold=200, keep_turns=1)
+    for i in range(12):
+        add_turn(window, i)
+        compactor.wait(5)
+    assert len(llm.prompts) >= 2
+    # 后续的总结基于上一次的摘要，而且不会重复总结已经压缩过的对话
+    assert "摘要1" in llm.prompts[1]
+    assert "第0个问题" not in llm.prompts[1]
+    assert window.summary == f"摘要{len(llm.prompts)}"
+
+
+def test_summarization_does_not_block_the_request_path():
+    window = ContextWindow(max_tokens=1000, pinned_turns=1)
+    llm = FakeSummarizer()
+    llm.release.clear()
+    compactor = HistoryCompactor(window, llm, threshold=200, keep_turns=1)
+    for i in range(6):
+        add_turn(window, i)
+    # 总结仍在进行中，构建提示词直接使用原始历史
+    assert compactor.pending
+    messages = window.build("新的问题")
+    assert messages[0]["content"].startswith("第0个问题")
+    llm.release.set()
+    assert compactor.wait(5)
+    assert window.build("新的问题")[0]["role"] == "system"
+
+
+def test_failed_summary_keeps_original_history():
+    window = ContextWindow(max_tokens=1000, pinned_turns=1)
+    compactor = HistoryCompactor(window, FakeSummarizer(fail=True), threshold=200, keep_turns=1)
+    for i in range(6):
+        add_turn(window, i)
+    compactor.wait(5)
+    assert window.summary is None
+    assert window.messages()[0].content.startswith("第0个问题")
+
+
+def test_clear_discards_pending_summary():
+    window = ContextWindow(max_tokens=1000, pinned_turns=1)
+    llm = FakeSummarizer()
+    llm.release.clear()
+    compactor = HistoryCompactor(window, llm, threshold=200, keep_turns=1)
+    for i in range(6):
+        add_turn(window, i)
+    window.clear()
+    llm.release.set()
+    compactor.wait(5)
+    assert window.summary is None
+    assert len(window) == 0
+
+
+def test_evicted_messages_are_folded_into_next_summary():
+    evicted = []
+    window = ContextWindow(max_tokens=300, pinned_turns=1, on_evict=evicted.extend)
+    llm = FakeSummarizer()
+    llm.release.clear()
+    compactor = HistoryCompactor(window, llm, threshold=150, keep_turns=1)
+    for i in range(10):
+        add_turn(window, i)
+    # 第一次总结尚未完成时窗口已经按预算淘汰了部分消息
+    assert evicted
+    llm.release.set()
+    compactor.wait(5)
+    add_turn(window, 10)
+    compactor.wait(5)
+    assert any(evicted[-1].content in prompt for prompt in llm.prompts)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_old_turns_are_replaced_by_summary,
+        test_summary_is_updated_incrementally,
+        test_summarization_does_not_block_the_request_path,
+        test_failed_summary_keeps_original_history,
+        test_clear_discards_pending_summary,
+        test_evicted_messages_are_folded_into_next_summary,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,97 @@
+"""
+测试对话上下文窗口
+
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+from core.message import Message
+from core.context import ContextWindow, TokenCounter
+
+
+def add_turn(window: ContextWindow, i: int, size: int = 20) -> list:
+    evicted = window.append(Message(f"第{i}个问题" + "啊" * size, "user"))
+    evicted += window.append(Message(f"answer {i} " + "x" * size * 4, "assistant"))
+    return evicted
+
+
+def test_token_counter_handles_cjk_and_latin():
+    counter = TokenCounter()
+    assert counter.count_text("你好世界") == 4
+    assert counter.count_text("abcdefgh") == 2
+    assert counter.count_message("user", "") == counter.message_overhead
+    assert TokenCounter(tokenize=len).count_text("abc") == 3
+
+
+def test_window_stays_within_token_budget():
+    window = ContextWindow(max_tokens=500, pinned_turns=1)
+    for i in range(200):
+        add_turn(window, i)
+        messages = window.build("新的问题", "你是一个有用的AI助手。")
+        assert window.last_prompt_tokens <= 500
+    # 系统提示词、最近的历史和当前输入都被保留
+    assert messages[0]["role"] == "system"
+    assert messages[-1] == {"role": "user", "content": "新的问题"}
+    assert messages[-2]["content"].startswith("answer 199")
+    assert messages[1]["role"] == "user"
+
+
+def test_max_messages_is_enforced():
+    window = ContextWindow(max_messages=10, pinned_turns=1)
+    for i in range(50):
+        add_turn(window, i)
+    assert len(window) == 10
+    assert window.messages()[0].content.startswith("第45个问题")
+
+
+def test_pinned_turns_are_never_evicted():
+    window = ContextWindow(max_tokens=10, pinned_turns=2)
+    for i in range(5):
+        add_turn(window, i, size=200)
+    assert len(window) == 4
+    assert window.messages()[0].content.startswith("第3个问题")
+
+
+def test_evicted_messages_are_reported_in_order():
+    evicted = []
+    window = ContextWindow(max_messages=4, pinned_turns=1, on_evict=evicted.extend)
+    for i in range(4):
+        add_turn(window, i)
+    assert [m.content.split()[0][:4] for m in evicted] == ["第0个问", "answ", "第1个问", "answ"]
+
+
+def test_token_count_is_incremental():
+    calls = []
+    counter = TokenCounter(tokenize=lambda text: calls.append(text) or len(text))
+    window = ContextWindow(max_tokens=100000, counter=counter)
+    for i in range(100):
+        add_turn(window, i)
+        window.build("问题", "系统提示词")
+    # 每条消息只计数一次，系统提示词不变时只计数一次
+    assert len(calls) == 200 + 100 + 1
+
+
+def test_build_latency_is_flat_over_long_session():
+    window = ContextWindow(max_tokens=2000, max_messages=100, pinned_turns=2)
+    timings = []
+    for i in range(500):
+        add_turn(window, i)
+        start = time.perf_counter()
+        window.build(f"第{i}轮输入", "你是一个有用的AI助手。")
+        timings.append(time.perf_counter() - start)
+    early = sorted(timings[50:100])[25]
+    late = sorted(timings[450:500])[25]
+    assert late < early * 3 + 1e-4
+    assert window.last_prompt_tokens <= 2000
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,96 @@
+"""
+测试事件系统
+
+最后一个用例使用本地伪 OpenAI 服务，无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import asyncio
+
+from core.events import (
+    EventLevel, EventType, EventSink, NullSink, ConsoleSink, CallbackSink,
+    emit, get_event_sink, set_event_sink,
+)
+from fake_openai_server import FakeOpenAIServer, make_llm
+
+
+def test_default_sink_is_silent():
+    assert isinstance(get_event_sink(), NullSink)
+    assert not get_event_sink().enabled_for(EventLevel.ERROR, EventType.MESSAGE)
+
+
+def test_sink_without_emit_fails_on_construction():
+    class BrokenSink(EventSink):
+        pass
+
+    try:
+        BrokenSink()
+        assert False, "未实现 emit 的接收器应当无法实例化"
+    except TypeError:
+        pass
+
+
+def test_console_sink_renders_like_print():
+    stream = io.StringIO()
+    sink = ConsoleSink(stream=stream)
+    emit(EventType.STEP, "开始", sink=sink)
+    emit(EventType.CHUNK, "你", sink=sink)
+    emit(EventType.CHUNK, "好", sink=sink)
+    emit(EventType.LLM_END, sink=sink)
+    assert stream.getvalue() == "开始\n你好\n"
+
+
+def test_callback_sink_filters_by_level_and_chunks():
+    events = []
+    sink = CallbackSink(events.append, level=EventLevel.INFO, include_chunks=False)
+    emit(EventType.MESSAGE, "调试", EventLevel.DEBUG, sink=sink)
+    emit(EventType.CHUNK, "块", sink=sink)
+    emit(EventType.TOOL_CALL, "调用", source="search", sink=sink, query="q")
+    assert len(events) == 1
+    assert events[0].source == "search"
+    assert events[0].data == {"query": "q"}
+
+
+def test_set_event_sink_returns_previous():
+    events = []
+    previous = set_event_sink(CallbackSink(events.append))
+    try:
+        emit(EventType.ANSWER, "完成")
+    finally:
+        restored = set_event_sink(previous)
+    assert isinstance(restored, CallbackSink)
+    assert [e.message for e in events] == ["完成"]
+
+
+def test_sync_and_async_llm_calls_emit_the_same_events():
+    def trace(events):
+        return [(e.type, e.message) for e in events if e.type in (EventType.LLM_START, EventType.CHUNK, EventType.LLM_END)]
+
+    tools = [{"type": "function", "function": {"name": "echo", "parameters": {"type": "object", "properties": {}}}}]
+    messages = [{"role": "user", "content": "你好"}]
+    with FakeOpenAIServer() as server:
+        sync_events, async_events = [], []
+        llm = make_llm(server, event_sink=CallbackSink(sync_events.append))
+        llm.invoke(messages)
+        llm.invoke_with_tools(messages, tools)
+        llm.event_sink = CallbackSink(async_events.append)
+
+        async def run():
+            await llm.ainvoke(messages)
+            await llm.ainvoke_with_tools(messages, tools)
+
+        asyncio.run(run())
+        assert trace(async_events) == trace(sync_events)
+        chunks = [e.message for e in async_events if e.type == EventType.CHUNK]
+        assert chunks == server.split_reply(server.reply) * 2
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
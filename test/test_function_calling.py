@@ -0,0 +1,258 @@
+"""
+测试原生函数调用: 工具的参数定义、工具调用增量的拼接，以及 ChatAgent / ReActAgent 的函数调用模式
+
+除最后一个用例在本地伪 OpenAI 服务上运行外，均使用按脚本回复的假 LLM，
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import json
+
+from core import Config
+from core.tool_calls import AssistantTurn, ToolCall, ToolCallAccumulator
+from tools import ToolExecutor
+from tools.base import BaseTool
+
+
+class WeatherTool(BaseTool):
+    parameters = {
+        "type": "object",
+        "properties": {
+            "city": {"type": "string", "description": "城市名称"},
+            "days": {"type": "integer", "description": "预报天数"},
+        },
+        "required": ["city"],
+    }
+
+    def __init__(self):
+        super().__init__("weather", "查询城市天气。")
+
+    def execute(self, input_data: str) -> str:
+        return f"raw: {input_data}"
+
+    def run(self, parameters: dict) -> str:
+        return f"{parameters['city']} 未来{parameters.get('days', 1)}天晴"
+
+
+class EchoTool(BaseTool):
+    def __init__(self):
+        super().__init__("echo", "原样返回输入。")
+
+    def execute(self, input_data: str) -> str:
+        return f"echo: {input_data}"
+
+
+class ScriptedToolLLM:
+    """依次返回预设的 AssistantTurn，并记录每次收到的消息与工具定义"""
+
+    model = "scripted"
+
+    def __init__(self, turns):
+        self.turns = list(turns)
+        self.calls = []
+
+    def invoke_with_tools(self, messages, tools, tool_choice=None, **kwargs):
+        self.calls.append({"messages": [dict(m) for m in messages], "tools": tools, "tool_choice": tool_choice})
+        return self.turns.pop(0)
+
+    async def ainvoke_with_tools(self, messages, tools, tool_choice=None, **kwargs):
+        return self.invoke_with_tools(messages, tools, tool_choice=tool_choice)
+
+
+# 原生函数调用需要在配置中显式启用
+NATIVE = Config(function_calling=True)
+
+
+def call(name, arguments, call_id="call_0"):
+    return ToolCall(id=call_id, name=name, arguments=json.dumps(arguments, ensure_ascii=False))
+
+
+def make_executor():
+    executor = ToolExecutor()
+    executor.register_tool(WeatherTool())
+    executor.register_tool(EchoTool())
+    return executor
+
+
+def test_accumulator_joins_streamed_deltas():
+    acc = ToolCallAccumulator()
+    acc.add([{"index": 0, "id": "call_a", "function": {"name": "weather", "arguments": ""}}])
+    acc.add([{"index": 1, "id": "call_b", "function": {"name": "echo", "arguments": '{"in'}}])
+    acc.add([{"index": 0, "function": {"name": "weather", "arguments": '{"city": '}}])
+    acc.add([{"index": 0, "function": {"arguments": '"北京"}'}}, {"index": 1, "function": {"arguments": 'put": "x"}'}}])
+    calls = acc.calls()
+    assert [c.name for c in calls] == ["weather", "echo"]
+    assert calls[0].id == "call_a" and calls[0].parse_arguments() == {"city": "北京"}
+    assert calls[1].parse_arguments() == {"input": "x"}
+    acc.reset()
+    assert acc.calls() == []
+
+
+def test_openai_tool_definitions():
+    executor = make_executor()
+    tools = executor.get_openai_tools()
+    assert tools is executor.get_openai_tools()
+    by_name = {t["function"]["name"]: t["function"] for t in tools}
+    assert by_name["weather"]["parameters"]["required"] == ["city"]
+    assert by_name["echo"]["parameters"] == BaseTool.DEFAULT_PARAMETERS
+    executor.unregister("echo")
+    assert [t["function"]["name"] for t in executor.get_openai_tools()] == ["weather"]
+
+
+def test_execute_tool_call_parses_arguments():
+    executor = make_executor()
+    assert executor.execute_tool_call("weather", '{"city": "上海", "days": 3}') == "上海 未来3天晴"
+    # 默认的 run 把唯一的参数作为 execute 的输入
+    assert executor.execute_tool_call("echo", {"input": "你好"}) == "echo: 你好"
+    assert "参数不合法" in executor.execute_tool_call("weather", '{"city": ')
+    assert "未找到" in executor.execute_tool_call("missing", "{}")
+
+
+def test_chat_agent_uses_native_tool_calls():
+    from agents.chat_agent import ChatAgent
+
+    llm = ScriptedToolLLM([
+        AssistantTurn("", [call("weather", {"city": "北京"}, "call_1"), call("echo", {"input": "hi"}, "call_2")]),
+        AssistantTurn("北京晴，echo 返回 hi。"),
+    ])
+    agent = ChatAgent("tester", llm, tool_registry=make_executor(), config=NATIVE)
+    assert agent.run("北京天气怎么样") == "北京晴，echo 返回 hi。"
+
+    first, second = llm.calls
+    assert "TOOL_CALL" not in first["messages"][0]["content"]
+    assert {t["function"]["name"] for t in first["tools"]} == {"weather", "echo"}
+    assistant, *tool_messages = second["messages"][-3:]
+    assert [c["id"] for c in assistant["tool_calls"]] == ["call_1", "call_2"]
+    assert tool_messages == [
+        {"role": "tool", "tool_call_id": "call_1", "content": "北京 未来1天晴"},
+        {"role": "tool", "tool_call_id": "call_2", "content": "echo: hi"},
+    ]
+
+
+def test_chat_agent_stops_calling_tools_after_max_iterations():
+    from agents.chat_agent import ChatAgent
+
+    llm = ScriptedToolLLM([
+        AssistantTurn("", [call("echo", {"input": "1"})]),
+        AssistantTurn("最终回答"),
+    ])
+    agent = ChatAgent("tester", llm, tool_registry=make_executor(), config=NATIVE)
+    assert agent.run("问题", max_tool_iterations=1) == "最终回答"
+    assert llm.calls[-1]["tool_choice"] == "none"
+
+
+def test_react_agent_with_function_calling():
+    from agents.react_agent import ReActAgent
+
+    llm = ScriptedToolLLM([
+        AssistantTurn("先查天气。", [call("weather", {"city": "北京"})]),
+        AssistantTurn("信息足够。", [call("Finish", {"answer": "北京晴"})]),
+    ])
+    agent = ReActAgent(llm_client=llm, tool_executor=make_executor(), max_steps=3, config=NATIVE)
+    assert agent.function_calling
+    assert agent.run("北京天气") == "北京晴"
+    assert llm.calls[0]["tools"][-1]["function"]["name"] == "Finish"
+    assert "工具名[参数]" not in llm.calls[0]["messages"][0]["content"]
+    assert llm.calls[1]["messages"][1]["content"].endswith("Action: weather[北京]\nObservation: 北京 未来1天晴\n")
+
+
+def test_react_agent_direct_answer_without_tool_call():
+    from agents.react_agent import ReActAgent
+
+    llm = ScriptedToolLLM([AssistantTurn("直接回答。")])
+    agent = ReActAgent(llm_client=llm, tool_executor=make_executor(), config=NATIVE)
+    assert agent.run("1+1") == "直接回答。"
+
+
+def test_react_agent_falls_back_to_text_actions():
+    from agents.react_agent import ReActAgent
+
+    # 模型忽略 tools 参数，按文本格式写出 Thought / Action
+    llm = ScriptedToolLLM([
+        AssistantTurn("Thought: 先查天气。\nAction: weather[北京]"),
+        AssistantTurn("Thought: 信息足够。\nAction: Finish[北京晴]"),
+    ])
+    agent = ReActAgent(llm_client=llm, tool_executor=make_executor(), max_steps=3, config=NATIVE)
+    assert agent.function_calling
+    assert agent.run("北京天气") == "北京晴"
+    assert llm.calls[1]["messages"][1]["content"].endswith("Action: weather[北京]\nObservation: raw: 北京\n")
+
+
+def test_native_calling_is_opt_in():
+    from agents.chat_agent import ChatAgent
+    from agents.react_agent import ReActAgent
+
+    llm = ScriptedToolLLM([])
+    assert not ChatAgent("tester", llm, tool_registry=make_executor())._use_function_calling()
+    assert not ReActAgent(llm_client=llm, tool_executor=make_executor()).function_calling
+
+
+def test_chat_agent_falls_back_when_server_rejects_tools():
+    from agents.chat_agent import ChatAgent
+    from core.resilience import RetryPolicy
+    from fake_openai_server import FakeOpenAIServer, make_llm
+
+    def reply(body):
+        if "工具执行结果" in body["messages"][-1]["content"]:
+            return "echo 返回 hi。"
+        return "[TOOL_CALL:echo:hi]"
+
+    with FakeOpenAIServer(reply=reply, reject_tools=True) as server:
+        llm = make_llm(server, retry_policy=RetryPolicy(max_retries=0))
+        agent = ChatAgent("tester", llm, tool_registry=make_executor(), config=NATIVE)
+        assert agent.run("调用 echo") == "echo 返回 hi。"
+        assert agent.get_history()[-1].content == "echo 返回 hi。"
+        # 第一次请求携带 tools 被拒绝，之后的请求按文本格式描述工具
+        first, *rest = server.requests
+        assert first.get("tools") and not any(r.get("tools") for r in rest)
+        assert "TOOL_CALL" in rest[0]["messages"][0]["content"]
+
+
+def test_llm_streams_and_accumulates_tool_calls():
+    from fake_openai_server import FakeOpenAIServer, make_llm
+
+    def reply(body):
+        if any(m["role"] == "tool" for m in body["messages"]):
+            return "北京晴"
+        return {"content": "让我查一下。", "tool_calls": [
+            {"name": "weather", "arguments": {"city": "北京", "days": 2}},
+            {"name": "echo", "arguments": {"input": "一段比较长的输入参数"}},
+        ]}
+
+    with FakeOpenAIServer(reply=reply) as server:
+        llm = make_llm(server, coalesce=False)
+        tools = make_executor().get_openai_tools()
+        turn = llm.invoke_with_tools([{"role": "user", "content": "北京天气"}], tools)
+        assert turn.content == "让我查一下。"
+        assert [c.name for c in turn.tool_calls] == ["weather", "echo"]
+        assert turn.tool_calls[0].parse_arguments() == {"city": "北京", "days": 2}
+        assert turn.tool_calls[1].parse_arguments() == {"input": "一段比较长的输入参数"}
+        assert turn.finish_reason == "tool_calls"
+        assert server.requests[-1]["tools"] == tools
+
+        messages = [{"role": "user", "content": "北京天气"}, turn.to_message()]
+        messages += [{"role": "tool", "tool_call_id": c.id, "content": "晴"} for c in turn.tool_calls]
+        assert llm.invoke_with_tools(messages, tools).content == "北京晴"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_accumulator_joins_streamed_deltas,
+        test_openai_tool_definitions,
+        test_execute_tool_call_parses_arguments,
+        test_chat_agent_uses_native_tool_calls,
+        test_chat_agent_stops_calling_tools_after_max_iterations,
+        test_react_agent_with_function_calling,
+        test_react_agent_direct_answer_without_tool_call,
+        test_react_agent_falls_back_to_text_actions,
+        test_native_calling_is_opt_in,
+        test_chat_agent_falls_back_when_server_rejects_tools,
+        test_llm_streams_and_accumulates_tool_calls,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,63 @@
+"""
+导入耗时基准
+
+在全新的子进程中测量导入耗时，并检查重量级依赖没有在导入阶段被加载。
+耗时超过预算时失败，预算可通过环境变量调整:
+    GOAGENT_IMPORT_BUDGET_MS       导入 core / agents / tools 包本身的预算，默认 50ms
+    GOAGENT_LLM_IMPORT_BUDGET_MS   导入 GoAgentLLM / RouterLLM 的预算，默认 250ms
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只有在真正发起请求或搜索时才应加载的依赖
+HEAVY_MODULES = ("openai", "httpx", "dotenv", "pydantic", "serpapi")
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+{statement}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement: str, repeat: int = 3) -> dict:
+    """在全新子进程中执行导入语句，返回多次测量中的最小耗时及已加载的重量级依赖"""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result["ms"] < best["ms"]:
+            best = result
+    return best
+
+
+def test_package_import_is_lazy():
+    budget = float(os.getenv("GOAGENT_IMPORT_BUDGET_MS", 50))
+    result = measure("import core, agents, tools")
+    assert result["loaded"] == [], f"导入阶段加载了重量级依赖: {result['loaded']}"
+    assert result["ms"] <= budget, f"导入耗时 {result['ms']:.1f}ms 超出预算 {budget:.0f}ms"
+
+
+def test_llm_import_defers_sdk():
+    budget = float(os.getenv("GOAGENT_LLM_IMPORT_BUDGET_MS", 250))
+    result = measure("from core import GoAgentLLM, RouterLLM, LLMResponseCache, RetryPolicy, get_registry")
+    assert result["loaded"] == [], f"导入阶段加载了重量级依赖: {result['loaded']}"
+    assert result["ms"] <= budget, f"导入耗时 {result['ms']:.1f}ms 超出预算 {budget:.0f}ms"
+
+
+if __name__ == "__main__":
+    for label, statement in [
+        ("import core, agents, tools", "import core, agents, tools"),
+        ("from core import GoAgentLLM", "from core import GoAgentLLM"),
+    ]:
+        result = measure(statement)
+        print(f"{label:<32} {result['ms']:8.1f} ms  已加载: {result['loaded'] or '无'}")
@@ -0,0 +1,97 @@
+"""
+测试 LLM 响应缓存: LRU 淘汰、TTL 过期、SQLite 持久化、缓存键规范化，以及 invoke / stream_invoke / astream 的缓存重放
+
+最后几个用例使用本地伪 OpenAI 服务，无需网络与密钥。
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+import tempfile
+
+from core.cache import LRUCache, LLMResponseCache
+from fake_openai_server import FakeOpenAIServer, make_llm
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a 成为最近使用
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = LLMResponseCache(ttl=0.05)
+    cache.set("k", ["a"])
+    assert cache.get("k") == ["a"]
+    time.sleep(0.06)
+    assert cache.get("k") is None
+    assert len(cache.memory) == 0
+
+
+def test_disk_tier_persists_across_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "llm_cache.db")
+        first = LLMResponseCache(db_path=db_path)
+        first.set("k", ["你", "好"])
+        first.disk.close()
+
+        second = LLMResponseCache(db_path=db_path)
+        assert second.get("k") == ["你", "好"]
+        # 磁盘命中后提升到内存层
+        assert second.get("k") == ["你", "好"]
+        stats = second.stats()
+        assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1 and stats["memory_size"] == 1
+        second.disk.close()
+
+
+def test_key_normalizes_messages_and_includes_params():
+    key = LLMResponseCache.make_key("m", [{"role": "user", "content": " 你好\r\n世界 "}], temperature=0)
+    assert key == LLMResponseCache.make_key("m", [{"role": "user", "content": "你好\n世界", "extra": 1}], temperature=0)
+    assert key != LLMResponseCache.make_key("other", [{"role": "user", "content": "你好\n世界"}], temperature=0)
+    assert key != LLMResponseCache.make_key("m", [{"role": "user", "content": "你好\n世界"}], temperature=0.5)
+    assert key != LLMResponseCache.make_key("m", [{"role": "system", "content": "你好\n世界"}], temperature=0)
+
+
+def test_invoke_and_stream_replay_cached_chunks():
+    with FakeOpenAIServer() as server:
+        llm = make_llm(server, cache=LLMResponseCache())
+        assert llm.invoke(MESSAGES) == server.reply
+        assert llm.invoke(MESSAGES) == server.reply
+        # 流式调用按原始分块重放
+        assert list(llm.stream_invoke(MESSAGES)) == server.split_reply(server.reply)
+        assert server.request_count == 1
+        # 每次调用只查询一次缓存: 一次未命中、两次命中
+        assert (llm.cache.misses, llm.cache.hits) == (1, 2)
+
+        # 非确定性调用不使用缓存
+        assert llm.invoke(MESSAGES, temperature=0.7) == server.reply
+        assert server.request_count == 2
+
+
+def test_stream_populates_cache_for_async_replay():
+    async def collect(llm):
+        return [chunk async for chunk in llm.astream(MESSAGES)]
+
+    with FakeOpenAIServer() as server:
+        llm = make_llm(server, cache=LLMResponseCache())
+        assert "".join(llm.stream_invoke(MESSAGES)) == server.reply
+        assert asyncio.run(collect(llm)) == server.split_reply(server.reply)
+        assert server.request_count == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,163 @@
+"""
+测试本地 BM25 检索: 中日韩分词、排序、增量建索引、段的持久化与合并，以及与 SearchTool 一致的输出格式
+
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import random
+import tempfile
+from collections import Counter
+
+from core.metrics import MetricsRegistry
+from tools import ToolExecutor
+from tools.local_search import BM25Index, LocalSearchTool, tokenize, query_terms
+
+DOCUMENTS = [
+    {"title": "RTX 5090 发布", "text": "英伟达发布了新一代旗舰显卡 RTX 5090，显存提升到 32GB。", "link": "docs/gpu.md"},
+    {"title": "差旅报销流程", "text": "员工出差后需在十个工作日内提交报销单，并附上发票。", "link": "docs/travel.md"},
+    {"title": "显卡驱动安装", "text": "安装显卡驱动前请先卸载旧版本驱动，然后重启电脑。", "link": "docs/driver.md"},
+    {"title": "Python 编码规范", "text": "Python 代码遵循 PEP 8，函数与变量使用小写加下划线命名。", "link": "docs/python.md"},
+    {"title": "年假制度", "text": "入职满一年的员工享有五天带薪年假，年假可以跨年使用一次。", "link": "docs/leave.md"},
+]
+
+
+def brute_force(documents, query, k, k1=1.2, b=0.75):
+    """不做任何剪枝的 BM25 打分，用于校验索引的结果"""
+    docs = [Counter(tokenize(f"{d['title']}\n{d['text']}")) for d in documents]
+    lengths = [sum(c.values()) for c in docs]
+    avgdl = sum(lengths) / len(docs)
+    scores = {}
+    for term, qtf in Counter(query_terms(query)).items():
+        df = sum(1 for c in docs if term in c)
+        if not df:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, c in enumerate(docs):
+            tf = c.get(term)
+            if tf:
+                norm = k1 * (1 - b + b * lengths[i] / avgdl)
+                scores[i] = scores.get(i, 0.0) + qtf * idf * tf * (k1 + 1) / (tf + norm)
+    return sorted(scores.values(), reverse=True)[:k]
+
+
+def random_corpus(n, seed=7):
+    rng = random.Random(seed)
+    chars = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    rare = "鲲鹏麒麟饕餮貔貅"
+    documents = []
+    for i in range(n):
+        text = "".join(rng.choice(chars) for _ in range(rng.randint(20, 80)))
+        if i % 17 == 0:
+            text += rng.choice(rare) + rng.choice(rare)
+        documents.append({"title": f"文档{i}", "text": text, "link": f"doc/{i}"})
+    return documents
+
+
+def test_cjk_tokenization():
+    assert tokenize("英伟达GPU") == ["英", "伟", "达", "英伟", "伟达", "gpu"]
+    # 全角字母数字与大小写归一化
+    assert tokenize("ＲＴＸ５０９０") == tokenize("rtx5090") == ["rtx5090"]
+    assert query_terms("英伟达 显卡 的") == ["英伟", "伟达", "显卡", "的"]
+
+
+def test_ranking_prefers_matching_documents():
+    index = BM25Index()
+    index.add_many(DOCUMENTS)
+    hits = index.search("显卡驱动怎么安装", k=3)
+    assert hits[0].document["link"] == "docs/driver.md"
+    assert {h.document["link"] for h in hits[:2]} == {"docs/driver.md", "docs/gpu.md"}
+    assert index.search("年假", k=1)[0].document["title"] == "年假制度"
+    assert index.search("量子计算") == []
+
+
+def test_pruned_search_matches_exhaustive_scoring():
+    documents = random_corpus(600)
+    index = BM25Index()
+    index.add_many(documents)
+    for query in ["的一是鲲鹏", "中国人民", "麒麟饕餮的", "发展经济学", "了"]:
+        expected = brute_force(documents, query, 10)
+        got = [h.score for h in index.search(query, k=10)]
+        assert len(got) == len(expected)
+        assert all(abs(a - b) < 1e-9 for a, b in zip(got, expected)), query
+
+
+def test_incremental_indexing_persists_segments():
+    with tempfile.TemporaryDirectory() as path:
+        index = BM25Index(path, flush_every=2, max_segments=100)
+        index.add_many(DOCUMENTS)
+        # 5 篇文档: 两个磁盘段，最后一篇仍在内存段中，同样可以查到
+        assert len(index._segments) == 2 and len(index) == 5
+        assert index.search("年假", k=1)[0].doc_id == 4
+        index.close()
+
+        reopened = BM25Index(path)
+        assert len(reopened) == 5 and len(reopened._segments) == 3
+        assert reopened.search("显卡驱动", k=1)[0].document["link"] == "docs/driver.md"
+        doc_id = reopened.add("新加入的文档介绍了显卡散热。", title="显卡散热")
+        assert doc_id == 5
+        assert reopened.search("散热", k=1)[0].doc_id == 5
+        reopened.close()
+
+
+def test_merged_segments_score_like_single_index():
+    documents = random_corpus(300, seed=11)
+    memory = BM25Index()
+    memory.add_many(documents)
+    with tempfile.TemporaryDirectory() as path:
+        index = BM25Index(path, flush_every=40, max_segments=3)
+        index.add_many(documents)
+        index.flush()
+        assert len(index._segments) <= 3
+        index.merge()
+        assert len(index._segments) == 1
+        assert sorted(f for f in os.listdir(path) if f.endswith(".post")) == [
+            os.path.basename(index._segments[0].prefix) + ".post"
+        ]
+        for query in ["鲲鹏", "中国", "发展的方法"]:
+            expected = [(h.doc_id, round(h.score, 9)) for h in memory.search(query, k=5)]
+            assert [(h.doc_id, round(h.score, 9)) for h in index.search(query, k=5)] == expected
+        index.close()
+
+
+def test_tool_output_matches_search_tool_format():
+    index = BM25Index()
+    index.add_many(DOCUMENTS)
+    tool = LocalSearchTool(index=index, max_results=2, metrics=MetricsRegistry())
+    output = tool.execute("显卡")
+    assert output.startswith("🔎 搜索到 2 条结果，以下是前 2 条:\n【结果 1】\n📌 标题: ")
+    assert "🔗 链接: docs/driver.md" in output and "🔗 链接: docs/gpu.md" in output
+    assert tool.execute("量子计算") == "对不起，没有找到关于 '量子计算' 的信息。"
+
+    # 经由工具执行器调用时同样按整条结果截断
+    executor = ToolExecutor(metrics=MetricsRegistry(), output_budgets={"LocalSearch": 60})
+    executor.register_tool(tool)
+    budgeted = executor.execute_tool_call("LocalSearch", {"query": "显卡"})
+    assert "【结果 1】" in budgeted and "【结果 2】" not in budgeted
+
+
+def test_snippet_centers_on_first_match():
+    index = BM25Index()
+    index.add("开头的无关内容。" * 30 + "这里提到了报销流程的关键步骤。" + "结尾。" * 30, title="长文档")
+    tool = LocalSearchTool(index=index, snippet_chars=40, metrics=MetricsRegistry())
+    output = tool.execute("报销")
+    assert "报销流程" in output and "📄 摘要: …" in output
+
+
+if __name__ == "__main__":
+    tests = [
+        test_cjk_tokenization,
+        test_ranking_prefers_matching_documents,
+        test_pruned_search_matches_exhaustive_scoring,
+        test_incremental_indexing_persists_segments,
+        test_merged_segments_score_like_single_index,
+        test_tool_output_matches_search_tool_format,
+        test_snippet_centers_on_first_match,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
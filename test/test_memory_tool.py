@@ -0,0 +1,174 @@
+"""
+测试向量记忆: 嵌入、批量余弦 top-k、IVF 近似检索的召回率、删除以及内存映射的持久化
+
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+
+import numpy as np
+
+from core.metrics import MetricsRegistry
+from tools import ToolExecutor
+from tools.memory import HashingEmbedder, MemoryTool, VectorIndex
+
+MEMORIES = [
+    "用户喜欢喝美式咖啡，不加糖。",
+    "用户的项目使用 Python 3.11 和 FastAPI。",
+    "下周三下午三点与客户开会讨论合同续签。",
+    "用户对花生过敏。",
+    "报销需要在十个工作日内提交发票。",
+]
+
+
+def clustered_vectors(n, dim=32, clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def test_hashing_embedder_ranks_overlapping_text_higher():
+    embedder = HashingEmbedder(dim=128)
+    vectors = embedder.embed(["用户喜欢喝咖啡", "用户喜欢喝美式咖啡", "合同续签会议"])
+    assert vectors.shape == (3, 128) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test_add_search_delete_through_tool_actions():
+    tool = MemoryTool(metrics=MetricsRegistry())
+    executor = ToolExecutor(metrics=MetricsRegistry())
+    executor.register_tool(tool)
+    for memory in MEMORIES:
+        assert "已记住" in executor.execute_tool_call("memory", {"action": "add", "content": memory})
+
+    output = executor.execute_tool_call("memory", {"action": "search", "query": "咖啡喝什么", "limit": 2})
+    assert output.startswith("🧠 找到") and "【记忆 0】" in output
+    # 直接传入文本时按检索处理
+    assert "过敏" in executor.execute_tool("memory", "花生过敏吗")
+
+    assert "已删除记忆 0" in executor.execute_tool_call("memory", {"action": "delete", "memory_id": "0"})
+    assert all(hit.memory_id != 0 for hit in tool.search("美式咖啡"))
+    assert tool.get(0) is None and tool.size == 4
+    assert "未找到" in tool.run({"action": "delete", "memory_id": 0})
+    assert "不支持的操作" in tool.run({"action": "update"})
+
+
+def test_recall_parameter_from_chat_agent_prompt():
+    from agents.chat_agent import ChatAgent
+
+    tool = MemoryTool(metrics=MetricsRegistry())
+    tool.add_many(MEMORIES)
+    agent = ChatAgent("tester", llm=None, tool_registry=ToolExecutor(metrics=MetricsRegistry()))
+    # ChatAgent 提示词中的示例: [TOOL_CALL:memory:recall=用户信息]
+    output = tool.run(agent._parse_tool_parameters("memory", "recall=花生过敏"))
+    assert output.startswith("🧠 找到") and "过敏" in output
+
+
+def test_batched_search_matches_single_queries():
+    tool = MemoryTool(metrics=MetricsRegistry())
+    tool.add_many(MEMORIES)
+    queries = ["合同会议", "发票报销", "FastAPI 项目"]
+    batched = tool.search_many(queries, k=3)
+    for query, hits in zip(queries, batched):
+        single = tool.search(query, k=3)
+        assert [h.memory_id for h in hits] == [h.memory_id for h in single]
+    assert batched[0][0].content == MEMORIES[2]
+
+
+def test_ivf_recall_against_exact_search():
+    vectors = clustered_vectors(6000)
+    exact = VectorIndex(32, ivf_threshold=None)
+    approx = VectorIndex(32, nlist=64, nprobe=8, ivf_threshold=4000)
+    exact.add(vectors)
+    for start in range(0, len(vectors), 1000):
+        approx.add(vectors[start:start + 1000])
+    assert approx.centroids is not None and exact.centroids is None
+
+    queries = clustered_vectors(50, seed=1)
+    truth = exact.search(queries, k=10)
+    found = approx.search(queries, k=10)
+    recall = np.mean([len({i for i, _ in t} & {i for i, _ in f}) / 10 for t, f in zip(truth, found)])
+    assert recall >= 0.9, recall
+
+    # 删除的向量不再出现在近似检索结果中
+    removed = [i for i, _ in found[0][:3]]
+    assert approx.delete(removed + removed) == 3
+    assert not {i for i, _ in approx.search(queries[:1], k=10)[0]} & set(removed)
+
+
+def test_persistence_with_memory_mapped_files():
+    with tempfile.TemporaryDirectory() as path:
+        tool = MemoryTool(path=path, metrics=MetricsRegistry(), ivf_threshold=None)
+        ids = tool.add_many(MEMORIES)
+        tool.delete(ids[3])
+        expected = [(h.memory_id, round(h.score, 6)) for h in tool.search("客户开会")]
+        tool.close()
+
+        reopened = MemoryTool(path=path, metrics=MetricsRegistry(), ivf_threshold=None)
+        assert isinstance(reopened.index._vectors.data, np.memmap)
+        assert reopened.size == 4 and reopened.get(ids[3]) is None
+        assert [(h.memory_id, round(h.score, 6)) for h in reopened.search("客户开会")] == expected
+        assert reopened.get(ids[1]).content == MEMORIES[1]
+        assert reopened.add("新的记忆: 用户改喝拿铁。") == 5
+        assert reopened.search("拿铁", k=1)[0].memory_id == 5
+        reopened.close()
+
+
+def test_tool_writes_append_offsets_periodically():
+    with tempfile.TemporaryDirectory() as path:
+        tool = MemoryTool(path=path, metrics=MetricsRegistry(), ivf_threshold=None, flush_every=2)
+        idx = os.path.join(path, "records.jsonl.idx")
+        tool.run({"action": "add", "content": MEMORIES[0]})
+        assert os.path.getsize(idx) == 0
+        # 未写入磁盘的新记录仍然可以检索到
+        assert "咖啡" in tool.run({"action": "search", "query": "美式咖啡"})
+        tool.run({"action": "add", "content": MEMORIES[1]})
+        assert os.path.getsize(idx) == 3 * 8
+        inode = os.stat(idx).st_ino
+        tool.add_many(MEMORIES[2:])
+        tool.close()
+        # 偏移表原地追加，而不是整体重写
+        assert os.path.getsize(idx) == 6 * 8 and os.stat(idx).st_ino == inode
+
+        # 未写完整的偏移在重新打开时被丢弃
+        with open(idx, "ab") as f:
+            f.write(b"\x01\x02\x03")
+        reopened = MemoryTool(path=path, metrics=MetricsRegistry(), ivf_threshold=None)
+        assert reopened.size == 5 and reopened.get(4).content == MEMORIES[4]
+        assert reopened.add("新的记忆") == 5
+        reopened.close()
+        assert os.path.getsize(idx) == 7 * 8
+
+
+def test_trained_index_survives_reopen():
+    vectors = clustered_vectors(3000, seed=2)
+    with tempfile.TemporaryDirectory() as path:
+        index = VectorIndex(32, path=path, nlist=32, ivf_threshold=2000)
+        index.add(vectors)
+        expected = index.search(vectors[:5], k=5)
+        index.flush()
+
+        reopened = VectorIndex(32, path=path, nlist=32)
+        assert reopened.centroids is not None and reopened.count == 3000
+        assert reopened.search(vectors[:5], k=5) == expected
+
+
+if __name__ == "__main__":
+    tests = [
+        test_hashing_embedder_ranks_overlapping_text_higher,
+        test_add_search_delete_through_tool_actions,
+        test_recall_parameter_from_chat_agent_prompt,
+        test_batched_search_matches_single_queries,
+        test_ivf_recall_against_exact_search,
+        test_persistence_with_memory_mapped_files,
+        test_tool_writes_append_offsets_periodically,
+        test_trained_index_survives_reopen,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
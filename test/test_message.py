@@ -0,0 +1,88 @@
+"""
+测试消息与按列存储的消息集合
+
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+from core.message import Message, MessageStore
+
+
+def test_message_is_slotted_with_lazy_fields():
+    message = Message("你好", "user")
+    assert not hasattr(message, "__dict__")
+    assert message._metadata is None
+    assert isinstance(message.timestamp, datetime)
+    message.metadata["source"] = "test"
+    assert message.metadata == {"source": "test"}
+    assert str(message) == "[user] 你好"
+
+
+def test_message_rejects_unknown_role():
+    try:
+        Message("hi", "robot")
+    except ValueError:
+        return
+    raise AssertionError("未知角色应当抛出 ValueError")
+
+
+def test_to_dict_is_cached_until_content_changes():
+    message = Message("hi", "assistant")
+    first = message.to_dict()
+    assert message.to_dict() is first
+    message.content = "changed"
+    assert message.to_dict() == {"role": "assistant", "content": "changed"}
+
+
+def test_store_round_trips_messages():
+    when = datetime(2024, 1, 1, 12, 0, 0)
+    store = MessageStore([Message("问题", "user", timestamp=when), Message("回答", "assistant", metadata={"k": 1})])
+    store.append("工具结果", "tool")
+    assert len(store) == 3
+    assert store[0].timestamp == when
+    assert store[1].metadata == {"k": 1}
+    assert store[-1].role == "tool"
+    assert [m.content for m in store] == ["问题", "回答", "工具结果"]
+
+
+def test_store_openai_list_is_built_incrementally():
+    store = MessageStore()
+    store.append("a", "user")
+    openai = store.to_openai()
+    first = openai[0]
+    store.append("b", "assistant")
+    assert store.to_openai() is openai
+    assert openai[0] is first
+    assert openai == [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}]
+
+
+def test_store_bulk_serialization():
+    store = MessageStore()
+    for i in range(1000):
+        store.append(f"消息{i}", ("user", "assistant")[i % 2], timestamp=float(i), metadata={"i": i} if i % 100 == 0 else None)
+    restored = MessageStore.loads(store.dumps())
+    assert len(restored) == 1000
+    assert restored[999].content == "消息999"
+    assert restored[999].role == "assistant"
+    assert restored[500].metadata == {"i": 500}
+    assert restored[501]._metadata is None
+    assert restored.to_openai() == store.to_openai()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_message_is_slotted_with_lazy_fields,
+        test_message_rejects_unknown_role,
+        test_to_dict_is_cached_until_content_changes,
+        test_store_round_trips_messages,
+        test_store_openai_list_is_built_incrementally,
+        test_store_bulk_serialization,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
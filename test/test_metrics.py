@@ -0,0 +1,71 @@
+"""
+测试 LLM 调用、工具调用与 Agent 步骤的指标采集
+
+使用本地伪 OpenAI 服务，无需网络与密钥。
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+from core import MetricsRegistry
+from tools import ToolExecutor
+from tools.base import BaseTool
+from agents import ReActAgent
+from fake_openai_server import FakeOpenAIServer, make_llm
+
+
+class EchoTool(BaseTool):
+    def __init__(self):
+        super().__init__(name="Echo", description="原样返回输入")
+
+    def execute(self, input_data: str) -> str:
+        return input_data
+
+
+def test_llm_call_metrics():
+    registry = MetricsRegistry()
+    with FakeOpenAIServer(latency=0.05) as server:
+        llm = make_llm(server, metrics=registry)
+        for _ in range(3):
+            assert llm.invoke([{"role": "user", "content": "你好"}]) == server.reply
+
+    assert registry.get("goagent_llm_requests_total").get(model="fake-model", status="ok") == 3
+    ttft = registry.get("goagent_llm_ttft_seconds")
+    assert ttft.count(model="fake-model") == 3
+    assert ttft.quantile(0.5, model="fake-model") >= 0.05
+    tokens = registry.get("goagent_llm_tokens_total")
+    assert tokens.get(model="fake-model", type="completion") == 3 * len(server.reply)
+
+
+def test_agent_and_tool_metrics_export():
+    registry = MetricsRegistry()
+    reply = "Thought: 需要调用工具\nAction: Echo[hello]"
+    with FakeOpenAIServer(reply=reply) as server:
+        llm = make_llm(server, metrics=registry)
+        executor = ToolExecutor(metrics=registry)
+        executor.register_tool(EchoTool())
+        agent = ReActAgent(llm_client=llm, tool_executor=executor, max_steps=2)
+        agent.metrics = registry
+        agent.run("测试")
+
+    assert registry.get("goagent_tool_calls_total").get(tool="Echo", status="ok") == 2
+    steps = registry.get("goagent_agent_step_duration_seconds")
+    assert steps.count(agent="ReAct Agent", step="llm") == 2
+    assert registry.get("goagent_agent_runs_total").get(agent="ReAct Agent", status="ok") == 1
+    assert registry.get("goagent_agent_tokens_total").get(agent="ReAct Agent", type="completion") > 0
+
+    text = registry.to_prometheus()
+    assert "# TYPE goagent_agent_run_duration_seconds histogram" in text
+    assert 'goagent_tool_duration_seconds_count{tool="Echo"} 2' in text
+    assert "goagent_llm_requests_total" in json.loads(registry.to_json())
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -7,10 +7,14 @@ from dotenv import load_dotenv
 from core import GoAgentLLM
 from tools import ToolExecutor, SearchTool
 from agents.react_agent import ReActAgent
+from core.events import set_event_sink, ConsoleSink
 
 # 加载环境变量
 load_dotenv()
 
+# 在控制台输出运行过程
+set_event_sink(ConsoleSink())
+
 # 初始化组件
 llm_client = GoAgentLLM()
 tool_executor = ToolExecutor()
@@ -0,0 +1,96 @@
+"""
+测试 ReActAgent 的提示词布局
+
+使用按脚本回复的假 LLM，无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import ToolExecutor
+from tools.base import BaseTool
+from agents.react_agent import ReActAgent
+
+
+class EchoTool(BaseTool):
+    def __init__(self, name: str = "echo"):
+        super().__init__(name, "原样返回输入。")
+
+    def execute(self, input_data: str) -> str:
+        return f"echo: {input_data}"
+
+
+class ScriptedLLM:
+    """依次返回预设的回复，并记录每次收到的消息"""
+
+    model = "scripted"
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def invoke(self, messages, **kwargs):
+        self.calls.append(messages)
+        return self.replies.pop(0)
+
+
+def make_agent(replies):
+    executor = ToolExecutor()
+    executor.register_tool(EchoTool())
+    llm = ScriptedLLM(replies)
+    return ReActAgent(llm_client=llm, tool_executor=executor, max_steps=5), llm
+
+
+def test_prompt_prefix_is_stable_across_steps():
+    agent, llm = make_agent([
+        "Thought: 先查一下。\nAction: echo[a]",
+        "Thought: 再查一下。\nAction: echo[b]",
+        "Thought: 够了。\nAction: Finish[完成]",
+    ])
+    assert agent.run("问题") == "完成"
+    assert len(llm.calls) == 3
+    systems = [call[0]["content"] for call in llm.calls]
+    users = [call[1]["content"] for call in llm.calls]
+    # 系统消息逐字节不变，用户消息只在末尾追加
+    assert len(set(systems)) == 1
+    assert "echo: 原样返回输入。" in systems[0]
+    for previous, current in zip(users, users[1:]):
+        assert current.startswith(previous)
+    assert users[2].endswith("Action: echo[b]\nObservation: echo: b\n")
+
+
+def test_system_prompt_is_cached_until_tools_change():
+    agent, _ = make_agent([])
+    first = agent._build_messages("问题")[0]["content"]
+    assert agent._build_messages("问题")[0]["content"] is first
+    agent.tool_registry.register_tool(EchoTool("shout"))
+    second = agent._build_messages("问题")[0]["content"]
+    assert second is not first
+    assert "shout" in second
+    assert agent.tool_registry.unregister("shout")
+    assert "shout" not in agent._build_messages("问题")[0]["content"]
+
+
+def test_new_task_resets_history():
+    agent, llm = make_agent([
+        "Thought: 查。\nAction: echo[x]",
+        "Thought: 好。\nAction: Finish[一]",
+        "Thought: 直接回答。\nAction: Finish[二]",
+    ])
+    agent.run("第一个问题")
+    agent.run("第二个问题")
+    last_user = llm.calls[-1][1]["content"]
+    assert "第二个问题" in last_user
+    assert "Observation" not in last_user
+
+
+if __name__ == "__main__":
+    tests = [
+        test_prompt_prefix_is_stable_across_steps,
+        test_system_prompt_is_cached_until_tools_change,
+        test_new_task_resets_history,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -6,10 +6,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 from core import GoAgentLLM
 from agents import ReflectionAgent
+from core.events import set_event_sink, ConsoleSink
 
 # 加载环境变量
 load_dotenv()
 
+# 在控制台输出运行过程
+set_event_sink(ConsoleSink())
+
 # 初始化组件
 llm_client = GoAgentLLM()
 
@@ -0,0 +1,150 @@
+"""
+测试 GoAgentLLM 的重试、熔断与对冲请求
+
+使用本地注入故障的伪 OpenAI 服务，无需网络与密钥。
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+
+from core.resilience import RetryPolicy, CircuitBreaker, HedgePolicy, CircuitOpenError
+from fake_openai_server import FakeOpenAIServer, make_llm
+
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+def test_retry_recovers_from_transient_errors():
+    fault_plan = [{"status": 503}, {"status": 500}]
+    with FakeOpenAIServer(fault_plan=fault_plan) as server:
+        llm = make_llm(server, retry_policy=RetryPolicy(max_retries=2, base_delay=0.01))
+        result = llm.invoke(MESSAGES)
+        assert result == server.reply
+        assert server.request_count == 3
+
+
+def test_retry_honors_retry_after():
+    with FakeOpenAIServer(fault_plan=[{"status": 429, "retry_after": 0.5}]) as server:
+        llm = make_llm(server, retry_policy=RetryPolicy(max_retries=1, base_delay=0.01))
+        start = time.perf_counter()
+        assert llm.invoke(MESSAGES) == server.reply
+        assert time.perf_counter() - start >= 0.5
+
+
+def test_non_retryable_status_fails_fast():
+    with FakeOpenAIServer(fault_plan=[{"status": 400}]) as server:
+        llm = make_llm(server, retry_policy=RetryPolicy(max_retries=3, base_delay=0.01))
+        assert llm.invoke(MESSAGES) is None
+        assert server.request_count == 1
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.3)
+    with FakeOpenAIServer(fault_plan=[{"status": 503}, {"status": 503}]) as server:
+        llm = make_llm(server, retry_policy=RetryPolicy(max_retries=0), circuit_breaker=breaker)
+        assert llm.invoke(MESSAGES) is None
+        assert llm.invoke(MESSAGES) is None
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # 熔断期间不会触达服务端
+        assert llm.invoke(MESSAGES) is None
+        assert server.request_count == 2
+
+        time.sleep(0.35)
+        assert llm.invoke(MESSAGES) == server.reply
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_half_open_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    try:
+        breaker.before_call()
+        assert False, "熔断器应处于打开状态"
+    except CircuitOpenError:
+        pass
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def open_then_half_open(breaker: CircuitBreaker) -> None:
+    breaker.record_failure()
+    time.sleep(breaker.recovery_timeout + 0.01)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_probe_released_when_stream_closed_early():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    with FakeOpenAIServer(chunk_delay=0.01) as server:
+        llm = make_llm(server, circuit_breaker=breaker, coalesce=False)
+        open_then_half_open(breaker)
+        stream = llm.stream_invoke(MESSAGES)
+        next(stream)
+        # 调用方提前关闭流，试探请求没有结论
+        stream.close()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert llm.invoke(MESSAGES) == server.reply
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_probe_released_when_async_stream_closed_early():
+    async def first_chunk(llm):
+        stream = llm.astream(MESSAGES)
+        chunk = await stream.__anext__()
+        await stream.aclose()
+        return chunk
+
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    with FakeOpenAIServer(chunk_delay=0.01) as server:
+        llm = make_llm(server, circuit_breaker=breaker, coalesce=False)
+        open_then_half_open(breaker)
+        assert asyncio.run(first_chunk(llm))
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert asyncio.run(llm.ainvoke(MESSAGES)) == server.reply
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_release_only_frees_half_open_slot():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    assert breaker.before_call() is False
+    open_then_half_open(breaker)
+    assert breaker.before_call() is True
+    try:
+        breaker.before_call()
+        assert False, "半开状态只允许一个试探请求"
+    except CircuitOpenError:
+        pass
+    breaker.release()
+    assert breaker.before_call() is True
+
+
+def test_hedged_request_cuts_tail_latency():
+    hedge = HedgePolicy(initial_delay=0.1, min_samples=1000)
+    with FakeOpenAIServer(fault_plan=[{"delay": 2.0}]) as server:
+        llm = make_llm(server, hedge_policy=hedge)
+        start = time.perf_counter()
+        assert llm.invoke(MESSAGES) == server.reply
+        assert time.perf_counter() - start < 1.0
+        assert hedge.hedges_sent == 1
+        assert hedge.hedges_won == 1
+
+
+def test_retry_policy_backoff_is_bounded():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0, jitter=False)
+    assert [policy.compute_delay(i) for i in range(4)] == [1.0, 2.0, 4.0, 4.0]
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+    assert all(0 <= policy.compute_delay(3) <= 4.0 for _ in range(50))
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
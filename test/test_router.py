@@ -0,0 +1,154 @@
+"""
+测试 RouterLLM 的多节点负载均衡、节点摘除与并发上限
+
+使用多个本地伪 OpenAI 服务，无需网络与密钥。
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+
+from core import RouterLLM
+from core.resilience import RetryPolicy, CircuitBreaker
+from fake_openai_server import FakeOpenAIServer
+
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+def make_router(servers, **kwargs) -> RouterLLM:
+    return RouterLLM(
+        endpoints=[server.base_url for server in servers],
+        model="fake-model",
+        api_key="sk-fake",
+        **kwargs
+    )
+
+
+def test_requests_spread_across_endpoints():
+    with FakeOpenAIServer(latency=0.05) as a, FakeOpenAIServer(latency=0.05) as b:
+        router = make_router([a, b])
+        result = router.invoke_many([MESSAGES] * 20, max_workers=8)
+        assert not result.errors
+        assert a.request_count + b.request_count == 20
+        assert a.request_count >= 5 and b.request_count >= 5
+
+
+def test_async_requests_spread_across_endpoints():
+    with FakeOpenAIServer(latency=0.05) as a, FakeOpenAIServer(latency=0.05) as b:
+        router = make_router([a, b])
+
+        async def main():
+            try:
+                return await router.ainvoke_many([MESSAGES] * 20)
+            finally:
+                await router.aclose()
+
+        result = asyncio.run(main())
+        assert not result.errors
+        assert a.request_count >= 5 and b.request_count >= 5
+
+
+def test_failed_endpoint_fails_over_and_is_ejected():
+    with FakeOpenAIServer(error_rate=1.0) as bad, FakeOpenAIServer() as good:
+        router = make_router(
+            [bad, good],
+            retry_policy=RetryPolicy(max_retries=1, base_delay=0.01),
+            failure_threshold=2,
+            ejection_time=60,
+        )
+        for _ in range(10):
+            assert router.invoke(MESSAGES) == good.reply
+        # 连续失败两次后被摘除，之后的请求不再发往故障节点
+        assert bad.request_count == 2
+        assert router.stats()[0]["ejected"]
+
+
+def test_per_endpoint_concurrency_cap():
+    with FakeOpenAIServer(latency=0.2) as a, FakeOpenAIServer(latency=0.2) as b:
+        router = RouterLLM(
+            endpoints=[{"base_url": a.base_url, "max_concurrency": 1}, {"base_url": b.base_url, "max_concurrency": 1}],
+            model="fake-model",
+            api_key="sk-fake",
+        )
+        start = time.perf_counter()
+        result = router.invoke_many([MESSAGES] * 4, max_workers=4)
+        elapsed = time.perf_counter() - start
+        assert not result.errors
+        # 两个节点各只允许一个在途请求，4 个请求至少需要两轮
+        assert elapsed >= 0.4
+        assert a.request_count == 2 and b.request_count == 2
+
+
+def test_latency_strategy_prefers_fast_endpoint():
+    with FakeOpenAIServer(latency=0.3) as slow, FakeOpenAIServer(latency=0.01) as fast:
+        router = make_router([slow, fast], strategy=RouterLLM.LATENCY)
+        for _ in range(10):
+            assert router.invoke(MESSAGES) == fast.reply
+        # 慢节点最多在取得第一个样本时被选中一次，之后尚无样本的快节点优先，随后一直选择快节点
+        assert slow.request_count <= 1 and fast.request_count >= 9
+
+
+def test_async_router_reused_across_event_loops():
+    with FakeOpenAIServer(latency=0.05) as a, FakeOpenAIServer(latency=0.05) as b:
+        router = RouterLLM(
+            endpoints=[{"base_url": a.base_url, "max_concurrency": 1}, {"base_url": b.base_url, "max_concurrency": 1}],
+            model="fake-model",
+            api_key="sk-fake",
+        )
+        batch = [[{"role": "user", "content": f"问题 {i}"}] for i in range(4)]
+        # 节点满载时需要等待释放事件，第二次 asyncio.run 使用新的事件循环
+        for _ in range(2):
+            result = asyncio.run(router.ainvoke_many(batch))
+            assert not result.errors
+        assert a.request_count + b.request_count == 8
+
+
+def test_async_waiter_woken_by_sync_release():
+    with FakeOpenAIServer(chunk_delay=0.01) as server:
+        router = RouterLLM(
+            endpoints=[{"base_url": server.base_url, "max_concurrency": 1}],
+            model="fake-model",
+            api_key="sk-fake",
+            coalesce=False,
+        )
+        # 同步流式调用占满唯一的节点
+        stream = router.stream_invoke(MESSAGES)
+        next(stream)
+
+        async def main():
+            waiter = asyncio.create_task(router.astream(MESSAGES).__anext__())
+            await asyncio.sleep(0.02)
+            assert not waiter.done()
+            # 在其他线程中释放节点，异步等待者应立即被唤醒而不是等到下一次轮询
+            await asyncio.get_running_loop().run_in_executor(None, stream.close)
+            start = time.perf_counter()
+            assert await waiter
+            return time.perf_counter() - start
+
+        assert asyncio.run(main()) < 0.05
+
+def test_probe_released_when_routed_stream_closed_early():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    with FakeOpenAIServer(chunk_delay=0.01) as a, FakeOpenAIServer(chunk_delay=0.01) as b:
+        router = make_router([a, b], circuit_breaker=breaker, coalesce=False)
+        breaker.record_failure()
+        time.sleep(0.06)
+        stream = router.stream_invoke(MESSAGES)
+        next(stream)
+        stream.close()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert router.invoke(MESSAGES) == a.reply
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert all(endpoint["outstanding"] == 0 for endpoint in router.stats())
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,84 @@
+"""
+测试 ReAct 执行历史的截断、压缩与滑动窗口
+
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.scratchpad import Scratchpad
+
+
+def search_blob(topic: str, i: int) -> str:
+    """模拟多条结果的搜索输出，只有一句与问题相关"""
+    noise = "".join(f"无关的第{j}条结果介绍了别的产品和广告。" for j in range(30))
+    return f"{noise}{topic}显卡的型号是RTX{5000 + i}。{noise}"
+
+
+def test_long_observation_is_truncated():
+    pad = Scratchpad(max_observation_tokens=50)
+    pad.add("search[x]", "很长的内容" * 200)
+    assert "已截断" in pad.text
+    assert pad.tokens < 100
+
+
+def test_recent_steps_stay_verbatim_and_older_are_compressed():
+    pad = Scratchpad(max_observation_tokens=None, window=2, stride=2, compressed_tokens=40, max_tokens=None)
+    pad.reset("英伟达最新的显卡型号是什么")
+    for i in range(4):
+        pad.add(f"search[英伟达 {i}]", search_blob("英伟达", i))
+    assert pad.compressions == 1
+    steps = pad.text.split("Action: ")[1:]
+    # 最早的两步只保留了相关的句子
+    assert "(摘录)" in steps[0] and "RTX5000" in steps[0]
+    assert "无关的第29条" not in steps[0]
+    # 最近的两步保持原文
+    assert steps[3].endswith(search_blob("英伟达", 3) + "\n")
+
+
+def test_prompt_size_stays_bounded():
+    pad = Scratchpad(max_observation_tokens=300, window=3, stride=2, compressed_tokens=60, max_tokens=1500)
+    pad.reset("英伟达最新的显卡型号是什么")
+    sizes = []
+    for i in range(40):
+        pad.add(f"search[英伟达 {i}]", search_blob("英伟达", i))
+        sizes.append(pad.tokens)
+    assert max(sizes[10:]) <= 1500 + 5 * 320
+    assert sizes[-1] - sizes[10] < 600
+    assert "(已省略)" in pad.text
+
+
+def test_agent_keeps_passed_empty_scratchpad():
+    from agents.react_agent import ReActAgent
+    from tools import ToolExecutor
+
+    # 空的 Scratchpad 长度为0，不能被当作未传入而换成默认参数
+    pad = Scratchpad(max_observation_tokens=50, window=2)
+    agent = ReActAgent(llm_client=None, tool_executor=ToolExecutor(), scratchpad=pad)
+    assert agent.scratchpad is pad
+
+
+def test_text_is_append_only_between_compressions():
+    pad = Scratchpad(max_observation_tokens=None, window=2, stride=3, max_tokens=None)
+    texts = []
+    for i in range(8):
+        pad.add(f"a[{i}]", f"observation {i}")
+        texts.append(pad.text)
+    compressed_at = {i for i in range(1, 8) if not texts[i].startswith(texts[i - 1])}
+    # window + stride 步之后每 stride 步压缩一次，其余步骤只在末尾追加
+    assert len(compressed_at) <= 2
+
+
+if __name__ == "__main__":
+    tests = [
+        test_long_observation_is_truncated,
+        test_recent_steps_stay_verbatim_and_older_are_compressed,
+        test_prompt_size_stays_bounded,
+        test_agent_keeps_passed_empty_scratchpad,
+        test_text_is_append_only_between_compressions,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,133 @@
+"""
+测试 SearchTool 的连接复用、异步与批量查询，以及 RateLimiter
+
+在本地伪 SerpApi 服务上运行，无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import asyncio
+
+from core.resilience import RateLimiter
+from fake_serpapi_server import FakeSerpApiServer
+
+
+def make_tool(server, **kwargs):
+    from tools.search import SearchTool
+    os.environ["SERPAPI_API_KEY"] = "fake-key"
+    os.environ["SEARCH_CACHE"] = "false"
+    return SearchTool(base_url=server.base_url, **kwargs)
+
+
+def test_rate_limiter_allows_burst_then_paces():
+    limiter = RateLimiter(rate=20, burst=2)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    # 前两个令牌立即放行，其余每个间隔 1/20 秒
+    assert time.monotonic() - start >= 4 / 20 * 0.9
+
+
+def test_rate_limiter_async_callers_are_paced():
+    limiter = RateLimiter(rate=50, burst=1)
+
+    async def main():
+        await asyncio.gather(*(limiter.aacquire() for _ in range(6)))
+
+    start = time.monotonic()
+    asyncio.run(main())
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+def test_connections_are_reused():
+    with FakeSerpApiServer() as server:
+        tool = make_tool(server)
+        for i in range(5):
+            assert "结果1" in tool.execute(f"查询{i}")
+        tool.close()
+    assert server.request_count == 5
+    assert server.connection_count == 1
+
+
+def test_aexecute_returns_formatted_results():
+    results = {"天气": {"answer_box": {"answer": "晴"}}}
+    with FakeSerpApiServer(results=results) as server:
+        tool = make_tool(server)
+
+        async def main():
+            try:
+                return await tool.aexecute("天气")
+            finally:
+                await tool.aclose()
+
+        assert asyncio.run(main()) == "【直接答案】\n晴"
+
+
+def test_aexecute_across_event_loops():
+    with FakeSerpApiServer() as server:
+        tool = make_tool(server)
+        # 每次 asyncio.run 使用新的事件循环，异步连接池随之重建
+        assert "结果1" in asyncio.run(tool.aexecute("a"))
+        assert "结果1" in asyncio.run(tool.aexecute("b"))
+    assert server.request_count == 2
+
+
+def test_search_many_runs_concurrently_and_keeps_order():
+    queries = [f"问题{i}" for i in range(8)]
+    with FakeSerpApiServer(latency=0.2) as server:
+        tool = make_tool(server, max_connections=4)
+        start = time.monotonic()
+        outputs = tool.search_many(queries)
+        elapsed = time.monotonic() - start
+    assert [q in out for q, out in zip(queries, outputs)] == [True] * 8
+    # 8 个请求、并发 4，约两轮延迟
+    assert elapsed < 0.2 * 8 / 2
+    assert server.max_in_flight == 4
+    assert server.connection_count <= 4
+
+
+def test_search_many_respects_rate_limit():
+    with FakeSerpApiServer() as server:
+        tool = make_tool(server, rate_limit=10)
+        start = time.monotonic()
+        tool.search_many([f"q{i}" for i in range(15)])
+        elapsed = time.monotonic() - start
+    # 桶容量为 10，其余 5 个请求每 0.1 秒放行一个
+    assert elapsed >= 0.4
+    gaps = [b - a for a, b in zip(server.request_times[10:], server.request_times[11:])]
+    assert min(gaps) >= 0.05
+
+
+def test_replays_recorded_serpapi_json(tmp_path=None):
+    from core.cassette import Cassette
+    import tempfile
+    path = os.path.join(tmp_path or tempfile.mkdtemp(), "search.jsonl")
+    request = {"engine": "google", "q": "录制的查询", "gl": "cn", "hl": "zh-cn"}
+    recorder = Cassette(path, Cassette.RECORD)
+    recorder.record("serpapi", request, {"result": {"knowledge_graph": {"title": "GoAgent", "description": "录制的描述"}}})
+
+    with FakeSerpApiServer(cassette=path) as server:
+        tool = make_tool(server)
+        assert "录制的描述" in tool.execute("录制的查询")
+        assert "没有找到" in tool.execute("未录制的查询")
+        tool.close()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_rate_limiter_allows_burst_then_paces,
+        test_rate_limiter_async_callers_are_paced,
+        test_connections_are_reused,
+        test_aexecute_returns_formatted_results,
+        test_aexecute_across_event_loops,
+        test_search_many_runs_concurrently_and_keeps_order,
+        test_search_many_respects_rate_limit,
+        test_replays_recorded_serpapi_json,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,99 @@
+"""
+测试搜索结果缓存
+
+用返回固定结果的 SearchTool 子类代替真实的 SerpApi 请求，无需网络与密钥，
+可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import time
+
+from core.cache import SearchResultCache
+from core.metrics import MetricsRegistry
+from tools.search import SearchTool
+
+RESULTS = {"answer_box": {"answer": "RTX 5090"}}
+EMPTY = {"error": "Google hasn't returned any results for this query."}
+
+
+class CountingSearchTool(SearchTool):
+    """记录请求次数，查询中包含"没有"时返回空结果"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = "test-key"
+        self.fetches = 0
+
+    def _fetch(self, params):
+        self.fetches += 1
+        return EMPTY if "没有" in params["q"] else RESULTS
+
+
+def test_repeated_queries_hit_cache():
+    metrics = MetricsRegistry()
+    tool = CountingSearchTool(cache=SearchResultCache(), metrics=metrics)
+    assert "RTX 5090" in tool.execute("英伟达 最新显卡")
+    # 大小写、全角字符与多余空白不影响缓存键
+    assert "RTX 5090" in tool.execute("  英伟达　最新显卡 ")
+    assert tool.fetches == 1
+    assert tool.cache.hit_rate == 0.5
+    counter = metrics.get("goagent_search_cache_total")
+    assert counter.get(result="hit") == 1 and counter.get(result="miss") == 1
+
+
+def test_locale_params_are_part_of_key():
+    base = {"engine": "google", "q": "Python", "gl": "cn", "hl": "zh-cn"}
+    other = dict(base, hl="en")
+    assert SearchResultCache.make_key(base) != SearchResultCache.make_key(other)
+    assert SearchResultCache.make_key(base) == SearchResultCache.make_key(dict(base, q="python", api_key="x"))
+
+
+def test_empty_results_are_negatively_cached_with_short_ttl():
+    tool = CountingSearchTool(cache=SearchResultCache(ttl=60, negative_ttl=0.05))
+    tool.execute("没有结果的查询")
+    tool.execute("没有结果的查询")
+    assert tool.fetches == 1
+    assert tool.cache.negative_hits == 1
+    time.sleep(0.1)
+    tool.execute("没有结果的查询")
+    assert tool.fetches == 2
+    # 过期的负缓存计为未命中，各层的命中数与总命中数一致
+    stats = tool.cache.stats()
+    assert (stats["hits"], stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0, 2)
+    assert stats["hit_rate"] == 1 / 3
+
+
+def test_errors_are_not_cached():
+    cache = SearchResultCache()
+    assert not cache.store({"q": "x"}, {"error": "Invalid API key."})
+    assert cache.lookup({"q": "x"}) is None
+
+
+def test_disk_cache_survives_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "search.db")
+        tool = CountingSearchTool(cache=SearchResultCache(db_path=path))
+        tool.execute("英伟达 最新显卡")
+        restarted = CountingSearchTool(cache=SearchResultCache(db_path=path))
+        assert "RTX 5090" in restarted.execute("英伟达 最新显卡")
+        assert restarted.fetches == 0
+        assert restarted.cache.stats()["disk_hits"] == 1
+        tool.cache.disk.close()
+        restarted.cache.disk.close()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_repeated_queries_hit_cache,
+        test_locale_params_are_part_of_key,
+        test_empty_results_are_negatively_cached_with_short_ttl,
+        test_errors_are_not_cached,
+        test_disk_cache_survives_restart,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -8,10 +8,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from dotenv import load_dotenv
 from tools import SearchTool
+from core.events import set_event_sink, ConsoleSink
 
 # 加载环境变量
 load_dotenv()
 
+# 在控制台输出运行过程
+set_event_sink(ConsoleSink())
+
 # 创建搜索工具
 search_tool = SearchTool()
 
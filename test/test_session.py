@@ -0,0 +1,139 @@
+"""
+测试会话日志与快照
+
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+
+from core.message import Message
+from core.context import ContextWindow
+from core.session import SessionStore
+
+
+def add_turn(session, window: ContextWindow, i: int) -> None:
+    for message in (Message(f"问题{i}", "user"), Message(f"回答{i}", "assistant", metadata={"i": i})):
+        window.append(message)
+        session.append(message)
+        session.maybe_snapshot(window)
+
+
+def test_session_round_trip_across_processes():
+    with tempfile.TemporaryDirectory() as root:
+        store = SessionStore(root, snapshot_every=10)
+        window = ContextWindow(max_messages=6, pinned_turns=1)
+        with store.open("abc") as session:
+            for i in range(25):
+                add_turn(session, window, i)
+
+        # 另一个进程中按 id 重新打开
+        assert store.list() == ["abc"]
+        with SessionStore(root).open("abc") as session:
+            assert len(session) == 50
+            history = list(session)
+            assert history[0].content == "问题0"
+            assert history[-1].metadata == {"i": 24}
+            restored = ContextWindow(max_messages=6, pinned_turns=1)
+            session.restore(restored)
+            assert [m.content for m in restored] == [m.content for m in window]
+
+
+def test_resume_only_reads_recent_journal():
+    with tempfile.TemporaryDirectory() as root:
+        store = SessionStore(root, snapshot_every=4)
+        window = ContextWindow(max_messages=4, pinned_turns=1)
+        with store.open("long") as session:
+            for i in range(1000):
+                add_turn(session, window, i)
+            snapshot_offset = session._snapshot["offset"]
+        with store.open("long") as session:
+            # 快照之后的日志不超过 snapshot_every 条
+            tail = list(session._scan(snapshot_offset))
+            assert len(tail) < 4
+            recent = session.recent()
+            assert recent[-1].content == "回答999"
+            assert len(recent) <= 4 + 4
+
+
+def test_summary_is_snapshotted():
+    with tempfile.TemporaryDirectory() as root:
+        store = SessionStore(root, snapshot_every=2)
+        window = ContextWindow(pinned_turns=1)
+        with store.open("s") as session:
+            add_turn(session, window, 0)
+            window.set_summary("之前聊了天气", window.messages())
+            add_turn(session, window, 1)
+        restored = ContextWindow(pinned_turns=1)
+        with store.open("s") as session:
+            session.restore(restored)
+        assert restored.summary == "之前聊了天气"
+        assert [m.content for m in restored] == ["问题1", "回答1"]
+
+
+def test_restore_does_not_trigger_compaction():
+    from core.compaction import HistoryCompactor
+
+    class FailingLLM:
+        def invoke(self, messages, **kwargs):
+            raise AssertionError("恢复时不应调用总结")
+
+    with tempfile.TemporaryDirectory() as root:
+        store = SessionStore(root, snapshot_every=4)
+        window = ContextWindow(pinned_turns=1)
+        with store.open("c") as session:
+            add_turn(session, window, 0)
+            window.set_summary("之前聊了天气", window.messages())
+            for i in range(1, 6):
+                add_turn(session, window, i)
+        restored = ContextWindow(max_tokens=1000, pinned_turns=1)
+        compactor = HistoryCompactor(restored, FailingLLM(), threshold=10, keep_turns=1)
+        with store.open("c") as session:
+            session.restore(restored)
+        assert restored.summary == "之前聊了天气" and len(restored) == 10
+        assert not compactor.pending
+        compactor.close()
+
+
+def test_partial_last_line_is_repaired():
+    with tempfile.TemporaryDirectory() as root:
+        store = SessionStore(root)
+        with store.open("crash") as session:
+            session.append(Message("完整的消息", "user"))
+        with open(os.path.join(root, "crash", "journal.jsonl"), "ab") as f:
+            f.write('{"r": "assistant", "c": "写了一半'.encode("utf-8"))
+        with store.open("crash") as session:
+            session.append(Message("恢复后的消息", "user"))
+            assert [m.content for m in session] == ["完整的消息", "恢复后的消息"]
+
+
+def test_session_ids_are_validated():
+    with tempfile.TemporaryDirectory() as root:
+        store = SessionStore(root)
+        for bad in ("../escape", "a/b", ".."):
+            try:
+                store.open(bad)
+            except ValueError:
+                continue
+            raise AssertionError(f"非法的会话 id 未被拒绝: {bad}")
+        with store.open() as session:
+            assert store.exists(session.id)
+        assert store.delete(session.id)
+        assert store.list() == []
+
+
+if __name__ == "__main__":
+    tests = [
+        test_session_round_trip_across_processes,
+        test_resume_only_reads_recent_journal,
+        test_summary_is_snapshotted,
+        test_restore_does_not_trigger_compaction,
+        test_partial_last_line_is_repaired,
+        test_session_ids_are_validated,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
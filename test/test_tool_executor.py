@@ -0,0 +1,186 @@
+"""
+测试 ToolExecutor 的超时、协作式取消与按工具的并发限制
+
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+import threading
+
+from tools.base import BaseTool, ToolTimeoutError, ToolCancelledError
+from tool_helpers import make_executor
+
+
+class SlowTool(BaseTool):
+    """按输入的秒数等待，期间响应取消信号"""
+
+    def __init__(self, name: str = "slow", max_concurrency=None):
+        super().__init__(name, "等待指定的秒数。")
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.peak = 0
+        self.cancelled_calls = 0
+        self._lock = threading.Lock()
+
+    def execute(self, input_data: str) -> str:
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if self.wait_cancelled(float(input_data)):
+                with self._lock:
+                    self.cancelled_calls += 1
+                self.check_cancelled()
+            return f"slept {input_data}"
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def test_call_within_timeout_returns_result():
+    executor = make_executor(SlowTool(), default_timeout=1.0)
+    assert executor.execute_tool("slow", "0.01") == "slept 0.01"
+
+
+def test_timeout_raises_and_cancels_tool():
+    tool = SlowTool()
+    executor = make_executor(tool, timeouts={"slow": 0.1})
+    start = time.monotonic()
+    try:
+        executor.execute_tool("slow", "5")
+        assert False, "应当超时"
+    except ToolTimeoutError as e:
+        assert e.tool == "slow" and not e.queued
+        assert "执行超时(0.1s)" in str(e)
+    assert time.monotonic() - start < 1.0
+    # 工具收到取消信号后协作地结束
+    deadline = time.monotonic() + 2
+    while tool.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert tool.running == 0 and tool.cancelled_calls == 1
+    calls = executor.metrics.get("goagent_tool_calls_total")
+    assert calls.get(tool="slow", status="timeout") == 1
+
+
+def test_tool_timeout_attribute_is_used():
+    tool = SlowTool()
+    tool.timeout = 0.05
+    executor = make_executor(tool)
+    assert executor.timeout_for("slow") == 0.05
+    try:
+        executor.execute_tool("slow", "5")
+        assert False, "应当超时"
+    except ToolTimeoutError:
+        pass
+
+
+def test_external_cancel_stops_tool():
+    tool = SlowTool()
+    executor = make_executor(tool)
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    try:
+        executor.execute_tool("slow", "5", cancel=cancel)
+        assert False, "应当被取消"
+    except ToolCancelledError:
+        pass
+    assert executor.metrics.get("goagent_tool_calls_total").get(tool="slow", status="cancelled") == 1
+
+
+def test_concurrency_limit_queues_calls():
+    tool = SlowTool(max_concurrency=2)
+    executor = make_executor(tool)
+    depths = []
+
+    def sample():
+        gauge = executor.metrics.get("goagent_tool_queue_depth")
+        for _ in range(10):
+            depths.append(gauge.get(tool="slow") if gauge else 0)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=executor.execute_tool, args=("slow", "0.1")) for _ in range(6)]
+    for t in threads:
+        t.start()
+    sample()
+    for t in threads:
+        t.join()
+    assert tool.peak == 2
+    assert max(depths) >= 1
+    assert executor.metrics.get("goagent_tool_queue_depth").get(tool="slow") == 0
+
+
+def test_queue_wait_counts_against_timeout():
+    tool = SlowTool()
+    executor = make_executor(tool, concurrency_limits={"slow": 1})
+    holder = threading.Thread(target=executor.execute_tool, args=("slow", "0.5"))
+    holder.start()
+    time.sleep(0.05)
+    try:
+        executor.execute_tool("slow", "0.01", timeout=0.1)
+        assert False, "应当排队超时"
+    except ToolTimeoutError as e:
+        assert e.queued and "排队等待超时" in str(e)
+    holder.join()
+    # 名额归还后可以继续调用
+    assert executor.execute_tool("slow", "0.01", timeout=1) == "slept 0.01"
+
+
+def test_async_cancellation_propagates_to_tool():
+    tool = SlowTool()
+    executor = make_executor(tool)
+
+    async def main():
+        task = asyncio.ensure_future(executor.aexecute_tool("slow", "5"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    start = time.monotonic()
+    asyncio.run(main())
+    assert time.monotonic() - start < 2
+    assert tool.cancelled_calls == 1
+
+
+def test_react_agent_shows_timeout_as_observation():
+    from agents.react_agent import ReActAgent
+
+    class ScriptedLLM:
+        model = "scripted"
+
+        def __init__(self, replies):
+            self.replies = list(replies)
+            self.calls = []
+
+        def invoke(self, messages, **kwargs):
+            self.calls.append(messages)
+            return self.replies.pop(0)
+
+    executor = make_executor(SlowTool(), default_timeout=0.05)
+    llm = ScriptedLLM(["Thought: 等一等。\nAction: slow[5]", "Thought: 超时了。\nAction: Finish[放弃]"])
+    agent = ReActAgent(llm_client=llm, tool_executor=executor, max_steps=3)
+    assert agent.run("问题") == "放弃"
+    assert "Observation: 错误: 工具 slow 执行超时(0.05s)" in llm.calls[1][1]["content"]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_call_within_timeout_returns_result,
+        test_timeout_raises_and_cancels_tool,
+        test_tool_timeout_attribute_is_used,
+        test_external_cancel_stops_tool,
+        test_concurrency_limit_queues_calls,
+        test_queue_wait_counts_against_timeout,
+        test_async_cancellation_propagates_to_tool,
+        test_react_agent_shows_timeout_as_observation,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,135 @@
+"""
+测试工具结果的 token 预算: 按结构截断，以及流式读取结果时的提前停止
+
+无需网络与密钥(搜索结果由 SearchTool 子类直接返回)，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache import SearchResultCache
+from core.context import TokenCounter
+from tools.base import BaseTool
+from tools.search import SearchTool
+from tool_helpers import make_executor
+
+RESULTS = {
+    "answer_box": {"answer": "RTX 5090"},
+    "organic_results": [
+        {"title": f"第{i}条", "snippet": "英伟达显卡的详细介绍。" * 10, "link": f"https://example.com/{i}"}
+        for i in range(1, 9)
+    ],
+}
+
+
+class CannedSearchTool(SearchTool):
+    def __init__(self, **kwargs):
+        super().__init__(cache=SearchResultCache(), **kwargs)
+        self.api_key = "test-key"
+
+    def _fetch(self, params):
+        return RESULTS
+
+
+class ParagraphTool(BaseTool):
+    """返回若干段落，并记录流式产出了多少段"""
+
+    def __init__(self, paragraphs):
+        super().__init__("paragraphs", "返回多段文本。")
+        self.paragraphs = paragraphs
+        self.produced = 0
+        self.closed = False
+
+    def execute(self, input_data: str) -> str:
+        return "".join(self.paragraphs)
+
+    def stream(self, input_data: str):
+        try:
+            for paragraph in self.paragraphs:
+                self.produced += 1
+                yield paragraph
+        finally:
+            self.closed = True
+
+
+def test_small_output_is_unchanged():
+    executor = make_executor(ParagraphTool(["第一段。\n\n", "第二段。"]))
+    assert executor.execute_tool("paragraphs", "") == "第一段。\n\n第二段。"
+
+
+def test_trailing_paragraphs_are_dropped():
+    paragraphs = [f"第{i}段" + "内容" * 20 + "。\n\n" for i in range(10)]
+    executor = make_executor(ParagraphTool(paragraphs), max_output_tokens=100)
+    output = executor.execute_tool("paragraphs", "")
+    assert output.startswith(paragraphs[0] + paragraphs[1].rstrip())
+    assert "第3段" not in output
+    assert "结果已截断" in output
+    assert executor.counter.count_text(output) <= 100 + 20
+    assert executor.metrics.get("goagent_tool_output_truncated_total").get(tool="paragraphs") == 1
+
+
+def test_oversized_first_block_keeps_its_head():
+    tool = ParagraphTool(["很长的单段内容" * 100])
+    output = tool.truncate_output(tool.execute(""), 50, TokenCounter())
+    assert output.startswith("很长的单段内容")
+    assert "结果已截断" in output
+    assert TokenCounter().count_text(output) < 80
+
+
+def test_search_keeps_answer_box_and_drops_trailing_results():
+    tool = CannedSearchTool()
+    full = tool.execute("英伟达 最新显卡")
+    assert full.startswith("【直接答案】\nRTX 5090")
+    assert "【结果 5】" in full and "【结果 6】" not in full
+
+    executor = make_executor(tool, output_budgets={"Search": 250})
+    output = executor.execute_tool("Search", "英伟达 最新显卡")
+    assert output.startswith("【直接答案】\nRTX 5090")
+    assert "【结果 1】" in output
+    assert "【结果 5】" not in output
+    # 保留的网页结果都是完整的
+    kept = output.count("【结果 ")
+    assert output.count("🔗 链接") == kept
+
+
+def test_native_call_output_is_budgeted():
+    executor = make_executor(CannedSearchTool(), output_budgets={"Search": 120})
+    output = executor.execute_tool_call("Search", {"query": "英伟达"})
+    assert "RTX 5090" in output and "结果已截断" in output
+
+
+def test_stream_stops_reading_when_budget_is_spent():
+    paragraphs = [f"第{i}段" + "内容" * 20 + "。\n\n" for i in range(50)]
+    tool = ParagraphTool(paragraphs)
+    executor = make_executor(tool, max_output_tokens=100)
+    pieces = list(executor.stream_tool("paragraphs", ""))
+    assert pieces[:2] == paragraphs[:2]
+    assert "预算截断" in pieces[-1]
+    # 预算用完后不再继续读取工具的生成器
+    assert tool.produced == 3 and tool.closed
+
+
+def test_consumer_can_stop_stream_early():
+    tool = ParagraphTool([f"段落{i}\n\n" for i in range(10)])
+    executor = make_executor(tool, max_output_tokens=None)
+    stream = executor.stream_tool("paragraphs", "")
+    assert next(stream) == "段落0\n\n"
+    stream.close()
+    assert tool.closed and tool.produced == 1
+    assert executor.metrics.get("goagent_tool_calls_total").get(tool="paragraphs", status="cancelled") == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_small_output_is_unchanged,
+        test_trailing_paragraphs_are_dropped,
+        test_oversized_first_block_keeps_its_head,
+        test_search_keeps_answer_box_and_drops_trailing_results,
+        test_native_call_output_is_budgeted,
+        test_stream_stops_reading_when_budget_is_spent,
+        test_consumer_can_stop_stream_early,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
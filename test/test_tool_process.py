@@ -0,0 +1,236 @@
+"""
+测试 CPU 密集型工具的进程池执行: 常驻工作进程、超时与取消时结束进程、内存上限与结果的序列化传输
+
+无需网络与密钥，可以直接运行，也可以通过 pytest 收集。
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import threading
+from functools import partial
+
+from tools import ToolProcessError, process_pool
+from tools.base import BaseTool, ToolTimeoutError, ToolCancelledError
+from tool_helpers import make_executor
+
+
+class SumTool(BaseTool):
+    """计算 0..n 的平方和，返回执行它的进程号"""
+
+    cpu_bound = True
+
+    def __init__(self, name: str = "sum"):
+        super().__init__(name, "计算平方和。")
+
+    def execute(self, input_data: str) -> str:
+        total = sum(i * i for i in range(int(input_data)))
+        return f"{os.getpid()}:{total}"
+
+
+class SpinTool(BaseTool):
+    """一直占用 CPU，直到被结束"""
+
+    cpu_bound = True
+
+    def __init__(self):
+        super().__init__("spin", "空转。")
+
+    def execute(self, input_data: str) -> str:
+        while True:
+            pass
+
+
+class MisbehavingTool(BaseTool):
+    """按输入分配大量内存、返回无法 pickle 的结果或抛出异常"""
+
+    cpu_bound = True
+
+    def __init__(self):
+        super().__init__("misbehave", "各种异常情况。")
+
+    def execute(self, input_data: str) -> str:
+        if input_data == "memory":
+            return str(len(bytearray(2 * 1024 ** 3)))
+        if input_data == "unpicklable":
+            return lambda: None
+        if input_data == "raise":
+            raise ValueError("输入不合法")
+        return f"{os.getpid()}:ok"
+
+
+class PidTool(BaseTool):
+    """I/O 型工具，返回执行它的进程号"""
+
+    def __init__(self):
+        super().__init__("pid", "返回进程号。")
+
+    def execute(self, input_data: str) -> str:
+        return str(os.getpid())
+
+
+class ValueTool(BaseTool):
+    """返回构造时给定的值"""
+
+    cpu_bound = True
+
+    def __init__(self, value: str):
+        super().__init__("value", "返回给定的值。")
+        self.value = value
+
+    def execute(self, input_data: str) -> str:
+        return self.value
+
+
+# 默认只启动一个工作进程，用例可以传入 process_workers 覆盖
+make_executor = partial(make_executor, process_workers=1)
+
+
+def worker_pid(result: str) -> int:
+    return int(result.split(":")[0])
+
+
+def test_cpu_bound_tool_runs_in_warm_worker():
+    executor = make_executor(SumTool(), PidTool())
+    try:
+        executor.warm_up()
+        assert executor._process_pool.size == 1
+        first = executor.execute_tool("sum", "1000")
+        assert first.endswith(f":{sum(i * i for i in range(1000))}")
+        assert worker_pid(first) != os.getpid()
+        # 工作进程常驻，后续调用复用同一个进程
+        assert worker_pid(executor.execute_tool_call("sum", {"input": "10"})) == worker_pid(first)
+        # I/O 型工具仍在当前进程中执行
+        assert executor.execute_tool("pid", "") == str(os.getpid())
+    finally:
+        executor.close()
+
+
+def test_tools_can_be_marked_by_name():
+    executor = make_executor(PidTool(), cpu_bound_tools=["pid"])
+    try:
+        assert executor.runs_in_process("pid")
+        assert executor.execute_tool("pid", "") != str(os.getpid())
+    finally:
+        executor.close()
+    assert not make_executor(SumTool(), process_workers=0).runs_in_process("sum")
+
+
+def test_timeout_kills_worker_and_pool_recovers():
+    executor = make_executor(SpinTool(), SumTool(), timeouts={"spin": 0.3})
+    try:
+        executor.warm_up()
+        start = time.monotonic()
+        try:
+            executor.execute_tool("spin", "")
+            assert False, "应当超时"
+        except ToolTimeoutError as e:
+            assert "执行超时(0.3s)" in str(e)
+        assert time.monotonic() - start < 2
+        restarts = executor.metrics.get("goagent_tool_process_restarts_total")
+        assert restarts.get(reason="timeout") == 1
+        assert executor.metrics.get("goagent_tool_calls_total").get(tool="spin", status="timeout") == 1
+        # 被结束的进程由新的工作进程替换
+        assert executor.execute_tool("sum", "10").endswith(":285")
+    finally:
+        executor.close()
+
+
+def test_cancel_kills_worker():
+    executor = make_executor(SpinTool())
+    try:
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        try:
+            executor.execute_tool("spin", "", cancel=cancel)
+            assert False, "应当被取消"
+        except ToolCancelledError:
+            pass
+        assert executor.metrics.get("goagent_tool_process_restarts_total").get(reason="cancelled") == 1
+    finally:
+        executor.close()
+
+
+def test_busy_worker_queues_and_queue_wait_counts_against_timeout():
+    executor = make_executor(SpinTool(), SumTool(), timeouts={"spin": 0.5})
+    try:
+        errors = []
+
+        def spin():
+            try:
+                executor.execute_tool("spin", "")
+            except ToolTimeoutError as e:
+                errors.append(e)
+
+        holder = threading.Thread(target=spin)
+        holder.start()
+        time.sleep(0.1)
+        try:
+            executor.execute_tool("sum", "10", timeout=0.1)
+            assert False, "应当排队超时"
+        except ToolTimeoutError as e:
+            assert e.queued
+        holder.join()
+        assert len(errors) == 1 and not errors[0].queued
+    finally:
+        executor.close()
+
+
+def test_workers_cache_a_snapshot_per_tool_instance():
+    tool = ValueTool("a")
+    executor = make_executor(tool)
+    try:
+        assert executor.execute_tool("value", "") == "a"
+        # 工作进程持有首次发送时的快照，主进程中的修改不会同步
+        tool.value = "changed"
+        assert executor.execute_tool("value", "") == "a"
+        # 同名的新实例有自己的令牌，会重新发送
+        executor.register_tool(ValueTool("b"))
+        assert executor.execute_tool("value", "") == "b"
+    finally:
+        executor.close()
+
+
+def test_memory_limit_and_result_transport():
+    if process_pool.resource is None:
+        return
+    executor = make_executor(MisbehavingTool(), process_memory_limit=512 * 1024 ** 2)
+    try:
+        try:
+            executor.execute_tool("misbehave", "memory")
+            assert False, "应当超出内存上限"
+        except ToolProcessError as e:
+            assert "内存上限" in str(e)
+        try:
+            executor.execute_tool("misbehave", "unpicklable")
+            assert False, "结果无法传输"
+        except ToolProcessError as e:
+            assert "无法在进程间传输" in str(e)
+        try:
+            executor.execute_tool("misbehave", "raise")
+            assert False, "应当抛出工具自身的异常"
+        except ValueError as e:
+            assert "输入不合法" in str(e)
+        # 结果无法传输或工具抛出异常时工作进程仍可继续使用
+        restarts = executor.metrics.get("goagent_tool_process_restarts_total")
+        assert restarts.get(reason="memory") == 1 and restarts.total() == 1
+        assert executor.execute_tool("misbehave", "").endswith(":ok")
+    finally:
+        executor.close()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_cpu_bound_tool_runs_in_warm_worker,
+        test_tools_can_be_marked_by_name,
+        test_timeout_kills_worker_and_pool_recovers,
+        test_cancel_kills_worker,
+        test_busy_worker_queues_and_queue_wait_counts_against_timeout,
+        test_workers_cache_a_snapshot_per_tool_instance,
+        test_memory_limit_and_result_transport,
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
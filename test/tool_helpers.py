@@ -0,0 +1,25 @@
+"""
+工具相关测试共用的辅助函数
+"""
+import sys
+import os
+# 添加项目根目录到路径，以便导入模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.metrics import MetricsRegistry
+from tools import ToolExecutor
+from tools.base import BaseTool
+
+
+def make_executor(*tools: BaseTool, **kwargs) -> ToolExecutor:
+    """
+    创建使用独立指标注册表的 ToolExecutor，并注册 tools。
+
+    Args:
+        *tools: 要注册的工具
+        **kwargs: 传给 ToolExecutor 的其他参数
+    """
+    executor = ToolExecutor(metrics=MetricsRegistry(), **kwargs)
+    for tool in tools:
+        executor.register_tool(tool)
+    return executor
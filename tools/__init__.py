@@ -1,9 +1,43 @@
-from .search import SearchTool
-from .tool_executor import ToolExecutor
+from typing import TYPE_CHECKING
+from core.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .base import ToolTimeoutError, ToolCancelledError, ToolProcessError
+    from .process_pool import ToolProcessPool
+    from .search import SearchTool
+    from .local_search import BM25Index, LocalSearchTool
+    from .memory import HashingEmbedder, MemoryTool, VectorIndex
+    from .tool_executor import ToolExecutor
+
+# 公开名称 -> 所在子模块，首次访问时才导入
+_EXPORTS = {
+    "ToolTimeoutError": ".base",
+    "ToolCancelledError": ".base",
+    "ToolProcessError": ".base",
+    "ToolProcessPool": ".process_pool",
+    "SearchTool": ".search",
+    "BM25Index": ".local_search",
+    "LocalSearchTool": ".local_search",
+    "HashingEmbedder": ".memory",
+    "MemoryTool": ".memory",
+    "VectorIndex": ".memory",
+    "ToolExecutor": ".tool_executor",
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
 
 # 定义模块的公开接口
 __all__ = [
+    "ToolTimeoutError",
+    "ToolCancelledError",
+    "ToolProcessError",
+    "ToolProcessPool",
     "SearchTool",
+    "BM25Index",
+    "LocalSearchTool",
+    "HashingEmbedder",
+    "MemoryTool",
+    "VectorIndex",
     "ToolExecutor",
 ]
 
@@ -1,12 +1,123 @@
+import re
+import json
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from core.context import TokenCounter
+
+# 当前工具调用的取消信号，由 ToolExecutor 在执行工具前设置
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("goagent_tool_cancel", default=None)
+
+
+class ToolTimeoutError(TimeoutError):
+    """工具调用超时(包括排队等待并发名额超时)时抛出的异常，消息可以直接作为观察结果展示给模型"""
+
+    def __init__(self, tool: str, timeout: float, queued: bool = False):
+        action = "排队等待" if queued else "执行"
+        super().__init__(f"工具 {tool} {action}超时({timeout}s)")
+        self.tool = tool
+        self.timeout = timeout
+        self.queued = queued
+
+
+class ToolCancelledError(Exception):
+    """工具在执行过程中检查到取消信号时抛出的异常"""
+
+
+class ToolProcessError(RuntimeError):
+    """工具无法在工作进程中执行时抛出的异常: 工具或结果无法序列化、超出内存上限或工作进程意外退出"""
+
+
+@contextmanager
+def cancel_scope(event: threading.Event) -> Iterator[threading.Event]:
+    """在当前线程(或协程)内把 event 设为工具调用的取消信号"""
+    token = _cancel_event.set(event)
+    try:
+        yield event
+    finally:
+        _cancel_event.reset(token)
+
+
+class OutputBudget:
+    """
+    按 token 预算依次接收工具结果的结构片段: 放得下的片段完整保留，第一个放不下的片段及之后的片段全部丢弃；
+    第一个片段本身就超出预算时只保留它的开头部分。
+    """
+
+    def __init__(self, max_tokens: int, counter: "TokenCounter"):
+        self.max_tokens = max_tokens
+        self.counter = counter
+        self.used = 0
+        self.kept = 0
+        self.truncated = False
+
+    def take(self, block: str) -> Optional[str]:
+        """
+        尝试加入一个片段。
+
+        Returns:
+            应保留的内容，预算已用完时返回None
+        """
+        if self.truncated:
+            return None
+        tokens = self.counter.count_text(block)
+        if self.used + tokens <= self.max_tokens:
+            self.used += tokens
+            self.kept += 1
+            return block
+        self.truncated = True
+        if self.kept:
+            return None
+        head = self.counter.truncate(block, self.max_tokens)
+        self.used += self.counter.count_text(head)
+        self.kept += 1
+        return head
+
+    def note(self, total: Optional[int] = None) -> str:
+        """附加在截断结果末尾的说明"""
+        if total is not None:
+            return f"\n…(结果已截断，原文约 {total} tokens)"
+        return f"\n…(结果已按 {self.max_tokens} tokens 的预算截断)"
 
 
 class BaseTool(ABC):
     """
     工具基类，定义所有工具的标准接口。
     所有具体工具实现应该继承此类。
+
+    耗时较长的工具应在适当的位置调用 check_cancelled()，超时或被取消后尽快结束，
+    而不是继续占用执行线程。
+
+    parameters 以 JSON Schema 描述工具的参数，用于原生函数调用；未定义时使用单个字符串参数 input。
+
+    结果超出 token 预算时按 split_output 划分的结构片段从末尾整段丢弃；
+    stream 按片段流式产出结果，执行器在预算用完时停止读取。
+
+    cpu_bound 为 True 的工具由执行器放到独立的工作进程中执行，不占用 agent 线程，也不与其他会话争抢 GIL；
+    这类工具的实例与结果需要能够被 pickle，且超时或取消时工作进程会被直接结束，无需调用 check_cancelled()。
     """
+
+    # 参数的 JSON Schema(type 为 object)，None 表示使用 DEFAULT_PARAMETERS
+    parameters: Optional[Dict[str, Any]] = None
+
+    DEFAULT_PARAMETERS: Dict[str, Any] = {
+        "type": "object",
+        "properties": {"input": {"type": "string", "description": "工具输入参数"}},
+        "required": ["input"],
+    }
+
+    # 默认超时时间(秒)，None 表示使用 ToolExecutor 的配置
+    timeout: Optional[float] = None
+    # 同时执行的调用数上限，None 表示不限制
+    max_concurrency: Optional[int] = None
+    # 结果的 token 预算，None 表示使用 ToolExecutor 的配置
+    max_output_tokens: Optional[int] = None
+    # 是否为 CPU 密集型工具，是则在进程池中执行
+    cpu_bound: bool = False
     
     def __init__(self, name: str, description: str):
         """
@@ -31,15 +142,119 @@ class BaseTool(ABC):
             工具执行结果
         """
         pass
+
+    def run(self, parameters: Dict[str, Any]) -> str:
+        """
+        以结构化参数执行工具，用于原生函数调用。
+        默认实现: 只有一个参数时把它作为 execute 的输入，否则把全部参数序列化为 JSON 传入；
+        需要多个参数的工具应重写此方法。
+
+        Args:
+            parameters: 按 parameters 定义解析出的参数
+
+        Returns:
+            工具执行结果
+        """
+        if len(parameters) == 1:
+            value = next(iter(parameters.values()))
+            return self.execute(value if isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+        return self.execute(json.dumps(parameters, ensure_ascii=False))
+
+    def stream(self, input_data: str) -> Iterator[str]:
+        """
+        流式产出结果片段。默认执行 execute 后按 split_output 逐段产出；
+        能够逐步生成结果的工具可以重写此方法，调用方停止读取时生成器会被关闭。
+
+        Args:
+            input_data: 工具输入参数
+
+        Yields:
+            结果的结构片段，拼接后即为完整结果
+        """
+        yield from self.split_output(self.execute(input_data))
+
+    def split_output(self, output: str) -> List[str]:
+        """
+        把完整结果划分为结构片段，片段按顺序拼接后应与原结果一致。默认按空行划分段落。
+        """
+        return [block for block in re.split(r"(?<=\n\n)", output) if block]
+
+    def truncate_output(self, output: str, max_tokens: int, counter: "TokenCounter") -> str:
+        """
+        把结果截断到 max_tokens 以内: 保留开头完整的结构片段，从末尾整段丢弃放不下的片段。
+
+        Args:
+            output: 完整结果
+            max_tokens: token 预算
+            counter: token 计数器
+
+        Returns:
+            截断后的结果，未超出预算时原样返回
+        """
+        budget = OutputBudget(max_tokens, counter)
+        kept = []
+        for block in self.split_output(output):
+            piece = budget.take(block)
+            if piece is None:
+                break
+            kept.append(piece)
+        if not budget.truncated:
+            return output
+        return "".join(kept).rstrip() + budget.note(counter.count_text(output))
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """获取参数的 JSON Schema"""
+        return self.parameters or self.DEFAULT_PARAMETERS
+
+    def to_openai_tool(self) -> Dict[str, Any]:
+        """
+        转换为 OpenAI 函数调用的工具定义。
+
+        Returns:
+            {"type": "function", "function": {"name", "description", "parameters"}}
+        """
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.get_parameters(),
+            },
+        }
     
     def get_metadata(self) -> Dict[str, Any]:
         """
         获取工具元数据。
         
         Returns:
-            包含工具名称和描述的字典
+            包含工具名称、描述和参数定义的字典
         """
         return {
             "name": self.name,
-            "description": self.description
+            "description": self.description,
+            "parameters": self.get_parameters()
         }
+
+    @property
+    def cancelled(self) -> bool:
+        """当前调用是否已超时或被取消"""
+        event = _cancel_event.get()
+        return event is not None and event.is_set()
+
+    def check_cancelled(self) -> None:
+        """当前调用已超时或被取消时抛出 ToolCancelledError"""
+        if self.cancelled:
+            raise ToolCancelledError(f"工具 {self.name} 的调用已被取消")
+
+    def wait_cancelled(self, timeout: float) -> bool:
+        """
+        最多等待 timeout 秒，期间被取消时立即返回，用于代替 time.sleep。
+
+        Returns:
+            调用是否已被取消
+        """
+        event = _cancel_event.get()
+        if event is None:
+            threading.Event().wait(timeout)
+            return False
+        return event.wait(timeout)
@@ -0,0 +1,567 @@
+"""
+本地文档库检索: 倒排索引 + BM25 打分，支持中日韩文字的分词、增量建索引以及内存映射的磁盘格式。
+
+磁盘上的索引目录由 manifest.json 与若干不可变的段(segment)组成，每个段包含:
+- .lex / .lexidx: 按 UTF-8 字节序排列的词项，以及每个词项的 (词项偏移, 倒排表偏移, 文档频率)
+- .post: 每个词项的倒排表，先是按升序排列的段内文档号，再是对应的词频(均为 uint32)
+- .len: 每篇文档的 token 数
+- .store / .storeidx: 文档内容(每篇一行 JSON)及其偏移
+所有文件通过 mmap 只读打开，查询时按需读取，不需要把倒排表载入内存。数值按本机字节序存储。
+"""
+import os
+import re
+import json
+import math
+import mmap
+import heapq
+import bisect
+import itertools
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from core.events import EventType, EventLevel, emit
+from core.metrics import MetricsRegistry, get_registry
+from .base import BaseTool
+from .search import RESULT_SEPARATOR, format_search_results
+
+# 中日韩文字(汉字、假名、谚文)的连续片段，或由字母数字组成的单词
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af"
+_TOKEN_RE = re.compile(f"([{_CJK}]+)|([0-9a-z]+(?:['._-][0-9a-z]+)*)")
+
+MANIFEST = "manifest.json"
+
+
+def _normalize(text: str) -> str:
+    # NFKC 把全角字母数字转为半角，便于与查询匹配
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    文档分词: 中日韩文字片段同时产出单字与相邻两字(bigram)，其他文字按单词切分并转为小写。
+
+    Args:
+        text: 文档文本
+
+    Returns:
+        token 列表
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(_normalize(text)):
+        run, word = match.groups()
+        if word:
+            tokens.append(word)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    查询分词: 两字及以上的中日韩片段只使用 bigram，单字的片段使用单字。
+    单字的文档频率通常很高，区分度低，只用 bigram 既能减少要读取的倒排表，也能提高排序质量。
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(_normalize(query)):
+        run, word = match.groups()
+        if word:
+            terms.append(word)
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+@dataclass
+class SearchHit:
+    """一条检索结果"""
+
+    doc_id: int
+    score: float
+    document: Dict[str, Any]
+
+
+class _MemorySegment:
+    """尚未写入磁盘的新文档，查询接口与磁盘段相同"""
+
+    def __init__(self):
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.lengths = array("I")
+        self.documents: List[Dict[str, Any]] = []
+        self.total_length = 0
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.lengths)
+
+    def add(self, tokens: List[str], document: Dict[str, Any]) -> None:
+        local = len(self.lengths)
+        for term, tf in Counter(tokens).items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array("I"), array("I"))
+            entry[0].append(local)
+            entry[1].append(tf)
+        self.lengths.append(len(tokens))
+        self.documents.append(document)
+        self.total_length += len(tokens)
+
+    def lookup(self, term: str) -> Optional[Tuple[Sequence[int], Sequence[int]]]:
+        return self.postings.get(term)
+
+    def document(self, local: int) -> Dict[str, Any]:
+        return self.documents[local]
+
+    def terms(self) -> Iterator[Tuple[bytes, Sequence[int], Sequence[int]]]:
+        encoded = sorted((term.encode("utf-8"), term) for term in self.postings)
+        for key, term in encoded:
+            docs, tfs = self.postings[term]
+            yield key, docs, tfs
+
+    def records(self) -> Iterator[bytes]:
+        for document in self.documents:
+            yield json.dumps(document, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def close(self) -> None:
+        pass
+
+
+class _DiskSegment:
+    """通过 mmap 只读打开的不可变段"""
+
+    def __init__(self, prefix: str, n_docs: int, total_length: int):
+        self.prefix = prefix
+        self.total_length = total_length
+        self._maps: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+        self.lexicon = self._map(".lex", "B")
+        self.entries = self._map(".lexidx", "Q")
+        self.postings = self._map(".post", "I")
+        self.lengths = self._map(".len", "I")
+        self.store = self._map(".store", "B")
+        self.store_index = self._map(".storeidx", "Q")
+        self.n_terms = len(self.entries) // 3
+        if len(self.lengths) != n_docs:
+            raise ValueError(f"索引段 {prefix} 已损坏: 文档数与清单不一致")
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.lengths)
+
+    def _map(self, suffix: str, fmt: str) -> memoryview:
+        with open(self.prefix + suffix, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                view = memoryview(b"").cast(fmt)
+            else:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mapped)
+                view = memoryview(mapped).cast(fmt)
+        self._views.append(view)
+        return view
+
+    def _term(self, index: int) -> bytes:
+        start = self.entries[3 * index]
+        end = self.entries[3 * index + 3] if index + 1 < self.n_terms else len(self.lexicon)
+        return self.lexicon[start:end].tobytes()
+
+    def lookup(self, term: str) -> Optional[Tuple[Sequence[int], Sequence[int]]]:
+        """在词项表上二分查找，返回(文档号, 词频)两个零拷贝视图"""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.n_terms or self._term(lo) != key:
+            return None
+        offset, df = self.entries[3 * lo + 1], self.entries[3 * lo + 2]
+        return self.postings[offset:offset + df], self.postings[offset + df:offset + 2 * df]
+
+    def document(self, local: int) -> Dict[str, Any]:
+        start, end = self.store_index[local], self.store_index[local + 1]
+        return json.loads(self.store[start:end].tobytes())
+
+    def terms(self) -> Iterator[Tuple[bytes, Sequence[int], Sequence[int]]]:
+        for index in range(self.n_terms):
+            offset, df = self.entries[3 * index + 1], self.entries[3 * index + 2]
+            yield self._term(index), self.postings[offset:offset + df], self.postings[offset + df:offset + 2 * df]
+
+    def records(self) -> Iterator[bytes]:
+        for local in range(self.n_docs):
+            yield self.store[self.store_index[local]:self.store_index[local + 1]].tobytes()
+
+    def close(self) -> None:
+        for view in self._views:
+            view.release()
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # 仍有查询持有倒排表的视图，映射在它们释放后由垃圾回收关闭
+                pass
+        self._views.clear()
+        self._maps.clear()
+
+
+def _write_segment(
+    prefix: str,
+    terms: Iterable[Tuple[bytes, Sequence[int], Sequence[int]]],
+    lengths: Iterable[int],
+    records: Iterable[bytes]
+) -> Tuple[int, int]:
+    """
+    写出一个段。terms 需按 UTF-8 字节序排列。
+
+    Returns:
+        (文档数, token 总数)
+    """
+    with open(prefix + ".lex", "wb") as lex, open(prefix + ".lexidx", "wb") as idx, \
+            open(prefix + ".post", "wb") as post:
+        position = 0
+        for key, docs, tfs in terms:
+            idx.write(array("Q", (lex.tell(), position, len(docs))).tobytes())
+            lex.write(key)
+            post.write(array("I", docs).tobytes())
+            post.write(array("I", tfs).tobytes())
+            position += 2 * len(docs)
+    lengths = array("I", lengths)
+    with open(prefix + ".len", "wb") as f:
+        f.write(lengths.tobytes())
+    offsets = array("Q", [0])
+    with open(prefix + ".store", "wb") as f:
+        for record in records:
+            f.write(record)
+            offsets.append(f.tell())
+    with open(prefix + ".storeidx", "wb") as f:
+        f.write(offsets.tobytes())
+    return len(lengths), sum(lengths)
+
+
+class BM25Index:
+    """
+    分段的 BM25 倒排索引。
+
+    新文档先加入内存段，累积到 flush_every 篇(或调用 flush)时写为一个新的磁盘段，已有的段不会被重写，
+    因此可以持续增量地建索引；段数超过 max_segments 时合并为一个段。查询同时覆盖磁盘段与内存段。
+
+    查询按 MaxScore 的思路剪枝: 词项按得分上界从高到低处理，当剩余词项的上界之和已不足以让新文档进入前 k 名时，
+    高频词项不再遍历整个倒排表，只在已有候选文档上二分查找词频。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        flush_every: int = 10000,
+        max_segments: int = 8
+    ):
+        """
+        Args:
+            path: 索引目录，None 表示只在内存中建索引
+            k1: BM25 的词频饱和参数
+            b: BM25 的文档长度归一化参数
+            flush_every: 内存段累积多少篇文档后写入磁盘
+            max_segments: 磁盘段数上限，超出时合并
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.flush_every = flush_every
+        self.max_segments = max_segments
+        self._segments: List[_DiskSegment] = []
+        self._buffer = _MemorySegment()
+        self._next_segment = 0
+        self._lock = threading.RLock()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def __len__(self) -> int:
+        return sum(segment.n_docs for segment in self._all_segments())
+
+    def _all_segments(self) -> List[Any]:
+        return self._segments + [self._buffer]
+
+    def _load(self) -> None:
+        manifest_path = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._next_segment = manifest.get("next_segment", 0)
+        for entry in manifest["segments"]:
+            self._segments.append(
+                _DiskSegment(os.path.join(self.path, entry["name"]), entry["n_docs"], entry["total_length"])
+            )
+
+    def _save_manifest(self) -> None:
+        manifest = {
+            "version": 1,
+            "next_segment": self._next_segment,
+            "segments": [
+                {"name": os.path.basename(s.prefix), "n_docs": s.n_docs, "total_length": s.total_length}
+                for s in self._segments
+            ],
+        }
+        manifest_path = os.path.join(self.path, MANIFEST)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        # 清单原子地替换，新段写完后才对查询可见
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def add(self, text: str, title: str = "", link: str = "", metadata: Optional[Dict[str, Any]] = None) -> int:
+        """
+        加入一篇文档。
+
+        Args:
+            text: 文档正文
+            title: 标题，同样参与检索
+            link: 链接或文件路径，展示在结果中
+            metadata: 随文档保存的其他信息
+
+        Returns:
+            文档号
+        """
+        document = {"title": title, "text": text, "link": link}
+        if metadata:
+            document["metadata"] = metadata
+        tokens = tokenize(f"{title}\n{text}")
+        with self._lock:
+            doc_id = len(self)
+            self._buffer.add(tokens, document)
+            if self.path is not None and self._buffer.n_docs >= self.flush_every:
+                self.flush()
+        return doc_id
+
+    def add_many(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """
+        批量加入文档，每项为包含 text 以及可选的 title、link、metadata 的字典。
+
+        Returns:
+            加入的文档数
+        """
+        count = 0
+        for document in documents:
+            self.add(document["text"], document.get("title", ""), document.get("link", ""), document.get("metadata"))
+            count += 1
+        return count
+
+    def flush(self) -> None:
+        """把内存段写为新的磁盘段；只在内存中建索引时不做任何事"""
+        with self._lock:
+            if self.path is None or self._buffer.n_docs == 0:
+                return
+            buffer = self._buffer
+            prefix = self._new_segment_prefix()
+            n_docs, total_length = _write_segment(prefix, buffer.terms(), buffer.lengths, buffer.records())
+            self._segments.append(_DiskSegment(prefix, n_docs, total_length))
+            self._buffer = _MemorySegment()
+            self._save_manifest()
+            if len(self._segments) > self.max_segments:
+                self.merge()
+
+    def merge(self) -> None:
+        """把全部磁盘段合并为一个段，减少查询时需要查找的段数"""
+        with self._lock:
+            if self.path is None or len(self._segments) <= 1:
+                return
+            old = self._segments
+            bases = list(itertools.accumulate([0] + [s.n_docs for s in old[:-1]]))
+            streams = [self._tagged_terms(order, segment) for order, segment in enumerate(old)]
+
+            def merged_terms():
+                for key, group in itertools.groupby(heapq.merge(*streams), key=lambda item: item[0]):
+                    docs, tfs = array("I"), array("I")
+                    for _, order, segment_docs, segment_tfs in group:
+                        base = bases[order]
+                        docs.extend(d + base for d in segment_docs)
+                        tfs.extend(segment_tfs)
+                    yield key, docs, tfs
+
+            prefix = self._new_segment_prefix()
+            n_docs, total_length = _write_segment(
+                prefix,
+                merged_terms(),
+                itertools.chain.from_iterable(s.lengths for s in old),
+                itertools.chain.from_iterable(s.records() for s in old),
+            )
+            self._segments = [_DiskSegment(prefix, n_docs, total_length)]
+            self._save_manifest()
+            for segment in old:
+                segment.close()
+                for suffix in (".lex", ".lexidx", ".post", ".len", ".store", ".storeidx"):
+                    os.remove(segment.prefix + suffix)
+            emit(EventType.MESSAGE, f"已合并 {len(old)} 个索引段({n_docs} 篇文档)。", EventLevel.DEBUG,
+                 source="BM25Index")
+
+    @staticmethod
+    def _tagged_terms(order: int, segment: _DiskSegment) -> Iterator[Tuple[bytes, int, Sequence[int], Sequence[int]]]:
+        # 段的序号作为第二个排序键，相同词项按段的顺序拼接倒排表
+        for key, docs, tfs in segment.terms():
+            yield key, order, docs, tfs
+
+    def _new_segment_prefix(self) -> str:
+        name = f"seg_{self._next_segment:06d}"
+        self._next_segment += 1
+        return os.path.join(self.path, name)
+
+    def close(self) -> None:
+        """写出内存段并释放内存映射"""
+        with self._lock:
+            self.flush()
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+    def search(self, query: str, k: int = 10) -> List[SearchHit]:
+        """
+        按 BM25 得分检索。
+
+        Args:
+            query: 查询字符串
+            k: 返回的结果数
+
+        Returns:
+            按得分从高到低排列的结果
+        """
+        with self._lock:
+            segments = self._all_segments()
+            bases = list(itertools.accumulate([0] + [s.n_docs for s in segments[:-1]]))
+            n_docs = bases[-1] + segments[-1].n_docs
+            if n_docs == 0 or k <= 0:
+                return []
+            avgdl = sum(s.total_length for s in segments) / n_docs
+
+            # 每个词项在各段中的倒排表与总文档频率
+            weighted = []
+            for term, qtf in Counter(query_terms(query)).items():
+                postings = [(i, segment.lookup(term)) for i, segment in enumerate(segments)]
+                postings = [(i, p) for i, p in postings if p is not None]
+                df = sum(len(p[0]) for _, p in postings)
+                if df == 0:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                weight = qtf * idf
+                # 词频分量 tf*(k1+1)/(tf+norm) 小于 k1+1
+                weighted.append((weight * (self.k1 + 1), weight, df, postings))
+            weighted.sort(key=lambda item: (-item[0], item[2]))
+            remaining = list(itertools.accumulate(item[0] for item in reversed(weighted)))[::-1]
+
+            scores: Dict[int, float] = {}
+            for index, (_, weight, _, postings) in enumerate(weighted):
+                threshold = heapq.nlargest(k, scores.values())[-1] if len(scores) >= k else 0.0
+                essential = len(scores) < k or threshold < remaining[index]
+                for i, (docs, tfs) in postings:
+                    segment, base = segments[i], bases[i]
+                    lengths = segment.lengths
+                    if essential:
+                        for local, tf in zip(docs, tfs):
+                            norm = self.k1 * (1 - self.b + self.b * lengths[local] / avgdl)
+                            doc_id = base + local
+                            scores[doc_id] = scores.get(doc_id, 0.0) + weight * tf * (self.k1 + 1) / (tf + norm)
+                        continue
+                    # 剩余词项不可能让新文档进入前 k 名，只为仍有机会的候选补上得分
+                    end = base + segment.n_docs
+                    for doc_id, score in list(scores.items()):
+                        if not base <= doc_id < end or score + remaining[index] <= threshold:
+                            continue
+                        local = doc_id - base
+                        position = bisect.bisect_left(docs, local)
+                        if position < len(docs) and docs[position] == local:
+                            tf = tfs[position]
+                            norm = self.k1 * (1 - self.b + self.b * lengths[local] / avgdl)
+                            scores[doc_id] = score + weight * tf * (self.k1 + 1) / (tf + norm)
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+            hits = []
+            for doc_id, score in top:
+                i = bisect.bisect_right(bases, doc_id) - 1
+                hits.append(SearchHit(doc_id, score, segments[i].document(doc_id - bases[i])))
+            return hits
+
+
+class LocalSearchTool(BaseTool):
+    """
+    本地文档库检索工具，基于 BM25Index，无需网络请求。
+    输出格式与 SearchTool 相同，超出 token 预算时同样从末尾整条丢弃结果。
+    """
+
+    parameters = {
+        "type": "object",
+        "properties": {"query": {"type": "string", "description": "搜索查询字符串"}},
+        "required": ["query"],
+    }
+    max_output_tokens = 800
+
+    def __init__(
+        self,
+        index: Optional[BM25Index] = None,
+        index_path: Optional[str] = None,
+        name: str = "LocalSearch",
+        description: Optional[str] = None,
+        max_results: int = 5,
+        snippet_chars: int = 120,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            index: 已建好的索引
+            index_path: 未传入 index 时打开的索引目录，默认读取环境变量LOCAL_SEARCH_INDEX，未设置时使用空的内存索引
+            name: 工具名称
+            description: 工具描述
+            max_results: 最多返回的结果条数
+            snippet_chars: 摘要的最大字符数
+            metrics: 指标注册表，默认使用全局注册表
+        """
+        super().__init__(
+            name=name,
+            description=description or "在本地文档库中检索。当问题涉及内部文档、项目资料等本地已收录的信息时，应优先使用此工具。"
+        )
+        if index is None:
+            index = BM25Index(index_path or os.getenv("LOCAL_SEARCH_INDEX") or None)
+        self.index = index
+        self.max_results = max_results
+        self.snippet_chars = snippet_chars
+        self.metrics = metrics or get_registry()
+
+    def execute(self, input_data: str) -> str:
+        query = input_data.strip()
+        if not query:
+            return "错误: 查询不能为空。"
+        with self.metrics.histogram("goagent_local_search_seconds", "本地检索耗时").time():
+            hits = self.index.search(query, self.max_results)
+        organic = [
+            {
+                "title": hit.document.get("title") or "无标题",
+                "snippet": self._snippet(hit.document.get("text", ""), query),
+                "link": hit.document.get("link", ""),
+            }
+            for hit in hits
+        ]
+        return format_search_results({"organic_results": organic}, query, self.max_results)
+
+    def split_output(self, output: str) -> List[str]:
+        """标题行为一段，之后每条结果为一段"""
+        head, *rest = re.split(f"(?={re.escape(RESULT_SEPARATOR)})", output)
+        return super().split_output(head) + rest
+
+    def _snippet(self, text: str, query: str) -> str:
+        """截取正文中第一个命中查询词项附近的片段"""
+        text = " ".join(text.split())
+        if len(text) <= self.snippet_chars:
+            return text
+        normalized = _normalize(text)
+        positions = [normalized.find(term) for term in query_terms(query)]
+        positions = [p for p in positions if p >= 0]
+        start = max(min(positions) - self.snippet_chars // 4, 0) if positions else 0
+        snippet = text[start:start + self.snippet_chars]
+        return ("…" if start > 0 else "") + snippet + ("…" if start + self.snippet_chars < len(text) else "")
@@ -0,0 +1,671 @@
+"""
+向量记忆: 可替换的本地嵌入模型、连续存放的 NumPy 向量矩阵、IVF 近似最近邻索引以及内存映射的持久化。
+
+持久化目录包含:
+- meta.json: 维度、条数、IVF 训练信息，最后原子地写入
+- vectors.f32 / alive.u8 / assign.i32: 按行存放的向量、是否有效、所属的 IVF 聚类，通过 np.memmap 读写
+- centroids.npy: IVF 聚类中心
+- records.jsonl / records.jsonl.idx: 每条记忆的内容及其偏移
+"""
+import os
+import json
+import math
+import time
+import zlib
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.events import EventType, EventLevel, emit
+from core.metrics import MetricsRegistry, get_registry
+from .base import BaseTool
+from .local_search import tokenize
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """按行做 L2 归一化，归一化后内积即余弦相似度；全零向量保持为零"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """得分最高的 k 个位置(按得分降序)，不包含 -inf"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    candidates = candidates[np.isfinite(scores[candidates])]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class Embedder(ABC):
+    """把文本批量转换为向量的嵌入模型，可以替换为任何本地模型"""
+
+    # 向量维度
+    dim: int
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        批量嵌入。
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            形状为 (len(texts), dim) 的 float32 矩阵
+        """
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(dim={self.dim})"
+
+
+class HashingEmbedder(Embedder):
+    """
+    基于特征哈希的嵌入: 按 local_search 的分词规则(中日韩单字与 bigram、单词)把 token 带符号地哈希到 dim 维，
+    再做 L2 归一化。无需模型文件，适合作为默认实现与测试；语义相似度需要替换为真正的嵌入模型。
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        rows, cols, signs = [], [], []
+        for i, text in enumerate(texts):
+            for token in tokenize(text):
+                h = zlib.crc32(token.encode("utf-8"))
+                rows.append(i)
+                cols.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), signs)
+        return _normalize_rows(vectors)
+
+
+class _Column:
+    """按行增长的数组: 内存中为普通 ndarray，指定路径时为文件上的 np.memmap，容量按倍数扩展"""
+
+    def __init__(self, path: Optional[str], dtype: Any, width: Optional[int] = None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.data = np.zeros(self._shape(0), dtype=self.dtype)
+        if path is not None and os.path.exists(path) and os.path.getsize(path) > 0:
+            capacity = os.path.getsize(path) // self._row_bytes()
+            self.data = np.memmap(path, dtype=self.dtype, mode="r+", shape=self._shape(capacity))
+
+    def _shape(self, capacity: int) -> Tuple[int, ...]:
+        return (capacity, self.width) if self.width else (capacity,)
+
+    def _row_bytes(self) -> int:
+        return self.dtype.itemsize * (self.width or 1)
+
+    def reserve(self, needed: int) -> None:
+        """确保至少能容纳 needed 行"""
+        capacity = len(self.data)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        if self.path is None:
+            data = np.zeros(self._shape(new_capacity), dtype=self.dtype)
+            data[:capacity] = self.data
+            self.data = data
+            return
+        self.flush()
+        self.data = None
+        # 扩展文件后重新映射，新增部分由文件系统填零
+        with open(self.path, "r+b" if os.path.exists(self.path) else "w+b") as f:
+            f.truncate(new_capacity * self._row_bytes())
+        self.data = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=self._shape(new_capacity))
+
+    def flush(self) -> None:
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+
+class VectorIndex:
+    """
+    余弦相似度的向量索引。
+
+    向量归一化后按行存放在一个连续矩阵中，删除只标记为无效，行号即向量的编号且保持不变。
+    有效向量数达到 ivf_threshold 时训练 IVF 索引(球面 k-means 聚类)，之后查询只扫描与查询最接近的 nprobe 个聚类；
+    数据量增长到训练时的 4 倍时重新训练。未训练时精确地分块扫描全部向量。
+    自动训练在越过阈值的那次 add 中同步完成，期间持有索引的锁，查询与写入都会等待；
+    不希望写入被阻塞时把 ivf_threshold 设为 None，在空闲时显式调用 train()。
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        path: Optional[str] = None,
+        nprobe: int = 16,
+        nlist: Optional[int] = None,
+        ivf_threshold: Optional[int] = 20000,
+        seed: int = 0
+    ):
+        """
+        Args:
+            dim: 向量维度
+            path: 持久化目录，None 表示只保存在内存中
+            nprobe: 查询时扫描的聚类数，越大召回率越高、越慢
+            nlist: 聚类数，默认为有效向量数平方根的 2 倍
+            ivf_threshold: 自动训练 IVF 的有效向量数，None 表示不自动训练，由调用方显式调用 train()
+            seed: 训练时的随机种子
+        """
+        self.dim = dim
+        self.path = path
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.ivf_threshold = ivf_threshold
+        self.seed = seed
+        self.count = 0
+        self.alive_count = 0
+        self.trained_count = 0
+        self.centroids: Optional[np.ndarray] = None
+        self._centroids_dirty = False
+        # IVF 倒排表: 按聚类排列的行号及每个聚类的起止位置，覆盖前 _listed 行
+        self._list_rows: Optional[np.ndarray] = None
+        self._list_bounds: Optional[np.ndarray] = None
+        self._listed = 0
+        self._lock = threading.RLock()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self._vectors = _Column(self._file("vectors.f32"), np.float32, dim)
+        self._alive = _Column(self._file("alive.u8"), np.uint8)
+        self._assign = _Column(self._file("assign.i32"), np.int32)
+        if path is not None:
+            self._load()
+
+    def __len__(self) -> int:
+        return self.alive_count
+
+    def _file(self, name: str) -> Optional[str]:
+        return os.path.join(self.path, name) if self.path is not None else None
+
+    def _load(self) -> None:
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dim"] != self.dim:
+            raise ValueError(f"向量索引的维度为 {meta['dim']}，与当前的 {self.dim} 不一致")
+        self.count = meta["count"]
+        self.alive_count = meta["alive_count"]
+        self.trained_count = meta.get("trained_count", 0)
+        if self.trained_count and os.path.exists(self._file("centroids.npy")):
+            self.centroids = np.load(self._file("centroids.npy"))
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        加入一批向量。有效向量数越过自动训练的阈值时，本次调用会同步训练 IVF 并重新划分全部向量。
+
+        Args:
+            vectors: 形状为 (n, dim) 或 (dim,) 的向量
+
+        Returns:
+            新向量的编号
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度应为 {self.dim}，实际为 {vectors.shape[1]}")
+        vectors = _normalize_rows(vectors)
+        with self._lock:
+            start, end = self.count, self.count + len(vectors)
+            for column in (self._vectors, self._alive, self._assign):
+                column.reserve(end)
+            self._vectors.data[start:end] = vectors
+            self._alive.data[start:end] = 1
+            self._assign.data[start:end] = self._nearest(vectors) if self.centroids is not None else -1
+            self.count = end
+            self.alive_count += len(vectors)
+            if self.ivf_threshold is not None and self.alive_count >= max(self.ivf_threshold, 4 * self.trained_count):
+                self.train()
+        return np.arange(start, end)
+
+    def delete(self, ids: Sequence[int]) -> int:
+        """
+        删除向量，之后不再出现在查询结果中。
+
+        Returns:
+            实际删除的条数
+        """
+        with self._lock:
+            ids = np.asarray(ids, dtype=np.int64)
+            ids = ids[(ids >= 0) & (ids < self.count)]
+            ids = np.unique(ids[self._alive.data[ids] == 1])
+            self._alive.data[ids] = 0
+            self.alive_count -= len(ids)
+            return len(ids)
+
+    def is_alive(self, row: int) -> bool:
+        """编号为 row 的向量是否存在且未被删除"""
+        return 0 <= row < self.count and bool(self._alive.data[row])
+
+    def search(self, queries: np.ndarray, k: int = 5, nprobe: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """
+        批量查询余弦相似度最高的 k 个向量。
+
+        Args:
+            queries: 形状为 (m, dim) 或 (dim,) 的查询向量
+            k: 每个查询返回的结果数
+            nprobe: 本次查询扫描的聚类数，默认使用 self.nprobe
+
+        Returns:
+            每个查询的 [(编号, 相似度), ...]，按相似度降序
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        queries = _normalize_rows(queries)
+        with self._lock:
+            if self.alive_count == 0 or k <= 0:
+                return [[] for _ in queries]
+            if self.centroids is None:
+                return self._search_flat(queries, k)
+            return self._search_ivf(queries, k, nprobe or self.nprobe)
+
+    def _search_flat(self, queries: np.ndarray, k: int, chunk: int = 65536) -> List[List[Tuple[int, float]]]:
+        """分块扫描全部向量，每块用一次矩阵乘法计算所有查询的得分"""
+        best_rows = [np.empty(0, dtype=np.int64) for _ in queries]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in queries]
+        for start in range(0, self.count, chunk):
+            stop = min(start + chunk, self.count)
+            scores = self._vectors.data[start:stop] @ queries.T
+            scores[self._alive.data[start:stop] == 0] = -np.inf
+            for j in range(len(queries)):
+                top = _top_k(scores[:, j], k)
+                rows = np.concatenate([best_rows[j], top + start])
+                merged = np.concatenate([best_scores[j], scores[top, j]])
+                keep = _top_k(merged, k)
+                best_rows[j], best_scores[j] = rows[keep], merged[keep]
+        return [list(zip(rows.tolist(), scores.tolist())) for rows, scores in zip(best_rows, best_scores)]
+
+    def _search_ivf(self, queries: np.ndarray, k: int, nprobe: int) -> List[List[Tuple[int, float]]]:
+        self._ensure_lists()
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        # 倒排表建立之后加入的向量按所属聚类直接筛选
+        fresh = np.arange(self._listed, self.count)
+        fresh_assign = self._assign.data[self._listed:self.count]
+        results = []
+        for query, lists in zip(queries, probes):
+            parts = [self._list_rows[self._list_bounds[c]:self._list_bounds[c + 1]] for c in lists]
+            parts.append(fresh[np.isin(fresh_assign, lists)])
+            rows = np.concatenate(parts)
+            scores = self._vectors.data[rows] @ query
+            scores[self._alive.data[rows] == 0] = -np.inf
+            top = _top_k(scores, k)
+            results.append(list(zip(rows[top].tolist(), scores[top].tolist())))
+        return results
+
+    def _ensure_lists(self) -> None:
+        """倒排表不存在，或其后新加入的向量过多时重建"""
+        if self._list_rows is not None and self.count - self._listed <= max(10000, self._listed // 10):
+            return
+        assign = self._assign.data[:self.count]
+        rows = np.flatnonzero((self._alive.data[:self.count] == 1) & (assign >= 0))
+        rows = rows[np.argsort(assign[rows], kind="stable")]
+        self._list_rows = rows
+        self._list_bounds = np.searchsorted(assign[rows], np.arange(len(self.centroids) + 1))
+        self._listed = self.count
+
+    def _nearest(self, vectors: np.ndarray, centroids: Optional[np.ndarray] = None, batch: int = 8192) -> np.ndarray:
+        """每个向量最接近的聚类中心"""
+        centroids = self.centroids if centroids is None else centroids
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch):
+            labels[start:start + batch] = np.argmax(vectors[start:start + batch] @ centroids.T, axis=1)
+        return labels
+
+    def train(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: Optional[int] = None) -> None:
+        """
+        用球面 k-means 训练 IVF 聚类中心，并重新划分全部向量。
+
+        Args:
+            nlist: 聚类数，默认使用构造时的 nlist 或有效向量数平方根的 2 倍
+            iterations: k-means 迭代次数
+            sample_size: 训练使用的样本数，默认为聚类数的 32 倍
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._alive.data[:self.count] == 1)
+            if len(rows) == 0:
+                return
+            start = time.perf_counter()
+            nlist = min(nlist or self.nlist or max(1, int(2 * math.sqrt(len(rows)))), len(rows))
+            rng = np.random.default_rng(self.seed)
+            sample_size = min(len(rows), max(sample_size or nlist * 32, nlist))
+            sample = self._vectors.data[np.sort(rng.choice(rows, sample_size, replace=False))]
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = self._nearest(sample, centroids)
+                order = np.argsort(labels, kind="stable")
+                sorted_labels = labels[order]
+                starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+                sums = np.zeros_like(centroids)
+                sums[sorted_labels[starts]] = np.add.reduceat(sample[order], starts, axis=0)
+                # 空的聚类重新随机选取中心
+                empty = np.bincount(labels, minlength=nlist) == 0
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+                centroids = _normalize_rows(sums).astype(np.float32)
+            self.centroids = centroids
+            self._centroids_dirty = True
+            for begin in range(0, self.count, 65536):
+                stop = min(begin + 65536, self.count)
+                self._assign.data[begin:stop] = self._nearest(self._vectors.data[begin:stop])
+            self.trained_count = len(rows)
+            self._list_rows = None
+            emit(EventType.MESSAGE, f"向量索引已训练: {len(rows)} 条, {nlist} 个聚类, "
+                 f"耗时 {time.perf_counter() - start:.1f}s", EventLevel.DEBUG, source="VectorIndex")
+
+    def flush(self) -> None:
+        """把向量与索引信息写入磁盘；只保存在内存中时不做任何事"""
+        if self.path is None:
+            return
+        with self._lock:
+            for column in (self._vectors, self._alive, self._assign):
+                column.flush()
+            if self._centroids_dirty:
+                # 聚类中心只在训练后写入
+                np.save(self._file("centroids.tmp.npy"), self.centroids)
+                os.replace(self._file("centroids.tmp.npy"), self._file("centroids.npy"))
+                self._centroids_dirty = False
+            meta = {
+                "version": 1,
+                "dim": self.dim,
+                "count": self.count,
+                "alive_count": self.alive_count,
+                "trained_count": self.trained_count,
+            }
+            with open(self._file("meta.json.tmp"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            # 元数据最后原子地替换，条数之外的行在重新打开时被忽略
+            os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+
+class _RecordStore:
+    """
+    按行号存取记忆内容: 内存中为列表，指定路径时追加写入 JSONL 文件并按偏移读取。
+    偏移表同样只追加写入 .idx 文件，flush 只写入上次之后新增的部分。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._records: List[Dict[str, Any]] = []
+        self._offsets = array("Q", [0])
+        self._file = None
+        self._index_file = None
+        self._written = 0   # 已写入 .idx 文件的偏移个数
+        self._synced = 0    # 已从写缓冲交给文件系统的内容字节数
+        if path is None:
+            return
+        if os.path.exists(path + ".idx"):
+            with open(path + ".idx", "rb") as f:
+                data = f.read()
+            if len(data) >= self._offsets.itemsize:
+                # 丢弃未写完整的最后一个偏移
+                self._offsets = array("Q")
+                self._offsets.frombytes(data[:len(data) - len(data) % self._offsets.itemsize])
+                self._written = len(self._offsets)
+        self._file = open(path, "a+b")
+        # 丢弃上次写入偏移之后未完成的内容
+        self._file.truncate(self._offsets[-1])
+        self._synced = self._offsets[-1]
+        self._index_file = open(path + ".idx", "a+b")
+        self._index_file.truncate(self._written * self._offsets.itemsize)
+
+    def __len__(self) -> int:
+        return len(self._records) if self._file is None else len(self._offsets) - 1
+
+    def append(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._records.append(record)
+            return
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def get(self, index: int) -> Dict[str, Any]:
+        if self._file is None:
+            return self._records[index]
+        start, end = self._offsets[index], self._offsets[index + 1]
+        if end > self._synced:
+            # 读取仍在写缓冲中的新记录时才需要刷新
+            self._file.flush()
+            self._synced = self._offsets[-1]
+        return json.loads(os.pread(self._file.fileno(), end - start, start))
+
+    def truncate(self, count: int) -> None:
+        """只保留前 count 条"""
+        if self._file is None:
+            del self._records[count:]
+            return
+        if count + 1 >= len(self._offsets):
+            return
+        del self._offsets[count + 1:]
+        self._file.flush()
+        self._file.truncate(self._offsets[-1])
+        self._synced = self._offsets[-1]
+        if self._written > len(self._offsets):
+            self._written = len(self._offsets)
+            self._index_file.truncate(self._written * self._offsets.itemsize)
+
+    def flush(self) -> None:
+        """先写入内容，再追加新增的偏移，使 .idx 中的偏移不会指向未写入的内容"""
+        if self._file is None:
+            return
+        self._file.flush()
+        self._synced = self._offsets[-1]
+        if self._written < len(self._offsets):
+            self._index_file.write(self._offsets[self._written:].tobytes())
+            self._index_file.flush()
+            self._written = len(self._offsets)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+            self._index_file = None
+
+
+@dataclass
+class MemoryHit:
+    """一条检索到的记忆"""
+
+    memory_id: int
+    score: float
+    content: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class MemoryTool(BaseTool):
+    """
+    向量记忆工具，支持 add(记住)、search(回忆)与 delete(遗忘)三种操作。
+    文本由 embedder 批量嵌入后存入 VectorIndex，内容与向量按相同的编号保存。
+    """
+
+    parameters = {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": ["add", "search", "delete"], "description": "要执行的操作"},
+            "content": {"type": "string", "description": "要记住的内容，action 为 add 时必填"},
+            "query": {"type": "string", "description": "检索的内容，action 为 search 时必填"},
+            "limit": {"type": "integer", "description": "最多返回的记忆条数"},
+            "memory_id": {"type": "integer", "description": "要删除的记忆编号，action 为 delete 时必填"},
+        },
+        "required": ["action"],
+    }
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        path: Optional[str] = None,
+        name: str = "memory",
+        max_results: int = 5,
+        min_score: float = 0.0,
+        flush_every: Optional[int] = 100,
+        metrics: Optional[MetricsRegistry] = None,
+        **index_options
+    ):
+        """
+        Args:
+            embedder: 嵌入模型，默认使用 HashingEmbedder
+            path: 持久化目录，默认读取环境变量MEMORY_PATH，未设置时只保存在内存中
+            name: 工具名称
+            max_results: search 默认返回的条数
+            min_score: 相似度不高于该值的记忆不返回
+            flush_every: 通过工具调用累计多少次写入(add / delete)后写入磁盘，None 表示只在 flush / close 时写入；
+                未写入磁盘的记忆在进程异常退出时丢失
+            metrics: 指标注册表，默认使用全局注册表
+            **index_options: 传给 VectorIndex 的其他参数，如 nprobe、nlist、ivf_threshold
+        """
+        super().__init__(
+            name=name,
+            description="长期记忆。action=add 记住一条信息，action=search 按语义回忆相关的记忆，action=delete 删除指定编号的记忆。"
+        )
+        self.embedder = embedder or HashingEmbedder()
+        self.path = path or os.getenv("MEMORY_PATH") or None
+        self.max_results = max_results
+        self.min_score = min_score
+        self.flush_every = flush_every
+        self._unflushed = 0
+        self.metrics = metrics or get_registry()
+        self._lock = threading.RLock()
+        self.index = VectorIndex(self.embedder.dim, self.path, **index_options)
+        self.records = _RecordStore(os.path.join(self.path, "records.jsonl") if self.path else None)
+        if len(self.records) < self.index.count:
+            raise ValueError(f"记忆库 {self.path} 已损坏: 内容条数少于向量条数")
+        # 向量元数据最后写入，多出的内容来自未完成的写入
+        self.records.truncate(self.index.count)
+
+    @property
+    def size(self) -> int:
+        """有效的记忆条数(工具实例不定义 __len__，以免空的记忆库在布尔判断中为假)"""
+        return len(self.index)
+
+    def add(self, content: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """
+        记住一条内容。
+
+        Returns:
+            记忆编号
+        """
+        return self.add_many([content], [metadata] if metadata else None)[0]
+
+    def add_many(self, contents: Sequence[str], metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> List[int]:
+        """
+        批量记住多条内容，嵌入一次完成。
+
+        Returns:
+            记忆编号列表
+        """
+        if not contents:
+            return []
+        vectors = self.embedder.embed(list(contents))
+        now = time.time()
+        with self._lock:
+            for i, content in enumerate(contents):
+                record = {"content": content, "created": now}
+                if metadata and metadata[i]:
+                    record["metadata"] = metadata[i]
+                self.records.append(record)
+            return self.index.add(vectors).tolist()
+
+    def search(self, query: str, k: Optional[int] = None) -> List[MemoryHit]:
+        """按语义检索相关的记忆"""
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries: Sequence[str], k: Optional[int] = None) -> List[List[MemoryHit]]:
+        """批量检索，嵌入与打分都按批完成"""
+        k = k or self.max_results
+        with self.metrics.histogram("goagent_memory_search_seconds", "记忆检索耗时").time():
+            vectors = self.embedder.embed(list(queries))
+            with self._lock:
+                results = self.index.search(vectors, k)
+                return [
+                    [self._hit(memory_id, score) for memory_id, score in hits if score > self.min_score]
+                    for hits in results
+                ]
+
+    def _hit(self, memory_id: int, score: float) -> MemoryHit:
+        record = self.records.get(memory_id)
+        return MemoryHit(memory_id, score, record["content"], record.get("metadata", {}))
+
+    def delete(self, memory_id: int) -> bool:
+        """删除一条记忆，之后不再被检索到"""
+        with self._lock:
+            return self.index.delete([memory_id]) == 1
+
+    def get(self, memory_id: int) -> Optional[MemoryHit]:
+        """按编号读取记忆，不存在或已删除时返回None"""
+        with self._lock:
+            if not self.index.is_alive(memory_id):
+                return None
+            return self._hit(memory_id, 1.0)
+
+    def flush(self) -> None:
+        """写入磁盘: 先写内容，再写向量与元数据"""
+        with self._lock:
+            self.records.flush()
+            self.index.flush()
+            self._unflushed = 0
+
+    def _written(self) -> None:
+        """工具调用写入后计数，达到 flush_every 时写入磁盘"""
+        if self.path is None:
+            return
+        with self._lock:
+            self._unflushed += 1
+            if self.flush_every is not None and self._unflushed >= self.flush_every:
+                self.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self.records.close()
+
+    def execute(self, input_data: str) -> str:
+        """直接传入文本时按 search 处理"""
+        return self.run({"action": "search", "query": input_data})
+
+    def run(self, parameters: Dict[str, Any]) -> str:
+        action = str(parameters.get("action", "search")).strip().lower()
+        try:
+            if action == "add":
+                content = str(parameters.get("content") or parameters.get("input") or "").strip()
+                if not content:
+                    return "错误: action=add 需要提供 content。"
+                memory_id = self.add(content)
+                self._written()
+                return f"✅ 已记住(记忆 {memory_id})。"
+            if action == "search":
+                # recall=... 是文本格式工具调用中的写法，与 query 等价
+                query = str(parameters.get("query") or parameters.get("recall") or parameters.get("input") or "").strip()
+                if not query:
+                    return "错误: action=search 需要提供 query。"
+                limit = int(parameters.get("limit") or self.max_results)
+                return self._format(self.search(query, limit), query)
+            if action == "delete":
+                memory_id = int(parameters["memory_id"])
+                if not self.delete(memory_id):
+                    return f"未找到编号为 {memory_id} 的记忆。"
+                self._written()
+                return f"🗑️ 已删除记忆 {memory_id}。"
+        except (KeyError, ValueError) as e:
+            return f"错误: 参数不合法({e})。"
+        return f"错误: 不支持的操作 '{action}'，可选 add、search、delete。"
+
+    @staticmethod
+    def _format(hits: List[MemoryHit], query: str) -> str:
+        if not hits:
+            return f"没有找到与 '{query}' 相关的记忆。"
+        entries = [f"【记忆 {hit.memory_id}】(相似度 {hit.score:.2f})\n{hit.content}" for hit in hits]
+        return f"🧠 找到 {len(hits)} 条相关记忆:\n\n" + "\n\n".join(entries)
@@ -0,0 +1,383 @@
+"""CPU 密集型工具的进程池: 常驻的工作进程、按调用的超时与取消、内存上限以及结果的序列化传输"""
+import os
+import time
+import uuid
+import pickle
+import signal
+import threading
+import multiprocessing
+from typing import Any, Iterable, List, Optional, Set, Tuple
+
+from core.metrics import MetricsRegistry, get_registry
+from core.events import EventType, EventLevel, emit
+from .base import BaseTool, ToolTimeoutError, ToolCancelledError, ToolProcessError
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，内存上限不生效
+    resource = None
+
+# 等待结果时检查取消信号的间隔(秒)
+_POLL_INTERVAL = 0.05
+
+
+def _apply_memory_limit(memory_limit: Optional[int]) -> None:
+    """限制工作进程的地址空间大小，超出时工具内的分配抛出 MemoryError"""
+    if not memory_limit or resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+
+def _worker_main(conn, memory_limit: Optional[int]) -> None:
+    """
+    工作进程的主循环。每条消息为 (key, tool, method, args)，tool 只在该进程首次执行这个工具时携带，
+    之后按 key 复用已反序列化的实例；收到 None 或连接关闭时退出。
+    """
+    # Ctrl+C 由主进程处理，工作进程随主进程关闭
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _apply_memory_limit(memory_limit)
+    tools = {}
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        key, tool, method, args = message
+        if tool is not None:
+            tools[key] = tool
+        try:
+            reply = ("ok", getattr(tools[key], method)(*args))
+        except MemoryError:
+            reply = ("memory", None)
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # 结果或异常无法 pickle: 序列化在写入前完成，连接仍然可用
+            kind = "结果" if reply[0] == "ok" else "异常"
+            conn.send(("unpicklable", f"{kind}无法在进程间传输({type(e).__name__}: {e}): {reply[1]!r:.200}"))
+
+
+class _Worker:
+    """一个工作进程及其连接，记录已加载的工具与执行过的调用数"""
+
+    def __init__(self, context, memory_limit: Optional[int], index: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit), name=f"goagent-tool-process-{index}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.loaded: Set[str] = set()
+        self.tasks = 0
+
+    def stop(self, graceful: bool = False) -> None:
+        """结束工作进程；graceful 为 True 时先请求其自行退出"""
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(0.5)
+            except (OSError, ValueError):
+                pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.conn.close()
+
+
+class ToolProcessPool:
+    """
+    在常驻的工作进程中执行 CPU 密集型工具，避免阻塞 agent 线程并绕开 GIL。
+
+    每个工作进程同一时间只执行一个调用；工具实例在每个进程中只传输一次，之后按实例复用，
+    进程中保存的是首次传输时的快照。
+    CPU 密集的工具无法协作地取消，因此超时或被取消时直接结束执行它的工作进程，并在下次需要时补充新的进程。
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        memory_limit: Optional[int] = None,
+        max_tasks_per_worker: Optional[int] = None,
+        start_method: Optional[str] = None,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        """
+        Args:
+            max_workers: 工作进程数上限，默认为 CPU 核数
+            memory_limit: 每个工作进程的地址空间上限(字节)，None 表示不限制；仅在支持 setrlimit 的平台生效
+            max_tasks_per_worker: 工作进程执行多少次调用后被替换，None 表示不替换
+            start_method: 进程启动方式，默认优先使用 forkserver，不可用时使用 spawn
+            metrics: 指标注册表，默认使用全局注册表
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.memory_limit = memory_limit
+        self.max_tasks_per_worker = max_tasks_per_worker
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = "forkserver" if "forkserver" in methods else "spawn"
+        self.context = multiprocessing.get_context(start_method)
+        self.metrics = metrics or get_registry()
+        self._idle: List[_Worker] = []
+        self._size = 0
+        self._spawned = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        """当前的工作进程数(包括正在执行调用的进程)"""
+        return self._size
+
+    def start(self, tools: Iterable[BaseTool] = (), timeout: Optional[float] = 30) -> None:
+        """
+        预热进程池: 启动全部工作进程并等待就绪，同时把 tools 加载到每个进程中，
+        使第一次调用不必承担进程启动、模块导入与工具反序列化的开销。
+        """
+        tools = list(tools)
+        workers = []
+        with self._condition:
+            workers.extend(self._idle)
+            self._idle.clear()
+            while self._size < self.max_workers:
+                workers.append(self._spawn())
+        healthy = []
+        try:
+            for worker in workers:
+                try:
+                    self._wait_ready(worker, None, timeout)
+                    for tool in tools:
+                        try:
+                            self._send(worker, tool, "get_metadata", ())
+                        except _Unsent:
+                            emit(EventType.MESSAGE, f"工具 '{tool.name}' 无法序列化，跳过预加载。",
+                                 EventLevel.WARNING, source="ToolProcessPool")
+                            continue
+                        self._receive(worker, tool, timeout, None, None)
+                    healthy.append(worker)
+                except (ToolTimeoutError, ToolProcessError) as e:
+                    emit(EventType.MESSAGE, f"工作进程预热失败: {e}", EventLevel.WARNING, source="ToolProcessPool")
+                    self._discard(worker, "crashed")
+        finally:
+            with self._condition:
+                self._idle.extend(healthy)
+                self._condition.notify_all()
+
+    def run(
+        self,
+        tool: BaseTool,
+        method: str,
+        args: Tuple[Any, ...],
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Any:
+        """
+        在工作进程中执行 tool.<method>(*args)。
+
+        Args:
+            tool: 要执行的工具，需要能够被 pickle
+            method: 工具的方法名，如 execute、run
+            args: 方法参数
+            timeout: 超时时间(秒)，包括等待空闲工作进程的时间
+            cancel: 取消信号，设置后结束正在执行的工作进程
+
+        Returns:
+            方法的返回值
+
+        Raises:
+            ToolTimeoutError: 等待空闲进程或执行超时
+            ToolCancelledError: 调用被取消
+            ToolProcessError: 工具或结果无法序列化、超出内存上限或工作进程意外退出
+            Exception: 工具自身抛出的异常原样抛出
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        worker = self._checkout(tool.name, timeout, deadline, cancel)
+        reason = "crashed"
+        try:
+            self._wait_ready(worker, deadline, timeout, tool.name, cancel)
+            self._send(worker, tool, method, args)
+            worker.tasks += 1
+            kind, value = self._receive(worker, tool, timeout, deadline, cancel)
+            reason = None
+            if kind == "memory":
+                reason = "memory"
+                raise ToolProcessError(f"工具 {tool.name} 超出工作进程的内存上限({self.memory_limit} 字节)")
+            if kind == "unpicklable":
+                raise ToolProcessError(f"工具 {tool.name} 的{value}")
+            if kind == "error":
+                raise value
+            return value
+        except ToolTimeoutError:
+            reason = "timeout"
+            raise
+        except ToolCancelledError:
+            reason = "cancelled"
+            raise
+        except _Unsent:
+            # 消息没有写入连接，工作进程仍然可用
+            reason = None
+            raise ToolProcessError(f"工具 {tool.name} 无法序列化，不能在进程池中执行") from None
+        finally:
+            self._checkin(worker, reason)
+
+    def close(self) -> None:
+        """结束空闲的工作进程，正在执行调用的进程在调用结束后退出"""
+        with self._condition:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            self._condition.notify_all()
+        for worker in workers:
+            worker.stop(graceful=True)
+        with self._condition:
+            self._size -= len(workers)
+        self.metrics.gauge("goagent_tool_process_workers", "进程池中的工作进程数").set(self._size)
+
+    def _spawn(self) -> _Worker:
+        """启动一个新的工作进程，调用方需持有 _condition"""
+        self._spawned += 1
+        worker = _Worker(self.context, self.memory_limit, self._spawned)
+        self._size += 1
+        self.metrics.gauge("goagent_tool_process_workers", "进程池中的工作进程数").set(self._size)
+        return worker
+
+    def _checkout(
+        self,
+        name: str,
+        timeout: Optional[float],
+        deadline: Optional[float],
+        cancel: Optional[threading.Event]
+    ) -> _Worker:
+        """取一个空闲的工作进程，没有空闲进程且未达上限时启动新进程，否则排队等待"""
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise ToolProcessError("进程池已关闭")
+                if cancel is not None and cancel.is_set():
+                    raise ToolCancelledError(f"工具 {name} 的调用已被取消")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_workers:
+                    return self._spawn()
+                wait = _POLL_INTERVAL if cancel is not None else None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ToolTimeoutError(name, timeout, queued=True)
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(wait)
+
+    def _checkin(self, worker: _Worker, reason: Optional[str]) -> None:
+        """归还工作进程；reason 不为None(超时、取消、崩溃等)或达到调用次数上限时替换该进程"""
+        if reason is None and self.max_tasks_per_worker and worker.tasks >= self.max_tasks_per_worker:
+            reason = "recycled"
+        if reason is None and not self._closed:
+            with self._condition:
+                self._idle.append(worker)
+                self._condition.notify()
+            return
+        self._discard(worker, reason or "closed")
+
+    def _discard(self, worker: _Worker, reason: str) -> None:
+        worker.stop(graceful=reason in ("recycled", "closed"))
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self.metrics.gauge("goagent_tool_process_workers", "进程池中的工作进程数").set(self._size)
+        self.metrics.counter("goagent_tool_process_restarts_total", "被结束并替换的工作进程数").inc(reason=reason)
+
+    def _wait_ready(
+        self,
+        worker: _Worker,
+        deadline: Optional[float],
+        timeout: Optional[float],
+        name: str = "",
+        cancel: Optional[threading.Event] = None
+    ) -> None:
+        """等待新启动的工作进程完成初始化，启动时间计入调用的超时"""
+        if worker.ready:
+            return
+        if deadline is None and timeout is not None:
+            deadline = time.monotonic() + timeout
+        self._poll(worker, name or "进程池", timeout, deadline, cancel)
+        try:
+            kind, _ = worker.conn.recv()
+        except (EOFError, OSError):
+            raise ToolProcessError(f"工作进程启动失败(exitcode={worker.process.exitcode})") from None
+        worker.ready = kind == "ready"
+
+    def _send(self, worker: _Worker, tool: BaseTool, method: str, args: Tuple[Any, ...]) -> None:
+        """
+        把一次调用发给工作进程。工具实例第一次发送时被分配一个随机令牌，每个进程按令牌缓存
+        反序列化得到的快照: 之后主进程中对该实例属性的修改不会同步到已加载它的进程。
+        令牌不依赖 id()，实例被回收后新实例复用相同地址也不会误用旧快照。
+        """
+        key = tool.__dict__.get("_process_token")
+        if key is None:
+            key = tool._process_token = uuid.uuid4().hex
+        payload = None if key in worker.loaded else tool
+        try:
+            # 先序列化再写入，无法 pickle 时连接中不会留下半条消息
+            data = pickle.dumps((key, payload, method, args))
+        except Exception as e:
+            raise _Unsent(e) from e
+        worker.conn.send_bytes(data)
+        worker.loaded.add(key)
+
+    def _receive(
+        self,
+        worker: _Worker,
+        tool: BaseTool,
+        timeout: Optional[float],
+        deadline: Optional[float],
+        cancel: Optional[threading.Event]
+    ) -> Tuple[str, Any]:
+        if deadline is None and timeout is not None:
+            deadline = time.monotonic() + timeout
+        self._poll(worker, tool.name, timeout, deadline, cancel)
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            raise ToolProcessError(
+                f"执行工具 {tool.name} 的工作进程意外退出(exitcode={worker.process.exitcode})"
+            ) from None
+        except Exception as e:
+            # 工具抛出的异常无法在主进程中还原
+            return "unpicklable", f"异常无法在进程间传输({type(e).__name__}: {e})"
+
+    def _poll(
+        self,
+        worker: _Worker,
+        name: str,
+        timeout: Optional[float],
+        deadline: Optional[float],
+        cancel: Optional[threading.Event]
+    ) -> None:
+        """等待连接上有数据可读，期间检查超时与取消信号"""
+        while True:
+            wait = _POLL_INTERVAL if cancel is not None else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ToolTimeoutError(name, timeout)
+                wait = remaining if wait is None else min(wait, remaining)
+            if worker.conn.poll(wait):
+                return
+            if not worker.process.is_alive() and not worker.conn.poll(0):
+                return  # 由随后的 recv 报告进程退出
+            if cancel is not None and cancel.is_set():
+                raise ToolCancelledError(f"工具 {name} 的调用已被取消")
+
+
+class _Unsent(Exception):
+    """消息在写入连接前序列化失败"""
@@ -1,27 +1,143 @@
 import os
-from serpapi import SerpApiClient
-from dotenv import load_dotenv
+import re
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from core.env import ensure_env
+from core.cache import SearchResultCache
+from core.cassette import Cassette, default_cassette
+from core.events import EventType, EventLevel, emit
+from core.metrics import MetricsRegistry, get_registry
+from core.resilience import RateLimiter
 from .base import BaseTool
 
-# 加载环境变量
-load_dotenv()
+if TYPE_CHECKING:
+    import httpx
+
+# 相邻两条网页结果之间的分隔
+RESULT_SEPARATOR = "\n" + "-" * 60 + "\n"
+
+
+def format_search_results(results: Dict[str, Any], query: str, max_results: int = 5) -> str:
+    """
+    把 SerpApi 格式的搜索结果渲染为工具输出: 直接答案或知识图谱在前，网页结果在后，
+    网页结果之间以 RESULT_SEPARATOR 分隔。其他检索工具构造相同结构的结果即可复用这一格式。
+
+    Args:
+        results: 搜索结果，可包含 answer_box、knowledge_graph 与 organic_results(title、snippet、link)
+        query: 查询字符串，没有结果时用于提示
+        max_results: 最多展示的网页结果条数
+
+    Returns:
+        格式化后的结果文本
+    """
+    sections = []
+    # 智能解析:优先寻找最直接的答案
+    if "answer_box_list" in results:
+        sections.append("【直接答案】\n" + "\n".join(results["answer_box_list"]))
+    elif "answer_box" in results and "answer" in results["answer_box"]:
+        sections.append(f"【直接答案】\n{results['answer_box']['answer']}")
+    elif "knowledge_graph" in results and "description" in results["knowledge_graph"]:
+        kg = results["knowledge_graph"]
+        result_text = "【知识图谱】\n"
+        if "title" in kg:
+            result_text += f"主题: {kg['title']}\n"
+        result_text += f"描述: {kg['description']}"
+        if "source" in kg:
+            result_text += f"\n来源: {kg['source']['name']}"
+        sections.append(result_text)
+
+    organic = results.get("organic_results") or []
+    if organic:
+        snippets = []
+        for i, res in enumerate(organic[:max_results]):
+            title = res.get('title', '无标题')
+            snippet = res.get('snippet', '无描述')
+            link = res.get('link', '')
+
+            result_text = f"【结果 {i+1}】\n"
+            result_text += f"📌 标题: {title}\n"
+            result_text += f"📄 摘要: {snippet}"
+            if link:
+                result_text += f"\n🔗 链接: {link}"
+
+            snippets.append(result_text)
+
+        header = f"🔎 搜索到 {len(organic)} 条结果，以下是前 {len(snippets)} 条:\n"
+        sections.append(header + RESULT_SEPARATOR.join(snippets))
+
+    if not sections:
+        return f"对不起，没有找到关于 '{query}' 的信息。"
+    return "\n\n".join(sections)
 
 
 class SearchTool(BaseTool):
     """
     基于SerpApi的网页搜索工具。
     智能解析搜索结果，优先返回直接答案或知识图谱信息。
+    相同的查询在缓存有效期内直接返回缓存的结果，不再请求 SerpApi。
+    请求通过保持连接的共享 HTTP 客户端发出，同时提供异步与批量查询接口。
     """
+
+    parameters = {
+        "type": "object",
+        "properties": {"query": {"type": "string", "description": "搜索查询字符串"}},
+        "required": ["query"],
+    }
+    max_output_tokens = 800
     
-    def __init__(self):
-        """初始化搜索工具"""
+    def __init__(
+        self,
+        cassette: Optional[Cassette] = None,
+        cache: Optional[SearchResultCache] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        base_url: Optional[str] = None,
+        timeout: float = 30.0,
+        max_connections: int = 10,
+        rate_limit: Optional[float] = None,
+        max_results: int = 5
+    ):
+        """
+        初始化搜索工具
+
+        Args:
+            cassette: 录制/回放用的 cassette，默认按环境变量GOAGENT_CASSETTE打开，未设置时不启用
+            cache: 搜索结果缓存，默认按环境变量创建:
+                SEARCH_CACHE(默认 true)、SEARCH_CACHE_TTL(秒，默认 3600)、
+                SEARCH_CACHE_NEGATIVE_TTL(秒，默认 300)、SEARCH_CACHE_DB(磁盘缓存路径，默认不启用)
+            metrics: 指标注册表，默认使用全局注册表
+            base_url: SerpApi 服务地址，默认读取环境变量SERPAPI_BASE_URL，未设置时为 https://serpapi.com
+            timeout: 单次请求超时时间(秒)
+            max_connections: 连接池大小，也是批量查询的默认并发数
+            rate_limit: 每秒最多发出的请求数，默认读取环境变量SEARCH_RATE_LIMIT，未设置时不限速
+            max_results: 最多返回的网页结果条数，超出 max_output_tokens 时再从末尾丢弃
+        """
         super().__init__(
             name="Search",
             description="一个网页搜索引擎。当你需要回答关于时事、事实以及在你的知识库中找不到的信息时，应使用此工具。"
         )
+        ensure_env()
         self.api_key = os.getenv("SERPAPI_API_KEY")
-        if not self.api_key:
-            print("警告: SERPAPI_API_KEY 未在 .env 文件中配置。")
+        self.cassette = cassette if cassette is not None else default_cassette()
+        self.cache = cache if cache is not None else self._default_cache()
+        self.metrics = metrics or get_registry()
+        base_url = base_url or os.getenv("SERPAPI_BASE_URL") or "https://serpapi.com"
+        self.endpoint = base_url.rstrip("/") + "/search.json"
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_results = max_results
+        if rate_limit is None and os.getenv("SEARCH_RATE_LIMIT"):
+            rate_limit = float(os.getenv("SEARCH_RATE_LIMIT"))
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        # HTTP 客户端在首次请求时才创建，之后复用连接
+        self._client: Optional["httpx.Client"] = None
+        self._client_lock = threading.Lock()
+        # 异步客户端绑定到创建时的事件循环，事件循环变化时重新创建
+        self._async_client: Optional["httpx.AsyncClient"] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        replay_only = self.cassette is not None and self.cassette.mode == Cassette.REPLAY
+        if not self.api_key and not replay_only:
+            emit(EventType.MESSAGE, "警告: SERPAPI_API_KEY 未在 .env 文件中配置。", EventLevel.WARNING, source=self.name)
     
     def execute(self, query: str) -> str:
         """
@@ -33,63 +149,210 @@ class SearchTool(BaseTool):
         Returns:
             搜索结果文本
         """
-        print(f"🔍 正在执行 [SerpApi] 网页搜索: {query}")
+        emit(EventType.TOOL_CALL, f"🔍 正在执行 [SerpApi] 网页搜索: {query}", source=self.name, query=query)
         try:
-            if not self.api_key:
+            results = self._search(self._params(query))
+            if results is None:
                 return "错误: SERPAPI_API_KEY 未在 .env 文件中配置。"
+            return self._format(results, query)
+        except Exception as e:
+            return f"搜索时发生错误: {e}"
 
-            params = {
-                "engine": "google",
-                "q": query,
-                "api_key": self.api_key,
-                "gl": "cn",     # 国家代码
-                "hl": "zh-cn",  # 语言代码
-            }
-            
-            client = SerpApiClient(params)
-            results = client.get_dict()
-            
-            # 智能解析:优先寻找最直接的答案
-            if "answer_box_list" in results:
-                answer_text = "【直接答案】\n" + "\n".join(results["answer_box_list"])
-                return answer_text
-            
-            if "answer_box" in results and "answer" in results["answer_box"]:
-                answer = results["answer_box"]["answer"]
-                return f"【直接答案】\n{answer}"
-            
-            if "knowledge_graph" in results and "description" in results["knowledge_graph"]:
-                kg = results["knowledge_graph"]
-                result_text = "【知识图谱】\n"
-                if "title" in kg:
-                    result_text += f"主题: {kg['title']}\n"
-                result_text += f"描述: {kg['description']}"
-                if "source" in kg:
-                    result_text += f"\n来源: {kg['source']['name']}"
-                return result_text
-            if "organic_results" in results and results["organic_results"]:
-                # 如果没有直接答案，则返回前三个有机结果的摘要
-                total_results = len(results["organic_results"])
-                snippets = []
-                
-                for i, res in enumerate(results["organic_results"][:3]):
-                    title = res.get('title', '无标题')
-                    snippet = res.get('snippet', '无描述')
-                    link = res.get('link', '')
-                    
-                    result_text = f"【结果 {i+1}】\n"
-                    result_text += f"📌 标题: {title}\n"
-                    result_text += f"📄 摘要: {snippet}"
-                    if link:
-                        result_text += f"\n🔗 链接: {link}"
-                    
-                    snippets.append(result_text)
-                
-                header = f"🔎 搜索到 {total_results} 条结果，以下是前 {min(3, total_results)} 条:\n"
-                separator = "\n" + "-"*60 + "\n"
-                return header + separator.join(snippets)
-            
-            return f"对不起，没有找到关于 '{query}' 的信息。"
+    async def aexecute(self, query: str) -> str:
+        """
+        异步执行网页搜索，复用共享的异步连接池。
 
+        Args:
+            query: 搜索查询字符串
+
+        Returns:
+            搜索结果文本
+        """
+        emit(EventType.TOOL_CALL, f"🔍 正在执行 [SerpApi] 异步网页搜索: {query}", source=self.name, query=query)
+        try:
+            results = await self._asearch(self._params(query))
+            if results is None:
+                return "错误: SERPAPI_API_KEY 未在 .env 文件中配置。"
+            return self._format(results, query)
         except Exception as e:
             return f"搜索时发生错误: {e}"
+
+    async def asearch_many(self, queries: List[str], max_concurrency: Optional[int] = None) -> List[str]:
+        """
+        并发执行多个搜索，同时进行的请求数不超过 max_concurrency，请求速率受 rate_limiter 限制。
+
+        Args:
+            queries: 查询列表
+            max_concurrency: 最大并发数，默认与连接池大小一致
+
+        Returns:
+            与 queries 顺序一致的搜索结果文本
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_connections)
+
+        async def run(query: str) -> str:
+            async with semaphore:
+                return await self.aexecute(query)
+
+        return list(await asyncio.gather(*(run(q) for q in queries)))
+
+    def search_many(self, queries: List[str], max_concurrency: Optional[int] = None) -> List[str]:
+        """asearch_many 的同步版本，不能在正在运行的事件循环中调用"""
+        return asyncio.run(self._run_and_close(self.asearch_many(queries, max_concurrency)))
+
+    async def _run_and_close(self, coro):
+        # 异步连接池绑定在创建它的事件循环上，asyncio.run 结束前关闭
+        try:
+            return await coro
+        finally:
+            await self.aclose()
+
+    def _params(self, query: str) -> Dict[str, Any]:
+        return {
+            "engine": "google",
+            "q": query,
+            "api_key": self.api_key,
+            "gl": "cn",     # 国家代码
+            "hl": "zh-cn",  # 语言代码
+        }
+
+    def _format(self, results: Dict[str, Any], query: str) -> str:
+        """
+        智能解析搜索结果: 直接答案或知识图谱在前，网页结果在后。
+        结果超出 token 预算时从末尾整条丢弃网页结果，直接答案始终保留。
+        """
+        return format_search_results(results, query, self.max_results)
+
+    def split_output(self, output: str) -> List[str]:
+        """直接答案与网页结果的标题行各为一段，之后每条网页结果为一段"""
+        head, *rest = re.split(f"(?={re.escape(RESULT_SEPARATOR)})", output)
+        return super().split_output(head) + rest
+
+    @staticmethod
+    def _default_cache() -> Optional[SearchResultCache]:
+        if os.getenv("SEARCH_CACHE", "true").lower() != "true":
+            return None
+        return SearchResultCache(
+            ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+            negative_ttl=float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "300")),
+            db_path=os.getenv("SEARCH_CACHE_DB") or None,
+        )
+
+    def _lookup(self, params: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        依次查询结果缓存与 cassette 回放。
+
+        Returns:
+            (不含API密钥的请求参数, 原始搜索结果或None)
+        """
+        # 缓存键与录制中都不包含API密钥
+        request = {k: v for k, v in params.items() if k != "api_key"}
+        if self.cache is not None:
+            results = self.cache.lookup(request)
+            if results is not None:
+                self.metrics.counter("goagent_search_cache_total", "搜索结果缓存查询次数").inc(result="hit")
+                emit(EventType.MESSAGE, "🔍 命中搜索结果缓存", EventLevel.DEBUG, source=self.name, query=params["q"])
+                return request, results
+            self.metrics.counter("goagent_search_cache_total", "搜索结果缓存查询次数").inc(result="miss")
+
+        replay = self.cassette.lookup("serpapi", request) if self.cassette is not None else None
+        if replay is not None:
+            if self.cache is not None:
+                self.cache.store(request, replay["result"])
+            return request, replay["result"]
+        return request, None
+
+    def _remember(self, request: Dict[str, Any], results: Dict[str, Any]) -> None:
+        """录制并缓存新获取的结果"""
+        if self.cassette is not None:
+            self.cassette.record("serpapi", request, {"result": results})
+        if self.cache is not None:
+            self.cache.store(request, results)
+
+    def _search(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        获取原始搜索结果:依次查询结果缓存、cassette 回放，最后请求 SerpApi。
+
+        Returns:
+            原始搜索结果，未配置API密钥且无法回放时返回None
+        """
+        request, results = self._lookup(params)
+        if results is not None:
+            return results
+        if not self.api_key:
+            return None
+        results = self._fetch(params)
+        self._remember(request, results)
+        return results
+
+    async def _asearch(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """_search 的异步版本"""
+        request, results = self._lookup(params)
+        if results is not None:
+            return results
+        if not self.api_key:
+            return None
+        results = await self._afetch(params)
+        self._remember(request, results)
+        return results
+
+    @property
+    def client(self) -> "httpx.Client":
+        """获取共享的同步 HTTP 客户端，连接保持复用，首次访问时创建"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    self._client = httpx.Client(limits=self._limits(), timeout=self.timeout)
+        return self._client
+
+    @property
+    def async_client(self) -> "httpx.AsyncClient":
+        """
+        获取共享的异步 HTTP 客户端，首次在事件循环中访问时创建。
+        连接池只能在创建它的事件循环中使用，当前事件循环不同时(如多次调用 asyncio.run)丢弃旧客户端并重新创建。
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = None
+            self._async_loop = loop
+        if self._async_client is None:
+            import httpx
+            self._async_client = httpx.AsyncClient(limits=self._limits(), timeout=self.timeout)
+        return self._async_client
+
+    def _limits(self) -> "httpx.Limits":
+        import httpx
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    def _fetch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """调用 SerpApi 获取原始搜索结果"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        # 限速等待期间调用可能已经超时
+        self.check_cancelled()
+        with self.metrics.histogram("goagent_search_duration_seconds", "SerpApi 请求耗时").time():
+            response = self.client.get(self.endpoint, params=params)
+        # SerpApi 的错误同样以 JSON 返回(包含 error 字段)，与 SDK 的 get_dict 行为一致
+        return response.json()
+
+    async def _afetch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """_fetch 的异步版本"""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire()
+        with self.metrics.histogram("goagent_search_duration_seconds", "SerpApi 请求耗时").time():
+            response = await self.async_client.get(self.endpoint, params=params)
+        return response.json()
+
+    def close(self) -> None:
+        """关闭同步客户端，释放连接池"""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        """关闭异步客户端，释放连接池"""
+        if self._async_client is not None and self._async_loop is asyncio.get_running_loop():
+            await self._async_client.aclose()
+        self._async_client = None
+        self._async_loop = None
@@ -1,13 +1,77 @@
-from typing import Dict, Any, Optional, List, Callable
-from .base import BaseTool
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Callable, Iterable, Iterator, Tuple
+from core.context import TokenCounter
+from core.metrics import MetricsRegistry, get_registry
+from core.events import EventType, EventLevel, emit
+from .base import BaseTool, OutputBudget, ToolTimeoutError, ToolCancelledError, cancel_scope
+
+if TYPE_CHECKING:
+    from .process_pool import ToolProcessPool
 
 
 class ToolExecutor:
     """
     工具执行器，负责管理和执行工具。
+
+    配置了超时的调用在工作线程中执行，超时后调用方立即得到 ToolTimeoutError，
+    同时设置取消信号，工具通过 check_cancelled() 协作地结束执行。
+    配置了并发上限的工具按名称使用信号量限流，排队的调用数通过 goagent_tool_queue_depth 指标导出。
+    工具结果超出 token 预算时按工具的结构划分截断，避免单个过大的结果拖慢下一次模型调用。
+    CPU 密集型工具(cpu_bound 或在 cpu_bound_tools 中列出)在常驻的工作进程中执行，
+    超时或取消时结束对应的工作进程；I/O 型工具仍在线程中执行。
     """
-    def __init__(self):
+    def __init__(
+        self,
+        metrics: Optional[MetricsRegistry] = None,
+        default_timeout: Optional[float] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+        max_workers: int = 32,
+        max_output_tokens: Optional[int] = 2000,
+        output_budgets: Optional[Dict[str, int]] = None,
+        counter: Optional[TokenCounter] = None,
+        process_workers: Optional[int] = None,
+        process_memory_limit: Optional[int] = None,
+        cpu_bound_tools: Optional[Iterable[str]] = None
+    ):
+        """
+        Args:
+            metrics: 指标注册表，默认使用全局注册表
+            default_timeout: 工具调用的默认超时时间(秒)，None 表示不限制
+            timeouts: 按工具名称配置的超时时间，优先于工具自身的 timeout 属性
+            concurrency_limits: 按工具名称配置的并发上限，优先于工具自身的 max_concurrency 属性
+            max_workers: 执行带超时调用的线程池大小
+            max_output_tokens: 工具结果的默认 token 预算，None 表示不截断
+            output_budgets: 按工具名称配置的 token 预算，优先于工具自身的 max_output_tokens 属性
+            counter: 计算结果 token 数的计数器
+            process_workers: 执行 CPU 密集型工具的工作进程数，默认为 CPU 核数；0 表示不使用进程池，在线程中执行
+            process_memory_limit: 每个工作进程的内存上限(字节)，None 表示不限制
+            cpu_bound_tools: 额外按名称标记为 CPU 密集型的工具
+        """
         self.tools: Dict[str, BaseTool] = {}
+        self.metrics = metrics or get_registry()
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self.concurrency_limits = dict(concurrency_limits or {})
+        self.max_workers = max_workers
+        self.max_output_tokens = max_output_tokens
+        self.output_budgets = dict(output_budgets or {})
+        self.counter = counter or TokenCounter()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._semaphores_lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.process_workers = process_workers
+        self.process_memory_limit = process_memory_limit
+        self.cpu_bound_tools = set(cpu_bound_tools or ())
+        self._process_pool: Optional["ToolProcessPool"] = None
+        # 工具集合的版本号，注册或移除工具时递增，供调用方缓存基于工具描述渲染的提示词
+        self.version = 0
+        self._description_cache: Optional[tuple] = None
+        self._openai_tools_cache: Optional[tuple] = None
     
     def register_tool(self, tool: BaseTool) -> None:
         """
@@ -17,9 +81,22 @@ class ToolExecutor:
             tool: 实现了BaseTool接口的工具实例
         """
         if tool.name in self.tools:
-            print(f"警告: 工具 '{tool.name}' 已存在，将被覆盖。")
+            emit(EventType.MESSAGE, f"警告: 工具 '{tool.name}' 已存在，将被覆盖。", EventLevel.WARNING, source="ToolExecutor")
         self.tools[tool.name] = tool
-        print(f"工具 '{tool.name}' 已注册。")
+        self.version += 1
+        emit(EventType.MESSAGE, f"工具 '{tool.name}' 已注册。", EventLevel.DEBUG, source="ToolExecutor")
+
+    def unregister(self, name: str) -> bool:
+        """
+        移除一个工具。
+
+        Returns:
+            工具存在并被移除时返回True
+        """
+        if self.tools.pop(name, None) is None:
+            return False
+        self.version += 1
+        return True
     
     def get_tool(self, name: str) -> Optional[BaseTool]:
         """
@@ -33,21 +110,339 @@ class ToolExecutor:
         """
         return self.tools.get(name)
     
-    def execute_tool(self, name: str, input_data: str) -> str:
+    def execute_tool(
+        self,
+        name: str,
+        input_data: str,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> str:
         """
         执行指定名称的工具。
         
         Args:
             name: 工具名称
             input_data: 工具输入参数
+            timeout: 本次调用的超时时间(秒)，包括排队等待并发名额的时间；默认按工具的配置
+            cancel: 外部的取消信号，设置后工具在下一次 check_cancelled() 时结束
             
         Returns:
             工具执行结果
+
+        Raises:
+            ToolTimeoutError: 调用超时
+            ToolCancelledError: 调用被取消
+        """
+        tool = self.get_tool(name)
+        if not tool:
+            self.metrics.counter("goagent_tool_calls_total", "工具调用次数").inc(tool=str(name), status="not_found")
+            return f"错误: 未找到名为 '{name}' 的工具。"
+
+        return self._call(tool, lambda: tool.execute(input_data), timeout, cancel, ("execute", (input_data,)))
+
+    def execute_tool_call(
+        self,
+        name: str,
+        arguments: Any,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> str:
+        """
+        执行模型通过原生函数调用发起的工具调用，超时、取消与并发限制与 execute_tool 相同。
+
+        Args:
+            name: 工具名称
+            arguments: 模型生成的参数，JSON 字符串或已解析的字典
+            timeout: 本次调用的超时时间(秒)，默认按工具的配置
+            cancel: 外部的取消信号
+
+        Returns:
+            工具执行结果；工具不存在或参数不合法时返回错误信息，交给模型修正
         """
         tool = self.get_tool(name)
-        if tool:
-            return tool.execute(input_data)
-        return f"错误: 未找到名为 '{name}' 的工具。"
+        if not tool:
+            self.metrics.counter("goagent_tool_calls_total", "工具调用次数").inc(tool=str(name), status="not_found")
+            return f"错误: 未找到名为 '{name}' 的工具。"
+        try:
+            parameters = json.loads(arguments or "{}") if isinstance(arguments, str) else dict(arguments or {})
+            if not isinstance(parameters, dict):
+                raise ValueError("参数必须是 JSON 对象")
+        except ValueError as e:
+            self.metrics.counter("goagent_tool_calls_total", "工具调用次数").inc(tool=name, status="bad_arguments")
+            return f"错误: 工具 '{name}' 的参数不合法({e})，请按参数定义重新生成。"
+        return self._call(tool, lambda: tool.run(parameters), timeout, cancel, ("run", (parameters,)))
+
+    def _call(
+        self,
+        tool: BaseTool,
+        func: Callable[[], str],
+        timeout: Optional[float],
+        cancel: Optional[threading.Event],
+        remote: Optional[Tuple[str, Tuple[Any, ...]]] = None
+    ) -> str:
+        """
+        在并发限制、超时与取消信号下执行 func，并记录调用指标。
+        remote 为等价的 (方法名, 参数)，CPU 密集型工具据此在工作进程中执行。
+        """
+        name = tool.name
+        timeout = self.timeout_for(name) if timeout is None else timeout
+        cancel = cancel or threading.Event()
+        status = "error"
+        start = time.perf_counter()
+        try:
+            semaphore = self._acquire(tool, timeout)
+            if cancel.is_set():
+                if semaphore is not None:
+                    semaphore.release()
+                raise ToolCancelledError(f"工具 {name} 的调用已被取消")
+            if remote is not None and self.runs_in_process(name):
+                remaining = None if timeout is None else max(timeout - (time.perf_counter() - start), 0)
+                result = self._invoke_in_process(tool, remote, remaining, timeout, cancel, semaphore)
+            elif timeout is None:
+                result = self._invoke(tool, func, cancel, semaphore)
+            else:
+                remaining = max(timeout - (time.perf_counter() - start), 0)
+                future = self._get_pool().submit(self._invoke, tool, func, cancel, semaphore)
+                try:
+                    result = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    cancel.set()
+                    # 尚未开始执行的调用直接取消并归还名额；已在执行的调用由工具协作地结束
+                    if future.cancel() and semaphore is not None:
+                        semaphore.release()
+                    raise ToolTimeoutError(name, timeout)
+            status = "ok"
+            return self._limit_output(tool, result)
+        except ToolTimeoutError as e:
+            status = "timeout"
+            emit(EventType.MESSAGE, f"⏱️ {e}", EventLevel.WARNING, source="ToolExecutor", tool=name, timeout=timeout)
+            raise
+        except ToolCancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            self.metrics.counter("goagent_tool_calls_total", "工具调用次数").inc(tool=name, status=status)
+            self.metrics.histogram("goagent_tool_duration_seconds", "工具调用耗时").observe(
+                time.perf_counter() - start, tool=name
+            )
+
+    async def aexecute_tool(self, name: str, input_data: str, timeout: Optional[float] = None) -> str:
+        """
+        execute_tool 的异步版本，在线程中执行；等待的协程被取消时同时取消工具调用。
+        """
+        cancel = threading.Event()
+        try:
+            return await asyncio.to_thread(self.execute_tool, name, input_data, timeout, cancel)
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+    def stream_tool(self, name: str, input_data: str) -> Iterator[str]:
+        """
+        流式执行工具，按工具的 stream 逐段产出结果。
+        结果超出 token 预算时停止读取并关闭工具的生成器，末尾附加截断说明；
+        调用方提前停止迭代时工具同样会被关闭。在调用方线程中执行，不受超时限制，但遵守并发上限。
+
+        Args:
+            name: 工具名称
+            input_data: 工具输入参数
+
+        Yields:
+            结果片段
+        """
+        tool = self.get_tool(name)
+        if not tool:
+            self.metrics.counter("goagent_tool_calls_total", "工具调用次数").inc(tool=str(name), status="not_found")
+            yield f"错误: 未找到名为 '{name}' 的工具。"
+            return
+
+        limit = self.output_budget_for(name)
+        budget = OutputBudget(limit, self.counter) if limit is not None else None
+        timeout = self.timeout_for(name)
+        semaphore = self._acquire(tool, timeout)
+        status = "error"
+        start = time.perf_counter()
+        if self.runs_in_process(name):
+            stream = self._stream_in_process(tool, input_data, timeout)
+        else:
+            stream = tool.stream(input_data)
+        try:
+            for block in stream:
+                piece = budget.take(block) if budget is not None else block
+                if piece:
+                    yield piece
+                if budget is not None and budget.truncated:
+                    break
+            if budget is not None and budget.truncated:
+                self.metrics.counter("goagent_tool_output_truncated_total", "超出 token 预算被截断的工具结果数").inc(tool=name)
+                yield budget.note()
+            status = "ok"
+        except GeneratorExit:
+            status = "cancelled"
+            raise
+        finally:
+            stream.close()
+            if semaphore is not None:
+                semaphore.release()
+            self.metrics.counter("goagent_tool_calls_total", "工具调用次数").inc(tool=name, status=status)
+            self.metrics.histogram("goagent_tool_duration_seconds", "工具调用耗时").observe(
+                time.perf_counter() - start, tool=name
+            )
+
+    def _stream_in_process(self, tool: BaseTool, input_data: str, timeout: Optional[float]) -> Iterator[str]:
+        """CPU 密集型工具在工作进程中执行完毕后按 split_output 逐段产出"""
+        try:
+            result = self._get_process_pool().run(tool, "execute", (input_data,), timeout)
+        except ToolTimeoutError as e:
+            raise ToolTimeoutError(tool.name, timeout, queued=e.queued) from None
+        yield from tool.split_output(result)
+
+    def output_budget_for(self, name: str) -> Optional[int]:
+        """工具结果的 token 预算: 按名称的配置 > 工具自身的 max_output_tokens 属性 > 默认预算"""
+        if name in self.output_budgets:
+            return self.output_budgets[name]
+        tool = self.tools.get(name)
+        if tool is not None and tool.max_output_tokens is not None:
+            return tool.max_output_tokens
+        return self.max_output_tokens
+
+    def _limit_output(self, tool: BaseTool, result: str) -> str:
+        """记录结果的 token 数，超出预算时按工具的结构划分截断"""
+        if not isinstance(result, str):
+            return result
+        tokens = self.counter.count_text(result)
+        self.metrics.histogram(
+            "goagent_tool_output_tokens", "工具结果的 token 数(估算)",
+            buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+        ).observe(tokens, tool=tool.name)
+        limit = self.output_budget_for(tool.name)
+        if limit is None or tokens <= limit:
+            return result
+        self.metrics.counter("goagent_tool_output_truncated_total", "超出 token 预算被截断的工具结果数").inc(tool=tool.name)
+        return tool.truncate_output(result, limit, self.counter)
+
+    def timeout_for(self, name: str) -> Optional[float]:
+        """工具的超时时间: 按名称的配置 > 工具自身的 timeout 属性 > 默认超时"""
+        if name in self.timeouts:
+            return self.timeouts[name]
+        tool = self.tools.get(name)
+        if tool is not None and tool.timeout is not None:
+            return tool.timeout
+        return self.default_timeout
+
+    def _semaphore_for(self, tool: BaseTool) -> Optional[threading.BoundedSemaphore]:
+        limit = self.concurrency_limits.get(tool.name, tool.max_concurrency)
+        if not limit:
+            return None
+        semaphore = self._semaphores.get(tool.name)
+        if semaphore is None:
+            with self._semaphores_lock:
+                semaphore = self._semaphores.setdefault(tool.name, threading.BoundedSemaphore(limit))
+        return semaphore
+
+    def _acquire(self, tool: BaseTool, timeout: Optional[float]) -> Optional[threading.BoundedSemaphore]:
+        """获取工具的并发名额，排队超时抛出 ToolTimeoutError；不限并发时返回None"""
+        semaphore = self._semaphore_for(tool)
+        if semaphore is None or semaphore.acquire(blocking=False):
+            return semaphore
+        queue_depth = self.metrics.gauge("goagent_tool_queue_depth", "等待并发名额的工具调用数")
+        queue_depth.inc(tool=tool.name)
+        start = time.perf_counter()
+        try:
+            acquired = semaphore.acquire(timeout=timeout)
+        finally:
+            queue_depth.dec(tool=tool.name)
+            self.metrics.histogram("goagent_tool_queue_seconds", "工具调用排队等待耗时").observe(
+                time.perf_counter() - start, tool=tool.name
+            )
+        if not acquired:
+            raise ToolTimeoutError(tool.name, timeout, queued=True)
+        return semaphore
+
+    def _invoke(
+        self,
+        tool: BaseTool,
+        func: Callable[[], str],
+        cancel: threading.Event,
+        semaphore: Optional[threading.BoundedSemaphore]
+    ) -> str:
+        """在取消信号的作用域内执行工具，结束后归还并发名额"""
+        in_flight = self.metrics.gauge("goagent_tool_in_flight", "正在执行的工具调用数")
+        in_flight.inc(tool=tool.name)
+        try:
+            with cancel_scope(cancel):
+                return func()
+        finally:
+            in_flight.dec(tool=tool.name)
+            if semaphore is not None:
+                semaphore.release()
+
+    def _invoke_in_process(
+        self,
+        tool: BaseTool,
+        remote: Tuple[str, Tuple[Any, ...]],
+        remaining: Optional[float],
+        timeout: Optional[float],
+        cancel: threading.Event,
+        semaphore: Optional[threading.BoundedSemaphore]
+    ) -> str:
+        """在工作进程中执行工具，结束后归还并发名额；等待结果期间只阻塞调用方线程，不持有 GIL"""
+        method, args = remote
+        in_flight = self.metrics.gauge("goagent_tool_in_flight", "正在执行的工具调用数")
+        in_flight.inc(tool=tool.name)
+        try:
+            return self._get_process_pool().run(tool, method, args, remaining, cancel)
+        except ToolTimeoutError as e:
+            # 报告配置的超时时间，而不是扣除排队后剩余的时间
+            raise ToolTimeoutError(tool.name, timeout, queued=e.queued) from None
+        finally:
+            in_flight.dec(tool=tool.name)
+            if semaphore is not None:
+                semaphore.release()
+
+    def runs_in_process(self, name: str) -> bool:
+        """工具是否在进程池中执行: 标记为 CPU 密集型且未禁用进程池"""
+        if self.process_workers == 0:
+            return False
+        if name in self.cpu_bound_tools:
+            return True
+        tool = self.tools.get(name)
+        return tool is not None and tool.cpu_bound
+
+    def warm_up(self) -> None:
+        """预热进程池: 启动全部工作进程，并把已注册的 CPU 密集型工具加载到每个进程中"""
+        if self.process_workers == 0:
+            return
+        tools = [tool for name, tool in self.tools.items() if self.runs_in_process(name)]
+        self._get_process_pool().start(tools)
+
+    def _get_process_pool(self) -> "ToolProcessPool":
+        if self._process_pool is None:
+            with self._semaphores_lock:
+                if self._process_pool is None:
+                    from .process_pool import ToolProcessPool
+                    self._process_pool = ToolProcessPool(
+                        max_workers=self.process_workers,
+                        memory_limit=self.process_memory_limit,
+                        metrics=self.metrics
+                    )
+        return self._process_pool
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._semaphores_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="goagent-tool")
+        return self._pool
+
+    def close(self) -> None:
+        """关闭执行线程池与进程池，不等待仍在执行的工具"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        if self._process_pool is not None:
+            self._process_pool.close()
+            self._process_pool = None
     
     def get_available_tools(self) -> str:
         """
@@ -72,12 +467,31 @@ class ToolExecutor:
 
     def get_tools_description(self) -> str:
         """
-        获取所有工具的描述字符串。
+        获取所有工具的描述字符串，工具集合不变时复用上次的结果。
         
         Returns:
             工具描述字符串
         """
+        cached = self._description_cache
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
         descriptions = []
         for name, tool in self.tools.items():
             descriptions.append(f"{name}: {tool.description}")
-        return "\n".join(descriptions)
+        description = "\n".join(descriptions)
+        self._description_cache = (self.version, description)
+        return description
+
+    def get_openai_tools(self) -> List[Dict[str, Any]]:
+        """
+        获取所有工具的 OpenAI 函数调用定义，工具集合不变时复用上次的结果(同一个列表对象)。
+
+        Returns:
+            可直接作为请求参数 tools 的列表
+        """
+        cached = self._openai_tools_cache
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        tools = [tool.to_openai_tool() for tool in self.tools.values()]
+        self._openai_tools_cache = (self.version, tools)
+        return tools